@@ -1,8 +1,10 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import users, auth, postgres_demo
+from app.api.v1.endpoints import users, auth, jobs, metrics, postgres_demo
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, prefix="/auth", tags=["authentication"])
 api_router.include_router(users.router, prefix="/users", tags=["users"])
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
 api_router.include_router(postgres_demo.router, prefix="/postgres-demo", tags=["postgres-demo"])
@@ -1,14 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from app.core.database import get_db
+from app.core.ratelimit import login_rate_limit, register_rate_limit
+from app.core.tokens import TokenError, decode_token, revocations
 from app.schemas.auth import Token, UserLogin
 from app.services.auth_service import AuthService
 
 router = APIRouter()
 
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(login_rate_limit)])
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
@@ -22,11 +26,24 @@ async def login(
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = auth_service.create_access_token(data={"sub": user.email})
+    access_token = auth_service.create_access_token(data={"sub": user.email}, user=user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
-@router.post("/register")
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(authorization: Optional[str] = Header(None)):
+    """Revoke the bearer token of this request"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
+    try:
+        claims = decode_token(authorization[7:])
+    except TokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    if claims.get("jti"):
+        await run_in_threadpool(revocations.revoke_token, claims["jti"], claims["exp"])
+
+
+@router.post("/register", dependencies=[Depends(register_rate_limit)])
 async def register(user_data: UserLogin, db: Session = Depends(get_db)):
     """Register a new user"""
     auth_service = AuthService(db)
@@ -1,16 +1,26 @@
+import asyncio
 from typing import List
-from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
+from urllib.parse import urlencode
+from fastapi import APIRouter, Request, Depends, HTTPException, Form, Query, UploadFile, File
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.audit import ACTIONS, ENTITY_TYPES, SETTING_FIELDS, USER_FIELDS, audit_log, diff, snapshot
+from app.core.database import get_db, get_postgres_db1, get_sqlite_db
+from app.core.jobs import jobs
+from app.core.ratelimit import login_form_rate_limit, register_form_rate_limit
+from app.core.scheduler import scheduler
+from app.core.sessions import sync_user_sessions, user_session_data
+from app.core.tokens import revoke_user_tokens
 from app.core.auth import get_current_user, require_auth, require_admin
+from app.core.templates import templates, dom_id
+from app.core.pubsub import Message, event_stream
 from app.services.user_service import UserService
 from app.services.settings_service import SettingsService
+from app.services.user_import_service import start_user_import
+from app.services.postgres_db1_service import get_audit_events
 from app.schemas.user import UserCreate, UserUpdate
 
 router = APIRouter()
-templates = Jinja2Templates(directory="app/templates")
 
 
 @router.get("/", response_class=HTMLResponse)
@@ -38,7 +48,7 @@ async def register_page(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 
-@router.post("/auth/login", response_class=HTMLResponse)
+@router.post("/auth/login", response_class=HTMLResponse, dependencies=[Depends(login_form_rate_limit)])
 async def login_form(
     request: Request,
     email: str = Form(...),
@@ -65,19 +75,12 @@ async def login_form(
         })
     
     # Store user in session
-    request.session["user"] = {
-        "id": user.id,
-        "email": user.email,
-        "username": user.username,
-        "full_name": user.full_name,
-        "is_active": user.is_active,
-        "is_superuser": user.is_superuser
-    }
+    request.session["user"] = user_session_data(user)
     
     return RedirectResponse(url="/", status_code=303)
 
 
-@router.post("/auth/register", response_class=HTMLResponse)
+@router.post("/auth/register", response_class=HTMLResponse, dependencies=[Depends(register_form_rate_limit)])
 async def register_form(
     request: Request,
     email: str = Form(...),
@@ -151,7 +154,7 @@ async def activate_account(
 
 
 @router.get("/admin", response_class=HTMLResponse)
-async def admin_panel(request: Request):
+async def admin_panel(request: Request, db: Session = Depends(get_db)):
     """Admin panel page"""
     user = get_current_user(request)
     if not user:
@@ -163,7 +166,6 @@ async def admin_panel(request: Request):
             "error_type": "admin_access"
         })
     
-    db = next(get_db())
     user_service = UserService(db)
     settings_service = SettingsService(db)
     
@@ -189,10 +191,10 @@ async def admin_users_table(
     request: Request, 
     sort: str = Query(None),
     order: str = Query("asc"),
-    user: dict = Depends(require_admin)
+    user: dict = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
     """HTMX endpoint for users table"""
-    db = next(get_db())
     user_service = UserService(db)
     users = user_service.get_users(sort=sort, order=order)
     
@@ -276,12 +278,12 @@ async def create_user_admin(
         if is_superuser.lower() == "true":
             user.is_superuser = True
             db.commit()
+        audit_log.record(current_user, "user.create", "user", user.id, diff({}, snapshot(user, USER_FIELDS)))
         
-        # Return updated users table
-        users = user_service.get_users()
-        return templates.TemplateResponse("users_table.html", {
+        # Return only the new row; the form appends it to the table body
+        return templates.TemplateResponse("user_row.html", {
             "request": request,
-            "users": users
+            "user": user
         })
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error creating user")
@@ -301,10 +303,6 @@ async def update_user_admin(
 ):
     """Update user from admin panel"""
     user_service = UserService(db)
-    user = user_service.get_user(user_id)
-    if not user:
-        from app.core.exceptions import UserNotFoundException
-        raise UserNotFoundException()
     
     user_update = UserUpdate(
         email=email,
@@ -313,20 +311,33 @@ async def update_user_admin(
         is_active=is_active.lower() == "true"
     )
     
+    before = snapshot(user_service.get_user(user_id), USER_FIELDS)
     try:
         updated_user = user_service.update_user(user_id, user_update)
-        # Update superuser status
-        updated_user.is_superuser = is_superuser.lower() == "true"
-        db.commit()
-        
-        # Return updated users table
-        users = user_service.get_users()
-        return templates.TemplateResponse("users_table.html", {
-            "request": request,
-            "users": users
-        })
+        if updated_user:
+            # Update superuser status
+            make_superuser = is_superuser.lower() == "true"
+            if updated_user.is_superuser != make_superuser:
+                updated_user.is_superuser = make_superuser
+                db.commit()
+                sync_user_sessions(updated_user)
+                revoke_user_tokens(updated_user.id)
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error updating user")
+    
+    if not updated_user:
+        from app.core.exceptions import UserNotFoundException
+        raise UserNotFoundException()
+    
+    changes = diff(before, snapshot(updated_user, USER_FIELDS))
+    if changes:
+        audit_log.record(current_user, "user.update", "user", user_id, changes)
+    
+    # Return only the changed row; the form swaps it in place
+    return templates.TemplateResponse("user_row.html", {
+        "request": request,
+        "user": updated_user
+    })
 
 
 @router.delete("/admin/users/{user_id}", response_class=HTMLResponse)
@@ -338,21 +349,52 @@ async def delete_user_admin(
 ):
     """Delete user from admin panel"""
     user_service = UserService(db)
+    before = snapshot(user_service.get_user(user_id), USER_FIELDS)
     
     try:
         success = user_service.delete_user(user_id)
-        if not success:
-            from app.core.exceptions import UserNotFoundException
-            raise UserNotFoundException()
-        
-        # Return updated users table
-        users = user_service.get_users()
-        return templates.TemplateResponse("users_table.html", {
-            "request": request,
-            "users": users
-        })
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error deleting user")
+    
+    if not success:
+        from app.core.exceptions import UserNotFoundException
+        raise UserNotFoundException()
+    audit_log.record(current_user, "user.delete", "user", user_id, diff(before, {}))
+    
+    # Remove the row out-of-band instead of re-rendering the table
+    return templates.TemplateResponse("row_deleted.html", {
+        "request": request,
+        "row_id": f"user-row-{user_id}"
+    })
+
+
+@router.post("/admin/users/import", response_class=HTMLResponse)
+async def import_users_admin(
+    request: Request,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(require_admin),
+    db: Session = Depends(get_sqlite_db)
+):
+    """Start a bulk user import; the returned fragment polls the job status"""
+    try:
+        job = await start_user_import(file, None, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    audit_log.record(current_user, "user.import", "import_job", job.id, {"filename": [None, file.filename]})
+    return templates.TemplateResponse("import_status.html", {"request": request, "job": job})
+
+
+@router.get("/admin/jobs/{job_id}", response_class=HTMLResponse)
+async def job_status_admin(
+    request: Request,
+    job_id: str,
+    current_user: dict = Depends(require_admin)
+):
+    """HTMX endpoint for background job progress"""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return templates.TemplateResponse("import_status.html", {"request": request, "job": job})
 
 
 # Settings endpoints
@@ -361,10 +403,10 @@ async def admin_settings_table(
     request: Request, 
     sort: str = Query(None),
     order: str = Query("asc"),
-    user: dict = Depends(require_admin)
+    user: dict = Depends(require_admin),
+    db: Session = Depends(get_db)
 ):
     """HTMX endpoint for settings table"""
-    db = next(get_db())
     settings_service = SettingsService(db)
     settings = settings_service.get_settings(sort=sort, order=order)
     
@@ -438,13 +480,13 @@ async def create_setting_admin(
     setting_create = SettingsCreate(setting_name=setting_name, value=value)
     
     try:
-        settings_service.create_setting(setting_create)
+        setting = settings_service.create_setting(setting_create)
+        audit_log.record(current_user, "setting.create", "setting", setting_name, diff({}, snapshot(setting, SETTING_FIELDS)))
         
-        # Return updated settings table
-        settings = settings_service.get_settings()
-        return templates.TemplateResponse("settings_table.html", {
+        # Return only the new row; the form appends it to the table body
+        return templates.TemplateResponse("setting_row.html", {
             "request": request,
-            "settings": settings
+            "setting": setting
         })
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error creating setting")
@@ -463,20 +505,25 @@ async def update_setting_admin(
     settings_service = SettingsService(db)
     
     setting_update = SettingsUpdate(value=value)
+    before = snapshot(settings_service.get_setting(setting_name), SETTING_FIELDS)
     
     try:
         updated_setting = settings_service.update_setting(setting_name, setting_update)
-        if not updated_setting:
-            raise HTTPException(status_code=404, detail="Setting not found")
-        
-        # Return updated settings table
-        settings = settings_service.get_settings()
-        return templates.TemplateResponse("settings_table.html", {
-            "request": request,
-            "settings": settings
-        })
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error updating setting")
+    
+    if not updated_setting:
+        raise HTTPException(status_code=404, detail="Setting not found")
+    
+    changes = diff(before, snapshot(updated_setting, SETTING_FIELDS))
+    if changes:
+        audit_log.record(current_user, "setting.update", "setting", setting_name, changes)
+    
+    # Return only the changed row; the form swaps it in place
+    return templates.TemplateResponse("setting_row.html", {
+        "request": request,
+        "setting": updated_setting
+    })
 
 
 @router.delete("/admin/settings/{setting_name}", response_class=HTMLResponse)
@@ -488,17 +535,129 @@ async def delete_setting_admin(
 ):
     """Delete setting from admin panel"""
     settings_service = SettingsService(db)
+    before = snapshot(settings_service.get_setting(setting_name), SETTING_FIELDS)
     
     try:
         success = settings_service.delete_setting(setting_name)
-        if not success:
-            raise HTTPException(status_code=404, detail="Setting not found")
-        
-        # Return updated settings table
-        settings = settings_service.get_settings()
-        return templates.TemplateResponse("settings_table.html", {
-            "request": request,
-            "settings": settings
-        })
     except Exception as e:
         raise HTTPException(status_code=400, detail="Error deleting setting")
+    
+    if not success:
+        raise HTTPException(status_code=404, detail="Setting not found")
+    audit_log.record(current_user, "setting.delete", "setting", setting_name, diff(before, {}))
+    
+    # Remove the row out-of-band instead of re-rendering the table
+    return templates.TemplateResponse("row_deleted.html", {
+        "request": request,
+        "row_id": f"setting-row-{dom_id(setting_name)}"
+    })
+
+
+# Live feed endpoints
+def _render_live_event(message: Message) -> str:
+    return templates.get_template("live_event.html").render(message=message).strip()
+
+
+@router.get("/admin/live", response_class=HTMLResponse)
+async def admin_live_feed(
+    request: Request,
+    severity: str = Query(None),
+    metric_name: str = Query(None),
+    user: dict = Depends(require_admin)
+):
+    """HTMX endpoint for the live feed panel (reconnects with new filters)"""
+    return templates.TemplateResponse("live_feed.html", {
+        "request": request,
+        "severity": severity,
+        "metric_name": metric_name
+    })
+
+
+@router.get("/admin/live/stream")
+async def admin_live_feed_stream(
+    request: Request,
+    severity: str = Query(None),
+    metric_name: str = Query(None),
+    user: dict = Depends(require_admin)
+):
+    """Server-sent events stream of rendered rows for the live feed panel"""
+    from app.services.postgres_db2_service import subscribe_live_feed
+    
+    subscription = subscribe_live_feed(severity=severity, metric_name=metric_name)
+    return StreamingResponse(
+        event_stream(request, subscription, lambda m: m.encode("html", _render_live_event)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Scheduler endpoints
+def _scheduler_panel(request: Request):
+    return templates.TemplateResponse("scheduler_panel.html", {
+        "request": request,
+        "jobs": list(scheduler.jobs.values()),
+        "runs": scheduler.recent_runs(limit=20),
+        "scheduler_running": scheduler.running,
+        "is_leader": scheduler.is_leader,
+        "worker_id": scheduler.worker_id
+    })
+
+
+@router.get("/admin/scheduler", response_class=HTMLResponse)
+async def admin_scheduler(request: Request, user: dict = Depends(require_admin)):
+    """HTMX endpoint for the scheduler panel"""
+    return _scheduler_panel(request)
+
+
+@router.post("/admin/scheduler/{job_name}/run", response_class=HTMLResponse)
+async def run_scheduled_job_admin(
+    request: Request,
+    job_name: str,
+    user: dict = Depends(require_admin)
+):
+    """Run a scheduled job now on this worker"""
+    if job_name not in scheduler.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        scheduler.trigger(job_name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    audit_log.record(user, "scheduler.run", "scheduler_job", job_name)
+    # Let the run mark itself as started before rendering
+    await asyncio.sleep(0)
+    return _scheduler_panel(request)
+
+
+# Audit log endpoints
+@router.get("/admin/audit", response_class=HTMLResponse)
+async def admin_audit_log(
+    request: Request,
+    actor: str = Query(None),
+    action: str = Query(None),
+    entity_type: str = Query(None),
+    entity_id: str = Query(None),
+    before: int = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    user: dict = Depends(require_admin),
+    db: Session = Depends(get_postgres_db1)
+):
+    """HTMX endpoint for the audit trail; with ``before``, only the next page of rows"""
+    # Empty form fields mean no filter
+    filters = {
+        name: value for name, value in
+        {"actor": actor, "action": action, "entity_type": entity_type, "entity_id": entity_id}.items()
+        if value
+    }
+    events = await get_audit_events(**filters, before_id=before, limit=limit + 1, db=db)
+    next_url = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_url = "/admin/audit?" + urlencode({**filters, "before": events[-1].id, "limit": limit})
+    return templates.TemplateResponse("audit_rows.html" if before else "audit_panel.html", {
+        "request": request,
+        "events": events,
+        "next_url": next_url,
+        "filters": filters,
+        "actions": ACTIONS,
+        "entity_types": ENTITY_TYPES
+    })
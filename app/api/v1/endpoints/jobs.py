@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.auth import require_admin
+from app.core.jobs import jobs
+
+router = APIRouter()
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, current_user: dict = Depends(require_admin)):
+    """Status and progress counters of a background job"""
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
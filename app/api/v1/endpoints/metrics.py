@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends
+from app.core.activity import activity_log
+from app.core.alerts import alert_engine
+from app.core.analytics_sketches import analytics_sketches
+from app.core.archive import column_archive
+from app.core.audit import audit_log
+from app.core.auth import require_admin
+from app.core.connection_tracking import connection_tracker
+from app.core.email import email_queue
+from app.core.idempotency import ingest_dedup
+from app.core.ratelimit import limiter
+from app.core.spool import ingest_spool
+from app.core.tokens import token_metrics
+from app.core.user_index import user_index
+
+router = APIRouter()
+
+
+@router.get("/")
+async def get_metrics(current_user: dict = Depends(require_admin)):
+    """In-process counters for this worker"""
+    return {
+        "rate_limit": limiter.metrics(),
+        "tokens": token_metrics.snapshot(),
+        "user_index": user_index.metrics(),
+        "db_connections": connection_tracker.metrics(),
+        "audit": audit_log.metrics(),
+        "activity_log": activity_log.metrics(),
+        "analytics_sketches": analytics_sketches.metrics(),
+        "archive": column_archive.metrics(),
+        "alerts": alert_engine.metrics(),
+        "email_queue": email_queue.metrics(),
+        "ingest_dedup": ingest_dedup.metrics(),
+        "spool": ingest_spool.metrics()
+    }
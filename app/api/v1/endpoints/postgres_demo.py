@@ -1,19 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from app.core.analytics_sketches import analytics_sketches
+from app.core.pubsub import Message, event_stream
+from app.core.responses import FastJSONResponse
+from app.core.user_index import user_index
 from app.core.database import get_sqlite_db, get_postgres_db1, get_postgres_db2
 from app.services.postgres_db1_service import (
     create_analytics_event,
     create_user_log,
-    get_user_analytics,
-    get_user_logs
+    get_user_analytics_rows,
+    get_user_logs_rows,
+    search_user_logs
 )
+from app.core.search import SORTS
+from app.core.timeseries import AGGREGATIONS, FILLS
 from app.services.postgres_db2_service import (
     create_system_event,
     create_performance_metric,
-    get_system_events,
-    get_performance_metrics
+    get_system_events_rows,
+    get_performance_metrics_rows,
+    get_performance_metric_points,
+    get_performance_metric_series,
+    search_system_events,
+    subscribe_live_feed
 )
-from app.models.user import User
 from typing import Optional
 from pydantic import BaseModel
 
@@ -50,13 +62,19 @@ class PerformanceMetricCreate(BaseModel):
 @router.post("/analytics")
 async def create_analytics(
     analytics: AnalyticsEventCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     sqlite_db: Session = Depends(get_sqlite_db),
     postgres_db1: Session = Depends(get_postgres_db1)
 ):
-    """Create analytics event - demonstrates cross-database operation"""
-    # First, verify user exists in SQLite database
-    user = sqlite_db.query(User).filter(User.id == analytics.user_id).first()
-    if not user:
+    """Create analytics event - demonstrates cross-database operation.
+
+    Retries are safe: send the same ``Idempotency-Key`` header, or resend the
+    same event within ``INGEST_DEDUP_CONTENT_SECONDS``, to get the original id.
+    While the database is unreachable the event is spooled: 202, no id yet.
+    """
+    # First, verify user exists (in-memory id index; SQLite only for unknown ids)
+    if not user_index.exists(analytics.user_id, sqlite_db):
         raise HTTPException(status_code=404, detail="User not found")
     
     # Then create analytics event in PostgreSQL Database 1
@@ -64,9 +82,14 @@ async def create_analytics(
         user_id=analytics.user_id,
         event_type=analytics.event_type,
         event_data=analytics.event_data,
+        idempotency_key=idempotency_key,
+        deduplicate=True,
         db=postgres_db1
     )
     
+    if analytics_event.id is None:
+        response.status_code = 202
+        return {"message": "Analytics event spooled", "event_id": None}
     return {"message": "Analytics event created", "event_id": analytics_event.id}
 
 
@@ -77,9 +100,8 @@ async def create_user_log_entry(
     postgres_db1: Session = Depends(get_postgres_db1)
 ):
     """Create user log entry - demonstrates cross-database operation"""
-    # Verify user exists in SQLite database
-    user = sqlite_db.query(User).filter(User.id == user_log.user_id).first()
-    if not user:
+    # Verify user exists (in-memory id index; SQLite only for unknown ids)
+    if not user_index.exists(user_log.user_id, sqlite_db):
         raise HTTPException(status_code=404, detail="User not found")
     
     # Create log entry in PostgreSQL Database 1
@@ -97,34 +119,48 @@ async def create_user_log_entry(
 @router.post("/system-event")
 async def create_system_event_entry(
     system_event: SystemEventCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     postgres_db2: Session = Depends(get_postgres_db2)
 ):
-    """Create system event in PostgreSQL Database 2"""
+    """Create system event in PostgreSQL Database 2 (retries and outages handled as for analytics)"""
     event = await create_system_event(
         event_type=system_event.event_type,
         severity=system_event.severity,
         message=system_event.message,
         event_metadata=system_event.event_metadata,
+        idempotency_key=idempotency_key,
+        deduplicate=True,
         db=postgres_db2
     )
     
+    if event.id is None:
+        response.status_code = 202
+        return {"message": "System event spooled", "event_id": None}
     return {"message": "System event created", "event_id": event.id}
 
 
 @router.post("/performance-metric")
 async def create_performance_metric_entry(
     metric: PerformanceMetricCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     postgres_db2: Session = Depends(get_postgres_db2)
 ):
-    """Create performance metric in PostgreSQL Database 2"""
+    """Create performance metric in PostgreSQL Database 2 (retries and outages handled as for analytics)"""
     performance_metric = await create_performance_metric(
         metric_name=metric.metric_name,
         metric_value=metric.metric_value,
         unit=metric.unit,
         tags=metric.tags,
+        idempotency_key=idempotency_key,
+        deduplicate=True,
         db=postgres_db2
     )
     
+    if performance_metric.id is None:
+        response.status_code = 202
+        return {"message": "Performance metric spooled", "metric_id": None}
     return {"message": "Performance metric created", "metric_id": performance_metric.id}
 
 
@@ -133,16 +169,70 @@ async def get_analytics_events(
     user_id: Optional[int] = None,
     event_type: Optional[str] = None,
     limit: int = 100,
+    fields: Optional[str] = None,
     postgres_db1: Session = Depends(get_postgres_db1)
 ):
-    """Get analytics events from PostgreSQL Database 1"""
-    events = await get_user_analytics(
+    """Get analytics events from PostgreSQL Database 1.
+
+    ``fields`` is an optional comma-separated column list, e.g. ``?fields=id,event_type``.
+    """
+    events = await get_user_analytics_rows(
         user_id=user_id,
         event_type=event_type,
         limit=limit,
+        fields=fields,
         db=postgres_db1
     )
-    return events
+    return FastJSONResponse(events)
+
+
+def loaded_sketches():
+    if not analytics_sketches.loaded:
+        raise HTTPException(status_code=503, detail="Approximate analytics are not available")
+    return analytics_sketches
+
+
+@router.get("/analytics/distinct-users")
+async def approximate_distinct_users(
+    event_type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Approximate number of distinct users with analytics events, from in-memory sketches.
+
+    The range defaults to the last 24 hours and is rounded out to whole buckets.
+    """
+    return loaded_sketches().distinct_users(since=since, until=until, event_type=event_type)
+
+
+@router.get("/analytics/top-event-types")
+async def approximate_top_event_types(
+    k: int = Query(10, ge=1, le=100),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Most frequent event types with approximate counts, from in-memory sketches"""
+    return loaded_sketches().top_event_types(k=k, since=since, until=until)
+
+
+@router.get("/analytics/percentiles")
+async def approximate_percentiles(
+    field: str,
+    q: str = "0.5,0.9,0.99",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Approximate percentiles of a numeric ``event_data`` field, from in-memory sketches.
+
+    ``q`` is a comma-separated list of quantiles between 0 and 1, e.g. ``?field=duration_ms&q=0.5,0.99``.
+    """
+    try:
+        quantiles = [float(value) for value in q.split(",")]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="q must be comma-separated numbers")
+    if not all(0 <= value <= 1 for value in quantiles):
+        raise HTTPException(status_code=400, detail="Quantiles must be between 0 and 1")
+    return loaded_sketches().percentiles(field, quantiles, since=since, until=until)
 
 
 @router.get("/user-logs")
@@ -150,16 +240,40 @@ async def get_user_log_entries(
     user_id: Optional[int] = None,
     action: Optional[str] = None,
     limit: int = 100,
+    fields: Optional[str] = None,
     postgres_db1: Session = Depends(get_postgres_db1)
 ):
-    """Get user logs from PostgreSQL Database 1"""
-    logs = await get_user_logs(
+    """Get user logs from PostgreSQL Database 1.
+
+    ``fields`` is an optional comma-separated column list, e.g. ``?fields=id,action``.
+    """
+    logs = await get_user_logs_rows(
         user_id=user_id,
         action=action,
         limit=limit,
+        fields=fields,
         db=postgres_db1
     )
-    return logs
+    return FastJSONResponse(logs)
+
+
+@router.get("/user-logs/search")
+async def search_user_log_entries(
+    q: str = Query(..., min_length=1, description='words and "quoted phrases" to find in user agents'),
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    sort: str = Query("rank", enum=list(SORTS)),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    postgres_db1: Session = Depends(get_postgres_db1)
+):
+    """Full-text search over user log user agents: best matches (or newest) first,
+    with highlighted fragments and keyset pagination through ``next_cursor``"""
+    try:
+        results = await search_user_logs(q, user_id, action, limit, cursor, sort, db=postgres_db1)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(results)
 
 
 @router.get("/system-events")
@@ -167,28 +281,110 @@ async def get_system_event_entries(
     event_type: Optional[str] = None,
     severity: Optional[str] = None,
     limit: int = 100,
+    fields: Optional[str] = None,
     postgres_db2: Session = Depends(get_postgres_db2)
 ):
-    """Get system events from PostgreSQL Database 2"""
-    events = await get_system_events(
+    """Get system events from PostgreSQL Database 2.
+
+    ``fields`` is an optional comma-separated column list, e.g. ``?fields=id,severity,message``.
+    """
+    events = await get_system_events_rows(
         event_type=event_type,
         severity=severity,
         limit=limit,
+        fields=fields,
         db=postgres_db2
     )
-    return events
+    return FastJSONResponse(events)
+
+
+@router.get("/system-events/search")
+async def search_system_event_entries(
+    q: str = Query(..., min_length=1, description='words and "quoted phrases" to find in messages'),
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    sort: str = Query("rank", enum=list(SORTS)),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    postgres_db2: Session = Depends(get_postgres_db2)
+):
+    """Full-text search over system event messages: best matches (or newest) first,
+    with highlighted fragments and keyset pagination through ``next_cursor``"""
+    try:
+        results = await search_system_events(q, event_type, severity, limit, cursor, sort, db=postgres_db2)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(results)
 
 
 @router.get("/performance-metrics")
 async def get_performance_metric_entries(
     metric_name: Optional[str] = None,
     limit: int = 100,
+    fields: Optional[str] = None,
     postgres_db2: Session = Depends(get_postgres_db2)
 ):
-    """Get performance metrics from PostgreSQL Database 2"""
-    metrics = await get_performance_metrics(
+    """Get performance metrics from PostgreSQL Database 2.
+
+    ``fields`` is an optional comma-separated column list, e.g. ``?fields=metric_value,recorded_at``.
+    """
+    metrics = await get_performance_metrics_rows(
         metric_name=metric_name,
         limit=limit,
+        fields=fields,
         db=postgres_db2
     )
-    return metrics
+    return FastJSONResponse(metrics)
+
+
+@router.get("/performance-metrics/series")
+async def get_performance_metric_series_entries(
+    metric_name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    step: int = Query(60, ge=1, description="bucket width in seconds"),
+    aggregation: str = Query("avg", enum=list(AGGREGATIONS)),
+    fill: str = Query("null", enum=list(FILLS), description="value for buckets without data"),
+    downsample: Optional[str] = Query(None, enum=["lttb"], description="pick raw points instead of aggregating"),
+    points: int = Query(500, ge=3, le=10000, description="target points for downsample=lttb"),
+    postgres_db2: Session = Depends(get_postgres_db2)
+):
+    """One performance metric over a time range (default: the last 24 hours), for charting.
+
+    By default one aggregated value per ``step`` seconds, computed in the database, with
+    gaps filled. ``downsample=lttb`` instead returns about ``points`` raw samples that keep
+    the shape of the series.
+    """
+    try:
+        if downsample == "lttb":
+            series = await get_performance_metric_points(metric_name, start, end, points, db=postgres_db2)
+        else:
+            series = await get_performance_metric_series(
+                metric_name, start, end, step, aggregation, fill, db=postgres_db2
+            )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(series)
+
+
+@router.get("/stream")
+async def stream_live_feed(
+    request: Request,
+    severity: Optional[str] = None,
+    metric_name: Optional[str] = None,
+    topics: Optional[str] = None
+):
+    """Server-sent events feed of newly created system events and performance metrics.
+
+    Filters are comma-separated lists, e.g. ``?severity=ERROR,CRITICAL``.
+    """
+    subscription = subscribe_live_feed(
+        severity=severity,
+        metric_name=metric_name,
+        topics=topics.split(",") if topics else None
+    )
+    return StreamingResponse(
+        event_stream(request, subscription, Message.json),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,12 +1,17 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from app.core.database import get_db
+from app.core.auth import require_admin
+from app.core.database import get_db, get_sqlite_db
 from app.schemas.user import User, UserCreate, UserUpdate
 from app.services.user_service import UserService
+from app.services.user_import_service import IMPORT_FORMATS, iter_user_export, start_user_import
 
 router = APIRouter()
 
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
 
 @router.get("/", response_model=List[User])
 async def get_users(
@@ -19,6 +24,35 @@ async def get_users(
     return users
 
 
+@router.post("/import", status_code=202)
+async def import_users(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, description="csv or ndjson; guessed from the file if omitted"),
+    current_user: dict = Depends(require_admin),
+    db: Session = Depends(get_sqlite_db)
+):
+    """Bulk-create users from a CSV or NDJSON upload; poll /jobs/{id} for progress"""
+    try:
+        job = await start_user_import(file, format, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+
+@router.get("/export")
+async def export_users(
+    format: str = Query("csv", enum=list(IMPORT_FORMATS)),
+    current_user: dict = Depends(require_admin),
+    db: Session = Depends(get_sqlite_db)
+):
+    """Stream every user as CSV or NDJSON"""
+    return StreamingResponse(
+        iter_user_export(db, format),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'}
+    )
+
+
 @router.get("/{user_id}", response_model=User)
 async def get_user(user_id: int, db: Session = Depends(get_db)):
     """Get a specific user by ID"""
@@ -0,0 +1,132 @@
+import random
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.core.batch_writer import BatchWriter
+from app.core.config import settings
+from app.core.database import get_postgres_db1_engine
+from app.core.tokens import TokenError, decode_token
+from app.models.postgres_db1 import UserLog
+
+USER_AGENT_MAX_LENGTH = 512
+
+
+def parse_sample_rates(spec: str) -> List[Tuple[str, float]]:
+    """``"/prefix=rate,..."`` as (prefix, rate) pairs, longest prefix first"""
+    rates = []
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        prefix, _, rate = item.strip().rpartition("=")
+        if not prefix.startswith("/") or not 0.0 <= float(rate) <= 1.0:
+            raise ValueError(f"Invalid activity log sample rate: {item!r}")
+        rates.append((prefix, float(rate)))
+    return sorted(rates, key=lambda pair: -len(pair[0]))
+
+
+class ActivityLog(BatchWriter):
+    """Authenticated requests recorded as UserLog rows, sampled per path prefix.
+
+    Logging must never slow requests down, so under overload entries are
+    dropped (and counted) instead of queued: a full buffer refuses new
+    entries and a failed batch write is discarded.
+    """
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], Engine] = get_postgres_db1_engine,
+        sample_rates: Optional[str] = None,
+        default_rate: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None
+    ):
+        super().__init__(
+            UserLog.__table__,
+            engine_factory,
+            batch_size=batch_size or settings.ACTIVITY_LOG_BATCH_SIZE,
+            flush_interval=flush_interval or settings.ACTIVITY_LOG_FLUSH_SECONDS,
+            max_pending=max_pending or settings.ACTIVITY_LOG_MAX_PENDING,
+            drop_newest=True,
+            name="activity log"
+        )
+        self.sample_rates = parse_sample_rates(
+            settings.ACTIVITY_LOG_SAMPLE_RATES if sample_rates is None else sample_rates
+        )
+        self.default_rate = settings.ACTIVITY_LOG_DEFAULT_RATE if default_rate is None else default_rate
+        self.random = random.random
+
+    def sample_rate(self, path: str) -> float:
+        for prefix, rate in self.sample_rates:
+            if path.startswith(prefix):
+                return rate
+        return self.default_rate
+
+    def sampled(self, path: str) -> bool:
+        rate = self.sample_rate(path)
+        return rate >= 1.0 or (rate > 0.0 and self.random() < rate)
+
+    def record(
+        self,
+        user_id: int,
+        action: str,
+        ip_address: Optional[str] = None,
+        user_agent: Optional[str] = None
+    ) -> bool:
+        return self.add({
+            "user_id": user_id,
+            "action": action,
+            "ip_address": ip_address,
+            "user_agent": user_agent[:USER_AGENT_MAX_LENGTH] if user_agent else None,
+            "created_at": datetime.now(timezone.utc),
+        })
+
+
+def request_user_id(scope: Scope, headers: Dict[bytes, bytes]) -> Optional[int]:
+    """The authenticated user's id from the session or a bearer token, without a database lookup"""
+    user = (scope.get("session") or {}).get("user")
+    if isinstance(user, dict):
+        return user.get("id")
+    authorization = headers.get(b"authorization", b"")
+    if authorization.startswith(b"Bearer "):
+        try:
+            claims = decode_token(authorization[7:].decode("latin-1"))
+        except TokenError:
+            return None
+        # Tokens without a uid claim would need a lookup by email; not logged
+        return claims.get("uid")
+    return None
+
+
+class ActivityLogMiddleware:
+    """Records sampled authenticated requests once their response has been sent.
+
+    Must sit inside the session middleware to see ``scope["session"]``. The
+    action is the method and route template, e.g. ``PUT /admin/users/{user_id}``.
+    """
+
+    def __init__(self, app: ASGIApp, activity_log: ActivityLog):
+        self.app = app
+        self.activity_log = activity_log
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.app(scope, receive, send)
+        if scope["type"] != "http" or not self.activity_log.sampled(scope["path"]):
+            return
+        headers = dict(scope["headers"])
+        user_id = request_user_id(scope, headers)
+        if user_id is None:
+            return
+        route = scope.get("route")
+        client = scope.get("client")
+        user_agent = headers.get(b"user-agent")
+        self.activity_log.record(
+            user_id,
+            f"{scope['method']} {getattr(route, 'path', scope['path'])}",
+            client[0] if client else None,
+            user_agent.decode("latin-1") if user_agent else None
+        )
+
+
+activity_log = ActivityLog()
@@ -0,0 +1,329 @@
+import html
+import json
+import operator
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+from app.core.config import settings
+from app.core.email import EmailQueue, email_queue
+
+SEVERITIES = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+SEVERITY_ALIASES = {"WARN": "WARNING", "ERR": "ERROR", "CRIT": "CRITICAL", "FATAL": "CRITICAL"}
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le, "==": operator.eq, "!=": operator.ne}
+
+DEFAULT_RULES = [
+    {
+        "name": "critical-event",
+        "description": "A CRITICAL system event",
+        "severity": "CRITICAL",
+        "group_by": ["event_type"],
+        "cooldown_seconds": 300,
+    },
+    {
+        "name": "error-burst",
+        "description": "10 or more ERROR or CRITICAL events of one type within 5 minutes",
+        "severity": "ERROR",
+        "count": 10,
+        "window_seconds": 300,
+        "group_by": ["event_type"],
+        "cooldown_seconds": 900,
+    },
+]
+
+
+def normalize_severity(value: Any) -> str:
+    """Severities are free-form strings; compare them as upper-case canonical names"""
+    name = str(value or "").strip().upper()
+    return SEVERITY_ALIASES.get(name, name)
+
+
+def severity_rank(value: Any) -> int:
+    """Position in SEVERITIES; -1 for unknown severities"""
+    name = normalize_severity(value)
+    return SEVERITIES.index(name) if name in SEVERITIES else -1
+
+
+def metadata_value(event: Dict[str, Any], path: str) -> Any:
+    """A value from event_metadata by dotted path, or None"""
+    value: Any = event.get("event_metadata")
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+class SlidingWindowCounter:
+    """Events in the last ``window`` seconds, counted per slot of
+    ``window / slots`` seconds: memory stays O(slots) however many events
+    arrive, and the window is accurate to one slot."""
+
+    def __init__(self, window: float, slots: int = 30):
+        self.width = window / slots
+        self.slots = slots
+        self.total = 0
+        self._counts: Deque[List[int]] = deque()  # [slot number, count], oldest first
+
+    def _expire(self, now: float) -> None:
+        oldest = int(now // self.width) - self.slots + 1
+        while self._counts and self._counts[0][0] < oldest:
+            self.total -= self._counts.popleft()[1]
+
+    def add(self, now: float, count: int = 1) -> int:
+        """Count events at ``now``; returns the total in the window"""
+        self._expire(now)
+        slot = int(now // self.width)
+        if self._counts and self._counts[-1][0] == slot:
+            self._counts[-1][1] += count
+        else:
+            self._counts.append([slot, count])
+        self.total += count
+        return self.total
+
+    def count(self, now: float) -> int:
+        self._expire(now)
+        return self.total
+
+
+class AlertRule:
+    """Which events count toward an alert and when it fires.
+
+    An event matches when every condition given holds: ``severity`` at
+    least this level, exact ``event_type``, ``message`` regex search,
+    ``metadata`` regexes searched in the string form of each key, and the
+    threshold ``field op value`` on a numeric metadata value (dotted path).
+    The rule fires once ``count`` matches fall within ``window_seconds``,
+    separately per ``group_by`` value (``event_type``, ``severity`` or
+    ``metadata.<path>``), then stays quiet for that group for
+    ``cooldown_seconds``.
+    """
+
+    FIELDS = {
+        "name", "description", "severity", "event_type", "message", "metadata", "field", "op", "value",
+        "count", "window_seconds", "cooldown_seconds", "group_by",
+    }
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        severity: Optional[str] = None,
+        event_type: Optional[str] = None,
+        message: Optional[str] = None,
+        metadata: Optional[Dict[str, str]] = None,
+        field: Optional[str] = None,
+        op: str = ">",
+        value: Optional[float] = None,
+        count: int = 1,
+        window_seconds: float = 60,
+        cooldown_seconds: float = 300,
+        group_by: Sequence[str] = ()
+    ):
+        if not name:
+            raise ValueError("Alert rules need a name")
+        if severity is not None and severity_rank(severity) < 0:
+            raise ValueError(f"Rule {name}: unknown severity {severity!r}, expected one of {', '.join(SEVERITIES)}")
+        if op not in OPERATORS:
+            raise ValueError(f"Rule {name}: unknown operator {op!r}")
+        if (field is None) != (value is None):
+            raise ValueError(f"Rule {name}: a threshold needs both field and value")
+        if count < 1 or window_seconds <= 0 or cooldown_seconds < 0:
+            raise ValueError(f"Rule {name}: count, window_seconds and cooldown_seconds must be positive")
+        for key in group_by:
+            if key not in ("event_type", "severity") and not key.startswith("metadata."):
+                raise ValueError(f"Rule {name}: cannot group by {key!r}")
+        try:
+            self.message = re.compile(message) if message else None
+            self.metadata = {key: re.compile(pattern) for key, pattern in (metadata or {}).items()}
+        except re.error as e:
+            raise ValueError(f"Rule {name}: invalid pattern: {e}")
+        self.name = name
+        self.description = description
+        self.severity = severity_rank(severity) if severity is not None else None
+        self.event_type = event_type
+        self.field = field
+        self.op = op
+        self.value = value
+        self.count = count
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.group_by = tuple(group_by)
+
+    @classmethod
+    def from_dict(cls, rule: Dict[str, Any]) -> "AlertRule":
+        unknown = set(rule) - cls.FIELDS
+        if unknown:
+            raise ValueError(f"Rule {rule.get('name')}: unknown keys {', '.join(sorted(unknown))}")
+        return cls(**rule)
+
+    def matches(self, event: Dict[str, Any]) -> bool:
+        if self.severity is not None and severity_rank(event.get("severity")) < self.severity:
+            return False
+        if self.event_type is not None and event.get("event_type") != self.event_type:
+            return False
+        if self.message is not None and not self.message.search(str(event.get("message") or "")):
+            return False
+        for key, pattern in self.metadata.items():
+            found = metadata_value(event, key)
+            if found is None or not pattern.search(str(found)):
+                return False
+        if self.field is not None:
+            found = metadata_value(event, self.field)
+            if isinstance(found, bool) or not isinstance(found, (int, float)):
+                return False
+            return OPERATORS[self.op](found, self.value)
+        return True
+
+    def group(self, event: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+        values = []
+        for key in self.group_by:
+            if key == "severity":
+                values.append((key, normalize_severity(event.get("severity"))))
+            elif key == "event_type":
+                values.append((key, event.get("event_type")))
+            else:
+                found = metadata_value(event, key[len("metadata."):])
+                values.append((key, found if isinstance(found, (str, int, float, bool)) or found is None else str(found)))
+        return tuple(values)
+
+
+def parse_rules(value: str) -> List[AlertRule]:
+    """Rules from a JSON list (the ALERT_RULES setting); empty means DEFAULT_RULES"""
+    rules = json.loads(value) if value and value.strip() else DEFAULT_RULES
+    if not isinstance(rules, list):
+        raise ValueError("ALERT_RULES must be a JSON list of rules")
+    parsed = [AlertRule.from_dict(rule) for rule in rules]
+    names = [rule.name for rule in parsed]
+    if len(names) != len(set(names)):
+        raise ValueError("Alert rule names must be unique")
+    return parsed
+
+
+class _GroupState:
+    __slots__ = ("window", "last_fired", "suppressed")
+
+    def __init__(self, window_seconds: float):
+        self.window = SlidingWindowCounter(window_seconds)
+        self.last_fired: Optional[float] = None
+        self.suppressed = 0
+
+
+class AlertEngine:
+    """Evaluates alert rules against each system event as it is ingested.
+
+    Rates come from incremental sliding-window counters kept per rule and
+    group, so nothing is re-queried. A fired alert is mailed to
+    ``recipients`` through the email queue; repeats within a rule's cooldown
+    are only counted, and the count goes out with the next notification.
+    State is per worker: rates count the events this process ingested.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Iterable[AlertRule]] = None,
+        recipients: Optional[Iterable[str]] = None,
+        queue: Optional[EmailQueue] = None,
+        max_groups: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.rules = list(rules) if rules is not None else parse_rules(settings.ALERT_RULES)
+        if recipients is None:
+            recipients = [address.strip() for address in settings.ALERT_RECIPIENTS.split(",") if address.strip()]
+        self.recipients = list(recipients)
+        self.queue = queue or email_queue
+        self.max_groups = max_groups or settings.ALERT_MAX_GROUPS
+        self.clock = clock
+        self._groups: Dict[str, "OrderedDict[tuple, _GroupState]"] = {rule.name: OrderedDict() for rule in self.rules}
+        self._lock = threading.Lock()
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=50)
+        self.counts = {"events": 0, "matched": 0, "fired": 0, "suppressed": 0}
+
+    def _state(self, rule: AlertRule, group: tuple) -> _GroupState:
+        groups = self._groups[rule.name]
+        state = groups.get(group)
+        if state is None:
+            state = groups[group] = _GroupState(rule.window_seconds)
+            if len(groups) > self.max_groups:
+                groups.popitem(last=False)
+        else:
+            groups.move_to_end(group)
+        return state
+
+    def observe(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Evaluate one event (a system_event_to_dict() dict); returns the alerts it fired"""
+        now = self.clock()
+        fired = []
+        with self._lock:
+            self.counts["events"] += 1
+            for rule in self.rules:
+                if not rule.matches(event):
+                    continue
+                self.counts["matched"] += 1
+                group = rule.group(event)
+                state = self._state(rule, group)
+                in_window = state.window.add(now)
+                if in_window < rule.count:
+                    continue
+                if state.last_fired is not None and now - state.last_fired < rule.cooldown_seconds:
+                    state.suppressed += 1
+                    self.counts["suppressed"] += 1
+                    continue
+                fired.append({
+                    "rule": rule.name,
+                    "description": rule.description,
+                    "group": {key: value for key, value in group},
+                    "count": in_window,
+                    "window_seconds": rule.window_seconds,
+                    "suppressed": state.suppressed,
+                    "event": event,
+                    "fired_at": datetime.now(timezone.utc).isoformat(),
+                })
+                state.last_fired = now
+                state.suppressed = 0
+                self.counts["fired"] += 1
+        for alert in fired:
+            self.recent.append(alert)
+            self.notify(alert)
+        return fired
+
+    def notify(self, alert: Dict[str, Any]) -> None:
+        if not self.recipients:
+            return
+        event = alert["event"]
+        group = ", ".join(f"{key}={value}" for key, value in alert["group"].items())
+        # Group values come from ingested events: no line breaks into the header
+        subject = re.sub(r"[\r\n]+", " ", f"[Alert] {alert['rule']}" + (f" ({group})" if group else ""))
+        repeats = f"<p>{alert['suppressed']} more since the last notification.</p>" if alert["suppressed"] else ""
+        body = f"""
+        <html>
+        <body>
+            <h2>{html.escape(alert['rule'])}</h2>
+            <p>{html.escape(alert['description'])}</p>
+            <p>{alert['count']} matching event(s) in the last {alert['window_seconds']:g} seconds.</p>
+            {repeats}
+            <p><strong>{html.escape(str(event.get('severity')))}</strong> {html.escape(str(event.get('event_type')))}
+            at {html.escape(str(event.get('created_at')))}</p>
+            <pre>{html.escape(str(event.get('message')))}</pre>
+            <pre>{html.escape(json.dumps(event.get('event_metadata'), indent=2, default=str))}</pre>
+        </body>
+        </html>
+        """
+        for address in self.recipients:
+            self.queue.enqueue(address, subject, body)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            **self.counts,
+            "rules": len(self.rules),
+            "groups": sum(len(groups) for groups in self._groups.values()),
+            "recent": [
+                {key: alert[key] for key in ("rule", "group", "count", "suppressed", "fired_at")}
+                for alert in list(self.recent)[-10:]
+            ],
+        }
+
+
+alert_engine = AlertEngine()
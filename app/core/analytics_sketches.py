@@ -0,0 +1,265 @@
+import asyncio
+import math
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Sequence
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.sketches import HyperLogLog, TDigest, TopK
+from app.core.timeseries import epoch_seconds
+from app.models.postgres_db1 import Analytics
+
+
+class SketchBucket:
+    """Sketches of the analytics events in one time bucket"""
+
+    def __init__(self, start: int, precision: int, max_keys: int):
+        self.start = start
+        self.precision = precision
+        self.max_keys = max_keys
+        self.events = 0
+        self.users = HyperLogLog(precision)
+        self.users_by_type: Dict[str, HyperLogLog] = {}
+        self.event_types = TopK(capacity=max_keys)
+        self.fields: Dict[str, TDigest] = {}
+        self.untracked = 0  # events whose type or fields did not fit in max_keys
+
+    def add(self, user_id: int, event_type: str, event_data: Optional[dict]) -> None:
+        self.events += 1
+        self.users.add(user_id)
+        self.event_types.add(event_type)
+        users = self.users_by_type.get(event_type)
+        if users is None and len(self.users_by_type) < self.max_keys:
+            users = self.users_by_type[event_type] = HyperLogLog(self.precision)
+        if users is None:
+            self.untracked += 1
+        else:
+            users.add(user_id)
+        if not isinstance(event_data, dict):
+            return
+        for field, value in event_data.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            digest = self.fields.get(field)
+            if digest is None:
+                if len(self.fields) >= self.max_keys:
+                    self.untracked += 1
+                    continue
+                digest = self.fields[field] = TDigest()
+            digest.add(float(value))
+
+
+class AnalyticsSketches:
+    """Approximate distinct users, top event types and numeric percentiles
+    over the Analytics table, answered from memory in milliseconds.
+
+    Events are summarised into one SketchBucket per ``bucket_seconds``
+    (HyperLogLog of user ids, count-min top-k of event types, t-digest per
+    numeric ``event_data`` field). A query merges the buckets overlapping
+    its range, so ranges are rounded out to whole buckets. refresh() reads
+    only rows with an id above the last one seen, and buckets older than
+    ``retention_seconds`` are discarded. Answers lag ingestion by up to one
+    refresh interval; a row committed after a higher id was read is missed.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds: Optional[int] = None,
+        retention_seconds: Optional[int] = None,
+        precision: Optional[int] = None,
+        max_keys: Optional[int] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.bucket_seconds = bucket_seconds or settings.ANALYTICS_SKETCH_BUCKET_SECONDS
+        self.retention_seconds = retention_seconds or settings.ANALYTICS_SKETCH_RETENTION_SECONDS
+        self.precision = precision or settings.ANALYTICS_SKETCH_HLL_PRECISION
+        self.max_keys = max_keys or settings.ANALYTICS_SKETCH_MAX_KEYS
+        self.clock = clock
+        self.loaded = False
+        self.last_id = 0
+        self.refreshed_at: Optional[float] = None
+        self._buckets: Dict[int, SketchBucket] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.counts = {"events": 0, "refreshes": 0, "expired_buckets": 0}
+
+    def bucket_start(self, seconds: float) -> int:
+        return int(seconds // self.bucket_seconds * self.bucket_seconds)
+
+    def add(self, user_id: int, event_type: str, event_data: Optional[dict], timestamp: datetime) -> None:
+        start = self.bucket_start(epoch_seconds(timestamp))
+        if start < self.bucket_start(self.clock() - self.retention_seconds):
+            return
+        with self._lock:
+            bucket = self._buckets.get(start)
+            if bucket is None:
+                bucket = self._buckets[start] = SketchBucket(start, self.precision, self.max_keys)
+            bucket.add(user_id, event_type, event_data)
+            self.counts["events"] += 1
+
+    def expire(self) -> None:
+        cutoff = self.bucket_start(self.clock() - self.retention_seconds)
+        with self._lock:
+            for start in [start for start in self._buckets if start < cutoff]:
+                del self._buckets[start]
+                self.counts["expired_buckets"] += 1
+
+    def refresh(self, session_factory: Callable[[], Session]) -> int:
+        """Add the events written since the last refresh; returns how many"""
+        table = Analytics.__table__
+        query = (
+            select(table.c.id, table.c.user_id, table.c.event_type, table.c.event_data, table.c.timestamp)
+            .where(table.c.id > self.last_id)
+            .order_by(table.c.id)
+            .execution_options(yield_per=10000)
+        )
+        if not self.loaded:
+            since = datetime.fromtimestamp(self.clock() - self.retention_seconds, timezone.utc)
+            query = query.where(table.c.timestamp >= since)
+        added = 0
+        with session_factory() as db:
+            for row in db.execute(query):
+                if row.timestamp is not None:
+                    self.add(row.user_id, row.event_type, row.event_data, row.timestamp)
+                self.last_id = row.id
+                added += 1
+        self.expire()
+        self.loaded = True
+        self.refreshed_at = self.clock()
+        self.counts["refreshes"] += 1
+        return added
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self.last_id = 0
+            self.loaded = False
+
+    def _select(self, since: Optional[datetime], until: Optional[datetime]):
+        """Buckets overlapping [since, until), the last 24 hours by default,
+        and the bucket-aligned range they cover"""
+        end = epoch_seconds(until) if until else self.clock()
+        begin = epoch_seconds(since) if since else end - 86400
+        first = self.bucket_start(begin)
+        last = max(math.ceil(end / self.bucket_seconds) * self.bucket_seconds, first + self.bucket_seconds)
+        with self._lock:
+            buckets = [bucket for start, bucket in sorted(self._buckets.items()) if first <= start < last]
+        coverage = {
+            "from": datetime.fromtimestamp(first, timezone.utc).isoformat(),
+            "to": datetime.fromtimestamp(last, timezone.utc).isoformat(),
+            "bucket_seconds": self.bucket_seconds,
+            "events": sum(bucket.events for bucket in buckets),
+            "refreshed_at": (
+                datetime.fromtimestamp(self.refreshed_at, timezone.utc).isoformat() if self.refreshed_at else None
+            ),
+        }
+        return buckets, coverage
+
+    def distinct_users(
+        self,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None,
+        event_type: Optional[str] = None
+    ) -> dict:
+        buckets, coverage = self._select(since, until)
+        merged = HyperLogLog(self.precision)
+        if event_type is None:
+            sketches = [bucket.users for bucket in buckets]
+        else:
+            sketches = [bucket.users_by_type[event_type] for bucket in buckets if event_type in bucket.users_by_type]
+        # False if a bucket saw the event type after max_keys types were already tracked
+        complete = event_type is None or all(
+            event_type in bucket.users_by_type or not bucket.event_types.sketch.estimate(event_type)
+            for bucket in buckets
+        )
+        if sketches:
+            merged.merge(*sketches)
+        return {
+            "event_type": event_type,
+            "distinct_users": merged.count(),
+            "relative_error": round(merged.relative_error, 4),  # one standard error
+            "complete": complete,
+            **coverage,
+        }
+
+    def top_event_types(
+        self,
+        k: int = 10,
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> dict:
+        buckets, coverage = self._select(since, until)
+        parts = [bucket.event_types for bucket in buckets]
+        # Each bucket overestimates by at most epsilon * its total (probability 1 - e^-depth)
+        error = round(sum(part.sketch.epsilon * part.sketch.total for part in parts))
+        with self._lock:  # the refresh thread adds to the same buckets
+            top = TopK.combine(parts, k)
+        return {
+            "event_types": [
+                {"event_type": key, "count": count, "max_overestimate": min(error, count)}
+                for key, count in top
+            ],
+            **coverage,
+        }
+
+    def percentiles(
+        self,
+        field: str,
+        quantiles: Sequence[float] = (0.5, 0.9, 0.99),
+        since: Optional[datetime] = None,
+        until: Optional[datetime] = None
+    ) -> dict:
+        buckets, coverage = self._select(since, until)
+        merged = TDigest()
+        digests = [bucket.fields[field] for bucket in buckets if field in bucket.fields]
+        if digests:
+            with self._lock:  # the refresh thread adds to the same digests
+                merged.merge(*digests)
+        return {
+            "field": field,
+            "count": int(merged.count),
+            "min": merged.min if merged.count else None,
+            "max": merged.max if merged.count else None,
+            "percentiles": {f"p{q * 100:g}": merged.quantile(q) for q in quantiles},
+            **coverage,
+        }
+
+    async def start(self, session_factory: Callable[[], Session], interval: Optional[float] = None) -> None:
+        """Load the retention window now, then refresh every ``interval`` seconds until stop()"""
+        interval = interval or settings.ANALYTICS_SKETCH_REFRESH_SECONDS
+        await run_in_threadpool(self.refresh, session_factory)
+
+        async def refresh() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await run_in_threadpool(self.refresh, session_factory)
+                except Exception as e:
+                    print(f"Analytics sketch refresh failed: {e}")
+
+        self._task = asyncio.get_running_loop().create_task(refresh())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, int]:
+        with self._lock:
+            buckets = list(self._buckets.values())
+        return {
+            **self.counts,
+            "buckets": len(buckets),
+            "last_id": self.last_id,
+            "untracked": sum(bucket.untracked for bucket in buckets),
+        }
+
+
+analytics_sketches = AnalyticsSketches()
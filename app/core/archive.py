@@ -0,0 +1,207 @@
+import heapq
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import quote, unquote
+from app.core.columnar import ColumnFile, write_columns
+from app.core.config import settings
+from app.core.timeseries import as_utc, epoch_seconds
+from app.models.postgres_db1 import Analytics
+from app.models.postgres_db2 import PerformanceMetric
+
+SUFFIX = ".col"
+
+
+@dataclass(frozen=True)
+class ArchiveSpec:
+    """How one table is archived: a file per (day of ``time``, ``key`` value)"""
+    model: Any
+    time: str
+    key: str
+    columns: Dict[str, str] = field(default_factory=dict)  # other columns -> i8 / f8 / json
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+
+ARCHIVED_TABLES = {
+    spec.name: spec for spec in (
+        ArchiveSpec(PerformanceMetric, time="recorded_at", key="metric_name",
+                    columns={"id": "i8", "metric_value": "f8", "unit": "json", "tags": "json"}),
+        ArchiveSpec(Analytics, time="timestamp", key="event_type",
+                    columns={"id": "i8", "user_id": "i8", "event_data": "json"}),
+    )
+}
+
+
+def day_of(seconds: float) -> date:
+    return datetime.fromtimestamp(seconds, timezone.utc).date()
+
+
+class ColumnArchive:
+    """Rows moved out of the live tables, as column files under ``root``:
+    ``<table>/day=YYYY-MM-DD/<key value>.col``, sorted by time.
+
+    Appending to a partition rewrites its file with the new rows merged
+    in, skipping ids it already holds, so re-archiving rows whose delete
+    did not happen is harmless. Readers scan only the partitions a query
+    touches and binary-search the mapped time column.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or settings.ARCHIVE_DIR)
+
+    def path(self, table: str, day: date, key: str) -> Path:
+        return self.root / table / f"day={day.isoformat()}" / (quote(key, safe="") + SUFFIX)
+
+    def partitions(
+        self,
+        table: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        key: Optional[str] = None
+    ) -> List[Tuple[date, str, Path]]:
+        """(day, key, path) of the files overlapping [start, end), oldest day first"""
+        directory = self.root / table
+        if not directory.is_dir():
+            return []
+        first = as_utc(start).date() if start else date.min
+        last = as_utc(end).date() if end else date.max
+        found = []
+        for day_directory in directory.iterdir():
+            if not day_directory.name.startswith("day="):
+                continue
+            day = date.fromisoformat(day_directory.name[4:])
+            if not first <= day <= last:
+                continue
+            if key is not None:
+                path = day_directory / (quote(key, safe="") + SUFFIX)
+                if path.exists():
+                    found.append((day, key, path))
+                continue
+            for path in day_directory.glob("*" + SUFFIX):
+                found.append((day, unquote(path.name[:-len(SUFFIX)]), path))
+        return sorted(found)
+
+    def append(self, spec: ArchiveSpec, rows: Sequence[Dict[str, Any]]) -> int:
+        """Add rows (dicts of every archived column) to their partitions; returns rows added"""
+        groups: Dict[Tuple[date, str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            seconds = epoch_seconds(row[spec.time])
+            groups.setdefault((day_of(seconds), row[spec.key]), []).append({**row, spec.time: seconds})
+        added = 0
+        for (day, key), group in groups.items():
+            path = self.path(spec.name, day, key)
+            columns: Dict[str, List[Any]] = {name: [] for name in [spec.time, *spec.columns]}
+            if path.exists():
+                with ColumnFile(path) as existing:
+                    columns = existing.read()
+            known = set(columns.get("id", ()))
+            fresh = [row for row in group if row.get("id") not in known]
+            if not fresh:
+                continue
+            merged = [dict(zip(columns, values)) for values in zip(*columns.values())] + fresh
+            merged.sort(key=lambda row: row[spec.time])
+            write_columns(
+                path,
+                {spec.time: ("f8", [row[spec.time] for row in merged]),
+                 **{name: (kind, [row[name] for row in merged]) for name, kind in spec.columns.items()}},
+                {"table": spec.name, "key": key, "day": day.isoformat()},
+            )
+            added += len(fresh)
+        return added
+
+    def scan(
+        self,
+        spec: ArchiveSpec,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        key: Optional[str] = None
+    ) -> Iterator[Tuple[str, ColumnFile, int, int]]:
+        """(key, open file, first row, end row) for the rows in [start, end) of
+        each partition, oldest first; each file is closed when the next is
+        produced"""
+        low = epoch_seconds(start) if start else float("-inf")
+        high = epoch_seconds(end) if end else float("inf")
+        for _, partition_key, path in self.partitions(spec.name, start, end, key):
+            with ColumnFile(path) as column_file:
+                times = column_file.column(spec.time)
+                first, last = bisect_left(times, low), bisect_left(times, high)
+                del times
+                if first < last:
+                    yield partition_key, column_file, first, last
+
+    def points(
+        self,
+        spec: ArchiveSpec,
+        value: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        key: Optional[str] = None
+    ) -> Iterator[Tuple[float, float]]:
+        """(epoch seconds, value) pairs in time order"""
+        for _, column_file, first, last in self.scan(spec, start, end, key):
+            times, values = column_file.column(spec.time), column_file.column(value)
+            yield from zip(times[first:last].tolist(), values[first:last].tolist())
+            del times, values
+
+    def count(self, spec: ArchiveSpec, start=None, end=None, key: Optional[str] = None) -> int:
+        return sum(last - first for _, _, first, last in self.scan(spec, start, end, key))
+
+    def latest(
+        self,
+        spec: ArchiveSpec,
+        limit: int,
+        columns: Sequence[str],
+        key: Optional[str] = None,
+        **equals: Any
+    ) -> List[Dict[str, Any]]:
+        """Up to ``limit`` newest archived rows, as dicts of ``columns``,
+        matching ``key`` and numeric column ``equals`` filters"""
+        found: List[Dict[str, Any]] = []
+        partitions = self.partitions(spec.name, key=key)
+        for day in sorted({day for day, _, _ in partitions}, reverse=True):
+            candidates = []  # (time, key, row index, file) across the day's partitions
+            for _, partition_key, path in (p for p in partitions if p[0] == day):
+                with ColumnFile(path) as column_file:
+                    times = column_file.column(spec.time).tolist()
+                    filters = [(column_file.column(name).tolist(), wanted) for name, wanted in equals.items()]
+                    rows = [
+                        index for index in range(column_file.rows)
+                        if all(values[index] == wanted for values, wanted in filters)
+                    ]
+                    newest = heapq.nlargest(limit - len(found), rows, key=times.__getitem__)
+                    selected = {  # columns not archived (e.g. idempotency_key) read as None
+                        name: column_file.column(name) for name in columns
+                        if name not in (spec.time, spec.key) and name in column_file.footer["columns"]
+                    }
+                    for index in newest:
+                        row = {name: values[index] for name, values in selected.items()}
+                        row[spec.key] = partition_key
+                        row[spec.time] = datetime.fromtimestamp(times[index], timezone.utc)
+                        candidates.append((times[index], {name: row.get(name) for name in columns}))
+                    del selected
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            found.extend(row for _, row in candidates[:limit - len(found)])
+            if len(found) >= limit:
+                break
+        return found
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        usage = {}
+        for table in ARCHIVED_TABLES:
+            files = [path for _, _, path in self.partitions(table)]
+            usage[table] = {"files": len(files), "bytes": sum(path.stat().st_size for path in files)}
+        return usage
+
+
+column_archive = ColumnArchive()
+
+
+def archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Rows older than the start of this UTC day are archived"""
+    now = as_utc(now or datetime.now(timezone.utc)) - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    return datetime(now.year, now.month, now.day, tzinfo=timezone.utc)
@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from sqlalchemy.engine import Engine
+from app.core.batch_writer import BatchWriter
+from app.core.config import settings
+from app.core.database import get_postgres_db1_engine
+from app.models.audit_event import AuditEvent
+
+USER_FIELDS = ("email", "username", "full_name", "is_active", "is_superuser")
+SETTING_FIELDS = ("value",)
+ACTIONS = (
+    "user.create", "user.update", "user.delete", "user.import",
+    "setting.create", "setting.update", "setting.delete", "scheduler.run",
+)
+ENTITY_TYPES = ("user", "setting", "import_job", "scheduler_job")
+
+
+def snapshot(obj: Any, fields: Iterable[str]) -> Dict[str, Any]:
+    """The audited fields of a row (empty for None: not created yet, or deleted)"""
+    return {field: getattr(obj, field) for field in fields} if obj is not None else {}
+
+
+def diff(before: Dict[str, Any], after: Dict[str, Any]) -> Dict[str, List[Any]]:
+    """``{field: [old, new]}`` for every field whose value changed"""
+    return {
+        field: [before.get(field), after.get(field)]
+        for field in sorted(before.keys() | after.keys())
+        if before.get(field) != after.get(field)
+    }
+
+
+class AuditLog(BatchWriter):
+    """Append-only trail of admin mutations, written in batches off the request path.
+
+    record() only buffers the event, so a mutation's response never waits on
+    the audit table. A failed write keeps its events for the next attempt;
+    past ``max_pending`` the oldest are dropped and counted, so an
+    unreachable database cannot exhaust memory.
+    """
+
+    def __init__(
+        self,
+        engine_factory: Callable[[], Engine] = get_postgres_db1_engine,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None
+    ):
+        super().__init__(
+            AuditEvent.__table__,
+            engine_factory,
+            batch_size=batch_size or settings.AUDIT_BATCH_SIZE,
+            flush_interval=flush_interval or settings.AUDIT_FLUSH_SECONDS,
+            max_pending=max_pending or settings.AUDIT_MAX_PENDING,
+            name="audit log"
+        )
+
+    def record(
+        self,
+        actor: Optional[Dict[str, Any]],
+        action: str,
+        entity_type: str,
+        entity_id: Any,
+        changes: Optional[Dict[str, List[Any]]] = None
+    ) -> None:
+        """Queue one event; ``actor`` is the current user dict from require_admin"""
+        self.add({
+            "actor_id": actor.get("id") if actor else None,
+            "actor": (actor.get("username") or actor.get("email")) if actor else None,
+            "action": action,
+            "entity_type": entity_type,
+            "entity_id": str(entity_id),
+            "changes": changes or {},
+            "created_at": datetime.now(timezone.utc),
+        })
+
+
+audit_log = AuditLog()
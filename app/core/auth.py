@@ -2,9 +2,9 @@ from typing import Optional
 from fastapi import Request, HTTPException, status
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import session_scope
+from app.core.sessions import user_session_data
+from app.core.tokens import TokenError, decode_token, principal_from_claims, token_metrics
 from app.services.user_service import UserService
 
 
@@ -18,25 +18,23 @@ def get_current_user(request: Request) -> Optional[dict]:
     # Check JWT token
     auth_header = request.headers.get("Authorization")
     if auth_header and auth_header.startswith("Bearer "):
-        token = auth_header.split(" ")[1]
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            email = payload.get("sub")
-            if email:
-                db = next(get_db())
-                user_service = UserService(db)
-                user = user_service.get_user_by_email(email)
+            claims = decode_token(auth_header[7:])
+        except TokenError as e:
+            token_metrics.increment(f"rejected:{e.reason}")
+            return None
+        # Tokens carrying role/active claims authorize without a lookup
+        principal = principal_from_claims(claims)
+        if principal is not None:
+            token_metrics.increment("claims")
+            return principal
+        email = claims.get("sub")
+        if email:
+            token_metrics.increment("lookup")
+            with session_scope() as db:
+                user = UserService(db).get_user_by_email(email)
                 if user:
-                    return {
-                        "id": user.id,
-                        "email": user.email,
-                        "username": user.username,
-                        "full_name": user.full_name,
-                        "is_active": user.is_active,
-                        "is_superuser": user.is_superuser
-                    }
-        except JWTError:
-            pass
+                    return user_session_data(user)
     
     return None
 
@@ -0,0 +1,127 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import Table
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+
+
+class BatchWriter:
+    """Buffers rows in memory and inserts them into ``table`` in batches.
+
+    add() only appends to a list, so callers on the request path never wait
+    on the database. A background task started with start() writes the
+    buffer with one executemany INSERT every ``flush_interval`` seconds, or
+    as soon as ``batch_size`` rows are waiting; stop() writes what is left.
+    Rows still buffered when the process dies are lost.
+
+    At most ``max_pending`` rows are kept. With ``drop_newest`` rows added
+    past that are refused and a failed write is discarded, so a slow or
+    unreachable database never builds a backlog. Otherwise the oldest rows
+    make room and a failed batch is re-queued for the next attempt.
+    """
+
+    def __init__(
+        self,
+        table: Table,
+        engine_factory: Callable[[], Engine],
+        batch_size: int,
+        flush_interval: float,
+        max_pending: int,
+        drop_newest: bool = False,
+        name: str = "batch writer"
+    ):
+        self.table = table
+        self.engine_factory = engine_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.drop_newest = drop_newest
+        self.name = name
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # keeps batches in insertion order
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counts = {"recorded": 0, "written": 0, "dropped": 0, "failed_flushes": 0}
+
+    def add(self, row: Dict[str, Any]) -> bool:
+        """Queue one row; False if it was dropped because the buffer is full"""
+        with self._lock:
+            if self.drop_newest and len(self._pending) >= self.max_pending:
+                self.counts["dropped"] += 1
+                return False
+            self._pending.append(row)
+            self.counts["recorded"] += 1
+            self._trim()
+            # Wake the writer once, when the batch fills, not on every row after
+            full = len(self._pending) == self.batch_size
+        if full and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return True
+
+    def _trim(self) -> None:
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.counts["dropped"] += overflow
+
+    def flush(self) -> int:
+        """Write everything buffered now (blocking); returns the number written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                with self.engine_factory().begin() as conn:
+                    conn.execute(self.table.insert(), batch)
+            except Exception:
+                with self._lock:
+                    self.counts["failed_flushes"] += 1
+                    if self.drop_newest:
+                        self.counts["dropped"] += len(batch)
+                    else:
+                        self._pending[:0] = batch
+                        self._trim()
+                raise
+            self.counts["written"] += len(batch)
+            return len(batch)
+
+    async def start(self) -> None:
+        """Flush in the background until stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        async def writer() -> None:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                try:
+                    await run_in_threadpool(self.flush)
+                except Exception as e:
+                    print(f"{self.name.capitalize()} flush failed: {e}")
+
+        self._task = self._loop.create_task(writer())
+
+    async def stop(self) -> None:
+        """Stop the writer and write what is left"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+        try:
+            await run_in_threadpool(self.flush)
+        except Exception as e:
+            print(f"{self.name.capitalize()} flush failed: {e}")
+
+    def metrics(self) -> Dict[str, int]:
+        return {**self.counts, "pending": len(self._pending)}
@@ -0,0 +1,102 @@
+"""A small columnar file format for archived rows.
+
+Layout: magic, column blocks (each 8-byte aligned), a JSON footer
+describing them, the footer length, magic. Fixed-width columns (``i8``
+int64, ``f8`` float64) are stored raw so ColumnFile can memory-map them
+and scan or binary-search them in place, reading only the pages touched.
+``json`` columns (strings, dicts, None) are zlib-compressed JSON lists
+and are decoded only when asked for.
+"""
+import json
+import mmap
+import os
+import struct
+import zlib
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+MAGIC = b"COLF1\0\0\0"
+TYPECODES = {"i8": "q", "f8": "d"}
+COMPRESSION_LEVEL = 6
+
+Column = Union[memoryview, List[Any]]
+
+
+def write_columns(path: Path, columns: Dict[str, Tuple[str, Sequence[Any]]], metadata: Dict[str, Any]) -> int:
+    """Write ``{name: (type, values)}`` to ``path`` atomically; returns the file size"""
+    lengths = {len(values) for _, values in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError("Columns must have the same length")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    described = {}
+    with open(temporary, "wb") as f:
+        f.write(MAGIC)
+        for name, (kind, values) in columns.items():
+            if kind in TYPECODES:
+                data, codec = array(TYPECODES[kind], values).tobytes(), "none"
+            elif kind == "json":
+                data = zlib.compress(json.dumps(list(values), separators=(",", ":")).encode(), COMPRESSION_LEVEL)
+                codec = "zlib"
+            else:
+                raise ValueError(f"Unknown column type {kind!r}")
+            described[name] = {"type": kind, "codec": codec, "offset": f.tell(), "length": len(data)}
+            f.write(data)
+            f.write(b"\0" * (-f.tell() % 8))
+        footer = json.dumps({"rows": lengths.pop() if lengths else 0, "columns": described, **metadata}).encode()
+        f.write(footer)
+        f.write(struct.pack("<Q", len(footer)))
+        f.write(MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    os.replace(temporary, path)
+    return size
+
+
+class ColumnFile:
+    """A memory-mapped columnar file; use as a context manager.
+
+    Numeric columns are zero-copy memoryviews into the mapping, so work
+    with them (and slices of them) inside the ``with`` block.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self._map)
+        if self._map[:8] != MAGIC or self._map[size - 8:] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a column file")
+        (footer_length,) = struct.unpack("<Q", self._map[size - 16:size - 8])
+        self.footer = json.loads(self._map[size - 16 - footer_length:size - 16])
+        self.rows: int = self.footer["rows"]
+        self._decoded: Dict[str, List[Any]] = {}
+
+    def __enter__(self) -> "ColumnFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def column(self, name: str) -> Column:
+        info = self.footer["columns"][name]
+        start, end = info["offset"], info["offset"] + info["length"]
+        if info["type"] in TYPECODES:
+            return memoryview(self._map)[start:end].cast(TYPECODES[info["type"]])
+        if name not in self._decoded:
+            self._decoded[name] = json.loads(zlib.decompress(self._map[start:end]))
+        return self._decoded[name]
+
+    def read(self) -> Dict[str, List[Any]]:
+        """Every column as a list (a copy)"""
+        return {name: list(self.column(name)) for name in self.footer["columns"]}
+
+    def close(self) -> None:
+        try:
+            self._map.close()
+        except BufferError:
+            pass  # a view is still referenced; the mapping closes when it is collected
+        self._file.close()
@@ -0,0 +1,160 @@
+import gzip
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# Already-compressed or streamed content that must not be buffered/recompressed
+_SKIP_CONTENT_TYPES = (
+    "text/event-stream",
+    "image/",
+    "video/",
+    "audio/",
+    "application/zip",
+    "application/gzip",
+    "application/octet-stream",
+)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred encoding for an Accept-Encoding header: br, then gzip"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(token.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class _Compressor:
+    """Streaming compressor with a one-shot fast path for single-body responses"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self._stream = None
+
+    def compress_all(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress(self, data: bytes) -> bytes:
+        if self._stream is None:
+            if self.encoding == "br":
+                self._stream = brotli.Compressor(quality=self.brotli_quality)
+            else:
+                # wbits=31: gzip container
+                self._stream = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        if self.encoding == "br":
+            return self._stream.process(data) + self._stream.flush()
+        return self._stream.compress(data) + self._stream.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._stream.finish()
+        return self._stream.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Brotli/gzip response compression, negotiated from Accept-Encoding.
+
+    Bodies smaller than ``minimum_size`` go out as-is, and responses that
+    already carry a Content-Encoding (the precompressed static files) or
+    are server-sent event streams are passed through untouched.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        responder = _CompressionResponder(
+            send, _Compressor(encoding, self.gzip_level, self.brotli_quality), self.minimum_size
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, send: Send, compressor: _Compressor, minimum_size: int):
+        self._send = send
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.streaming = False
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+            return
+
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if "content-encoding" in headers or content_type.startswith(_SKIP_CONTENT_TYPES):
+                self.passthrough = True
+                await self._send(message)
+            else:
+                # Held back until the first body chunk decides the headers
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self._send(start)
+                await self._send(message)
+                return
+            headers["Content-Encoding"] = self.compressor.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                body = self.compressor.compress_all(body)
+                headers["Content-Length"] = str(len(body))
+                await self._send(start)
+                await self._send({"type": "http.response.body", "body": body})
+                return
+            del headers["Content-Length"]
+            self.streaming = True
+            await self._send(start)
+
+        if self.streaming:
+            data = self.compressor.compress(body)
+            if not more_body:
+                data += self.compressor.finish()
+            await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -0,0 +1,85 @@
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+
+
+class ConnectionTracker:
+    """Pool connections currently checked out, per engine.
+
+    Hooks the pool's checkout/checkin events. A connection still checked
+    out after ``threshold`` seconds is reported as a leak, with the stack
+    that checked it out when ``capture_stacks`` is on. Counting is always
+    on; capturing a stack costs tens of microseconds per checkout, so it is
+    meant for debugging a suspected leak.
+    """
+
+    def __init__(
+        self,
+        threshold: Optional[float] = None,
+        capture_stacks: Optional[bool] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.threshold = settings.DB_LEAK_THRESHOLD_SECONDS if threshold is None else threshold
+        self.capture_stacks = settings.DB_LEAK_CAPTURE_STACKS if capture_stacks is None else capture_stacks
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._out: Dict[int, Tuple[str, float, Optional[str]]] = {}
+        self._engines: Dict[int, str] = {}
+        self.peak: Dict[str, int] = {}
+        self.checkouts = 0
+
+    def instrument(self, engine: Engine, name: str) -> Engine:
+        """Track ``engine``'s pool under ``name``; safe to call twice"""
+        if id(engine) in self._engines:
+            return engine
+        self._engines[id(engine)] = name
+
+        def checkout(dbapi_connection, record, proxy) -> None:
+            stack = "".join(traceback.format_stack(limit=20)[:-1]) if self.capture_stacks else None
+            with self._lock:
+                self._out[id(record)] = (name, self.clock(), stack)
+                self.checkouts += 1
+                held = self.checked_out(name)
+                if held > self.peak.get(name, 0):
+                    self.peak[name] = held
+
+        def checkin(dbapi_connection, record) -> None:
+            with self._lock:
+                self._out.pop(id(record), None)
+
+        event.listen(engine, "checkout", checkout)
+        event.listen(engine, "checkin", checkin)
+        return engine
+
+    def checked_out(self, name: Optional[str] = None) -> int:
+        return sum(1 for engine, _, _ in list(self._out.values()) if name is None or engine == name)
+
+    def leaks(self, older_than: Optional[float] = None) -> List[dict]:
+        """Connections held longer than ``older_than`` seconds, oldest first"""
+        older_than = self.threshold if older_than is None else older_than
+        now = self.clock()
+        held = [
+            {"engine": name, "held_seconds": round(now - since, 3), "stack": stack}
+            for name, since, stack in list(self._out.values())
+            if now - since >= older_than
+        ]
+        return sorted(held, key=lambda leak: -leak["held_seconds"])
+
+    def reset_peaks(self) -> None:
+        with self._lock:
+            self.peak = {name: self.checked_out(name) for name in self._engines.values()}
+
+    def metrics(self) -> dict:
+        return {
+            "checked_out": {name: self.checked_out(name) for name in sorted(set(self._engines.values()))},
+            "peak": dict(self.peak),
+            "checkouts": self.checkouts,
+            "leaks": self.leaks()
+        }
+
+
+connection_tracker = ConnectionTracker()
@@ -1,34 +1,59 @@
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Callable, Iterator, Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.core.config import settings
+from app.core.connection_tracking import connection_tracker
 
-# SQLite Engine (for users and settings)
-sqlite_engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False}
-)
+# Engines and session factories are created on first use rather than at import
+# time, so importing the app does not load psycopg2 or build connection pools
+# for databases a process never touches (tests, CLI scripts, worker forks).
 
-# PostgreSQL Database 1 Engine
-postgres_db1_engine = create_engine(
-    settings.POSTGRES_DB1_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.DEBUG
-)
 
-# PostgreSQL Database 2 Engine
-postgres_db2_engine = create_engine(
-    settings.POSTGRES_DB2_URL,
-    pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.DEBUG
-)
+@lru_cache(maxsize=None)
+def get_sqlite_engine() -> Engine:
+    """SQLite Engine (for users and settings)"""
+    return connection_tracker.instrument(create_engine(
+        settings.DATABASE_URL,
+        connect_args={"check_same_thread": False}
+    ), "sqlite")
+
+
+@lru_cache(maxsize=None)
+def get_postgres_db1_engine() -> Engine:
+    """PostgreSQL Database 1 Engine"""
+    return connection_tracker.instrument(create_engine(
+        settings.POSTGRES_DB1_URL,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+        pool_recycle=300,
+        echo=settings.DEBUG
+    ), "postgres_db1")
+
+
+@lru_cache(maxsize=None)
+def get_postgres_db2_engine() -> Engine:
+    """PostgreSQL Database 2 Engine"""
+    return connection_tracker.instrument(create_engine(
+        settings.POSTGRES_DB2_URL,
+        pool_pre_ping=settings.POSTGRES_POOL_PRE_PING,
+        pool_recycle=300,
+        echo=settings.DEBUG
+    ), "postgres_db2")
+
+
+# Session Factories (bound to their engine on first session)
+SQLiteSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+PostgresDB1SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+PostgresDB2SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
-# Session Factories
-SQLiteSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=sqlite_engine)
-PostgresDB1SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=postgres_db1_engine)
-PostgresDB2SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=postgres_db2_engine)
+_SESSION_ENGINES = (
+    (SQLiteSessionLocal, get_sqlite_engine),
+    (PostgresDB1SessionLocal, get_postgres_db1_engine),
+    (PostgresDB2SessionLocal, get_postgres_db2_engine),
+)
 
 # Base classes for different databases
 SQLiteBase = declarative_base()
@@ -36,37 +61,88 @@ PostgresDB1Base = declarative_base()
 PostgresDB2Base = declarative_base()
 
 
-def get_sqlite_db():
-    """Dependency for SQLite database sessions (users and settings)"""
-    db = SQLiteSessionLocal()
+def _bound(session_factory: sessionmaker) -> sessionmaker:
+    """Bind a session factory to its engine the first time it is used"""
+    if session_factory.kw.get("bind") is None:
+        for factory, get_engine in _SESSION_ENGINES:
+            if factory is session_factory:
+                session_factory.configure(bind=get_engine())
+    return session_factory
+
+
+def __getattr__(name: str):
+    """Keep the old module-level engine names working, created lazily"""
+    engines = {
+        "sqlite_engine": get_sqlite_engine,
+        "postgres_db1_engine": get_postgres_db1_engine,
+        "postgres_db2_engine": get_postgres_db2_engine,
+    }
+    if name in engines:
+        return engines[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_sqlite_session() -> Session:
+    """A new users/settings Session (a ShardedSession when sharding is on)"""
+    if settings.SQLITE_SHARD_URLS:
+        from app.core.sharding import get_shard_router
+        return get_shard_router().session()
+    return _bound(SQLiteSessionLocal)()
+
+
+def create_postgres_db1_session() -> Session:
+    return _bound(PostgresDB1SessionLocal)()
+
+
+def create_postgres_db2_session() -> Session:
+    return _bound(PostgresDB2SessionLocal)()
+
+
+@contextmanager
+def session_scope(
+    session_factory: Callable[[], Session] = create_sqlite_session,
+    db: Optional[Session] = None
+) -> Iterator[Session]:
+    """Unit of work: a new session that is always closed, returning its
+    connection to the pool and rolling back anything left uncommitted.
+
+    When ``db`` is given (the request's session, passed down to a service)
+    it is used as is and its owner closes it, so the same service code runs
+    inside a request or standalone without leaking a session.
+    """
+    if db is not None:
+        yield db
+        return
+    db = session_factory()
     try:
         yield db
     finally:
         db.close()
 
 
+# Request-scoped dependencies: FastAPI caches them per request, so every
+# dependency asking for get_db shares one session, closed after the response.
+def get_sqlite_db():
+    """Dependency for SQLite database sessions (users and settings)"""
+    with session_scope(create_sqlite_session) as db:
+        yield db
+
+
 def get_postgres_db1():
     """Dependency for PostgreSQL Database 1 sessions"""
-    db = PostgresDB1SessionLocal()
-    try:
+    with session_scope(create_postgres_db1_session) as db:
         yield db
-    finally:
-        db.close()
 
 
 def get_postgres_db2():
     """Dependency for PostgreSQL Database 2 sessions"""
-    db = PostgresDB2SessionLocal()
-    try:
+    with session_scope(create_postgres_db2_session) as db:
         yield db
-    finally:
-        db.close()
 
 
-# Legacy support - maps to SQLite database
-def get_db():
-    """Legacy database dependency - maps to SQLite database"""
-    return get_sqlite_db()
+# Legacy name, kept as the same dependency so an override of either applies
+# to both. Never call next(get_db()): that session is never closed.
+get_db = get_sqlite_db
 
 
 # Import all models to ensure they are registered with SQLAlchemy
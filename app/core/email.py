@@ -1,9 +1,14 @@
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
+import asyncio
 import secrets
 import string
+import threading
+
+# smtplib and the MIME classes are imported inside the send methods: only the
+# code paths that actually send mail pay for them.
 
 
 class EmailService:
@@ -19,38 +24,68 @@ class EmailService:
         alphabet = string.ascii_letters + string.digits
         return ''.join(secrets.choice(alphabet) for _ in range(length))
 
-    def send_activation_email(self, user_email: str, username: str, activation_token: str):
-        """Send activation email to new user"""
-        try:
-            # Create message
-            msg = MIMEMultipart()
-            msg['From'] = self.from_email
-            msg['To'] = user_email
-            msg['Subject'] = "Activate Your Account - FastAPI Admin"
+    def _activation_message(self, user_email: str, username: str, activation_token: str):
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
 
-            # Create activation URL
-            base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
-            activation_url = f"{base_url}/activate/{activation_token}"
+        # Create message
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = user_email
+        msg['Subject'] = "Activate Your Account - FastAPI Admin"
 
-            # Email body
-            body = f"""
-            <html>
-            <body>
-                <h2>Welcome to FastAPI Admin!</h2>
-                <p>Hello {username},</p>
-                <p>Thank you for registering with FastAPI Admin. To complete your registration, please click the link below to activate your account:</p>
-                <p><a href="{activation_url}" style="background-color: #3B82F6; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">Activate Account</a></p>
-                <p>Or copy and paste this URL into your browser:</p>
-                <p>{activation_url}</p>
-                <p>This link will expire in 24 hours.</p>
-                <p>If you didn't create this account, please ignore this email.</p>
-                <br>
-                <p>Best regards,<br>FastAPI Admin Team</p>
-            </body>
-            </html>
-            """
+        # Create activation URL
+        base_url = getattr(settings, 'BASE_URL', 'http://localhost:8000')
+        activation_url = f"{base_url}/activate/{activation_token}"
 
-            msg.attach(MIMEText(body, 'html'))
+        # Email body
+        body = f"""
+        <html>
+        <body>
+            <h2>Welcome to FastAPI Admin!</h2>
+            <p>Hello {username},</p>
+            <p>Thank you for registering with FastAPI Admin. To complete your registration, please click the link below to activate your account:</p>
+            <p><a href="{activation_url}" style="background-color: #3B82F6; color: white; padding: 12px 24px; text-decoration: none; border-radius: 6px; display: inline-block;">Activate Account</a></p>
+            <p>Or copy and paste this URL into your browser:</p>
+            <p>{activation_url}</p>
+            <p>This link will expire in 24 hours.</p>
+            <p>If you didn't create this account, please ignore this email.</p>
+            <br>
+            <p>Best regards,<br>FastAPI Admin Team</p>
+        </body>
+        </html>
+        """
+
+        msg.attach(MIMEText(body, 'html'))
+        return msg
+
+    def message(self, to_email: str, subject: str, html: str):
+        """A ready-to-send HTML message"""
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
+        msg = MIMEMultipart()
+        msg['From'] = self.from_email
+        msg['To'] = to_email
+        msg['Subject'] = subject
+        msg.attach(MIMEText(html, 'html'))
+        return msg
+
+    def connect(self):
+        """A logged-in SMTP connection; the caller quits it"""
+        import smtplib
+
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        server.starttls()
+        server.login(self.smtp_username, self.smtp_password)
+        return server
+
+    def send_activation_email(self, user_email: str, username: str, activation_token: str):
+        """Send activation email to new user"""
+        import smtplib
+
+        try:
+            msg = self._activation_message(user_email, username, activation_token)
 
             # Send email
             server = smtplib.SMTP(self.smtp_server, self.smtp_port)
@@ -65,8 +100,42 @@ class EmailService:
             print(f"Error sending email: {e}")
             return False
 
+    def send_activation_emails(self, recipients: Iterable[Tuple[str, str, str]]) -> int:
+        """Send activation emails for (email, username, token) tuples over one
+        SMTP connection; returns how many were accepted"""
+        import smtplib
+
+        sent = 0
+        try:
+            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+            server.starttls()
+            server.login(self.smtp_username, self.smtp_password)
+        except Exception as e:
+            print(f"Error connecting to SMTP server: {e}")
+            return 0
+        try:
+            for user_email, username, activation_token in recipients:
+                try:
+                    msg = self._activation_message(user_email, username, activation_token)
+                    server.sendmail(self.from_email, user_email, msg.as_string())
+                    sent += 1
+                except smtplib.SMTPRecipientsRefused as e:
+                    print(f"Error sending email to {user_email}: {e}")
+        except Exception as e:
+            print(f"Error sending email: {e}")
+        finally:
+            try:
+                server.quit()
+            except Exception:
+                pass
+        return sent
+
     def send_welcome_email(self, user_email: str, username: str):
         """Send welcome email after successful activation"""
+        import smtplib
+        from email.mime.text import MIMEText
+        from email.mime.multipart import MIMEMultipart
+
         try:
             msg = MIMEMultipart()
             msg['From'] = self.from_email
@@ -100,3 +169,122 @@ class EmailService:
         except Exception as e:
             print(f"Error sending welcome email: {e}")
             return False
+
+
+class EmailQueue:
+    """Outgoing mail sent by a background task instead of on the caller's path.
+
+    enqueue() only appends. The task started with start() sends everything
+    pending over one SMTP connection as soon as mail is queued; when the
+    server cannot be reached the mail stays queued and is retried every
+    ``retry_seconds``, up to ``max_attempts`` times. Beyond ``max_pending``
+    the oldest mail is dropped. Queued mail is lost if the process dies.
+    """
+
+    def __init__(
+        self,
+        email_service: Optional[EmailService] = None,
+        max_pending: Optional[int] = None,
+        retry_seconds: Optional[float] = None,
+        max_attempts: Optional[int] = None
+    ):
+        self.email_service = email_service or EmailService()
+        self.max_pending = max_pending or settings.EMAIL_QUEUE_MAX_PENDING
+        self.retry_seconds = retry_seconds or settings.EMAIL_QUEUE_RETRY_SECONDS
+        self.max_attempts = max_attempts or settings.EMAIL_QUEUE_MAX_ATTEMPTS
+        self._pending: Deque[List] = deque()  # [to, subject, html, attempts]
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.counts = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0}
+
+    def enqueue(self, to_email: str, subject: str, html: str) -> None:
+        with self._lock:
+            self._pending.append([to_email, subject, html, 0])
+            self.counts["queued"] += 1
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.counts["dropped"] += 1
+        if self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def send_pending(self) -> int:
+        """Send what is queued now (blocking); returns how many were sent"""
+        import smtplib
+
+        with self._send_lock:
+            with self._lock:
+                batch, self._pending = self._pending, deque()
+            if not batch:
+                return 0
+            sent = 0
+            try:
+                server = self.email_service.connect()
+                try:
+                    while batch:
+                        to_email, subject, html, _ = batch[0]
+                        # A message that fails on its own is dropped; a connection
+                        # failure (raised out of the loop) retries the rest
+                        try:
+                            msg = self.email_service.message(to_email, subject, html).as_string()
+                            server.sendmail(self.email_service.from_email, to_email, msg)
+                            sent += 1
+                        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPDataError) as e:
+                            print(f"Error sending email to {to_email}: {e}")
+                            self.counts["failed"] += 1
+                        except OSError:  # the connection (SMTPException is an OSError too)
+                            raise
+                        except Exception as e:  # e.g. a header that doesn't parse
+                            print(f"Error sending email to {to_email}: {e}")
+                            self.counts["failed"] += 1
+                        batch.popleft()
+                finally:
+                    try:
+                        server.quit()
+                    except Exception:
+                        pass
+            except Exception as e:
+                print(f"Error sending queued email: {e}")
+                with self._lock:
+                    for item in batch:
+                        item[3] += 1
+                    expired = [item for item in batch if item[3] >= self.max_attempts]
+                    self.counts["failed"] += len(expired)
+                    self._pending.extendleft(reversed([item for item in batch if item[3] < self.max_attempts]))
+            self.counts["sent"] += sent
+            return sent
+
+    async def start(self) -> None:
+        """Send in the background until stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+
+        async def sender() -> None:
+            while True:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.retry_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                await run_in_threadpool(self.send_pending)
+
+        self._task = self._loop.create_task(sender())
+
+    async def stop(self) -> None:
+        """Stop the sender; mail still queued is not sent"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wakeup = None
+
+    def metrics(self) -> Dict[str, int]:
+        return {**self.counts, "pending": len(self._pending)}
+
+
+email_queue = EmailQueue()
@@ -1,3 +1,4 @@
+from typing import Optional
 from fastapi import HTTPException, status
 
 
@@ -17,3 +18,34 @@ class UserNotFoundException(HTTPException):
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
+
+
+class InvalidFieldsException(HTTPException):
+    """Exception raised when a fields= projection names unknown columns"""
+    def __init__(self, unknown, allowed):
+        super().__init__(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}"
+        )
+
+
+class SearchIndexMissingException(HTTPException):
+    """Exception raised when full-text search runs before its index is built"""
+    def __init__(self, table: str):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Search on {table} is not available until its index is built (run scripts/migrate.py)"
+        )
+
+
+class RateLimitExceededException(HTTPException):
+    """Exception raised when a client exceeds a rate limit"""
+    def __init__(self, retry_after: int, template: Optional[str] = None):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Too many requests. Try again in {retry_after} seconds.",
+            headers={"Retry-After": str(retry_after)}
+        )
+        self.retry_after = retry_after
+        # HTML page to re-render with the error instead of a JSON 429
+        self.template = template
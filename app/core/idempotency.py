@@ -0,0 +1,212 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from sqlalchemy import inspect, insert, select, text
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm import Session
+from app.core.config import settings
+
+
+def request_key(idempotency_key: str) -> str:
+    """What is stored in a table's idempotency_key column for an Idempotency-Key header"""
+    return hashlib.sha256(idempotency_key.encode()).hexdigest()
+
+
+def content_key(values: Dict[str, Any]) -> str:
+    """A hash of the ingested fields, for recognising a retry sent without a key"""
+    canonical = json.dumps(values, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+# How long a table found without its idempotency_key unique index (the
+# migration hasn't run yet) is trusted to stay that way
+SCHEMA_RECHECK_SECONDS = 30.0
+
+
+def missing_conflict_target(error: DBAPIError) -> bool:
+    """Whether ``error`` is an ON CONFLICT naming columns no unique index covers yet"""
+    if getattr(error.orig, "pgcode", None) == "42P10":  # invalid_column_reference
+        return True
+    return "ON CONFLICT clause does not match" in str(error.orig)
+
+
+def upsert_insert(dialect: str):
+    """The dialect's INSERT with ON CONFLICT support, or None"""
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return None
+    return dialect_insert
+
+
+class IngestDeduplicator:
+    """Makes event ingestion safe to retry.
+
+    A request carrying an Idempotency-Key is inserted with
+    ``ON CONFLICT (idempotency_key) DO NOTHING RETURNING``: the first
+    insert wins, and a retry that reaches the database costs one failed
+    insert plus one lookup by key, never a read before every write. In
+    front of that sits a window of recently ingested keys (per worker,
+    ``window_size`` entries), so most retries resolve to the original row
+    without touching the table. With ``deduplicate`` the window also holds
+    a hash of the event's content for ``content_seconds``, catching retries
+    from clients that send no key; content is never made unique in the
+    database, because identical events may legitimately repeat.
+
+    Until the migration has built the unique index on idempotency_key, a
+    keyed insert falls back to a lookup by key before a plain insert (two
+    concurrent retries can then both insert).
+    """
+
+    def __init__(
+        self,
+        window_size: Optional[int] = None,
+        key_seconds: Optional[float] = None,
+        content_seconds: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.window_size = window_size or settings.INGEST_DEDUP_WINDOW_SIZE
+        self.key_seconds = settings.INGEST_DEDUP_KEY_SECONDS if key_seconds is None else key_seconds
+        self.content_seconds = settings.INGEST_DEDUP_CONTENT_SECONDS if content_seconds is None else content_seconds
+        self.clock = clock
+        self._window: "OrderedDict[Tuple[str, str], Tuple[float, int]]" = OrderedDict()  # -> (expires, row id)
+        self._schema: Dict[Tuple[str, str], Tuple[bool, float]] = {}  # (database, table) -> (unique, recheck at)
+        self._lock = threading.Lock()
+        self.counts = {"inserted": 0, "duplicates_window": 0, "duplicates_conflict": 0}
+
+    def _recall(self, key: Tuple[str, str]) -> Optional[int]:
+        with self._lock:
+            entry = self._window.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._window[key]
+                return None
+            return entry[1]
+
+    def _remember(self, key: Tuple[str, str], row_id: int, seconds: float) -> None:
+        with self._lock:
+            self._window[key] = (self.clock() + seconds, row_id)
+            self._window.move_to_end(key)
+            while len(self._window) > self.window_size:
+                self._window.popitem(last=False)
+
+    def _has_unique_key(self, db: Session, model: Any) -> bool:
+        """Whether idempotency_key has a usable unique index yet; once it
+        has, that is never checked again"""
+        table = model.__tablename__
+        cache_key = (str(db.get_bind().url), table)
+        with self._lock:
+            cached = self._schema.get(cache_key)
+        if cached is not None and (cached[0] or cached[1] > self.clock()):
+            return cached[0]
+        conn = db.connection()
+        inspector = inspect(conn)
+        names = [index["name"] for index in inspector.get_indexes(table)
+                 if index["unique"] and index["column_names"] == ["idempotency_key"]]
+        names += [constraint["name"] for constraint in inspector.get_unique_constraints(table)
+                  if constraint["column_names"] == ["idempotency_key"]]
+        if names and conn.dialect.name == "postgresql":
+            # An index still being built CONCURRENTLY (or left by a failed build) is not usable
+            names = [name for name in names if conn.execute(text(
+                "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+            ), {"name": name}).scalar()]
+        db.commit()  # end the inspection's transaction
+        self._set_has_unique_key(cache_key, bool(names))
+        return bool(names)
+
+    def _set_has_unique_key(self, cache_key: Tuple[str, str], unique: bool) -> None:
+        with self._lock:
+            self._schema[cache_key] = (unique, self.clock() + SCHEMA_RECHECK_SECONDS)
+
+    def _insert_keyed(self, db: Session, model: Any, values: Dict[str, Any], stored_key: str) -> Tuple[Any, bool]:
+        if not self._has_unique_key(db, model):
+            row = db.scalars(select(model).where(model.idempotency_key == stored_key)).first()
+            if row is not None:
+                return row, False
+            row = model(**values, idempotency_key=stored_key)
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+            return row, True
+        dialect_insert = upsert_insert(db.get_bind().dialect.name)
+        if dialect_insert is not None:
+            stmt = (
+                dialect_insert(model)
+                .values(**values, idempotency_key=stored_key)
+                .on_conflict_do_nothing(index_elements=["idempotency_key"])
+                .returning(model)
+            )
+            try:
+                row = db.scalars(stmt).first()
+                db.commit()
+            except DBAPIError as e:
+                if not missing_conflict_target(e):
+                    raise
+                db.rollback()  # the index went away (dropped to be rebuilt): look again later
+                self._set_has_unique_key((str(db.get_bind().url), model.__tablename__), False)
+                return self._insert_keyed(db, model, values, stored_key)
+        else:
+            try:
+                row = db.scalars(insert(model).values(**values, idempotency_key=stored_key).returning(model)).first()
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                row = None
+        if row is not None:
+            return row, True
+        return db.scalars(select(model).where(model.idempotency_key == stored_key)).one(), False
+
+    def ingest(
+        self,
+        db: Session,
+        model: Any,
+        values: Dict[str, Any],
+        idempotency_key: Optional[str] = None,
+        deduplicate: bool = False
+    ) -> Tuple[Any, bool]:
+        """Insert ``values`` into ``model``'s table unless this is a retry;
+        returns (row, created). The session is committed."""
+        table = model.__tablename__
+        stored_key = request_key(idempotency_key) if idempotency_key else None
+        if stored_key is not None:
+            window_key, seconds = (table, "key:" + stored_key), self.key_seconds
+        elif deduplicate and self.content_seconds > 0:
+            window_key, seconds = (table, "content:" + content_key(values)), self.content_seconds
+        else:
+            window_key = None
+
+        if window_key is not None:
+            row_id = self._recall(window_key)
+            row = db.get(model, row_id) if row_id is not None else None
+            if row is not None:
+                self.counts["duplicates_window"] += 1
+                return row, False
+
+        if stored_key is not None:
+            row, created = self._insert_keyed(db, model, values, stored_key)
+        else:
+            row, created = model(**values), True
+            db.add(row)
+            db.commit()
+            db.refresh(row)
+        self.counts["inserted" if created else "duplicates_conflict"] += 1
+        if window_key is not None:
+            self._remember(window_key, row.id, seconds)
+        return row, created
+
+    def reset(self) -> None:
+        with self._lock:
+            self._window.clear()
+            self._schema.clear()
+
+    def metrics(self) -> Dict[str, int]:
+        return {**self.counts, "window": len(self._window)}
+
+
+ingest_dedup = IngestDeduplicator()
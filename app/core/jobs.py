@@ -0,0 +1,102 @@
+import asyncio
+import secrets
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+from app.core.config import settings
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Per-job cap on recorded errors; the count keeps going past it
+MAX_JOB_ERRORS = 100
+
+
+class Job:
+    """Progress of a background job, polled through the job-status endpoint"""
+
+    def __init__(self, kind: str):
+        self.id = secrets.token_urlsafe(12)
+        self.kind = kind
+        self.status = PENDING
+        self.counters: Dict[str, int] = {}
+        self.errors: List[Dict[str, Any]] = []
+        self.error_count = 0
+        self.detail: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def add_error(self, **error: Any) -> None:
+        self.error_count += 1
+        if len(self.errors) < MAX_JOB_ERRORS:
+            self.errors.append(error)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "counters": dict(self.counters),
+            "error_count": self.error_count,
+            "errors": list(self.errors),
+            "detail": self.detail,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class JobRegistry:
+    """In-process registry of recent jobs; the oldest finished ones are evicted"""
+
+    def __init__(self, maxsize: Optional[int] = None):
+        self.maxsize = maxsize or settings.JOB_HISTORY_SIZE
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+        self._lock = threading.Lock()
+
+    def create(self, kind: str) -> Job:
+        job = Job(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            if len(self._jobs) > self.maxsize:
+                for job_id in [j.id for j in self._jobs.values() if j.done][: len(self._jobs) - self.maxsize]:
+                    del self._jobs[job_id]
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def start(self, job: Job, run: Callable[[Job], Awaitable[None]]) -> asyncio.Task:
+        """Run ``run(job)`` as a task on the current loop, recording its outcome"""
+        task = asyncio.get_running_loop().create_task(self._run(job, run))
+        # Keep a reference so the task isn't garbage collected mid-run
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _run(self, job: Job, run: Callable[[Job], Awaitable[None]]) -> None:
+        job.status = RUNNING
+        job.started_at = datetime.utcnow()
+        try:
+            await run(job)
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.status = FAILED
+            job.detail = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+
+
+jobs = JobRegistry()
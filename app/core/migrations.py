@@ -0,0 +1,281 @@
+"""Schema upgrades for tables that already exist.
+
+``create_all`` creates missing tables but never changes existing ones, so
+the columns and indexes added to a model after its table was first
+created are listed here as idempotent steps. ``migrate(database)`` applies
+the ones a database lacks. It runs at startup (MIGRATE_ON_STARTUP) and
+from ``scripts/migrate.py``; on a large deployment run the script once,
+before the new version starts.
+
+SQLite can't add AUTOINCREMENT to an existing table, so such tables are
+rebuilt: copied into a new table, which then replaces the old one.
+
+On PostgreSQL indexes are built CONCURRENTLY, so the table stays writable
+during the build, and an index left INVALID by a failed build (which
+``IF NOT EXISTS`` would skip forever) is dropped and built again. A
+session advisory lock keeps the steps to one process at a time: workers
+starting together leave them to whichever took the lock first.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateTable
+from starlette.concurrency import run_in_threadpool
+from app.core.database import (
+    PostgresDB1Base, PostgresDB2Base, SQLiteBase, get_postgres_db1_engine, get_postgres_db2_engine, get_sqlite_engine
+)
+from app.core.search import SEARCHABLE, SearchSpec, ensure_search_index, has_search_index
+from app.models.postgres_db1 import Analytics
+from app.models.postgres_db2 import PerformanceMetric, SystemEvent
+from app.models.token_revocation import TokenRevocation
+from app.models.user import User
+
+ADVISORY_LOCK_KEY = 0x6D696772  # "migr"
+
+
+def _invalid_index(conn: Connection, name: str) -> Optional[bool]:
+    """PostgreSQL: whether index ``name`` is INVALID; None if it doesn't exist"""
+    valid = conn.execute(text(
+        "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+    ), {"name": name}).scalar()
+    return None if valid is None else not valid
+
+
+class Migration:
+    """One idempotent schema step on ``table``"""
+    table: str
+
+    @property
+    def description(self) -> str:
+        raise NotImplementedError
+
+    def applied(self, conn: Connection) -> bool:
+        raise NotImplementedError
+
+    def apply(self, conn: Connection) -> None:
+        raise NotImplementedError
+
+
+@dataclass(frozen=True)
+class AddColumn(Migration):
+    """A nullable column without a default: adding it rewrites nothing"""
+    model: Any
+    column: str
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def description(self) -> str:
+        return f"add column {self.model.__tablename__}.{self.column}"
+
+    def applied(self, conn: Connection) -> bool:
+        return self.column in {column["name"] for column in inspect(conn).get_columns(self.model.__tablename__)}
+
+    def apply(self, conn: Connection) -> None:
+        column = self.model.__table__.c[self.column]
+        if_not_exists = "IF NOT EXISTS " if conn.dialect.name == "postgresql" else ""
+        conn.execute(text(
+            f"ALTER TABLE {self.model.__tablename__} ADD COLUMN {if_not_exists}"
+            f"{self.column} {column.type.compile(dialect=conn.dialect)}"
+        ))
+
+
+@dataclass(frozen=True)
+class CreateIndex(Migration):
+    """An index on columns; a unique one is also satisfied by any unique
+    index or constraint on the same columns (as create_all makes them)"""
+    name: str
+    table: str
+    columns: Sequence[str]
+    unique: bool = False
+
+    @property
+    def description(self) -> str:
+        return f"create {'unique ' if self.unique else ''}index {self.name} on {self.table} ({', '.join(self.columns)})"
+
+    def applied(self, conn: Connection) -> bool:
+        if conn.dialect.name == "postgresql" and _invalid_index(conn, self.name):
+            return False
+        inspector = inspect(conn)
+        indexes = inspector.get_indexes(self.table)
+        if any(index["name"] == self.name for index in indexes):
+            return True
+        if not self.unique:
+            return False
+        unique = [index["column_names"] for index in indexes if index["unique"]]
+        unique += [constraint["column_names"] for constraint in inspector.get_unique_constraints(self.table)]
+        return list(self.columns) in unique
+
+    def apply(self, conn: Connection) -> None:
+        concurrently = ""
+        if conn.dialect.name == "postgresql":
+            concurrently = "CONCURRENTLY "
+            if _invalid_index(conn, self.name):
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.name}"))
+        conn.execute(text(
+            f"CREATE {'UNIQUE ' if self.unique else ''}INDEX {concurrently}IF NOT EXISTS {self.name} "
+            f"ON {self.table} ({', '.join(self.columns)})"
+        ))
+
+
+@dataclass(frozen=True)
+class SearchIndex(Migration):
+    """A full-text index (app/core/search.py)"""
+    spec: SearchSpec
+
+    @property
+    def table(self) -> str:
+        return self.spec.name
+
+    @property
+    def description(self) -> str:
+        return f"create full-text index on {self.spec.name} ({self.spec.column})"
+
+    def applied(self, conn: Connection) -> bool:
+        return has_search_index(self.spec, conn)
+
+    def apply(self, conn: Connection) -> None:
+        if conn.dialect.name == "postgresql" and _invalid_index(conn, self.spec.index_name):
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {self.spec.index_name}"))
+        ensure_search_index(self.spec, conn.engine)
+
+
+@dataclass(frozen=True)
+class Autoincrement(Migration):
+    """SQLite: ids that are never handed out again, even once the rows
+    holding them are deleted (``sqlite_autoincrement`` on the model)"""
+    model: Any
+
+    @property
+    def table(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def description(self) -> str:
+        return f"rebuild {self.model.__tablename__} with AUTOINCREMENT ids"
+
+    def applied(self, conn: Connection) -> bool:
+        if conn.dialect.name != "sqlite":
+            return True  # SERIAL / IDENTITY sequences never go back
+        sql = conn.execute(text(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+        ), {"name": self.table}).scalar()
+        return "AUTOINCREMENT" in (sql or "").upper()
+
+    def apply(self, conn: Connection) -> None:
+        table = self.model.__table__
+        rebuilt = table.to_metadata(MetaData(), name=f"{self.table}__rebuild")
+        existing = {column["name"] for column in inspect(conn).get_columns(self.table)}
+        columns = ", ".join(column.name for column in table.c if column.name in existing)
+        # One transaction: other connections see the old table or the new one
+        with conn.engine.begin() as tx:
+            tx.execute(text(f"DROP TABLE IF EXISTS {rebuilt.name}"))
+            tx.execute(CreateTable(rebuilt))  # indexes come after the rename, under their own names
+            tx.execute(text(f"INSERT INTO {rebuilt.name} ({columns}) SELECT {columns} FROM {self.table}"))
+            tx.execute(text(f"DROP TABLE {self.table}"))
+            tx.execute(text(f"ALTER TABLE {rebuilt.name} RENAME TO {self.table}"))
+            for index in table.indexes:
+                index.create(tx)
+
+
+def _idempotency_key(model) -> List[Migration]:
+    table = model.__tablename__
+    return [
+        AddColumn(model, "idempotency_key"),
+        CreateIndex(f"uq_{table}_idempotency_key", table, ("idempotency_key",), unique=True),
+    ]
+
+
+MIGRATIONS: Dict[str, List[Migration]] = {
+    "postgres_db1": [
+        *_idempotency_key(Analytics),
+        SearchIndex(SEARCHABLE["user_logs"]),
+    ],
+    "postgres_db2": [
+        *_idempotency_key(SystemEvent),
+        *_idempotency_key(PerformanceMetric),
+        # Time-series queries; declared on the model, so new tables already have it
+        CreateIndex("ix_performance_metrics_name_time", "performance_metrics", ("metric_name", "recorded_at")),
+        SearchIndex(SEARCHABLE["system_events"]),
+    ],
+    "sqlite": [
+        # Ids other workers poll past (revocations) or that place a row on a shard (users)
+        Autoincrement(User),
+        Autoincrement(TokenRevocation),
+    ],
+}
+
+ENGINES: Dict[str, Callable[[], Engine]] = {
+    "postgres_db1": get_postgres_db1_engine,
+    "postgres_db2": get_postgres_db2_engine,
+    "sqlite": get_sqlite_engine,
+}
+BASES = {"postgres_db1": PostgresDB1Base, "postgres_db2": PostgresDB2Base, "sqlite": SQLiteBase}
+
+
+def _applied(step: Migration, conn: Connection) -> bool:
+    return inspect(conn).has_table(step.table) and step.applied(conn)
+
+
+def pending(database: str, engine: Optional[Engine] = None) -> List[Migration]:
+    """The steps ``database`` still lacks (all of them for a table not created yet)"""
+    engine = engine or ENGINES[database]()
+    with engine.connect() as conn:
+        return [step for step in MIGRATIONS[database] if not _applied(step, conn)]
+
+
+def migrate(database: str, engine: Optional[Engine] = None, wait: bool = True) -> List[str]:
+    """Apply the steps ``database`` lacks (blocking); returns their descriptions.
+
+    Without ``wait``, nothing is done while another process is migrating
+    the same PostgreSQL database.
+    """
+    engine = engine or ENGINES[database]()
+    BASES[database].metadata.create_all(bind=engine)  # missing tables, with every column and index
+    # Autocommit: each step stands alone, and CREATE INDEX CONCURRENTLY can't run in a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            if wait:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            elif not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}).scalar():
+                return []
+        try:
+            applied = []
+            for step in MIGRATIONS[database]:
+                if not _applied(step, conn):
+                    print(f"{database}: {step.description}")
+                    step.apply(conn)
+                    applied.append(step.description)
+            return applied
+        finally:
+            if postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+
+
+_background: Set[asyncio.Task] = set()
+
+
+async def migrate_on_startup() -> None:
+    """SQLite databases (development, tests) are upgraded before serving;
+    PostgreSQL ones in the background, as an index build on a large table
+    can take a while, by the first worker to get there"""
+
+    async def run(database: str, engine: Engine) -> None:
+        try:
+            await run_in_threadpool(migrate, database, engine, False)
+        except Exception as e:
+            print(f"{database}: schema upgrade failed, run scripts/migrate.py: {e}")
+
+    for database, engine_factory in ENGINES.items():
+        engine = engine_factory()
+        if engine.dialect.name == "sqlite":
+            migrate(database, engine)
+        else:
+            task = asyncio.get_running_loop().create_task(run(database, engine))
+            _background.add(task)
+            task.add_done_callback(_background.discard)
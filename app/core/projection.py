@@ -0,0 +1,32 @@
+from typing import List, Optional
+from sqlalchemy import Column, Select, select
+from app.core.exceptions import InvalidFieldsException
+
+
+def public_columns(model) -> List[Column]:
+    """The table's columns except internal ones (``info={"internal": True}``)"""
+    return [column for column in model.__table__.c if not column.info.get("internal")]
+
+
+def project_columns(model, fields: Optional[str] = None) -> List[Column]:
+    """Public columns named by a comma-separated ``fields`` value, in table order.
+
+    No value (or one naming no columns, like ``","``) selects every public column.
+    """
+    table_columns = {column.key: column for column in public_columns(model)}
+    requested = {name.strip() for name in (fields or "").split(",") if name.strip()}
+    if not requested:
+        return list(table_columns.values())
+    unknown = sorted(requested.difference(table_columns))
+    if unknown:
+        raise InvalidFieldsException(unknown, table_columns)
+    return [column for key, column in table_columns.items() if key in requested]
+
+
+def select_projection(model, fields: Optional[str] = None) -> Select:
+    """Core SELECT of the projected columns.
+
+    Executed through a Session this yields plain Row tuples: no ORM
+    instances, identity map or attribute instrumentation.
+    """
+    return select(*project_columns(model, fields))
@@ -0,0 +1,130 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Set
+from fastapi import Request
+from app.core.config import settings
+
+
+class Message:
+    """A published payload, encoded at most once per format for all subscribers"""
+
+    __slots__ = ("topic", "data", "_encoded")
+
+    def __init__(self, topic: str, data: Dict[str, Any]):
+        self.topic = topic
+        self.data = data
+        self._encoded: Dict[str, str] = {}
+
+    def encode(self, name: str, encoder: Callable[["Message"], str]) -> str:
+        """Return ``encoder(self)``, memoized under ``name``"""
+        encoded = self._encoded.get(name)
+        if encoded is None:
+            encoded = self._encoded[name] = encoder(self)
+        return encoded
+
+    def json(self) -> str:
+        return self.encode("json", lambda m: json.dumps(m.data, default=str))
+
+
+class Subscription:
+    """One subscriber's bounded queue; the oldest message is dropped when full"""
+
+    def __init__(
+        self,
+        topics: Iterable[str],
+        maxsize: int,
+        predicate: Optional[Callable[[Message], bool]] = None
+    ):
+        self.topics = set(topics)
+        self.predicate = predicate
+        self.queue: "asyncio.Queue[Message]" = asyncio.Queue(maxsize=maxsize)
+        self.loop = asyncio.get_running_loop()
+        self.dropped = 0
+
+    def offer(self, message: Message) -> None:
+        if self.predicate is not None and not self.predicate(message):
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Message]:
+        """Next message, or None if nothing arrived within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Broker:
+    """In-process pub/sub: one publish fans out to every matching subscriber"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    def subscribe(
+        self,
+        topics: Iterable[str],
+        predicate: Optional[Callable[[Message], bool]] = None,
+        maxsize: Optional[int] = None
+    ) -> Subscription:
+        """Must be called from the event loop that will consume the queue"""
+        subscription = Subscription(topics, maxsize or settings.SSE_QUEUE_SIZE, predicate)
+        for topic in subscription.topics:
+            self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._subscribers.get(topic)
+            if subscribers:
+                subscribers.discard(subscription)
+
+    def subscriber_count(self, topic: str) -> int:
+        return len(self._subscribers.get(topic, ()))
+
+    def publish(self, topic: str, data: Dict[str, Any]) -> int:
+        """Deliver ``data`` to the subscribers of ``topic``; returns how many were offered it"""
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return 0
+        message = Message(topic, data)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        for subscription in list(subscribers):
+            if subscription.loop is running_loop:
+                subscription.offer(message)
+            else:
+                subscription.loop.call_soon_threadsafe(subscription.offer, message)
+        return len(subscribers)
+
+
+broker = Broker()
+
+
+def format_sse(event: str, data: str) -> str:
+    """Format one server-sent event; multi-line data becomes several data: lines"""
+    lines = "".join(f"data: {line}\n" for line in data.splitlines() or [""])
+    return f"event: {event}\n{lines}\n"
+
+
+async def event_stream(
+    request: Request,
+    subscription: Subscription,
+    encoder: Callable[[Message], str]
+) -> AsyncIterator[str]:
+    """Yield SSE frames for a subscription until the client disconnects"""
+    try:
+        yield "retry: 3000\n\n"
+        while not await request.is_disconnected():
+            message = await subscription.get(timeout=settings.SSE_KEEPALIVE_SECONDS)
+            if message is None:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(message.topic, encoder(message))
+    finally:
+        broker.unsubscribe(subscription)
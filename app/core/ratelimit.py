@@ -0,0 +1,248 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+from fastapi import Request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import get_sqlite_engine
+from app.core.exceptions import RateLimitExceededException
+from app.models.rate_limit import RateLimitCounter
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+class Rate:
+    """``count`` requests per ``period`` seconds, e.g. Rate.parse("5/minute")"""
+
+    def __init__(self, count: int, period: float):
+        if count < 1 or period <= 0:
+            raise ValueError("Rate needs a positive count and period")
+        self.count = count
+        self.period = period
+
+    @classmethod
+    def parse(cls, value: str) -> "Rate":
+        count, _, unit = value.partition("/")
+        unit = unit.strip().lower().rstrip("s")
+        if unit not in _PERIODS:
+            raise ValueError(f"Invalid rate {value!r}; expected e.g. 5/minute")
+        return cls(int(count), _PERIODS[unit])
+
+    def __str__(self) -> str:
+        return f"{self.count}/{self.period:g}s"
+
+
+class MemoryBackend:
+    """Per-process token buckets: each key holds up to ``count`` tokens that
+    refill continuously at ``count / period`` per second.
+
+    Buckets live in an LRU bounded to ``max_keys``; an evicted bucket is
+    simply full again on its next hit.
+    """
+
+    def __init__(self, max_keys: int = 100_000, clock: Callable[[], float] = time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, rate: Rate) -> float:
+        """Take a token; returns 0 if allowed, else seconds until one is available"""
+        now = self.clock()
+        refill = rate.count / rate.period
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rate.count, now))
+            tokens = min(rate.count, tokens + (now - updated) * refill)
+            if tokens >= 1:
+                tokens -= 1
+                retry_after = 0.0
+            else:
+                retry_after = (1 - tokens) / refill
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class DatabaseBackend:
+    """Sliding-window counters in a shared table, for multi-worker deployments.
+
+    Each key counts hits per fixed window with an atomic UPDATE (or INSERT
+    for a new window); the estimate weighs the previous window by how much
+    of it still overlaps the sliding window.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None, clock: Callable[[], float] = time.time):
+        if session_factory is None:
+            session_factory = lambda: Session(get_sqlite_engine())  # noqa: E731
+        self.session_factory = session_factory
+        self.clock = clock
+        self._hits = 0
+
+    def hit(self, key: str, rate: Rate) -> float:
+        now = self.clock()
+        window = int(now // rate.period)
+        elapsed = (now % rate.period) / rate.period
+        with self.session_factory() as db:
+            # Count first, then check: concurrent workers can't both slip
+            # under the limit, and rejected attempts still count
+            self._increment(db, key, window, (window + 2) * rate.period)
+            counter = RateLimitCounter.__table__.c
+            counts = dict(db.execute(
+                select(counter.window, counter.count)
+                .where(counter.key == key, counter.window.in_((window - 1, window)))
+            ).all())
+            self._hits += 1
+            if self._hits % self.PRUNE_EVERY == 0:
+                db.execute(delete(RateLimitCounter).where(RateLimitCounter.expires_at < now))
+            db.commit()
+
+        previous, current = counts.get(window - 1, 0), counts.get(window, 0)
+        if previous * (1 - elapsed) + current <= rate.count:
+            return 0.0
+        if previous and current <= rate.count:
+            # Until enough of the previous window has slid out
+            target = 1 - (rate.count - current) / previous
+            return max((target - elapsed) * rate.period, 0.001)
+        return (1 - elapsed) * rate.period
+
+    def _increment(self, db: Session, key: str, window: int, expires_at: float) -> None:
+        increment = (
+            update(RateLimitCounter)
+            .where(RateLimitCounter.key == key, RateLimitCounter.window == window)
+            .values(count=RateLimitCounter.count + 1)
+        )
+        if db.execute(increment).rowcount:
+            return
+        try:
+            db.execute(insert(RateLimitCounter).values(key=key, window=window, count=1, expires_at=expires_at))
+        except IntegrityError:
+            # Another worker created the window first; nothing else is in
+            # this transaction yet, so retry the increment in a fresh one
+            db.rollback()
+            db.execute(increment)
+
+    def reset(self) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(RateLimitCounter))
+            db.commit()
+
+
+class RateLimiter:
+    """Checks named limits against a backend and counts the outcomes"""
+
+    def __init__(self, backend=None, enabled: Optional[bool] = None):
+        self.backend = backend or MemoryBackend()
+        self.enabled = settings.RATE_LIMIT_ENABLED if enabled is None else enabled
+        self.allowed: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    async def check(self, scope: str, keys: List[Tuple[str, str, Rate]]) -> float:
+        """Hit every (kind, value, rate) key for ``scope``.
+
+        Returns 0 when all allow the request, else the longest retry-after.
+        Every key is charged, so a blocked IP can't reset a username's budget.
+        """
+        if not self.enabled:
+            return 0.0
+        retry_after = 0.0
+        rejected_by = None
+        for kind, value, rate in keys:
+            key = f"{scope}:{kind}:{value}"
+            if isinstance(self.backend, MemoryBackend):
+                wait = self.backend.hit(key, rate)
+            else:
+                wait = await run_in_threadpool(self.backend.hit, key, rate)
+            if wait > retry_after:
+                retry_after, rejected_by = wait, kind
+        with self._lock:
+            if rejected_by:
+                metric = f"{scope}:{rejected_by}"
+                self.rejected[metric] = self.rejected.get(metric, 0) + 1
+            else:
+                self.allowed[scope] = self.allowed.get(scope, 0) + 1
+        return retry_after
+
+    def metrics(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {"allowed": dict(self.allowed), "rejected": dict(self.rejected)}
+
+    def reset(self) -> None:
+        self.backend.reset()
+        with self._lock:
+            self.allowed.clear()
+            self.rejected.clear()
+
+
+def _create_limiter() -> RateLimiter:
+    if settings.RATE_LIMIT_BACKEND == "database":
+        return RateLimiter(DatabaseBackend())
+    return RateLimiter(MemoryBackend())
+
+
+limiter = _create_limiter()
+
+
+def rate_limit(
+    scope: str,
+    per_ip: Optional[str] = None,
+    per_username: Optional[str] = None,
+    username_fields: Tuple[str, ...] = ("username", "email"),
+    template: Optional[str] = None
+):
+    """Dependency factory limiting a route by client IP and/or submitted username.
+
+    Use it in the route's ``dependencies=[...]`` so it runs before the
+    session and handler dependencies: a rejected request never touches the
+    database or bcrypt. ``template`` renders an HTML page instead of a 429
+    JSON error.
+    """
+    ip_rate = Rate.parse(per_ip) if per_ip else None
+    username_rate = Rate.parse(per_username) if per_username else None
+
+    async def dependency(request: Request) -> None:
+        keys = []
+        if ip_rate:
+            keys.append(("ip", request.client.host if request.client else "unknown", ip_rate))
+        if username_rate:
+            form = await request.form()
+            username = next((form.get(f) for f in username_fields if form.get(f)), None)
+            if username:
+                keys.append(("username", str(username).strip().lower(), username_rate))
+        retry_after = await limiter.check(scope, keys)
+        if retry_after:
+            raise RateLimitExceededException(math.ceil(retry_after), template)
+
+    return dependency
+
+
+# Shared scopes: the API and the web forms draw from the same budgets
+login_rate_limit = rate_limit(
+    "login",
+    per_ip=settings.LOGIN_RATE_LIMIT_PER_IP,
+    per_username=settings.LOGIN_RATE_LIMIT_PER_USERNAME
+)
+login_form_rate_limit = rate_limit(
+    "login",
+    per_ip=settings.LOGIN_RATE_LIMIT_PER_IP,
+    per_username=settings.LOGIN_RATE_LIMIT_PER_USERNAME,
+    template="login.html"
+)
+register_rate_limit = rate_limit("register", per_ip=settings.REGISTER_RATE_LIMIT_PER_IP)
+register_form_rate_limit = rate_limit(
+    "register",
+    per_ip=settings.REGISTER_RATE_LIMIT_PER_IP,
+    template="register.html"
+)
@@ -0,0 +1,53 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.engine import Row
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+
+def encode_default(obj: Any) -> Any:
+    """Serialize what the JSON encoder doesn't know natively.
+
+    Row tuples from column selects become dicts directly; ORM instances
+    become a dict of their column attributes, without going through
+    FastAPI's recursive jsonable_encoder.
+    """
+    if isinstance(obj, Row):
+        return obj._asdict()
+    if hasattr(obj, "__table__"):
+        mapper = sa_inspect(obj).mapper
+        return {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=encode_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=encode_default, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """Opt-in JSON response: orjson when available, ORM/Row aware.
+
+    Return it directly from a route (``return FastJSONResponse(rows)``) so
+    FastAPI skips jsonable_encoder; setting it only as ``response_class``
+    still runs the content through jsonable_encoder first.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
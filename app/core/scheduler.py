@@ -0,0 +1,309 @@
+import asyncio
+import inspect
+import json
+import os
+import secrets
+import socket
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import get_sqlite_engine
+from app.models.scheduler import JobRun, SchedulerLock
+
+# All schedule times are naive UTC, like the rest of the app (datetime.utcnow)
+
+LEADER_LOCK = "scheduler"
+
+
+class IntervalSchedule:
+    """Run every ``seconds`` (or minutes/hours), first one interval after start"""
+
+    def __init__(self, seconds: float = 0, minutes: float = 0, hours: float = 0):
+        self.interval = timedelta(seconds=seconds, minutes=minutes, hours=hours)
+        if self.interval <= timedelta(0):
+            raise ValueError("Interval must be positive")
+
+    def next_after(self, moment: datetime) -> datetime:
+        return moment + self.interval
+
+    def __str__(self) -> str:
+        return f"every {self.interval}"
+
+
+def _parse_cron_field(field: str, low: int, high: int) -> frozenset:
+    values = set()
+    for part in field.split(","):
+        expression, _, step = part.partition("/")
+        step = int(step) if step else 1
+        if expression == "*":
+            start, end = low, high
+        elif "-" in expression:
+            start, end = (int(v) for v in expression.split("-", 1))
+        else:
+            start = end = int(expression)
+            if step > 1:
+                end = high
+        if not (low <= start <= end <= high) or step < 1:
+            raise ValueError(f"Invalid cron field {field!r}")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronSchedule:
+    """Five-field cron expression: minute hour day-of-month month day-of-week.
+
+    Supports ``*``, lists, ranges and steps; day-of-week 0 and 7 are Sunday.
+    As in cron, a restricted day-of-month and day-of-week match either.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expression!r}")
+        self.expression = expression
+        self.minutes = _parse_cron_field(fields[0], 0, 59)
+        self.hours = _parse_cron_field(fields[1], 0, 23)
+        self.days = _parse_cron_field(fields[2], 1, 31)
+        self.months = _parse_cron_field(fields[3], 1, 12)
+        self.weekdays = frozenset(d % 7 for d in _parse_cron_field(fields[4], 0, 7))
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day = moment.day in self.days
+        weekday = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def next_after(self, moment: datetime) -> datetime:
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=5 * 366)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                month = candidate.month % 12 + 1
+                candidate = candidate.replace(
+                    year=candidate.year + (month == 1), month=month, day=1, hour=0, minute=0
+                )
+            elif not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression never matches: {self.expression!r}")
+
+    def __str__(self) -> str:
+        return f"cron {self.expression}"
+
+
+class ScheduledJob:
+    """A registered job; ``func(db)`` gets a fresh Session and may be sync or async"""
+
+    def __init__(self, name: str, func: Callable[[Session], Any], schedule, description: str = ""):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.description = description or (func.__doc__ or "").strip()
+        self.next_run = schedule.next_after(datetime.utcnow())
+        self.running = False
+        self.last_run: Optional[datetime] = None
+        self.last_status: Optional[str] = None
+
+
+class Scheduler:
+    """In-process async scheduler started and stopped with the app lifespan.
+
+    Every worker runs the loop, but only the holder of the leader lease in
+    the scheduler_locks table runs jobs; the lease is renewed while alive
+    and taken over by another worker once it expires.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        worker_id: Optional[str] = None,
+        lock_ttl: Optional[float] = None
+    ):
+        self.session_factory = session_factory or (lambda: Session(get_sqlite_engine()))
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+        self.lock_ttl = timedelta(seconds=lock_ttl or settings.SCHEDULER_LOCK_TTL_SECONDS)
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self.is_leader = False
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._runs: set = set()
+
+    def add(self, name: str, schedule, func: Callable[[Session], Any], description: str = "") -> ScheduledJob:
+        """Register (or replace) a job"""
+        job = self.jobs[name] = ScheduledJob(name, func, schedule, description)
+        return job
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._loop())
+
+    async def stop(self) -> None:
+        if not self.running:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if self._runs:
+            await asyncio.gather(*self._runs, return_exceptions=True)
+        if self.is_leader:
+            await run_in_threadpool(self._release)
+
+    async def _loop(self) -> None:
+        renew_every = self.lock_ttl.total_seconds() / 3
+        next_election = datetime.utcnow()
+        while True:
+            now = datetime.utcnow()
+            if now >= next_election:
+                try:
+                    self.is_leader = await run_in_threadpool(self._elect)
+                except Exception as e:
+                    print(f"Scheduler leader election failed: {e}")
+                    self.is_leader = False
+                next_election = now + timedelta(seconds=renew_every)
+
+            for job in self.jobs.values():
+                if job.next_run <= now:
+                    job.next_run = job.schedule.next_after(now)
+                    if self.is_leader and not job.running:
+                        self._spawn(job, "schedule")
+
+            wake_at = min([next_election] + [job.next_run for job in self.jobs.values()])
+            timeout = max((wake_at - datetime.utcnow()).total_seconds(), 0.05)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _spawn(self, job: ScheduledJob, trigger: str) -> asyncio.Task:
+        task = asyncio.get_running_loop().create_task(self.run(job.name, trigger))
+        self._runs.add(task)
+        task.add_done_callback(self._runs.discard)
+        return task
+
+    def trigger(self, name: str) -> asyncio.Task:
+        """Start a job now on this worker, regardless of leadership"""
+        job = self.jobs[name]
+        if job.running:
+            raise RuntimeError(f"Job {name!r} is already running")
+        return self._spawn(job, "manual")
+
+    async def run(self, name: str, trigger: str = "manual") -> Dict[str, Any]:
+        """Run a job once, recording it in the run history"""
+        job = self.jobs[name]
+        job.running = True
+        run_id, status, result, error = None, "succeeded", None, None
+        try:
+            run_id = await run_in_threadpool(self._record_start, job.name, trigger)
+            if inspect.iscoroutinefunction(job.func):
+                with self.session_factory() as db:
+                    result = await job.func(db)
+            else:
+                result = await run_in_threadpool(self._call, job.func)
+        except Exception as e:
+            status, error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            job.running = False
+            job.last_run = datetime.utcnow()
+            job.last_status = status
+        if run_id is not None:  # None when recording the start failed
+            await run_in_threadpool(self._record_finish, run_id, status, result, error)
+        return {"job": job.name, "status": status, "result": result, "error": error}
+
+    def _call(self, func: Callable[[Session], Any]) -> Any:
+        with self.session_factory() as db:
+            return func(db)
+
+    def _elect(self) -> bool:
+        now = datetime.utcnow()
+        lease = {"owner": self.worker_id, "expires_at": now + self.lock_ttl}
+        with self.session_factory() as db:
+            renewed = db.execute(
+                update(SchedulerLock)
+                .where(SchedulerLock.name == LEADER_LOCK)
+                .where(or_(SchedulerLock.owner == self.worker_id, SchedulerLock.expires_at < now))
+                .values(**lease)
+            ).rowcount
+            if not renewed:
+                try:
+                    db.execute(insert(SchedulerLock).values(name=LEADER_LOCK, **lease))
+                    renewed = 1
+                except IntegrityError:
+                    # Another worker holds a live lease
+                    db.rollback()
+                    return False
+            db.commit()
+        return bool(renewed)
+
+    def _release(self) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                update(SchedulerLock)
+                .where(SchedulerLock.name == LEADER_LOCK, SchedulerLock.owner == self.worker_id)
+                .values(expires_at=datetime.utcnow())
+            )
+            db.commit()
+        self.is_leader = False
+
+    def _record_start(self, job_name: str, trigger: str) -> int:
+        with self.session_factory() as db:
+            run_id = db.execute(insert(JobRun).values(
+                job_name=job_name,
+                worker=self.worker_id,
+                trigger=trigger,
+                status="running",
+                started_at=datetime.utcnow()
+            )).inserted_primary_key[0]
+            db.commit()
+        return run_id
+
+    def _record_finish(self, run_id: int, status: str, result: Any, error: Optional[str]) -> None:
+        with self.session_factory() as db:
+            db.execute(update(JobRun).where(JobRun.id == run_id).values(
+                status=status,
+                result=json.dumps(result, default=str) if result is not None else None,
+                error=error,
+                finished_at=datetime.utcnow()
+            ))
+            db.commit()
+
+    def recent_runs(self, limit: int = 50, job_name: Optional[str] = None) -> List[JobRun]:
+        with self.session_factory() as db:
+            query = select(JobRun).order_by(JobRun.id.desc()).limit(limit)
+            if job_name:
+                query = query.where(JobRun.job_name == job_name)
+            runs = db.execute(query).scalars().all()
+            db.expunge_all()
+        return runs
+
+
+def prune_job_runs(db: Session) -> int:
+    """Delete run history older than SCHEDULER_HISTORY_DAYS"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.SCHEDULER_HISTORY_DAYS)
+    deleted = db.execute(delete(JobRun).where(JobRun.started_at < cutoff)).rowcount
+    db.commit()
+    return deleted
+
+
+scheduler = Scheduler()
@@ -0,0 +1,249 @@
+"""Full-text search over free-text columns (system event messages, user agents).
+
+On PostgreSQL a GIN index on ``to_tsvector(SEARCH_TEXT_CONFIG, column)``
+does the matching; ranking is ``ts_rank_cd`` and highlighting
+``ts_headline``. On SQLite (the tests' stand-in) an external-content FTS5
+table mirrors the column, with ``bm25`` ranking and ``snippet``
+highlighting. Either way the index is maintained by the database as rows
+are inserted, updated or deleted (an index expression, or triggers), so
+nothing has to be rebuilt.
+
+Results are keyset-paginated: the cursor holds the (score, id) or id of
+the last result, so later pages cost the same as the first.
+"""
+import base64
+import html
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import and_, column, func, inspect, literal_column, null, or_, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_postgres_db1_engine, get_postgres_db2_engine
+from app.core.exceptions import SearchIndexMissingException
+from app.core.projection import public_columns
+from app.models.postgres_db1 import UserLog
+from app.models.postgres_db2 import SystemEvent
+
+SORTS = ("rank", "recent")
+# Highlight markers that cannot occur in text, swapped for <mark> after escaping
+MARK_START, MARK_END = "\ue000", "\ue001"
+
+
+@dataclass(frozen=True)
+class SearchSpec:
+    """A searchable text column"""
+    model: Any
+    column: str
+    engine_factory: Callable[[], Engine]
+
+    @property
+    def name(self) -> str:
+        return self.model.__tablename__
+
+    @property
+    def fts_table(self) -> str:
+        return f"{self.name}_fts"
+
+    @property
+    def index_name(self) -> str:
+        return f"ix_{self.name}_{self.column}_fts"
+
+
+SEARCHABLE = {
+    spec.name: spec for spec in (
+        SearchSpec(SystemEvent, "message", get_postgres_db2_engine),
+        SearchSpec(UserLog, "user_agent", get_postgres_db1_engine),
+    )
+}
+
+
+def _text_config():
+    if not re.fullmatch(r"[a-z_]+", settings.SEARCH_TEXT_CONFIG):
+        raise ValueError(f"Invalid SEARCH_TEXT_CONFIG {settings.SEARCH_TEXT_CONFIG!r}")
+    return literal_column(f"'{settings.SEARCH_TEXT_CONFIG}'::regconfig")
+
+
+def has_search_index(spec: SearchSpec, conn: Connection) -> bool:
+    """Whether the full-text index for ``spec`` exists (on PostgreSQL: and is valid)"""
+    if conn.dialect.name == "postgresql":
+        return bool(conn.execute(text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name"
+        ), {"name": spec.index_name}).scalar())
+    return inspect(conn).has_table(spec.fts_table)
+
+
+_indexed: Set[Tuple[str, str]] = set()  # (database url, table) found indexed; an index is never dropped
+
+
+def require_search_index(spec: SearchSpec, conn: Connection) -> None:
+    """Raise SearchIndexMissingException (503) until the migrations have built the index"""
+    key = (str(conn.engine.url), spec.name)
+    if key in _indexed:
+        return
+    if not has_search_index(spec, conn):
+        raise SearchIndexMissingException(spec.name)
+    _indexed.add(key)
+
+
+def ensure_search_index(spec: SearchSpec, engine: Optional[Engine] = None) -> None:
+    """Create the full-text index for ``spec`` if it is missing.
+
+    A migration step (app/core/migrations.py, which also rebuilds an index
+    a failed build left invalid): on PostgreSQL the build reads the whole
+    table, so it doesn't belong in request or worker startup paths.
+    """
+    engine = engine or spec.engine_factory()
+    dialect = engine.dialect.name
+    if dialect == "postgresql":
+        config = f"'{settings.SEARCH_TEXT_CONFIG}'::regconfig"
+        _text_config()  # validates the name
+        # CONCURRENTLY: building it on a large existing table doesn't block ingestion
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {spec.index_name} "
+                f"ON {spec.name} USING gin (to_tsvector({config}, {spec.column}))"
+            ))
+    elif dialect == "sqlite":
+        fts, name, col = spec.fts_table, spec.name, spec.column
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": fts}
+            ).first()
+            if exists:
+                return
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({col}, content='{name}', content_rowid='id', "
+                f"tokenize='porter unicode61')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {name} BEGIN "
+                f"INSERT INTO {fts}(rowid, {col}) VALUES (new.id, new.{col}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {name} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.id, old.{col}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {col} ON {name} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {col}) VALUES ('delete', old.id, old.{col}); "
+                f"INSERT INTO {fts}(rowid, {col}) VALUES (new.id, new.{col}); END"
+            ))
+            conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))  # rows from before the index
+
+
+def parse_query(q: str) -> List[str]:
+    """Words and "quoted phrases"; every one of them must match"""
+    terms = [phrase or word for phrase, word in re.findall(r'"([^"]*)"|(\S+)', q or "")]
+    terms = [term.strip() for term in terms if term.strip()]
+    if not terms:
+        raise ValueError("The search query is empty")
+    return terms
+
+
+def fts5_query(terms: Sequence[str]) -> str:
+    """FTS5 MATCH syntax: each term a quoted string, so user input is never parsed as operators"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def encode_cursor(sort: str, row: Dict[str, Any]) -> str:
+    keys = [sort, row["id"]] + ([row["score"]] if sort == "rank" else [])
+    return base64.urlsafe_b64encode(json.dumps(keys).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    try:
+        keys = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        assert isinstance(keys, list) and keys[0] == sort and isinstance(keys[1], int)
+        assert len(keys) == (3 if sort == "rank" else 2)
+        assert sort != "rank" or isinstance(keys[2], (int, float))
+    except Exception:
+        raise ValueError("Invalid cursor (cursors only continue the search and sort they came from)")
+    return keys[1:]
+
+
+def highlight(fragment: Optional[str]) -> Optional[str]:
+    """Escape a fragment for HTML and turn the markers into <mark> tags"""
+    if fragment is None:
+        return None
+    return html.escape(fragment).replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def search(
+    db: Session,
+    spec: SearchSpec,
+    q: str,
+    criteria: Sequence[Any] = (),
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: str = "rank"
+) -> Dict[str, Any]:
+    """One page of rows whose ``spec.column`` matches ``q``, best match first
+    (``sort="rank"``) or newest first (``"recent"``), each with its ``score``
+    and a highlighted ``highlight`` fragment; ``next_cursor`` continues it"""
+    if sort not in SORTS:
+        raise ValueError(f"Unknown sort {sort!r}, expected one of {', '.join(SORTS)}")
+    terms = parse_query(q)
+    require_search_index(spec, db.connection())
+    model = spec.model
+    target = model.__table__.c[spec.column]
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        config = _text_config()
+        query = func.websearch_to_tsquery(config, q)
+        vector = func.to_tsvector(config, target)
+        score = func.ts_rank_cd(vector, query)
+        matches = select(*public_columns(model)).where(vector.op("@@")(query), *criteria)
+        recent_key = model.__table__.c.id
+    elif dialect == "sqlite":
+        fts = table(spec.fts_table, column("rowid"))
+        match = fts5_query(terms)
+        score = -func.bm25(literal_column(spec.fts_table))  # bm25 is lower for better matches
+        matches = (
+            select(*public_columns(model))
+            .select_from(model.__table__.join(fts, fts.c.rowid == model.__table__.c.id))
+            .where(literal_column(spec.fts_table).op("MATCH")(match), *criteria)
+        )
+        recent_key = fts.c.rowid  # FTS5 walks its index in rowid order
+    else:
+        raise ValueError(f"Full-text search is not supported on {dialect}")
+
+    if sort == "rank":
+        # Every match is scored to sort them; the keyset then skips what earlier pages returned
+        found = matches.add_columns(score.label("score")).subquery()
+        page = select(found)
+        if cursor:
+            last_id, last_score = decode_cursor(cursor, sort)
+            page = page.where(or_(found.c.score < last_score, and_(found.c.score == last_score, found.c.id < last_id)))
+        page = page.order_by(found.c.score.desc(), found.c.id.desc())
+    else:
+        # Newest first needs no scores, and stops reading matches after the page
+        page = matches.add_columns(null().label("score"))
+        if cursor:
+            (last_id,) = decode_cursor(cursor, sort)
+            page = page.where(recent_key < last_id)
+        page = page.order_by(recent_key.desc())
+    rows = [row._asdict() for row in db.connection().execute(page.limit(limit + 1))]
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    # Highlight only the page's rows: ts_headline is costly per row
+    ids = [row["id"] for row in rows]
+    fragments: Dict[int, str] = {}
+    if ids:
+        if dialect == "postgresql":
+            headline = func.ts_headline(
+                config, target, query, f"StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=2"
+            )
+            stmt = select(model.__table__.c.id, headline).where(model.__table__.c.id.in_(ids))
+        else:
+            snippet = func.snippet(literal_column(spec.fts_table), 0, MARK_START, MARK_END, "…", 24)
+            stmt = select(fts.c.rowid, snippet).where(
+                literal_column(spec.fts_table).op("MATCH")(match), fts.c.rowid.in_(ids)
+            )
+        fragments = dict(db.connection().execute(stmt).all())
+    for row in rows:
+        row["highlight"] = highlight(fragments.get(row["id"]))
+    return {"results": rows, "next_cursor": encode_cursor(sort, rows[-1]) if more else None}
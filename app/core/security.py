@@ -1,26 +1,76 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+import asyncio
+import os
+from datetime import timedelta
+from functools import lru_cache
+from typing import List, Optional
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# passlib/bcrypt is imported on first use; most requests and every import of
+# app.main never need it.
+
+
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """Password hashing context, created on first use"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+def __getattr__(name: str):
+    """Keep ``pwd_context`` importable as a module attribute"""
+    if name == "pwd_context":
+        return get_pwd_context()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+
+def _hash_many(passwords: List[str]) -> List[str]:
+    """Runs in a hashing worker process"""
+    return [get_password_hash(password) for password in passwords]
+
+
+def _hash_workers() -> int:
+    return settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+
+
+@lru_cache(maxsize=None)
+def get_hash_pool():
+    """Process pool for bulk password hashing, started on first use"""
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    # spawn: workers must not inherit the server's threads, sockets and loop
+    return ProcessPoolExecutor(max_workers=_hash_workers(), mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown_hash_pool() -> None:
+    if get_hash_pool.cache_info().currsize:
+        get_hash_pool().shutdown(wait=False, cancel_futures=True)
+        get_hash_pool.cache_clear()
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """Hash many passwords in parallel across the hashing processes, in order"""
+    if not passwords:
+        return []
+    pool = get_hash_pool()
+    size = -(-len(passwords) // _hash_workers())
+    loop = asyncio.get_running_loop()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(pool, _hash_many, passwords[i:i + size])
+        for i in range(0, len(passwords), size)
+    ))
+    return [hashed for chunk in chunks for hashed in chunk]
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-    return encoded_jwt
+    from app.core.tokens import create_access_token as create_token
+
+    return create_token(data, expires_delta.total_seconds() if expires_delta else 15 * 60)
@@ -0,0 +1,271 @@
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from http.cookies import SimpleCookie
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.core.config import settings
+from app.core.database import get_sqlite_engine
+from app.models.server_session import ServerSession
+
+
+def user_session_data(user) -> Dict[str, Any]:
+    """The ``session["user"]`` dict for a User row"""
+    return {
+        "id": user.id,
+        "email": user.email,
+        "username": user.username,
+        "full_name": user.full_name,
+        "is_active": user.is_active,
+        "is_superuser": user.is_superuser
+    }
+
+
+def _user_id(data: Dict[str, Any]) -> Optional[int]:
+    user = data.get("user")
+    return user.get("id") if isinstance(user, dict) else None
+
+
+class MemorySessionStore:
+    """Per-process LRU of sessions, with a user id index for bulk revocation.
+
+    Sessions are held as their JSON text, so callers always get a private
+    copy. Only suitable for a single worker.
+    """
+
+    def __init__(self, max_entries: int = 100_000, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._sessions: "OrderedDict[str, Tuple[str, float, Optional[int]]]" = OrderedDict()
+        self._by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Tuple[str, float]]:
+        """(data JSON, expires_at) of a live session"""
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return None
+            if entry[1] <= self.clock():
+                self._remove(session_id)
+                return None
+            self._sessions.move_to_end(session_id)
+            return entry[0], entry[1]
+
+    def set(self, session_id: str, data: str, user_id: Optional[int], ttl: float) -> None:
+        with self._lock:
+            self._remove(session_id)
+            self._sessions[session_id] = (data, self.clock() + ttl, user_id)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(session_id)
+            while len(self._sessions) > self.max_entries:
+                self._remove(next(iter(self._sessions)))
+
+    def touch(self, session_id: str, ttl: float) -> None:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                self._sessions[session_id] = (entry[0], self.clock() + ttl, entry[2])
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._remove(session_id)
+
+    def delete_for_user(self, user_id: int) -> int:
+        with self._lock:
+            session_ids = list(self._by_user.get(user_id, ()))
+            for session_id in session_ids:
+                self._remove(session_id)
+            return len(session_ids)
+
+    def update_user(self, user_id: int, user: Dict[str, Any]) -> int:
+        """Replace ``session["user"]`` in every session of a user"""
+        with self._lock:
+            session_ids = self._by_user.get(user_id, ())
+            for session_id in session_ids:
+                data, expires_at, _ = self._sessions[session_id]
+                self._sessions[session_id] = (json.dumps({**json.loads(data), "user": user}), expires_at, user_id)
+            return len(session_ids)
+
+    def _remove(self, session_id: str) -> None:
+        entry = self._sessions.pop(session_id, None)
+        if entry is not None and entry[2] is not None:
+            session_ids = self._by_user.get(entry[2])
+            if session_ids:
+                session_ids.discard(session_id)
+                if not session_ids:
+                    del self._by_user[entry[2]]
+
+
+class DatabaseSessionStore:
+    """Sessions in the server_sessions table, shared by every worker.
+
+    Expired rows are filtered on read and deleted by the
+    purge_expired_sessions maintenance job.
+    """
+
+    def __init__(self, session_factory: Optional[Callable[[], Session]] = None, clock: Callable[[], float] = time.time):
+        self.session_factory = session_factory or (lambda: Session(get_sqlite_engine()))
+        self.clock = clock
+
+    def get(self, session_id: str) -> Optional[Tuple[str, float]]:
+        with self.session_factory() as db:
+            row = db.execute(
+                select(ServerSession.data, ServerSession.expires_at)
+                .where(ServerSession.id == session_id, ServerSession.expires_at > self.clock())
+            ).first()
+        return (row.data, row.expires_at) if row else None
+
+    def set(self, session_id: str, data: str, user_id: Optional[int], ttl: float) -> None:
+        with self.session_factory() as db:
+            db.merge(ServerSession(id=session_id, user_id=user_id, data=data, expires_at=self.clock() + ttl))
+            db.commit()
+
+    def touch(self, session_id: str, ttl: float) -> None:
+        with self.session_factory() as db:
+            db.execute(
+                update(ServerSession).where(ServerSession.id == session_id)
+                .values(expires_at=self.clock() + ttl)
+            )
+            db.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self.session_factory() as db:
+            db.execute(delete(ServerSession).where(ServerSession.id == session_id))
+            db.commit()
+
+    def delete_for_user(self, user_id: int) -> int:
+        with self.session_factory() as db:
+            deleted = db.execute(delete(ServerSession).where(ServerSession.user_id == user_id)).rowcount
+            db.commit()
+        return deleted
+
+    def update_user(self, user_id: int, user: Dict[str, Any]) -> int:
+        with self.session_factory() as db:
+            sessions = db.execute(select(ServerSession).where(ServerSession.user_id == user_id)).scalars().all()
+            for server_session in sessions:
+                server_session.data = json.dumps({**json.loads(server_session.data), "user": user})
+            db.commit()
+        return len(sessions)
+
+
+class ServerSessionMiddleware:
+    """Drop-in for Starlette's SessionMiddleware that keeps ``request.session``
+    server-side and puts only a random session id in the cookie.
+
+    The cookie is only sent when the session is created or changed, or when
+    the sliding expiry is renewed (at most once per ``refresh_after``
+    seconds); other responses carry no Set-Cookie at all.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store,
+        session_cookie: str = "session",
+        max_age: int = 14 * 24 * 60 * 60,
+        refresh_after: int = 300,
+        https_only: bool = False,
+        same_site: str = "lax"
+    ):
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.refresh_after = refresh_after
+        self.security_flags = f"httponly; samesite={same_site}" + ("; secure" if https_only else "")
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        session_id = self._cookie_value(scope)
+        loaded, expires_at = None, 0.0
+        if session_id:
+            entry = await self._call(self.store.get, session_id)
+            if entry is None:
+                session_id = None
+            else:
+                loaded, expires_at = entry
+        scope["session"] = json.loads(loaded) if loaded else {}
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                await self._commit(scope["session"], session_id, loaded, expires_at, MutableHeaders(scope=message))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _call(self, func, *args):
+        # The memory store never blocks; the database one goes to a thread
+        if isinstance(self.store, MemorySessionStore):
+            return func(*args)
+        return await run_in_threadpool(func, *args)
+
+    async def _commit(self, session: dict, session_id: Optional[str], loaded: Optional[str],
+                      expires_at: float, headers: MutableHeaders) -> None:
+        if not session:
+            if session_id:
+                await self._call(self.store.delete, session_id)
+                headers.append("Set-Cookie", self._cookie(session_id, max_age=0))
+            return
+        data = json.dumps(session)
+        if data != loaded:
+            # New or changed: a fresh id on login guards against fixation
+            if session_id is None or _user_id(session) != _user_id(json.loads(loaded)):
+                if session_id:
+                    await self._call(self.store.delete, session_id)
+                session_id = secrets.token_urlsafe(16)
+            await self._call(self.store.set, session_id, data, _user_id(session), self.max_age)
+        elif expires_at - self.max_age + self.refresh_after <= self.store.clock():
+            await self._call(self.store.touch, session_id, self.max_age)
+        else:
+            return
+        headers.append("Set-Cookie", self._cookie(session_id, self.max_age))
+
+    def _cookie(self, session_id: str, max_age: int) -> str:
+        return f"{self.session_cookie}={session_id}; path=/; Max-Age={max_age}; {self.security_flags}"
+
+    def _cookie_value(self, scope: Scope) -> Optional[str]:
+        for key, value in scope.get("headers", ()):
+            if key == b"cookie":
+                morsel = SimpleCookie(value.decode("latin-1")).get(self.session_cookie)
+                if morsel is not None:
+                    return morsel.value
+        return None
+
+
+def create_session_store():
+    if settings.SESSION_BACKEND == "memory":
+        return MemorySessionStore(max_entries=settings.SESSION_MAX_ENTRIES)
+    if settings.SESSION_BACKEND == "database":
+        return DatabaseSessionStore()
+    return None
+
+
+# None with the default signed-cookie sessions (SESSION_BACKEND=cookie)
+session_store = create_session_store()
+
+
+def revoke_user_sessions(user_id: int) -> int:
+    """Log a user out everywhere; a no-op with cookie sessions"""
+    if session_store is None:
+        return 0
+    return session_store.delete_for_user(user_id)
+
+
+def sync_user_sessions(user) -> int:
+    """After an account change: revoke if deactivated, else refresh the
+    user dict held in its sessions"""
+    if session_store is None:
+        return 0
+    if not user.is_active:
+        return session_store.delete_for_user(user.id)
+    return session_store.update_user(user.id, user_session_data(user))
@@ -0,0 +1,213 @@
+import functools
+import heapq
+import itertools
+import zlib
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from sqlalchemy import create_engine, func, select, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import ORMExecuteState, Query, Session, sessionmaker
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+from app.core.config import settings
+from app.core.connection_tracking import connection_tracker
+from app.core.database import SQLiteBase, get_sqlite_engine
+from app.core.migrations import Autoincrement
+from app.models.settings import Settings
+from app.models.user import User
+
+# Users and settings can be spread over several SQLite files, each with its
+# own write lock. Everything else (sessions, rate limits, scheduler, token
+# revocations) stays in DATABASE_URL, which is also shard "0".
+
+SHARDED_TABLES = (User.__table__, Settings.__table__)
+
+
+def _shard_key(value: str) -> int:
+    # crc32 rather than hash(): placement must agree across processes
+    return zlib.crc32(value.strip().lower().encode("utf-8"))
+
+
+def _equality_values(statement, column) -> List[Any]:
+    """Values ``column`` is compared to with == in a statement's WHERE clause"""
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is None:
+        return []
+    values = []
+    for element in visitors.iterate(whereclause):
+        if isinstance(element, BinaryExpression) and element.operator is operators.eq:
+            left, right = element.left, element.right
+            if isinstance(left, BindParameter):
+                left, right = right, left
+            if isinstance(right, BindParameter) and getattr(left, "key", None) == column.key \
+                    and getattr(left, "table", None) is column.table:
+                values.append(right.effective_value)
+    return values
+
+
+class ShardRouter:
+    """Maps users and settings to shards and builds sharded sessions.
+
+    - users are placed by a hash of their email, but each shard hands out
+      ids from its own range (``id_range`` ids per shard), so an id alone
+      finds its shard
+    - settings are placed by a hash of their name, which never changes
+    - queries filtered on User.id or Settings.setting_name go to one shard;
+      any other query runs on every shard and the rows are concatenated
+    """
+
+    def __init__(self, engines: Sequence[Engine], id_range: Optional[int] = None):
+        if not engines:
+            raise ValueError("ShardRouter needs at least one engine")
+        self.engines: Dict[str, Engine] = {str(i): engine for i, engine in enumerate(engines)}
+        self.shard_ids = list(self.engines)
+        self.id_range = id_range or settings.SHARD_ID_RANGE
+        self._session_factory = sessionmaker(
+            class_=ShardedSession,
+            shards=self.engines,
+            shard_chooser=self.shard_chooser,
+            identity_chooser=self.identity_chooser,
+            execute_chooser=self.execute_chooser,
+            autocommit=False,
+            autoflush=False,
+            info={"shard_router": self}
+        )
+
+    def session(self) -> ShardedSession:
+        return self._session_factory()
+
+    def shard_sessions(self) -> Iterable[Session]:
+        """A plain Session per shard, for work that runs shard by shard"""
+        for shard_id in self.shard_ids:
+            yield Session(self.engines[shard_id])
+
+    def shard_for_key(self, value: str) -> str:
+        return self.shard_ids[_shard_key(value) % len(self.shard_ids)]
+
+    def shard_for_user_id(self, user_id: int) -> str:
+        index = (int(user_id) - 1) // self.id_range
+        if not 0 <= index < len(self.shard_ids):
+            raise KeyError(f"User id {user_id} is outside every shard's range")
+        return self.shard_ids[index]
+
+    def shard_chooser(self, mapper, instance, clause=None) -> str:
+        if instance is not None:
+            if mapper.class_ is User:
+                if instance.id is not None:
+                    return self.shard_for_user_id(instance.id)
+                return self.shard_for_key(instance.email)
+            if mapper.class_ is Settings:
+                return self.shard_for_key(instance.setting_name)
+        return self.shard_ids[0]
+
+    def identity_chooser(self, mapper, primary_key, **kw) -> List[str]:
+        if mapper.class_ is User:
+            try:
+                return [self.shard_for_user_id(primary_key[0])]
+            except (KeyError, TypeError, ValueError):
+                return []
+        if mapper.class_ is Settings:
+            return [self.shard_for_key(primary_key[0])]
+        return self.shard_ids
+
+    def execute_chooser(self, context: ORMExecuteState) -> List[str]:
+        statement = context.statement
+        shards = set()
+        for column, choose in (
+            (User.__table__.c.id, self.shard_for_user_id),
+            (Settings.__table__.c.setting_name, self.shard_for_key),
+        ):
+            for value in _equality_values(statement, column):
+                try:
+                    shards.add(choose(value))
+                except (KeyError, TypeError, ValueError):
+                    continue
+        return [shard_id for shard_id in self.shard_ids if shard_id in shards] or self.shard_ids
+
+    def create_all(self) -> None:
+        """Create the sharded tables and start each shard's user ids at its range.
+
+        A users table from before sharding (without AUTOINCREMENT, so no
+        sqlite_sequence) is rebuilt first. Raises RuntimeError, rather
+        than start, if a shard holds users outside its range: they'd be
+        looked up on another shard.
+        """
+        step = Autoincrement(User)
+        for index, (shard_id, engine) in enumerate(self.engines.items()):
+            SQLiteBase.metadata.create_all(bind=engine, tables=list(SHARDED_TABLES))
+            with engine.connect() as conn:
+                if not step.applied(conn):
+                    step.apply(conn)
+            base = index * self.id_range
+            with engine.begin() as conn:
+                low, high = conn.execute(select(func.min(User.id), func.max(User.id))).one()
+                if low is not None and (low <= base or high > base + self.id_range):
+                    raise RuntimeError(
+                        f"Shard {shard_id} holds user ids {low}-{high}, outside its range "
+                        f"{base + 1}-{base + self.id_range}; move them before enabling sharding"
+                    )
+                conn.execute(text(
+                    "INSERT INTO sqlite_sequence (name, seq) SELECT :table, :base "
+                    "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :table)"
+                ), {"table": User.__tablename__, "base": base})
+                conn.execute(text(
+                    "UPDATE sqlite_sequence SET seq = :base WHERE name = :table AND seq < :base"
+                ), {"table": User.__tablename__, "base": base})
+
+
+@lru_cache(maxsize=None)
+def get_shard_router() -> Optional[ShardRouter]:
+    """The router when SQLITE_SHARD_URLS is set, else None (a single database)"""
+    urls = [url.strip() for url in settings.SQLITE_SHARD_URLS.split(",") if url.strip()]
+    if not urls:
+        return None
+    engines = [get_sqlite_engine()] + [
+        connection_tracker.instrument(create_engine(url, connect_args={"check_same_thread": False}), f"shard{i}")
+        for i, url in enumerate(urls, 1)
+    ]
+    return ShardRouter(engines)
+
+
+def is_sharded(db: Session) -> bool:
+    return isinstance(db, ShardedSession)
+
+
+def merge_sorted(query: Query, order_by: Sequence, descending: bool = False,
+                 skip: int = 0, limit: Optional[int] = None) -> List[Any]:
+    """Run an ordered query on every shard and merge-sort the rows.
+
+    Each shard returns at most ``skip + limit`` rows already in order, so
+    offset pagination stays correct across shards. ``order_by`` are mapped
+    attributes; NULLs sort first, as in SQLite.
+    """
+    columns = [column.desc() if descending else column.asc() for column in order_by]
+    keys = [column.key for column in order_by]
+
+    def sort_key(row):
+        return tuple((getattr(row, key) is not None, getattr(row, key)) for key in keys)
+
+    per_shard = []
+    for shard_id in query.session.info["shard_router"].shard_ids:
+        shard_query = query.order_by(None).order_by(*columns).set_shard(shard_id)
+        if limit is not None:
+            shard_query = shard_query.limit(skip + limit)
+        per_shard.append(shard_query.all())
+    merged = heapq.merge(*per_shard, key=sort_key, reverse=descending)
+    return list(itertools.islice(merged, skip, None if limit is None else skip + limit))
+
+
+def for_each_shard(func: Callable[[Session], int]) -> Callable[[Session], int]:
+    """Wrap a maintenance job so it runs on every users/settings shard and
+    returns the summed result; unchanged without sharding"""
+    @functools.wraps(func)
+    def run(db: Session) -> int:
+        router = get_shard_router()
+        if router is None:
+            return func(db)
+        total = 0
+        for shard_db in router.shard_sessions():
+            with shard_db:
+                total += func(shard_db)
+        return total
+    return run
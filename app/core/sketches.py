@@ -0,0 +1,192 @@
+"""Mergeable streaming sketches: fixed memory, bounded error.
+
+- HyperLogLog: distinct count, standard error 1.04 / sqrt(2 ** precision)
+- CountMinSketch: frequency, overestimates by at most e / width of the total
+  with probability 1 - exp(-depth); TopK keeps the heaviest keys it has seen
+- TDigest: quantiles, most accurate near the tails
+
+All of them merge, so per-bucket sketches combine into any time range.
+"""
+import hashlib
+import math
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+
+def hash64(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "little")
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 11):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = bytearray(self.m)
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value) -> None:
+        h = hash64(value)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, *others: "HyperLogLog") -> None:
+        self.registers = bytearray(map(max, self.registers, *(other.registers for other in others)))
+
+    def count(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small sets
+        return round(estimate)
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 1024, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array("q", bytes(8 * width)) for _ in range(depth)]
+        self.total = 0
+
+    @property
+    def epsilon(self) -> float:
+        """Overestimate bound, as a fraction of ``total``"""
+        return math.e / self.width
+
+    def positions(self, key) -> List[int]:
+        """Counter index of ``key`` in each row; the same for every sketch of this shape"""
+        h = hash64(key)
+        h1, h2 = h & 0xFFFFFFFF, h >> 32
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add(self, key, count: int = 1) -> int:
+        """Add and return the new estimate for ``key``"""
+        self.total += count
+        estimate = None
+        for row, index in zip(self.rows, self.positions(key)):
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate
+
+    def estimate(self, key, positions: Optional[List[int]] = None) -> int:
+        return min(row[index] for row, index in zip(self.rows, positions or self.positions(key)))
+
+
+class TopK:
+    """Heavy hitters: a count-min sketch plus the ``capacity`` keys with the
+    highest estimates seen so far"""
+
+    def __init__(self, capacity: int = 100, width: int = 1024, depth: int = 4):
+        self.capacity = capacity
+        self.sketch = CountMinSketch(width, depth)
+        self.candidates: Dict[str, int] = {}
+        self._floor = 0  # at most the lowest candidate estimate (estimates only grow)
+
+    def add(self, key, count: int = 1) -> None:
+        estimate = self.sketch.add(key, count)
+        if key in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[key] = estimate
+        elif estimate > self._floor:
+            lightest = min(self.candidates, key=self.candidates.get)
+            if estimate > self.candidates[lightest]:
+                del self.candidates[lightest]
+                self.candidates[key] = estimate
+                self._floor = min(self.candidates.values())
+            else:
+                self._floor = self.candidates[lightest]
+
+    @staticmethod
+    def combine(parts: List["TopK"], k: int) -> List[Tuple[str, int]]:
+        """The k heaviest keys across sketches (e.g. time buckets), with
+        summed estimates; each overestimates by at most epsilon * total"""
+        totals = {}
+        for key in set().union(*(part.candidates for part in parts)):
+            positions = parts[0].sketch.positions(key)
+            totals[key] = sum(part.sketch.estimate(key, positions) for part in parts)
+        return sorted(totals.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+
+class TDigest:
+    """Merging t-digest (Dunning) with the k1 scale function"""
+
+    def __init__(self, compression: float = 100.0):
+        self.compression = compression
+        self.centroids: List[List[float]] = []  # [mean, weight], sorted by mean
+        self._buffer: List[Tuple[float, float]] = []
+        self.count = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        self._buffer.append((value, weight))
+        self.count += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, *others: "TDigest") -> None:
+        """Add the points of ``others``, leaving them unchanged"""
+        for other in others:
+            self._buffer.extend((mean, weight) for mean, weight in other.centroids + other._buffer)
+            self.count += other.count
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+        self._compress()
+
+    def _k(self, q: float) -> float:
+        return self.compression / (2 * math.pi) * math.asin(2 * min(max(q, 0.0), 1.0) - 1)
+
+    def _compress(self) -> None:
+        if not self._buffer:
+            return
+        points = sorted([(mean, weight) for mean, weight in self.centroids] + self._buffer)
+        self._buffer = []
+        total = sum(weight for _, weight in points)
+        merged: List[List[float]] = []
+        before = 0.0  # weight of the finished centroids
+        mean, weight = points[0]
+        k_low = self._k(0.0)
+        for point_mean, point_weight in points[1:]:
+            if self._k((before + weight + point_weight) / total) - k_low <= 1.0:
+                weight += point_weight
+                mean += (point_mean - mean) * point_weight / weight
+            else:
+                merged.append([mean, weight])
+                before += weight
+                k_low = self._k(before / total)
+                mean, weight = point_mean, point_weight
+        merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q: float) -> Optional[float]:
+        self._compress()
+        if not self.centroids:
+            return None
+        if len(self.centroids) == 1:
+            return self.centroids[0][0]
+        target = q * self.count
+        # Interpolate between centroid centers; the ends run to min and max
+        previous_mean, previous_center = self.min, 0.0
+        cumulative = 0.0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - previous_center
+                fraction = (target - previous_center) / span if span else 0.0
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_mean, previous_center = mean, center
+            cumulative += weight
+        span = self.count - previous_center
+        fraction = (target - previous_center) / span if span else 1.0
+        return previous_mean + min(fraction, 1.0) * (self.max - previous_mean)
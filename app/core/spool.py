@@ -0,0 +1,453 @@
+"""A local write-ahead spool for event ingestion.
+
+While PostgreSQL Database 1 or 2 cannot be reached, ingested events are
+appended to segment files under SPOOL_DIR instead of being lost, and are
+replayed into their tables in bulk once the database is back.
+
+A record is a header (payload length, CRC-32) followed by a JSON payload;
+a record torn by a crash fails its length or checksum and ends the
+segment. Writes go straight to the file (so a process crash loses
+nothing) and are fsynced at most every SPOOL_FSYNC_SECONDS. A segment is
+only ever handled by the process holding its flock: the writer, while it
+is the active segment, then whichever worker replays it. Records a
+database rejects for any reason other than being unreachable are moved
+to a quarantine file next to the segments, in the same format, and can
+be replayed with ``scripts/replay_quarantine.py`` once fixed. A database
+whose unique index on idempotency_key is not built yet (see
+app/core/migrations.py) keeps its rows spooled, like one that is down.
+"""
+import asyncio
+import fcntl
+import json
+import os
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.database import get_postgres_db1_engine, get_postgres_db2_engine
+from app.core.idempotency import ingest_dedup, missing_conflict_target, request_key, upsert_insert
+from app.models.postgres_db1 import Analytics
+from app.models.postgres_db2 import PerformanceMetric, SystemEvent
+
+HEADER = struct.Struct("<II")  # payload length, crc32
+SUFFIX = ".seg"
+QUARANTINE_SUFFIX = ".quarantine"
+# SQLSTATEs of an unreachable PostgreSQL (besides class 08, connection exceptions):
+# shutting down, crashed, starting up, too many connections, statement timeout
+UNAVAILABLE_SQLSTATES = {"57P01", "57P02", "57P03", "53300", "57014"}
+# SQLite (the tests' stand-in) reports an unreachable file by message only
+SQLITE_UNAVAILABLE = ("unable to open database file", "database is locked", "disk i/o error")
+
+
+@dataclass(frozen=True)
+class SpooledTable:
+    model: Any
+    database: str
+    time: str  # set from the time the event was spooled, not when it is replayed
+
+
+SPOOLED_TABLES = {
+    spec.model.__tablename__: spec for spec in (
+        SpooledTable(Analytics, "postgres_db1", "timestamp"),
+        SpooledTable(SystemEvent, "postgres_db2", "created_at"),
+        SpooledTable(PerformanceMetric, "postgres_db2", "recorded_at"),
+    )
+}
+
+
+def is_unavailable(error: Exception) -> bool:
+    """Whether a database error means "not reachable right now" (connection
+    or timeout) rather than a bad statement, row or schema"""
+    if isinstance(error, PoolTimeoutError):
+        return True
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated:
+        return True
+    if not isinstance(error, OperationalError):
+        return False
+    if isinstance(error.orig, sqlite3.Error):
+        return any(message in str(error.orig).lower() for message in SQLITE_UNAVAILABLE)
+    sqlstate = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    if sqlstate is None:
+        return True  # psycopg2 raises connection failures and timeouts without one
+    return sqlstate.startswith("08") or sqlstate in UNAVAILABLE_SQLSTATES
+
+
+def is_not_ready(error: Exception) -> bool:
+    """Whether replaying can't work yet, but will later: the database is
+    unreachable, or lacks the unique index the replay's ON CONFLICT needs"""
+    return is_unavailable(error) or (isinstance(error, DBAPIError) and missing_conflict_target(error))
+
+
+def encode_record(record: Dict[str, Any]) -> bytes:
+    payload = json.dumps(record, default=str).encode()
+    return HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def read_segment(f: BinaryIO) -> Iterator[Dict[str, Any]]:
+    """The records of a segment, up to the first torn one"""
+    while True:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return
+        length, checksum = HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        yield json.loads(payload)
+
+
+def _append_locked(path: Path, data: bytes) -> None:
+    """Append to a file that replay_quarantine() may rewrite or delete"""
+    while True:
+        with open(path, "ab") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_nlink == 0:
+                continue  # deleted while we waited for the lock
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+            return
+
+
+class IngestSpool:
+    """Spools events for unreachable databases and replays them later.
+
+    ingest() inserts through the deduplicator as usual. When that fails
+    because the database is unreachable, the event is appended to the
+    spool and the database is marked down, so the following events are
+    spooled without waiting on it. The background task replays the spool
+    every ``replay_seconds`` in batches of ``replay_batch`` rows per
+    INSERT; each spooled row carries an idempotency key, so a segment
+    replayed twice (a crash before it was deleted, or kept because one of
+    its databases was still down) adds nothing. Each database is replayed
+    on its own: one still down keeps its rows spooled without holding
+    back the others, and every database that took its rows is marked up
+    again.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        segment_bytes: Optional[int] = None,
+        fsync_seconds: Optional[float] = None,
+        replay_seconds: Optional[float] = None,
+        replay_batch: Optional[int] = None,
+        engines: Optional[Dict[str, Callable[[], Engine]]] = None,
+        enabled: Optional[bool] = None
+    ):
+        self.directory = Path(directory or settings.SPOOL_DIR)
+        self.segment_bytes = segment_bytes or settings.SPOOL_SEGMENT_BYTES
+        self.fsync_seconds = settings.SPOOL_FSYNC_SECONDS if fsync_seconds is None else fsync_seconds
+        self.replay_seconds = replay_seconds or settings.SPOOL_REPLAY_SECONDS
+        self.replay_batch = replay_batch or settings.SPOOL_REPLAY_BATCH
+        self.engines = engines or {"postgres_db1": get_postgres_db1_engine, "postgres_db2": get_postgres_db2_engine}
+        self.enabled = settings.SPOOL_ENABLED if enabled is None else enabled
+        self.down: set = set()
+        self._fd: Optional[int] = None
+        self._size = 0
+        self._dirty = False
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.counts = {"spooled": 0, "replayed": 0, "failed_replays": 0, "quarantined": 0, "fsyncs": 0}
+        self.last_replay: Dict[str, Any] = {}
+
+    # Writing
+
+    def _open_segment(self) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{time.time_ns():020d}-{os.getpid()}{SUFFIX}"
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._size = 0
+
+    def _sync(self) -> None:
+        os.fsync(self._fd)
+        self._dirty = False
+        self._last_sync = time.monotonic()
+        self.counts["fsyncs"] += 1
+
+    def _close_segment(self) -> None:
+        if self._fd is None:
+            return
+        if self._dirty:
+            self._sync()
+        fcntl.flock(self._fd, fcntl.LOCK_UN)
+        os.close(self._fd)
+        self._fd = None
+
+    def append(self, table: str, values: Dict[str, Any], at: datetime) -> None:
+        record = encode_record({"table": table, "at": at.isoformat(), "values": values})
+        with self._lock:
+            if self._fd is None:
+                self._open_segment()
+            os.write(self._fd, record)
+            self._size += len(record)
+            self._dirty = True
+            self.counts["spooled"] += 1
+            if self._size >= self.segment_bytes:
+                self._close_segment()
+            elif time.monotonic() - self._last_sync >= self.fsync_seconds:
+                self._sync()
+
+    def sync(self) -> None:
+        """fsync what has been appended since the last fsync"""
+        with self._lock:
+            if self._fd is not None and self._dirty:
+                self._sync()
+
+    def ingest(
+        self,
+        db: Session,
+        model: Any,
+        values: Dict[str, Any],
+        idempotency_key: Optional[str] = None,
+        deduplicate: bool = False
+    ) -> Tuple[Any, bool]:
+        """Like IngestDeduplicator.ingest(); a spooled event comes back as an
+        unsaved row (id None) with its time column set"""
+        spec = SPOOLED_TABLES[model.__tablename__]
+        if spec.database not in self.down:
+            try:
+                return ingest_dedup.ingest(db, model, values, idempotency_key, deduplicate)
+            except Exception as e:
+                if not self.enabled or not is_unavailable(e):
+                    raise
+                try:
+                    db.rollback()
+                except Exception:
+                    pass
+                if spec.database not in self.down:
+                    self.down.add(spec.database)
+                    print(f"{spec.database} is unavailable, spooling ingested events: {e}")
+        at = datetime.now(timezone.utc)
+        # Spooled rows always get a key: replaying a segment twice must not duplicate them
+        key = request_key(idempotency_key or f"spool:{uuid.uuid4().hex}")
+        self.append(spec.model.__tablename__, {**values, "idempotency_key": key}, at)
+        return model(**values, **{spec.time: at}), True
+
+    # Replaying
+
+    def segments(self) -> List[Path]:
+        return sorted(self.directory.glob("*" + SUFFIX))
+
+    def _insert(self, database: str, records: List[Dict[str, Any]]) -> int:
+        """Insert records bound for ``database`` in one transaction"""
+        rows: Dict[str, List[Dict[str, Any]]] = {}
+        for record in records:
+            spec = SPOOLED_TABLES[record["table"]]
+            rows.setdefault(record["table"], []).append(
+                {**record["values"], spec.time: datetime.fromisoformat(record["at"])}
+            )
+        engine = self.engines[database]()
+        dialect_insert = upsert_insert(engine.dialect.name)
+        with engine.begin() as conn:
+            for table_name, table_rows in rows.items():
+                table = SPOOLED_TABLES[table_name].model.__table__
+                stmt = dialect_insert(table).on_conflict_do_nothing(index_elements=["idempotency_key"]) \
+                    if dialect_insert is not None else table.insert()
+                for start in range(0, len(table_rows), self.replay_batch):
+                    conn.execute(stmt, table_rows[start:start + self.replay_batch])
+        return len(records)
+
+    def _insert_one_by_one(self, database: str, records: List[Dict[str, Any]]) -> Tuple[int, List[Dict[str, Any]]]:
+        """Insert records one at a time; returns (inserted, rejected)"""
+        replayed, rejected = 0, []
+        for record in records:
+            try:
+                replayed += self._insert(database, [record])
+            except Exception as e:
+                if is_not_ready(e):
+                    raise
+                rejected.append(record)
+        return replayed, rejected
+
+    def _insert_each(self, path: Path, database: str, records: List[Dict[str, Any]], error: Exception) -> int:
+        """After a batch was rejected (not an outage), insert its records one
+        at a time and quarantine the ones that are rejected again"""
+        replayed, rejected = self._insert_one_by_one(database, records)
+        if rejected:
+            quarantine = path.with_name(f"{path.stem}-{database}{QUARANTINE_SUFFIX}")
+            _append_locked(quarantine, b"".join(encode_record(record) for record in rejected))
+            self.counts["quarantined"] += len(rejected)
+            print(f"{database} rejected {len(rejected)} spooled row(s), moved to {quarantine}: {error}")
+        return replayed
+
+    def _replay_segment(self, path: Path, unavailable: set) -> Optional[int]:
+        """Insert one segment's records and delete it; None if another process
+        holds it. The segment is kept while a database it has rows for is in
+        ``unavailable`` (which a failed insert adds to)."""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return None  # replayed by another worker meanwhile
+        with f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            if not path.exists():
+                return None
+            records: Dict[str, List[Dict[str, Any]]] = {}
+            for record in read_segment(f):
+                records.setdefault(SPOOLED_TABLES[record["table"]].database, []).append(record)
+            replayed, keep = 0, False
+            for database, database_records in records.items():
+                if database in unavailable:
+                    keep = True
+                    continue
+                try:
+                    try:
+                        replayed += self._insert(database, database_records)
+                    except Exception as e:
+                        if is_not_ready(e):
+                            raise
+                        replayed += self._insert_each(path, database, database_records, e)
+                except Exception as e:
+                    if not is_not_ready(e):
+                        raise
+                    reason = "is still unavailable" if is_unavailable(e) else "is not migrated yet"
+                    print(f"{database} {reason}, keeping its spooled events: {e}")
+                    unavailable.add(database)
+                    keep = True
+            if not keep:
+                path.unlink()
+        return replayed
+
+    def replay(self) -> int:
+        """Replay every segment not held by another process (blocking); returns rows replayed"""
+        with self._replay_lock:
+            started = time.perf_counter()
+            replayed = 0
+            unavailable: set = set()
+            try:
+                # Closed segments first (the active one is locked, so skipped); only once
+                # every database took them is the active segment closed, so an outage
+                # doesn't leave a small segment behind every replay_seconds
+                for path in self.segments():
+                    replayed += self._replay_segment(path, unavailable) or 0
+                if not unavailable:
+                    with self._lock:
+                        self._close_segment()
+                    for path in self.segments():
+                        replayed += self._replay_segment(path, unavailable) or 0
+            except Exception:
+                self.counts["failed_replays"] += 1
+                raise
+            finally:
+                self.counts["replayed"] += replayed
+                if replayed:
+                    seconds = time.perf_counter() - started
+                    self.last_replay = {
+                        "rows": replayed,
+                        "seconds": round(seconds, 3),
+                        "rows_per_second": round(replayed / seconds) if seconds else None,
+                        "at": datetime.now(timezone.utc).isoformat(),
+                    }
+            if unavailable:
+                self.counts["failed_replays"] += 1
+            for database in self.down - unavailable:
+                print(f"{database} is available again")
+                self.down.discard(database)
+            return replayed
+
+    def quarantined(self) -> List[Path]:
+        return sorted(self.directory.glob("*" + QUARANTINE_SUFFIX))
+
+    def replay_quarantine(self, path: Path) -> Tuple[int, int]:
+        """Insert a quarantine file's records again, once whatever rejected
+        them is fixed (blocking); returns (replayed, still rejected).
+
+        Rejected records stay in the file, which is deleted once empty. An
+        unreachable or unmigrated database raises and leaves it untouched.
+        """
+        try:
+            f = open(path, "r+b")
+        except FileNotFoundError:
+            return 0, 0
+        with f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            if os.fstat(f.fileno()).st_nlink == 0:
+                return 0, 0  # replayed by another process meanwhile
+            records: Dict[str, List[Dict[str, Any]]] = {}
+            for record in read_segment(f):
+                records.setdefault(SPOOLED_TABLES[record["table"]].database, []).append(record)
+            replayed, rejected = 0, []
+            for database, database_records in records.items():
+                try:
+                    replayed += self._insert(database, database_records)
+                except Exception as e:
+                    if is_not_ready(e):
+                        raise
+                    inserted, database_rejected = self._insert_one_by_one(database, database_records)
+                    replayed += inserted
+                    rejected += database_rejected
+            if rejected:
+                f.seek(0)
+                f.truncate()
+                f.write(b"".join(encode_record(record) for record in rejected))
+                f.flush()
+                os.fsync(f.fileno())
+            else:
+                path.unlink()
+        return replayed, len(rejected)
+
+    async def start(self) -> None:
+        """fsync and replay in the background until stop()"""
+
+        async def run() -> None:
+            next_replay = 0.0
+            while True:
+                await asyncio.sleep(self.fsync_seconds or 1.0)
+                self.sync()
+                if time.monotonic() < next_replay:
+                    continue
+                next_replay = time.monotonic() + self.replay_seconds
+                if not self.segments() and not self.down:
+                    continue
+                try:
+                    await run_in_threadpool(self.replay)
+                except Exception as e:
+                    print(f"Spool replay failed: {e}")
+
+        self._task = asyncio.get_running_loop().create_task(run())
+
+    async def stop(self) -> None:
+        """Stop the task and close the active segment; the rest is replayed on the next start"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        with self._lock:
+            self._close_segment()
+
+    def metrics(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            **self.counts,
+            "segments": len(segments),
+            "quarantine_files": len(self.quarantined()),
+            "bytes": sum(path.stat().st_size for path in segments if path.exists()),
+            "down": sorted(self.down),
+            "last_replay": self.last_replay,
+        }
+
+
+ingest_spool = IngestSpool()
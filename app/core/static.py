@@ -0,0 +1,73 @@
+import json
+import os
+from functools import lru_cache
+from typing import Dict, Optional
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+STATIC_ROOT = os.path.join("app", "static")
+# Output of scripts/build_static.py: content-hashed files plus .gz/.br variants
+DIST_DIR = os.path.join(STATIC_ROOT, "dist")
+MANIFEST_NAME = "manifest.json"
+STATIC_URL = "/static"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Precompressed variants, in order of preference
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+@lru_cache(maxsize=None)
+def load_manifest(directory: str = DIST_DIR) -> Dict[str, str]:
+    """Logical asset name -> hashed file name, or {} if the build hasn't run"""
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def static_asset(name: str) -> Optional[str]:
+    """URL of the built, content-hashed asset, or None when it isn't built"""
+    hashed = load_manifest().get(name)
+    if hashed is None:
+        return None
+    return f"{STATIC_URL}/{hashed}"
+
+
+def _accepted_encodings(scope: Scope) -> set:
+    for key, value in scope.get("headers", ()):
+        if key == b"accept-encoding":
+            return {part.split(";")[0].strip() for part in value.decode("latin-1").split(",")}
+    return set()
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles serving prebuilt .br/.gz variants with immutable caching.
+
+    Only the build output is mounted, and every file name there carries a
+    content hash, so responses can be cached forever.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        accepted = _accepted_encodings(scope)
+        for encoding, suffix in _ENCODINGS:
+            if encoding not in accepted:
+                continue
+            full_path, stat_result = self.lookup_path(path + suffix)
+            if stat_result is None:
+                continue
+            # Content-Type is still guessed from the original extension
+            # (mimetypes reads "app.css.br" as text/css, encoding br)
+            response = self.file_response(full_path, stat_result, scope)
+            response.headers["Content-Encoding"] = encoding
+            response.headers["Vary"] = "Accept-Encoding"
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+            return response
+
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Vary"] = "Accept-Encoding"
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        return response
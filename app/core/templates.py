@@ -0,0 +1,128 @@
+import hashlib
+import os
+import re
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from app.core.config import settings
+from app.core.static import static_asset
+
+# Part of the bytecode cache file names: bump when the code generated by
+# FragmentCacheExtension changes, since cached bytecode is only keyed on the
+# template source.
+BYTECODE_CACHE_VERSION = 1
+
+
+class FragmentCache:
+    """Bounded LRU of rendered template fragments, keyed by tuples"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class FragmentCacheExtension(Extension):
+    """Adds ``{% cache key, ... %}...{% endcache %}`` to templates.
+
+    The rendered body is stored under the tuple of all key expressions, so
+    callers include every value the fragment depends on (e.g. the row's
+    columns); a changed row produces a new key and is re-rendered.
+    """
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=FragmentCache(settings.TEMPLATE_FRAGMENT_CACHE_SIZE))
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_cache_support", [nodes.List(args)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _cache_support(self, key, caller):
+        key = tuple(key)
+        cache = self.environment.fragment_cache
+        rendered = cache.get(key)
+        if rendered is None:
+            rendered = caller()
+            cache.set(key, rendered)
+        return rendered
+
+
+_DOM_ID_SAFE = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def dom_id(value: Any) -> str:
+    """Make a value usable in an HTML id / CSS selector (e.g. setting names)"""
+    text = str(value)
+    if _DOM_ID_SAFE.fullmatch(text):
+        return text
+    return "h" + hashlib.sha1(text.encode()).hexdigest()[:16]
+
+
+def _bytecode_cache() -> Optional[FileSystemBytecodeCache]:
+    """Persistent bytecode cache so new processes skip template compilation"""
+    directory = settings.TEMPLATE_BYTECODE_CACHE_DIR
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    return FileSystemBytecodeCache(directory, f"__jinja2_v{BYTECODE_CACHE_VERSION}_%s.cache")
+
+
+# Single Jinja2 environment shared by the frontend routes and the error
+# handlers in app.main, so templates are loaded and compiled only once.
+# Templates are not re-checked on disk in production.
+templates = Jinja2Templates(
+    directory="app/templates",
+    auto_reload=settings.ENVIRONMENT != "production",
+    bytecode_cache=_bytecode_cache(),
+    extensions=[FragmentCacheExtension],
+)
+templates.env.filters["dom_id"] = dom_id
+templates.env.globals["static_asset"] = static_asset
+
+
+def precompile_templates() -> int:
+    """Load every template once so the first request doesn't compile any"""
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
@@ -0,0 +1,163 @@
+"""Helpers for downsampled time-series queries.
+
+Aggregation happens in the database: rows are grouped by bucket number,
+floor((epoch(timestamp) - start) / step), so only one row per bucket
+comes back. Each bucket is kept as a partial (count, sum, min, max) so
+archived data can be folded in before the aggregation is chosen. Gaps are
+filled here; lttb() picks representative raw points from a stream
+instead of aggregating.
+"""
+import math
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.sql.elements import ColumnElement
+
+AGGREGATIONS = ("avg", "min", "max", "sum", "count")
+FILLS = ("null", "zero", "previous", "linear")
+
+Point = Tuple[float, float]
+BucketStates = Dict[int, List[float]]  # bucket -> [count, sum, min, max]
+
+
+def as_utc(value: datetime) -> datetime:
+    """Naive timestamps (SQLite) are UTC"""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def epoch_seconds(value: datetime) -> float:
+    return as_utc(value).timestamp()
+
+
+def epoch_column(column: ColumnElement, dialect: str) -> ColumnElement:
+    """A timestamp column as float epoch seconds, computed in SQL (no datetime parsing per row)"""
+    if dialect == "sqlite":
+        # julianday() is off by ~10 µs; SQLite date functions only resolve milliseconds anyway
+        return func.round((func.julianday(column) - 2440587.5) * 86400.0, 3)
+    return func.extract("epoch", column)
+
+
+def bucket_index(column: ColumnElement, start: float, step: int, dialect: str) -> ColumnElement:
+    """Bucket number of a timestamp column, as SQL for ``dialect``"""
+    if dialect == "sqlite":
+        # Timestamps are stored as UTC text; integer division floors for rows at or after start
+        return (cast(func.strftime("%s", column), Integer) - int(start)) // step
+    return func.floor((epoch_column(column, dialect) - start) / step)
+
+
+def bucket_states(column: ColumnElement, value: ColumnElement, start: float, step: int, dialect: str):
+    """Columns of a GROUP BY bucket query yielding (bucket, count, sum, min, max) rows"""
+    bucket = bucket_index(column, start, step, dialect).label("bucket")
+    return bucket, (bucket, func.count(value), func.sum(value), func.min(value), func.max(value))
+
+
+def merge_bucket(states: BucketStates, index: int, count: int, total: float, low: float, high: float) -> None:
+    state = states.get(index)
+    if state is None:
+        states[index] = [count, total, low, high]
+    else:
+        state[0] += count
+        state[1] += total
+        state[2] = min(state[2], low)
+        state[3] = max(state[3], high)
+
+
+def merge_sorted_columns(
+    states: BucketStates,
+    times: Sequence[float],
+    values: Sequence[float],
+    first: int,
+    last: int,
+    start: float,
+    step: int
+) -> None:
+    """Fold rows [first, last) of time-sorted columns into ``states``: one
+    binary search and one slice per bucket rather than a step per row"""
+    index = first
+    while index < last:
+        bucket = int((times[index] - start) // step)
+        stop = bisect_left(times, start + (bucket + 1) * step, index, last)
+        chunk = values[index:stop]
+        merge_bucket(states, bucket, stop - index, sum(chunk), min(chunk), max(chunk))
+        index = stop
+
+
+def aggregate(state: List[float], aggregation: str) -> float:
+    count, total, low, high = state
+    if aggregation == "avg":
+        return total / count
+    return {"min": low, "max": high, "sum": total, "count": count}[aggregation]
+
+
+def fill_gaps(values: Dict[int, float], count: int, fill: str = "null") -> List[Optional[float]]:
+    """A value for each of ``count`` buckets from the buckets that have one"""
+    series = [values.get(index) for index in range(count)]
+    if fill == "zero":
+        return [0 if value is None else value for value in series]
+    if fill == "previous":
+        last = None
+        for index, value in enumerate(series):
+            if value is None:
+                series[index] = last
+            else:
+                last = value
+        return series
+    if fill == "linear":
+        known = sorted(values)
+        for left, right in zip(known, known[1:]):
+            for index in range(left + 1, right):
+                series[index] = values[left] + (values[right] - values[left]) * (index - left) / (right - left)
+    return series
+
+
+def _triangle_area(a: Point, b: Point, c: Point) -> float:
+    return abs((a[0] - c[0]) * (b[1] - a[1]) - (a[0] - b[0]) * (c[1] - a[1]))
+
+
+def _choose(bucket: Sequence[Point], previous: Point, following: Sequence[Point]) -> Point:
+    """The point of ``bucket`` forming the largest triangle with the previous
+    pick and the average of the following bucket"""
+    average = (
+        math.fsum(point[0] for point in following) / len(following),
+        math.fsum(point[1] for point in following) / len(following),
+    )
+    return max(bucket, key=lambda point: _triangle_area(previous, point, average))
+
+
+def lttb(points: Iterable[Point], total: int, threshold: int) -> List[Point]:
+    """Largest-Triangle-Three-Buckets visual downsampling (Steinarsson) to
+    about ``threshold`` points, keeping peaks and troughs that averaging
+    would flatten.
+
+    ``points`` are (x, y) in x order and are consumed as a stream: only two
+    buckets are held at a time. ``total`` is their expected count, which
+    sizes the buckets; the first and last points are always kept.
+    """
+    iterator = iter(points)
+    if threshold < 3 or total <= threshold:
+        return list(iterator)
+    first = next(iterator, None)
+    if first is None:
+        return []
+    every = (total - 2) / (threshold - 2)
+    selected = [first]
+    previous: List[Point] = []
+    current: List[Point] = []
+    number = 0
+    for index, point in enumerate(iterator):
+        bucket = int(index / every)
+        if bucket != number and current:
+            if previous:
+                selected.append(_choose(previous, selected[-1], current))
+            previous, current, number = current, [], bucket
+        current.append(point)
+    if not current:
+        return selected
+    last = current.pop()
+    if previous:
+        selected.append(_choose(previous, selected[-1], current or [last]))
+    if current:
+        selected.append(_choose(current, selected[-1], [last]))
+    selected.append(last)
+    return selected
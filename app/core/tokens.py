@@ -0,0 +1,272 @@
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import secrets
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import get_sqlite_engine
+from app.core.responses import dumps
+from app.models.token_revocation import TokenRevocation
+
+# HS256 JWTs signed and verified with the stdlib: the keyed HMAC state is
+# built once per key and copied per token, and known headers map straight
+# to their key without being decoded.
+
+ALGORITHM = "HS256"
+
+
+class TokenError(Exception):
+    """A token that must not authenticate; ``reason`` feeds the metrics"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(segment: bytes) -> bytes:
+    return base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4))
+
+
+def parse_keys(value: str, default_secret: str) -> List[Tuple[str, str]]:
+    """(kid, secret) pairs from "kid:secret,kid:secret" (JWT_KEYS)"""
+    keys = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        kid, sep, secret = item.partition(":")
+        if not sep or not kid or not secret:
+            raise ValueError("JWT_KEYS entries must look like kid:secret")
+        keys.append((kid, secret))
+    return keys or [("primary", default_secret)]
+
+
+class KeyRing:
+    """HMAC-SHA256 keys by kid: the first one signs, every one verifies.
+
+    To rotate, put the new key first and keep the old one listed until the
+    tokens it signed have expired. Tokens without a kid (issued before key
+    ids) are checked against the signing key.
+    """
+
+    def __init__(self, keys: List[Tuple[str, str]]):
+        if not keys:
+            raise ValueError("KeyRing needs at least one key")
+        self.signing_kid = keys[0][0]
+        self._macs = {kid: hmac.new(secret.encode(), digestmod=hashlib.sha256) for kid, secret in keys}
+        self._headers = {kid: _b64encode(dumps({"alg": ALGORITHM, "typ": "JWT", "kid": kid})) for kid in self._macs}
+        self._kid_by_header = {header: kid for kid, header in self._headers.items()}
+
+    def sign(self, header: bytes, payload: bytes, kid: str) -> bytes:
+        mac = self._macs[kid].copy()
+        mac.update(header + b"." + payload)
+        return mac.digest()
+
+    def header(self) -> bytes:
+        return self._headers[self.signing_kid]
+
+    def kid_for_header(self, header: bytes) -> str:
+        kid = self._kid_by_header.get(header)
+        if kid is not None:
+            return kid
+        # Headers written by other encoders (key order, extra fields)
+        try:
+            fields = json.loads(_b64decode(header))
+        except (ValueError, binascii.Error):
+            raise TokenError("malformed")
+        if not isinstance(fields, dict) or fields.get("alg") != ALGORITHM:
+            raise TokenError("algorithm")
+        kid = fields.get("kid", self.signing_kid)
+        if kid not in self._macs:
+            raise TokenError("unknown_key")
+        return kid
+
+
+class RevocationList:
+    """Revoked token ids and per-user cutoffs, kept in memory per worker.
+
+    Revocations are written to the token_revocations table and every worker
+    pulls new rows at most every JWT_REVOCATION_REFRESH_SECONDS, so checking
+    a token is two dict lookups.
+    """
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        refresh_interval: Optional[float] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        self.session_factory = session_factory or (lambda: Session(get_sqlite_engine()))
+        self.refresh_interval = settings.JWT_REVOCATION_REFRESH_SECONDS if refresh_interval is None else refresh_interval
+        self.clock = clock
+        self._tokens: Dict[str, float] = {}  # jti -> expires_at
+        self._users: Dict[str, Tuple[float, float]] = {}  # user id -> (revoked_at, expires_at)
+        self._last_id = 0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def revoke_token(self, jti: str, expires_at: float) -> None:
+        """Reject one token (logout) until it would have expired anyway"""
+        self._add("token", jti, self.clock(), expires_at)
+
+    def revoke_user(self, user_id: int) -> None:
+        """Reject every token issued to a user so far"""
+        now = self.clock()
+        self._add("user", str(user_id), now, now + settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+    def is_revoked(self, claims: Dict[str, Any]) -> bool:
+        if self.clock() >= self._next_refresh:
+            self.refresh()
+        if claims.get("jti") in self._tokens:
+            return True
+        cutoff = self._users.get(str(claims.get("uid")))
+        # iat has one-second resolution: a token from the same second as the
+        # revocation is rejected too
+        return cutoff is not None and claims.get("iat", 0) <= cutoff[0]
+
+    def refresh(self) -> None:
+        """Pull revocations written since the last refresh (by any worker)"""
+        with self._lock:
+            now = self.clock()
+            self._next_refresh = now + self.refresh_interval
+            try:
+                with self.session_factory() as db:
+                    rows = db.execute(
+                        select(TokenRevocation)
+                        .where(TokenRevocation.id > self._last_id, TokenRevocation.expires_at > now)
+                        .order_by(TokenRevocation.id)
+                    ).scalars().all()
+            except Exception as e:
+                # Keep the last known list; the next refresh retries
+                print(f"Token revocation refresh failed: {e}")
+                return
+            for row in rows:
+                self._apply(row.kind, row.key, row.revoked_at, row.expires_at)
+                self._last_id = max(self._last_id, row.id)
+            self._tokens = {jti: exp for jti, exp in self._tokens.items() if exp > now}
+            self._users = {uid: cutoff for uid, cutoff in self._users.items() if cutoff[1] > now}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tokens.clear()
+            self._users.clear()
+            self._last_id = 0
+            self._next_refresh = 0.0
+
+    def _add(self, kind: str, key: str, revoked_at: float, expires_at: float) -> None:
+        with self.session_factory() as db:
+            db.execute(insert(TokenRevocation).values(
+                kind=kind, key=key, revoked_at=revoked_at, expires_at=expires_at
+            ))
+            db.commit()
+        # Effective on this worker at once, on the others at their next refresh
+        with self._lock:
+            self._apply(kind, key, revoked_at, expires_at)
+
+    def _apply(self, kind: str, key: str, revoked_at: float, expires_at: float) -> None:
+        if kind == "token":
+            self._tokens[key] = expires_at
+        elif revoked_at >= self._users.get(key, (0.0, 0.0))[0]:
+            self._users[key] = (revoked_at, expires_at)
+
+
+class TokenMetrics:
+    def __init__(self):
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counts)
+
+
+keyring = KeyRing(parse_keys(settings.JWT_KEYS, settings.SECRET_KEY))
+revocations = RevocationList()
+token_metrics = TokenMetrics()
+
+
+def encode_token(claims: Dict[str, Any]) -> str:
+    header = keyring.header()
+    payload = _b64encode(dumps(claims))
+    signature = _b64encode(keyring.sign(header, payload, keyring.signing_kid))
+    return b".".join((header, payload, signature)).decode("ascii")
+
+
+def decode_token(token: str) -> Dict[str, Any]:
+    """Verified, unexpired and unrevoked claims of a token; raises TokenError"""
+    try:
+        header, payload, signature = token.encode("ascii").split(b".")
+        signature = _b64decode(signature)
+    except (UnicodeEncodeError, ValueError, binascii.Error):
+        raise TokenError("malformed")
+    kid = keyring.kid_for_header(header)
+    if not hmac.compare_digest(keyring.sign(header, payload, kid), signature):
+        raise TokenError("signature")
+    try:
+        claims = json.loads(_b64decode(payload))
+    except (ValueError, binascii.Error):
+        raise TokenError("malformed")
+    if not isinstance(claims, dict):
+        raise TokenError("malformed")
+    exp = claims.get("exp")
+    if not isinstance(exp, (int, float)) or exp <= time.time():
+        raise TokenError("expired")
+    if revocations.is_revoked(claims):
+        raise TokenError("revoked")
+    return claims
+
+
+def user_claims(user) -> Dict[str, Any]:
+    """Claims that let API requests authorize without loading the user"""
+    claims = {"uid": user.id}
+    if settings.JWT_EMBED_CLAIMS:
+        claims.update(
+            name=user.username,
+            fn=user.full_name,
+            act=user.is_active,
+            adm=user.is_superuser
+        )
+    return claims
+
+
+def create_access_token(data: Dict[str, Any], expires_in: Optional[float] = None, user=None) -> str:
+    """Sign ``data`` with iat, exp and a jti; ``user`` adds its claims"""
+    now = int(time.time())
+    claims = {
+        **data,
+        "iat": now,
+        "exp": now + int(expires_in if expires_in is not None else settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60),
+        "jti": secrets.token_urlsafe(12),
+    }
+    if user is not None:
+        claims.update(user_claims(user))
+    return encode_token(claims)
+
+
+def principal_from_claims(claims: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The current-user dict straight from the token, if it embeds the claims"""
+    if "adm" not in claims or "uid" not in claims:
+        return None
+    return {
+        "id": claims["uid"],
+        "email": claims.get("sub"),
+        "username": claims.get("name"),
+        "full_name": claims.get("fn"),
+        "is_active": claims.get("act"),
+        "is_superuser": claims["adm"]
+    }
+
+
+def revoke_user_tokens(user_id: int) -> None:
+    revocations.revoke_user(user_id)
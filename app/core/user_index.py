@@ -0,0 +1,141 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.models.user import User
+
+CHUNK_BITS = 1 << 16  # ids per chunk; a chunk is an 8 KiB bitmap
+
+
+class UserIdIndex:
+    """In-memory set of existing user ids for validating foreign user_ids.
+
+    Ids are bits in 8 KiB chunks allocated on demand, so a million
+    contiguous ids take 128 KiB and sharded id ranges cost nothing for the
+    gaps. A set bit is trusted. An id not found is checked once against the
+    database and then remembered as missing for ``negative_ttl`` seconds.
+    Users created or deleted through other workers reach this one via that
+    fallback (new ids) or the periodic rebuild (deletions).
+    """
+
+    def __init__(
+        self,
+        negative_cache_size: Optional[int] = None,
+        negative_ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.negative_cache_size = negative_cache_size or settings.USER_INDEX_NEGATIVE_CACHE_SIZE
+        self.negative_ttl = settings.USER_INDEX_NEGATIVE_TTL_SECONDS if negative_ttl is None else negative_ttl
+        self.clock = clock
+        self.loaded = False
+        self._chunks: Dict[int, bytearray] = {}
+        self._missing: "OrderedDict[int, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self.counts = {"hits": 0, "misses_cached": 0, "lookups": 0}
+
+    def __len__(self) -> int:
+        return sum(int.from_bytes(chunk, "little").bit_count() for chunk in self._chunks.values())
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._chunks) * CHUNK_BITS // 8
+
+    def add(self, user_id: int) -> None:
+        chunk, bit = divmod(user_id, CHUNK_BITS)
+        with self._lock:
+            bitmap = self._chunks.get(chunk)
+            if bitmap is None:
+                bitmap = self._chunks[chunk] = bytearray(CHUNK_BITS // 8)
+            bitmap[bit >> 3] |= 1 << (bit & 7)
+            self._missing.pop(user_id, None)
+
+    def discard(self, user_id: int) -> None:
+        chunk, bit = divmod(user_id, CHUNK_BITS)
+        with self._lock:
+            bitmap = self._chunks.get(chunk)
+            if bitmap is not None:
+                bitmap[bit >> 3] &= ~(1 << (bit & 7)) & 0xFF
+
+    def contains(self, user_id: int) -> Optional[bool]:
+        """True if indexed, False if recently found missing, None if unknown"""
+        chunk, bit = divmod(user_id, CHUNK_BITS)
+        bitmap = self._chunks.get(chunk)
+        if bitmap is not None and bitmap[bit >> 3] & (1 << (bit & 7)):
+            self.counts["hits"] += 1
+            return True
+        expires = self._missing.get(user_id)
+        if expires is not None and expires > self.clock():
+            self.counts["misses_cached"] += 1
+            return False
+        return None
+
+    def exists(self, user_id: int, db: Session) -> bool:
+        """Whether a user id exists, reading the database only for unknown ids"""
+        known = self.contains(user_id)
+        if known is not None:
+            return known
+        self.counts["lookups"] += 1
+        found = db.execute(select(User.id).where(User.id == user_id)).first() is not None
+        if found:
+            self.add(user_id)
+        else:
+            with self._lock:
+                self._missing[user_id] = self.clock() + self.negative_ttl
+                self._missing.move_to_end(user_id)
+                while len(self._missing) > self.negative_cache_size:
+                    self._missing.popitem(last=False)
+        return found
+
+    def rebuild(self, ids: Iterable[int]) -> None:
+        """Replace the index with exactly ``ids``"""
+        chunks: Dict[int, bytearray] = {}
+        for user_id in ids:
+            chunk, bit = divmod(user_id, CHUNK_BITS)
+            bitmap = chunks.get(chunk)
+            if bitmap is None:
+                bitmap = chunks[chunk] = bytearray(CHUNK_BITS // 8)
+            bitmap[bit >> 3] |= 1 << (bit & 7)
+        with self._lock:
+            self._chunks = chunks
+            self._missing.clear()
+            self.loaded = True
+
+    def load(self, session_factory: Callable[[], Session]) -> None:
+        with session_factory() as db:
+            self.rebuild(db.execute(select(User.__table__.c.id).execution_options(yield_per=10000)).scalars())
+
+    async def start(self, session_factory: Callable[[], Session], interval: Optional[float] = None) -> None:
+        """Load now, then rebuild every ``interval`` seconds until stop()"""
+        interval = interval or settings.USER_INDEX_REBUILD_SECONDS
+        await run_in_threadpool(self.load, session_factory)
+
+        async def refresh() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await run_in_threadpool(self.load, session_factory)
+                except Exception as e:
+                    print(f"User id index rebuild failed: {e}")
+
+        self._task = asyncio.get_running_loop().create_task(refresh())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> Dict[str, int]:
+        return {**self.counts, "ids": len(self), "memory_bytes": self.memory_bytes}
+
+
+user_index = UserIdIndex()
@@ -1,16 +1,31 @@
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.exception_handlers import http_exception_handler as default_http_exception_handler
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import HTMLResponse
 from starlette.middleware.sessions import SessionMiddleware
 from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.core.sessions import ServerSessionMiddleware, session_store
 from app.api.v1.api import api_router
 from app.api.v1.endpoints.frontend import router as frontend_router
-from app.core.exceptions import AdminAccessDeniedException
-from fastapi.templating import Jinja2Templates
+from app.core.exceptions import AdminAccessDeniedException, RateLimitExceededException
+from app.core.templates import templates, precompile_templates
+from app.core.static import DIST_DIR, STATIC_URL, PrecompressedStaticFiles
 from app.core.auth import get_current_user
+from app.core.security import shutdown_hash_pool
+from app.core.scheduler import scheduler
+from app.core.sharding import get_shard_router
+from app.core.user_index import user_index
+from app.core.audit import audit_log
+from app.core.activity import ActivityLogMiddleware, activity_log
+from app.core.analytics_sketches import analytics_sketches
+from app.core.email import email_queue
+from app.core.spool import ingest_spool
+from app.core.migrations import migrate_on_startup
+from app.services.maintenance_service import register_maintenance_jobs
 from app.core.database import (
-    SQLiteBase, PostgresDB1Base, PostgresDB2Base,
-    sqlite_engine, postgres_db1_engine, postgres_db2_engine
+    SQLiteBase, PostgresDB1Base, PostgresDB2Base, create_sqlite_session,
+    create_postgres_db1_session, get_sqlite_engine, get_postgres_db1_engine, get_postgres_db2_engine
 )
 from contextlib import asynccontextmanager
 
@@ -19,12 +34,38 @@ from contextlib import asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     # Create tables for all databases
-    SQLiteBase.metadata.create_all(bind=sqlite_engine)
-    PostgresDB1Base.metadata.create_all(bind=postgres_db1_engine)
-    PostgresDB2Base.metadata.create_all(bind=postgres_db2_engine)
+    SQLiteBase.metadata.create_all(bind=get_sqlite_engine())
+    if get_shard_router() is not None:
+        get_shard_router().create_all()
+    PostgresDB1Base.metadata.create_all(bind=get_postgres_db1_engine())
+    PostgresDB2Base.metadata.create_all(bind=get_postgres_db2_engine())
+    # ...and upgrade the ones that existed before a column or index was added
+    if settings.MIGRATE_ON_STARTUP:
+        await migrate_on_startup()
+    # Compile (or load from the bytecode cache) every template up front
+    precompile_templates()
+    await user_index.start(create_sqlite_session)
+    await audit_log.start()
+    await email_queue.start()
+    if settings.SPOOL_ENABLED:
+        await ingest_spool.start()
+    if settings.ACTIVITY_LOG_ENABLED:
+        await activity_log.start()
+    if settings.ANALYTICS_SKETCHES_ENABLED:
+        await analytics_sketches.start(create_postgres_db1_session)
+    register_maintenance_jobs(scheduler)
+    if settings.SCHEDULER_ENABLED:
+        await scheduler.start()
     yield
     # Shutdown
-    pass
+    await scheduler.stop()
+    await user_index.stop()
+    await audit_log.stop()
+    await activity_log.stop()
+    await analytics_sketches.stop()
+    await email_queue.stop()
+    await ingest_spool.stop()
+    shutdown_hash_pool()
 
 
 app = FastAPI(
@@ -44,8 +85,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Set up session middleware
-app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
+# Record authenticated requests (inside the session middleware, to see the user)
+if settings.ACTIVITY_LOG_ENABLED:
+    app.add_middleware(ActivityLogMiddleware, activity_log=activity_log)
+
+# Set up session middleware: signed cookie by default, or server-side
+if session_store is None:
+    app.add_middleware(SessionMiddleware, secret_key=settings.SECRET_KEY)
+else:
+    app.add_middleware(
+        ServerSessionMiddleware,
+        store=session_store,
+        max_age=settings.SESSION_TTL_SECONDS,
+        refresh_after=settings.SESSION_REFRESH_SECONDS,
+    )
+
+# Compress responses (outermost, so it sees the final body and headers)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
 
 # Include API router
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -53,8 +114,8 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 # Include frontend router
 app.include_router(frontend_router)
 
-# Initialize templates for error pages
-templates = Jinja2Templates(directory="app/templates")
+# Built, content-hashed assets (scripts/build_static.py)
+app.mount(STATIC_URL, PrecompressedStaticFiles(directory=DIST_DIR, check_dir=False), name="static")
 
 
 @app.exception_handler(AdminAccessDeniedException)
@@ -66,6 +127,18 @@ async def admin_access_denied_handler(request: Request, exc: AdminAccessDeniedEx
     })
 
 
+@app.exception_handler(RateLimitExceededException)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceededException):
+    """429 for the API; HTML forms are re-rendered with the error instead"""
+    if exc.template:
+        # 200 so the htmx form swaps the page in (it ignores 4xx responses)
+        return templates.TemplateResponse(exc.template, {
+            "request": request,
+            "error": exc.detail
+        }, headers=exc.headers)
+    return await default_http_exception_handler(request, exc)
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Handle HTTP exceptions with custom 404 page for admin access"""
@@ -82,7 +155,8 @@ async def http_exception_handler(request: Request, exc: HTTPException):
                 "request": request,
                 "error_type": "not_found"
             })
-    return None  # Let FastAPI handle other HTTP exceptions
+    # Let FastAPI handle other HTTP exceptions
+    return await default_http_exception_handler(request, exc)
 
 
 @app.exception_handler(404)
@@ -1,7 +1,12 @@
 # Database models package
 from .user import User
 from .settings import Settings
+from .scheduler import SchedulerLock, JobRun
+from .rate_limit import RateLimitCounter
+from .server_session import ServerSession
+from .token_revocation import TokenRevocation
 from .postgres_db1 import Analytics, UserLog
+from .audit_event import AuditEvent
 from .postgres_db2 import SystemEvent, PerformanceMetric
 
-__all__ = ["User", "Settings", "Analytics", "UserLog", "SystemEvent", "PerformanceMetric"]
+__all__ = ["User", "Settings", "SchedulerLock", "JobRun", "RateLimitCounter", "ServerSession", "TokenRevocation", "Analytics", "UserLog", "AuditEvent", "SystemEvent", "PerformanceMetric"]
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index, event
+from app.core.database import PostgresDB1Base
+
+
+class AuditEvent(PostgresDB1Base):
+    """One admin mutation: who did what to which entity, and the field diff.
+
+    Append-only: rows are only ever inserted. ``changes`` maps each changed
+    field to ``[old, new]`` (old is null on create, new is null on delete).
+    """
+    __tablename__ = "audit_events"
+    __table_args__ = (
+        # Each filter of the audit trail seeks an index and pages by id
+        Index("ix_audit_events_entity", "entity_type", "entity_id", "id"),
+        Index("ix_audit_events_actor", "actor", "id"),
+        Index("ix_audit_events_action", "action", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)  # insertion order; pages are keyed on it
+    actor_id = Column(Integer, nullable=True)
+    actor = Column(String, nullable=True)
+    action = Column(String, nullable=False)
+    entity_type = Column(String, nullable=False)
+    entity_id = Column(String, nullable=False)
+    changes = Column(JSON, nullable=False)
+    created_at = Column(DateTime(timezone=True), nullable=False)  # when the mutation happened, not the write
+
+
+@event.listens_for(AuditEvent, "before_update")
+@event.listens_for(AuditEvent, "before_delete")
+def _append_only(mapper, connection, target):
+    raise ValueError("Audit events are append-only")
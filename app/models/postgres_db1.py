@@ -10,6 +10,8 @@ class Analytics(PostgresDB1Base):
     user_id = Column(Integer, index=True, nullable=False)
     event_type = Column(String, nullable=False)
     event_data = Column(JSON, nullable=True)
+    # sha256 of the client's Idempotency-Key; internal, never listed
+    idempotency_key = Column(String(64), unique=True, nullable=True, info={"internal": True})
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
 
 
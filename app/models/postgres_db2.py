@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Float
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Float, Index
 from sqlalchemy.sql import func
 from app.core.database import PostgresDB2Base
 
@@ -11,16 +11,24 @@ class SystemEvent(PostgresDB2Base):
     severity = Column(String, nullable=False)  # INFO, WARNING, ERROR, CRITICAL
     message = Column(Text, nullable=False)
     event_metadata = Column(JSON, nullable=True)
+    # sha256 of the client's Idempotency-Key; internal, never listed
+    idempotency_key = Column(String(64), unique=True, nullable=True, info={"internal": True})
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class PerformanceMetric(PostgresDB2Base):
     __tablename__ = "performance_metrics"
+    __table_args__ = (
+        # Time-series queries: one metric over a time range
+        Index("ix_performance_metrics_name_time", "metric_name", "recorded_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     metric_name = Column(String, nullable=False)
     metric_value = Column(Float, nullable=False)
     unit = Column(String, nullable=True)
     tags = Column(JSON, nullable=True)
+    # sha256 of the client's Idempotency-Key; internal, never listed
+    idempotency_key = Column(String(64), unique=True, nullable=True, info={"internal": True})
     recorded_at = Column(DateTime(timezone=True), server_default=func.now())
 
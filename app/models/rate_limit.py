@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, Float
+from app.core.database import SQLiteBase
+
+
+class RateLimitCounter(SQLiteBase):
+    """Hits per key and fixed window, for the shared rate-limit backend"""
+    __tablename__ = "rate_limit_counters"
+
+    key = Column(String, primary_key=True)
+    window = Column(Integer, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    expires_at = Column(Float, index=True, nullable=False)  # unix time
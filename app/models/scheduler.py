@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from app.core.database import SQLiteBase
+
+
+class SchedulerLock(SQLiteBase):
+    """Leader lease: the worker holding an unexpired row runs the scheduled jobs"""
+    __tablename__ = "scheduler_locks"
+
+    name = Column(String, primary_key=True)
+    owner = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+
+class JobRun(SQLiteBase):
+    __tablename__ = "job_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_name = Column(String, index=True, nullable=False)
+    worker = Column(String, nullable=False)
+    trigger = Column(String, nullable=False)  # schedule or manual
+    status = Column(String, nullable=False)  # running, succeeded, failed
+    result = Column(Text, nullable=True)  # JSON
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, index=True, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, String, Float, Text
+from app.core.database import SQLiteBase
+
+
+class ServerSession(SQLiteBase):
+    """Server-side session data, keyed by the id in the session cookie"""
+    __tablename__ = "server_sessions"
+
+    id = Column(String, primary_key=True)
+    user_id = Column(Integer, index=True)  # for revoking all of a user's sessions
+    data = Column(Text, nullable=False)  # JSON
+    expires_at = Column(Float, index=True, nullable=False)  # unix time
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Float
+from app.core.database import SQLiteBase
+
+
+class TokenRevocation(SQLiteBase):
+    """A revoked access token (kind "token", key = jti) or a per-user cutoff
+    (kind "user", key = user id) rejecting tokens issued up to revoked_at"""
+    __tablename__ = "token_revocations"
+    # Workers poll for rows past the last id they saw: AUTOINCREMENT keeps
+    # ids from restarting below it once the purge has emptied the table
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    revoked_at = Column(Float, nullable=False)  # unix time
+    expires_at = Column(Float, index=True, nullable=False)  # no token it matches is valid past this
@@ -5,6 +5,8 @@ from app.core.database import SQLiteBase
 
 class User(SQLiteBase):
     __tablename__ = "users"
+    # Never reuse ids; with sharding, each shard's sequence starts at its range
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True, nullable=False)
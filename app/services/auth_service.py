@@ -1,9 +1,7 @@
-from datetime import datetime, timedelta
 from typing import Optional
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
-from app.core.config import settings
 from app.core.security import verify_password
+from app.core.tokens import create_access_token
 from app.models.user import User
 from app.schemas.auth import UserLogin
 
@@ -25,12 +23,8 @@ class AuthService:
             return None
         return user
 
-    def create_access_token(self, data: dict) -> str:
-        to_encode = data.copy()
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm="HS256")
-        return encoded_jwt
+    def create_access_token(self, data: dict, user: Optional[User] = None) -> str:
+        return create_access_token(data, user=user)
 
     def create_user(self, user_data: UserLogin) -> Optional[User]:
         # Check if user already exists
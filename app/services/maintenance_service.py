@@ -0,0 +1,177 @@
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from app.core.archive import ARCHIVED_TABLES, ArchiveSpec, ColumnArchive, archive_cutoff, column_archive
+from app.core.config import settings
+from app.core.database import create_postgres_db1_session, create_postgres_db2_session
+from app.core.scheduler import CronSchedule, Scheduler, prune_job_runs
+from app.core.sharding import for_each_shard
+from app.core.sessions import DatabaseSessionStore, revoke_user_sessions, session_store
+from app.core.tokens import revoke_user_tokens
+from app.core.user_index import user_index
+from app.models.server_session import ServerSession
+from app.models.token_revocation import TokenRevocation
+from app.models.user import User
+
+
+def _batched(
+    db: Session,
+    select_ids,
+    apply,
+    batch_size: Optional[int],
+    max_batches: Optional[int],
+    after: Optional[Callable[[List[int]], None]] = None
+) -> int:
+    """Apply a statement to ids chosen by ``select_ids`` in bounded batches.
+
+    Each batch is its own short transaction, so a large backlog never holds
+    the users table locked; a run stops after ``max_batches`` and picks up
+    the rest next time. ``after`` gets each batch's ids once committed.
+    """
+    batch_size = batch_size or settings.MAINTENANCE_BATCH_SIZE
+    max_batches = max_batches or settings.MAINTENANCE_MAX_BATCHES
+    total = 0
+    for _ in range(max_batches):
+        ids = db.execute(select_ids.limit(batch_size)).scalars().all()
+        if not ids:
+            break
+        db.execute(apply(ids))
+        db.commit()
+        if after is not None:
+            after(ids)
+        total += len(ids)
+        if len(ids) < batch_size:
+            break
+    return total
+
+
+def purge_expired_activation_tokens(
+    db: Session,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> int:
+    """Clear expired activation tokens left on active accounts"""
+    now = datetime.utcnow()
+    return _batched(
+        db,
+        select(User.id).where(User.activation_token_expires < now, User.is_active.is_(True)).order_by(User.id),
+        lambda ids: update(User).where(User.id.in_(ids)).values(
+            activation_token=None,
+            activation_token_expires=None
+        ),
+        batch_size,
+        max_batches
+    )
+
+
+def purge_inactive_registrations(
+    db: Session,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> int:
+    """Delete never-activated accounts whose token expired over the retention period ago"""
+    cutoff = datetime.utcnow() - timedelta(days=settings.INACTIVE_REGISTRATION_RETENTION_DAYS)
+    return _batched(
+        db,
+        select(User.id).where(
+            User.is_active.is_(False),
+            User.is_superuser.is_(False),
+            User.activation_token_expires < cutoff
+        ).order_by(User.id),
+        lambda ids: delete(User).where(User.id.in_(ids)),
+        batch_size,
+        max_batches,
+        after=_forget_users
+    )
+
+
+def _forget_users(ids: List[int]) -> None:
+    """What UserService.delete_user does once a user is gone"""
+    for user_id in ids:
+        user_index.discard(user_id)
+        revoke_user_sessions(user_id)
+        revoke_user_tokens(user_id)
+
+
+def purge_expired_sessions(db: Session) -> int:
+    """Delete expired server-side sessions"""
+    deleted = db.execute(delete(ServerSession).where(ServerSession.expires_at <= time.time())).rowcount
+    db.commit()
+    return deleted
+
+
+def purge_expired_token_revocations(db: Session) -> int:
+    """Delete revocations whose tokens have all expired"""
+    deleted = db.execute(delete(TokenRevocation).where(TokenRevocation.expires_at <= time.time())).rowcount
+    db.commit()
+    return deleted
+
+
+def archive_table(
+    spec: ArchiveSpec,
+    session_factory: Callable[[], Session],
+    cutoff: Optional[datetime] = None,
+    archive: ColumnArchive = column_archive,
+    batch_size: Optional[int] = None,
+    max_batches: Optional[int] = None
+) -> int:
+    """Move rows older than ``cutoff`` (default: ARCHIVE_AFTER_DAYS ago) into the column archive.
+
+    Each batch is written to its partition files before it is deleted;
+    if the delete fails the next run archives the same rows again, which
+    the archive ignores by id.
+    """
+    cutoff = cutoff or archive_cutoff()
+    batch_size = batch_size or settings.ARCHIVE_BATCH_ROWS
+    max_batches = max_batches or settings.ARCHIVE_MAX_BATCHES
+    table = spec.model.__table__
+    time_column = table.c[spec.time]
+    query = (
+        select(*(table.c[name] for name in [spec.time, spec.key, *spec.columns]))
+        .where(time_column < cutoff)
+        .order_by(time_column, table.c.id)
+        .limit(batch_size)
+    )
+    total = 0
+    with session_factory() as db:
+        for _ in range(max_batches):
+            rows = db.execute(query).mappings().all()
+            if not rows:
+                break
+            archive.append(spec, rows)
+            ids = [row["id"] for row in rows]
+            for start in range(0, len(ids), 10000):  # stays under bind-parameter limits
+                db.execute(delete(table).where(table.c.id.in_(ids[start:start + 10000])))
+            db.commit()
+            total += len(rows)
+            if len(rows) < batch_size:
+                break
+    return total
+
+
+def archive_performance_metrics(db: Session) -> int:
+    """Archive old performance metrics (``db``, the users database, is unused)"""
+    return archive_table(ARCHIVED_TABLES["performance_metrics"], create_postgres_db2_session)
+
+
+def archive_analytics(db: Session) -> int:
+    """Archive old analytics events (``db``, the users database, is unused)"""
+    return archive_table(ARCHIVED_TABLES["analytics"], create_postgres_db1_session)
+
+
+def register_maintenance_jobs(scheduler: Scheduler) -> None:
+    scheduler.add(
+        "purge_expired_activation_tokens", CronSchedule("15 * * * *"), for_each_shard(purge_expired_activation_tokens)
+    )
+    scheduler.add(
+        "purge_inactive_registrations", CronSchedule("30 3 * * *"), for_each_shard(purge_inactive_registrations)
+    )
+    scheduler.add("prune_job_runs", CronSchedule("45 3 * * *"), prune_job_runs)
+    scheduler.add("purge_expired_token_revocations", CronSchedule("5 * * * *"), purge_expired_token_revocations)
+    if isinstance(session_store, DatabaseSessionStore):
+        scheduler.add("purge_expired_sessions", CronSchedule("0 * * * *"), purge_expired_sessions)
+    if settings.ARCHIVE_ENABLED:
+        scheduler.add("archive_performance_metrics", CronSchedule("10 4 * * *"), archive_performance_metrics)
+        scheduler.add("archive_analytics", CronSchedule("40 4 * * *"), archive_analytics)
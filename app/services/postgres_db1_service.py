@@ -1,6 +1,11 @@
 from sqlalchemy.orm import Session
 from app.models.postgres_db1 import Analytics, UserLog
-from app.core.database import get_postgres_db1
+from app.models.audit_event import AuditEvent
+from app.core.archive import ARCHIVED_TABLES, column_archive
+from app.core.database import create_postgres_db1_session, session_scope
+from app.core.spool import ingest_spool
+from app.core.projection import project_columns, select_projection
+from app.core.search import SEARCHABLE, search
 from typing import Optional, Dict, Any, List
 
 
@@ -8,22 +13,25 @@ async def create_analytics_event(
     user_id: int,
     event_type: str,
     event_data: Optional[Dict[str, Any]] = None,
+    idempotency_key: Optional[str] = None,
+    deduplicate: bool = False,
     db: Session = None
 ) -> Analytics:
-    """Create analytics event in PostgreSQL Database 1"""
-    if db is None:
-        db = next(get_postgres_db1())
-    
-    analytics = Analytics(
-        user_id=user_id,
-        event_type=event_type,
-        event_data=event_data
-    )
-    
-    db.add(analytics)
-    db.commit()
-    db.refresh(analytics)
-    return analytics
+    """Create analytics event in PostgreSQL Database 1.
+
+    A retry (same ``idempotency_key``, or with ``deduplicate`` the same
+    content shortly after) returns the original event instead. While the
+    database is unreachable the event is spooled and returned unsaved (id None).
+    """
+    with session_scope(create_postgres_db1_session, db) as db:
+        analytics, _ = ingest_spool.ingest(
+            db,
+            Analytics,
+            {"user_id": user_id, "event_type": event_type, "event_data": event_data},
+            idempotency_key,
+            deduplicate
+        )
+        return analytics
 
 
 async def create_user_log(
@@ -34,20 +42,36 @@ async def create_user_log(
     db: Session = None
 ) -> UserLog:
     """Create user log entry in PostgreSQL Database 1"""
-    if db is None:
-        db = next(get_postgres_db1())
-    
-    user_log = UserLog(
-        user_id=user_id,
-        action=action,
-        ip_address=ip_address,
-        user_agent=user_agent
-    )
-    
-    db.add(user_log)
-    db.commit()
-    db.refresh(user_log)
-    return user_log
+    with session_scope(create_postgres_db1_session, db) as db:
+        user_log = UserLog(
+            user_id=user_id,
+            action=action,
+            ip_address=ip_address,
+            user_agent=user_agent
+        )
+
+        db.add(user_log)
+        db.commit()
+        db.refresh(user_log)
+        return user_log
+
+
+def _analytics_criteria(user_id: Optional[int], event_type: Optional[str]) -> list:
+    criteria = []
+    if user_id:
+        criteria.append(Analytics.user_id == user_id)
+    if event_type:
+        criteria.append(Analytics.event_type == event_type)
+    return criteria
+
+
+def _user_log_criteria(user_id: Optional[int], action: Optional[str]) -> list:
+    criteria = []
+    if user_id:
+        criteria.append(UserLog.user_id == user_id)
+    if action:
+        criteria.append(UserLog.action == action)
+    return criteria
 
 
 async def get_user_analytics(
@@ -57,16 +81,35 @@ async def get_user_analytics(
     db: Session = None
 ) -> List[Analytics]:
     """Get analytics events from PostgreSQL Database 1"""
-    if db is None:
-        db = next(get_postgres_db1())
-    
-    query = db.query(Analytics)
-    if user_id:
-        query = query.filter(Analytics.user_id == user_id)
-    if event_type:
-        query = query.filter(Analytics.event_type == event_type)
-    
-    return query.order_by(Analytics.timestamp.desc()).limit(limit).all()
+    with session_scope(create_postgres_db1_session, db) as db:
+        query = db.query(Analytics).filter(*_analytics_criteria(user_id, event_type))
+        return query.order_by(Analytics.timestamp.desc()).limit(limit).all()
+
+
+async def get_user_analytics_rows(
+    user_id: Optional[int] = None,
+    event_type: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    db: Session = None
+) -> List[Dict[str, Any]]:
+    """Get analytics events as dicts of the requested columns only.
+
+    Newest first; when the live table has fewer than ``limit``, older ones
+    come from the archive.
+    """
+    with session_scope(create_postgres_db1_session, db) as db:
+        stmt = select_projection(Analytics, fields).where(*_analytics_criteria(user_id, event_type))
+        rows = [row._asdict() for row in db.execute(stmt.order_by(Analytics.timestamp.desc()).limit(limit))]
+    if len(rows) < limit:
+        rows += column_archive.latest(
+            ARCHIVED_TABLES["analytics"],
+            limit - len(rows),
+            [column.key for column in project_columns(Analytics, fields)],
+            key=event_type,
+            **({} if user_id is None else {"user_id": user_id})
+        )
+    return rows
 
 
 async def get_user_logs(
@@ -76,13 +119,70 @@ async def get_user_logs(
     db: Session = None
 ) -> List[UserLog]:
     """Get user logs from PostgreSQL Database 1"""
-    if db is None:
-        db = next(get_postgres_db1())
-    
-    query = db.query(UserLog)
-    if user_id:
-        query = query.filter(UserLog.user_id == user_id)
+    with session_scope(create_postgres_db1_session, db) as db:
+        query = db.query(UserLog).filter(*_user_log_criteria(user_id, action))
+        return query.order_by(UserLog.created_at.desc()).limit(limit).all()
+
+
+async def get_user_logs_rows(
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    db: Session = None
+) -> List[Dict[str, Any]]:
+    """Get user logs as dicts of the requested columns only"""
+    with session_scope(create_postgres_db1_session, db) as db:
+        stmt = select_projection(UserLog, fields).where(*_user_log_criteria(user_id, action))
+        return [row._asdict() for row in db.execute(stmt.order_by(UserLog.created_at.desc()).limit(limit))]
+
+
+async def search_user_logs(
+    q: str,
+    user_id: Optional[int] = None,
+    action: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: str = "rank",
+    db: Session = None
+) -> Dict[str, Any]:
+    """Full-text search over user log user agents; a page of ranked, highlighted results"""
+    with session_scope(create_postgres_db1_session, db) as db:
+        return search(db, SEARCHABLE["user_logs"], q, _user_log_criteria(user_id, action), limit, cursor, sort)
+
+
+def _audit_criteria(
+    actor: Optional[str],
+    action: Optional[str],
+    entity_type: Optional[str],
+    entity_id: Optional[str],
+    before_id: Optional[int]
+) -> list:
+    criteria = []
+    if actor:
+        criteria.append(AuditEvent.actor == actor)
     if action:
-        query = query.filter(UserLog.action == action)
-    
-    return query.order_by(UserLog.created_at.desc()).limit(limit).all()
+        criteria.append(AuditEvent.action == action)
+    if entity_type:
+        criteria.append(AuditEvent.entity_type == entity_type)
+    if entity_id:
+        criteria.append(AuditEvent.entity_id == entity_id)
+    if before_id:
+        criteria.append(AuditEvent.id < before_id)
+    return criteria
+
+
+async def get_audit_events(
+    actor: Optional[str] = None,
+    action: Optional[str] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[str] = None,
+    before_id: Optional[int] = None,
+    limit: int = 50,
+    db: Session = None
+) -> List[AuditEvent]:
+    """A page of audit events, newest first; the last id is ``before_id`` for the next page"""
+    with session_scope(create_postgres_db1_session, db) as db:
+        criteria = _audit_criteria(actor, action, entity_type, entity_id, before_id)
+        query = db.query(AuditEvent).filter(*criteria)
+        return query.order_by(AuditEvent.id.desc()).limit(limit).all()
@@ -1,31 +1,85 @@
+import heapq
+import math
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from app.models.postgres_db2 import SystemEvent, PerformanceMetric
-from app.core.database import get_postgres_db2
+from app.core.alerts import alert_engine
+from app.core.archive import ARCHIVED_TABLES, column_archive
+from app.core.config import settings
+from app.core.database import create_postgres_db2_session, session_scope
+from app.core.projection import project_columns, select_projection
+from app.core.pubsub import Message, Subscription, broker
+from app.core.search import SEARCHABLE, search
+from app.core.spool import ingest_spool
+from app.core.timeseries import (
+    AGGREGATIONS, FILLS, aggregate, as_utc, bucket_states, epoch_column, fill_gaps, lttb, merge_bucket,
+    merge_sorted_columns
+)
 from typing import Optional, Dict, Any, List
 
+SYSTEM_EVENT_TOPIC = "system_event"
+PERFORMANCE_METRIC_TOPIC = "performance_metric"
+
+
+def system_event_to_dict(system_event: SystemEvent) -> Dict[str, Any]:
+    return {
+        "id": system_event.id,
+        "event_type": system_event.event_type,
+        "severity": system_event.severity,
+        "message": system_event.message,
+        "event_metadata": system_event.event_metadata,
+        "created_at": system_event.created_at.isoformat() if system_event.created_at else None
+    }
+
+
+def performance_metric_to_dict(performance_metric: PerformanceMetric) -> Dict[str, Any]:
+    return {
+        "id": performance_metric.id,
+        "metric_name": performance_metric.metric_name,
+        "metric_value": performance_metric.metric_value,
+        "unit": performance_metric.unit,
+        "tags": performance_metric.tags,
+        "recorded_at": performance_metric.recorded_at.isoformat() if performance_metric.recorded_at else None
+    }
+
 
 async def create_system_event(
     event_type: str,
     severity: str,
     message: str,
     event_metadata: Optional[Dict[str, Any]] = None,
+    idempotency_key: Optional[str] = None,
+    deduplicate: bool = False,
     db: Session = None
 ) -> SystemEvent:
-    """Create system event in PostgreSQL Database 2"""
-    if db is None:
-        db = next(get_postgres_db2())
-    
-    system_event = SystemEvent(
-        event_type=event_type,
-        severity=severity,
-        message=message,
-        event_metadata=event_metadata
-    )
-    
-    db.add(system_event)
-    db.commit()
-    db.refresh(system_event)
-    return system_event
+    """Create system event in PostgreSQL Database 2.
+
+    A retry (same ``idempotency_key``, or with ``deduplicate`` the same
+    content shortly after) returns the original event instead. While the
+    database is unreachable the event is spooled and returned unsaved (id
+    None); alerts and the live feed still see it.
+    """
+    with session_scope(create_postgres_db2_session, db) as db:
+        system_event, created = ingest_spool.ingest(
+            db,
+            SystemEvent,
+            {"event_type": event_type, "severity": severity, "message": message, "event_metadata": event_metadata},
+            idempotency_key,
+            deduplicate
+        )
+        if not created:
+            return system_event
+
+        # Evaluate alert rules and push to live feed subscribers
+        subscribed = broker.subscriber_count(SYSTEM_EVENT_TOPIC)
+        if settings.ALERTS_ENABLED or subscribed:
+            event = system_event_to_dict(system_event)
+            if settings.ALERTS_ENABLED:
+                alert_engine.observe(event)
+            if subscribed:
+                broker.publish(SYSTEM_EVENT_TOPIC, event)
+        return system_event
 
 
 async def create_performance_metric(
@@ -33,23 +87,42 @@ async def create_performance_metric(
     metric_value: float,
     unit: Optional[str] = None,
     tags: Optional[Dict[str, Any]] = None,
+    idempotency_key: Optional[str] = None,
+    deduplicate: bool = False,
     db: Session = None
 ) -> PerformanceMetric:
-    """Create performance metric in PostgreSQL Database 2"""
-    if db is None:
-        db = next(get_postgres_db2())
-    
-    performance_metric = PerformanceMetric(
-        metric_name=metric_name,
-        metric_value=metric_value,
-        unit=unit,
-        tags=tags
-    )
-    
-    db.add(performance_metric)
-    db.commit()
-    db.refresh(performance_metric)
-    return performance_metric
+    """Create performance metric in PostgreSQL Database 2 (retries and outages handled as for system events)"""
+    with session_scope(create_postgres_db2_session, db) as db:
+        performance_metric, created = ingest_spool.ingest(
+            db,
+            PerformanceMetric,
+            {"metric_name": metric_name, "metric_value": metric_value, "unit": unit, "tags": tags},
+            idempotency_key,
+            deduplicate
+        )
+        if not created:
+            return performance_metric
+
+        # Push to live feed subscribers
+        if broker.subscriber_count(PERFORMANCE_METRIC_TOPIC):
+            broker.publish(PERFORMANCE_METRIC_TOPIC, performance_metric_to_dict(performance_metric))
+        return performance_metric
+
+
+def _system_event_criteria(event_type: Optional[str], severity: Optional[str]) -> list:
+    criteria = []
+    if event_type:
+        criteria.append(SystemEvent.event_type == event_type)
+    if severity:
+        criteria.append(SystemEvent.severity == severity)
+    return criteria
+
+
+def _performance_metric_criteria(metric_name: Optional[str]) -> list:
+    criteria = []
+    if metric_name:
+        criteria.append(PerformanceMetric.metric_name == metric_name)
+    return criteria
 
 
 async def get_system_events(
@@ -59,16 +132,38 @@ async def get_system_events(
     db: Session = None
 ) -> List[SystemEvent]:
     """Get system events from PostgreSQL Database 2"""
-    if db is None:
-        db = next(get_postgres_db2())
-    
-    query = db.query(SystemEvent)
-    if event_type:
-        query = query.filter(SystemEvent.event_type == event_type)
-    if severity:
-        query = query.filter(SystemEvent.severity == severity)
-    
-    return query.order_by(SystemEvent.created_at.desc()).limit(limit).all()
+    with session_scope(create_postgres_db2_session, db) as db:
+        query = db.query(SystemEvent).filter(*_system_event_criteria(event_type, severity))
+        return query.order_by(SystemEvent.created_at.desc()).limit(limit).all()
+
+
+async def get_system_events_rows(
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    db: Session = None
+) -> List[Dict[str, Any]]:
+    """Get system events as dicts of the requested columns only"""
+    with session_scope(create_postgres_db2_session, db) as db:
+        stmt = select_projection(SystemEvent, fields).where(*_system_event_criteria(event_type, severity))
+        return [row._asdict() for row in db.execute(stmt.order_by(SystemEvent.created_at.desc()).limit(limit))]
+
+
+async def search_system_events(
+    q: str,
+    event_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: str = "rank",
+    db: Session = None
+) -> Dict[str, Any]:
+    """Full-text search over system event messages; a page of ranked, highlighted results"""
+    with session_scope(create_postgres_db2_session, db) as db:
+        return search(
+            db, SEARCHABLE["system_events"], q, _system_event_criteria(event_type, severity), limit, cursor, sort
+        )
 
 
 async def get_performance_metrics(
@@ -77,11 +172,166 @@ async def get_performance_metrics(
     db: Session = None
 ) -> List[PerformanceMetric]:
     """Get performance metrics from PostgreSQL Database 2"""
-    if db is None:
-        db = next(get_postgres_db2())
-    
-    query = db.query(PerformanceMetric)
-    if metric_name:
-        query = query.filter(PerformanceMetric.metric_name == metric_name)
-    
-    return query.order_by(PerformanceMetric.recorded_at.desc()).limit(limit).all()
+    with session_scope(create_postgres_db2_session, db) as db:
+        query = db.query(PerformanceMetric).filter(*_performance_metric_criteria(metric_name))
+        return query.order_by(PerformanceMetric.recorded_at.desc()).limit(limit).all()
+
+
+async def get_performance_metrics_rows(
+    metric_name: Optional[str] = None,
+    limit: int = 100,
+    fields: Optional[str] = None,
+    db: Session = None
+) -> List[Dict[str, Any]]:
+    """Get performance metrics as dicts of the requested columns only.
+
+    Newest first; when the live table has fewer than ``limit``, older ones
+    come from the archive.
+    """
+    with session_scope(create_postgres_db2_session, db) as db:
+        stmt = select_projection(PerformanceMetric, fields).where(*_performance_metric_criteria(metric_name))
+        rows = [row._asdict() for row in db.execute(stmt.order_by(PerformanceMetric.recorded_at.desc()).limit(limit))]
+    if len(rows) < limit:
+        rows += column_archive.latest(
+            ARCHIVED_TABLES["performance_metrics"],
+            limit - len(rows),
+            [column.key for column in project_columns(PerformanceMetric, fields)],
+            key=metric_name
+        )
+    return rows
+
+
+def _series_range(start: Optional[datetime], end: Optional[datetime]):
+    """UTC [start, end) in whole seconds; the last 24 hours by default"""
+    end = (as_utc(end) if end else datetime.now(timezone.utc)).replace(microsecond=0)
+    start = (as_utc(start) if start else end - timedelta(days=1)).replace(microsecond=0)
+    if start >= end:
+        raise ValueError("start must be before end")
+    return start, end
+
+
+async def get_performance_metric_series(
+    metric_name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    step: int = 60,
+    aggregation: str = "avg",
+    fill: str = "null",
+    db: Session = None
+) -> Dict[str, Any]:
+    """One metric aggregated per ``step`` seconds, one value per bucket from ``start``.
+
+    The grouping runs in the database, and archived rows in the range are
+    folded in from their column files; buckets without data are filled
+    with ``fill`` (null, zero, previous or linear).
+    """
+    if aggregation not in AGGREGATIONS:
+        raise ValueError(f"aggregation must be one of {', '.join(AGGREGATIONS)}")
+    if fill not in FILLS:
+        raise ValueError(f"fill must be one of {', '.join(FILLS)}")
+    start, end = _series_range(start, end)
+    count = math.ceil((end - start).total_seconds() / step)
+    if count > settings.TIMESERIES_MAX_POINTS:
+        raise ValueError(f"{count} buckets requested; at most {settings.TIMESERIES_MAX_POINTS}, use a larger step")
+    states = {}
+    with session_scope(create_postgres_db2_session, db) as db:
+        column = PerformanceMetric.recorded_at
+        bucket, columns = bucket_states(
+            column, PerformanceMetric.metric_value, start.timestamp(), step, db.get_bind().dialect.name
+        )
+        stmt = (
+            select(*columns)
+            .where(PerformanceMetric.metric_name == metric_name, column >= start, column < end)
+            .group_by(bucket)
+        )
+        for index, *state in db.execute(stmt):
+            merge_bucket(states, int(index), *state)
+    spec = ARCHIVED_TABLES["performance_metrics"]
+    for _, column_file, first, last in column_archive.scan(spec, start, end, key=metric_name):
+        merge_sorted_columns(
+            states, column_file.column(spec.time), column_file.column("metric_value"),
+            first, last, start.timestamp(), step
+        )
+    values = {index: aggregate(state, aggregation) for index, state in states.items()}
+    return {
+        "metric_name": metric_name,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "step": step,
+        "aggregation": aggregation,
+        "fill": fill,
+        "timestamps": [(start + timedelta(seconds=index * step)).isoformat() for index in range(count)],
+        "values": fill_gaps(values, count, fill),
+    }
+
+
+async def get_performance_metric_points(
+    metric_name: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    points: int = 500,
+    db: Session = None
+) -> Dict[str, Any]:
+    """About ``points`` raw samples of one metric chosen by LTTB, streamed from the archive and the database"""
+    start, end = _series_range(start, end)
+    criteria = [
+        PerformanceMetric.metric_name == metric_name,
+        PerformanceMetric.recorded_at >= start,
+        PerformanceMetric.recorded_at < end,
+    ]
+    spec = ARCHIVED_TABLES["performance_metrics"]
+    with session_scope(create_postgres_db2_session, db) as db:
+        total = db.execute(select(func.count()).select_from(PerformanceMetric).where(*criteria)).scalar()
+        total += column_archive.count(spec, start, end, key=metric_name)
+        epoch = epoch_column(PerformanceMetric.recorded_at, db.get_bind().dialect.name)
+        # Core rows straight from the connection: Session.execute doubles the per-row cost
+        rows = db.connection().execute(
+            select(epoch, PerformanceMetric.metric_value)
+            .where(*criteria)
+            .order_by(PerformanceMetric.recorded_at)
+            .execution_options(yield_per=10000)
+        )
+        live = ((float(x), y) for x, y in rows)
+        archived = column_archive.points(spec, "metric_value", start, end, key=metric_name)
+        selected = lttb(heapq.merge(archived, live), total, points)
+    return {
+        "metric_name": metric_name,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "downsample": "lttb",
+        "source_points": total,
+        "timestamps": [datetime.fromtimestamp(x, timezone.utc).isoformat() for x, _ in selected],
+        "values": [y for _, y in selected],
+    }
+
+
+def _split_filter(value: Optional[str]) -> Optional[set]:
+    """Parse a comma-separated filter value into a set (None means no filter)"""
+    if not value:
+        return None
+    return {item.strip() for item in value.split(",") if item.strip()} or None
+
+
+def subscribe_live_feed(
+    severity: Optional[str] = None,
+    metric_name: Optional[str] = None,
+    topics: Optional[List[str]] = None
+) -> Subscription:
+    """Subscribe to newly created system events and performance metrics.
+
+    ``severity`` and ``metric_name`` are comma-separated lists; each only
+    filters its own topic. Must be called from the consuming event loop.
+    """
+    severities = _split_filter(severity)
+    if severities:
+        severities = {s.upper() for s in severities}
+    metric_names = _split_filter(metric_name)
+
+    def matches(message: Message) -> bool:
+        if message.topic == SYSTEM_EVENT_TOPIC and severities:
+            return str(message.data["severity"]).upper() in severities
+        if message.topic == PERFORMANCE_METRIC_TOPIC and metric_names:
+            return message.data["metric_name"] in metric_names
+        return True
+
+    return broker.subscribe(topics or [SYSTEM_EVENT_TOPIC, PERFORMANCE_METRIC_TOPIC], predicate=matches)
@@ -1,4 +1,5 @@
 from sqlalchemy.orm import Session
+from app.core.sharding import is_sharded, merge_sorted
 from app.models.settings import Settings
 from app.schemas.settings import SettingsCreate, SettingsUpdate
 from typing import List, Optional
@@ -12,6 +13,12 @@ class SettingsService:
         """Get all settings with optional sorting"""
         query = self.db.query(Settings)
         
+        if sort and is_sharded(self.db):
+            column = getattr(Settings, sort, None)
+            if column:
+                order_by = [column] if column is Settings.setting_name else [column, Settings.setting_name]
+                return merge_sorted(query, order_by, order.lower() == "desc")
+        
         if sort:
             column = getattr(Settings, sort, None)
             if column:
@@ -0,0 +1,240 @@
+import asyncio
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, sessionmaker
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.email import EmailService
+from app.core.jobs import Job, jobs
+from app.core.responses import dumps
+from app.core.security import hash_passwords
+from app.core.sharding import is_sharded
+from app.models.user import User
+from app.schemas.user import UserCreate
+
+IMPORT_FORMATS = ("csv", "ndjson")
+USER_IMPORT_JOB = "user_import"
+
+# Columns written by the export (never the password hash or activation token)
+EXPORT_COLUMNS = ("id", "email", "username", "full_name", "is_active", "is_superuser", "created_at")
+EXPORT_BATCH_SIZE = 1000
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    """csv or ndjson from the upload's file name or content type"""
+    name = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if name.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type or "jsonl" in content_type:
+        return "ndjson"
+    return None
+
+
+def iter_records(fileobj: BinaryIO, fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield (line number, record) pairs, reading the file incrementally.
+
+    A record that can't be parsed is yielded as an Exception instance.
+    """
+    text = io.TextIOWrapper(fileobj, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, {k: v for k, v in record.items() if k is not None and v != ""}
+        return
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+            continue
+        if not isinstance(record, dict):
+            record = ValueError("expected a JSON object")
+        yield line_number, record
+
+
+def _validation_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+class UserImportService:
+    """Bulk user import: streaming validation, pooled hashing, batched inserts"""
+
+    def __init__(self, session_factory: sessionmaker, batch_size: Optional[int] = None):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.email_service = EmailService()
+
+    async def run(self, job: Job, fileobj: BinaryIO, fmt: str) -> None:
+        seen_emails, seen_usernames = set(), set()
+        email_sends: List[asyncio.Future] = []
+        batch: List[Tuple[int, UserCreate]] = []
+
+        for line, record in iter_records(fileobj, fmt):
+            job.increment("processed")
+            try:
+                if isinstance(record, Exception):
+                    raise record
+                user = UserCreate(**record)
+            except (ValidationError, ValueError, TypeError) as e:
+                job.add_error(line=line, error=_validation_message(e))
+                continue
+            if user.email in seen_emails or user.username in seen_usernames:
+                job.add_error(line=line, error="duplicate email or username in file")
+                continue
+            seen_emails.add(user.email)
+            seen_usernames.add(user.username)
+            batch.append((line, user))
+            if len(batch) >= self.batch_size:
+                await self._import_batch(job, batch, email_sends)
+                batch = []
+            # Let the loop serve requests between records of a large file
+            if job.counters["processed"] % 500 == 0:
+                await asyncio.sleep(0)
+
+        if batch:
+            await self._import_batch(job, batch, email_sends)
+        for sent in await asyncio.gather(*email_sends):
+            job.increment("emails_sent", sent)
+
+    async def _import_batch(
+        self,
+        job: Job,
+        batch: List[Tuple[int, UserCreate]],
+        email_sends: List[asyncio.Future]
+    ) -> None:
+        existing_emails, existing_usernames = await run_in_threadpool(self._existing, batch)
+        new_users = []
+        for line, user in batch:
+            if user.email in existing_emails or user.username in existing_usernames:
+                job.add_error(line=line, error="email or username already registered")
+            else:
+                new_users.append(user)
+        if not new_users:
+            return
+
+        hashed = await hash_passwords([user.password for user in new_users])
+        expires = datetime.utcnow() + timedelta(hours=24)
+        rows = [
+            {
+                "email": user.email,
+                "username": user.username,
+                "hashed_password": hashed_password,
+                "full_name": user.full_name,
+                "is_active": False,  # Users are inactive by default
+                "is_superuser": False,
+                "activation_token": self.email_service.generate_activation_token(),
+                "activation_token_expires": expires,
+            }
+            for user, hashed_password in zip(new_users, hashed)
+        ]
+        await run_in_threadpool(self._insert, rows)
+        job.increment("created", len(rows))
+
+        # One SMTP connection per batch, sent in the background
+        recipients = [(row["email"], row["username"], row["activation_token"]) for row in rows]
+        email_sends.append(asyncio.get_running_loop().run_in_executor(
+            None, self.email_service.send_activation_emails, recipients
+        ))
+        job.increment("emails_queued", len(recipients))
+
+    def _existing(self, batch: List[Tuple[int, UserCreate]]) -> Tuple[set, set]:
+        emails = [user.email for _, user in batch]
+        usernames = [user.username for _, user in batch]
+        with self.session_factory() as db:
+            found = db.execute(
+                select(User.email, User.username).where(User.email.in_(emails) | User.username.in_(usernames))
+            ).all()
+        return {row.email for row in found}, {row.username for row in found}
+
+    def _insert(self, rows: List[Dict[str, Any]]) -> None:
+        # One executemany INSERT per batch (and shard), in a single transaction
+        with self.session_factory() as db, db.begin():
+            if not is_sharded(db):
+                db.execute(insert(User), rows)
+                return
+            router = db.info["shard_router"]
+            by_shard: Dict[str, List[Dict[str, Any]]] = {}
+            for row in rows:
+                by_shard.setdefault(router.shard_for_key(row["email"]), []).append(row)
+            for shard_id, shard_rows in by_shard.items():
+                # Core insert: the ORM bulk path can't route rows to shards
+                db.connection(bind_arguments={"shard_id": shard_id}).execute(insert(User.__table__), shard_rows)
+
+
+async def start_user_import(upload, fmt: Optional[str], db: Session) -> Job:
+    """Spool an UploadFile to disk and import it in a background job.
+
+    The job opens its own sessions on the same engine as ``db``, which is
+    closed with the request.
+    """
+    fmt = fmt or detect_format(upload.filename, upload.content_type)
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format; expected one of: {', '.join(IMPORT_FORMATS)}")
+
+    # The upload is closed once the response is sent
+    spool = tempfile.NamedTemporaryFile(prefix="user-import-", delete=False)
+    try:
+        await run_in_threadpool(shutil.copyfileobj, upload.file, spool)
+    finally:
+        spool.close()
+
+    if is_sharded(db):
+        service = UserImportService(db.info["shard_router"].session)
+    else:
+        service = UserImportService(sessionmaker(bind=db.get_bind(), autoflush=False))
+
+    async def run(job: Job) -> None:
+        try:
+            with open(spool.name, "rb") as f:
+                await service.run(job, f, fmt)
+        finally:
+            os.unlink(spool.name)
+
+    job = jobs.create(USER_IMPORT_JOB)
+    jobs.start(job, run)
+    return job
+
+
+def _export_row(row) -> Dict[str, Any]:
+    record = row._asdict()
+    if record["created_at"] is not None:
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+
+def iter_user_export(db: Session, fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[bytes]:
+    """Stream all users as CSV or NDJSON, one keyset-paginated batch at a time"""
+    columns = [User.__table__.c[name] for name in EXPORT_COLUMNS]
+    if fmt == "csv":
+        yield (",".join(EXPORT_COLUMNS) + "\r\n").encode("utf-8")
+
+    last_id = 0
+    while True:
+        rows = db.execute(
+            select(*columns).where(User.id > last_id).order_by(User.id).limit(batch_size)
+        ).all()
+        # With sharding this is one page per shard, concatenated
+        rows = sorted(rows, key=lambda row: row.id)[:batch_size]
+        if not rows:
+            return
+        last_id = rows[-1].id
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(_export_row(row).values() for row in rows)
+            yield buffer.getvalue().encode("utf-8")
+        else:
+            yield b"".join(dumps(_export_row(row)) + b"\n" for row in rows)
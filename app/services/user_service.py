@@ -5,6 +5,10 @@ from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 from app.core.security import get_password_hash
 from app.core.email import EmailService
+from app.core.sharding import is_sharded, merge_sorted
+from app.core.sessions import revoke_user_sessions, sync_user_sessions
+from app.core.tokens import revoke_user_tokens, user_claims
+from app.core.user_index import user_index
 
 
 class UserService:
@@ -14,6 +18,12 @@ class UserService:
     def get_users(self, skip: int = 0, limit: int = 100, sort: str = None, order: str = "asc") -> List[User]:
         query = self.db.query(User)
         
+        if is_sharded(self.db):
+            # Merge per-shard pages; the id tiebreak keeps pages stable
+            column = getattr(User, sort, None) if sort else None
+            order_by = [column, User.id] if column is not None else [User.id]
+            return merge_sorted(query, order_by, column is not None and order.lower() == "desc", skip, limit)
+        
         if sort:
             column = getattr(User, sort, None)
             if column:
@@ -53,6 +63,7 @@ class UserService:
         self.db.add(db_user)
         self.db.commit()
         self.db.refresh(db_user)
+        user_index.add(db_user.id)
         
         # Send activation email
         email_service.send_activation_email(user.email, user.username, activation_token)
@@ -91,12 +102,18 @@ class UserService:
         if not db_user:
             return None
         
+        claims = user_claims(db_user)
         update_data = user.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_user, field, value)
         
         self.db.commit()
         self.db.refresh(db_user)
+        # Deactivation logs the user out; other edits show up in open sessions
+        sync_user_sessions(db_user)
+        # Issued tokens would keep the old claims
+        if user_claims(db_user) != claims:
+            revoke_user_tokens(user_id)
         return db_user
 
     def delete_user(self, user_id: int) -> bool:
@@ -106,4 +123,7 @@ class UserService:
         
         self.db.delete(db_user)
         self.db.commit()
+        user_index.discard(user_id)
+        revoke_user_sessions(user_id)
+        revoke_user_tokens(user_id)
         return True
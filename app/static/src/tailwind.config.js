@@ -0,0 +1,9 @@
+/** Tailwind config for scripts/build_static.py (mirrors the inline config in base.html) */
+module.exports = {
+  darkMode: 'class',
+  content: ['./app/templates/**/*.html'],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+}
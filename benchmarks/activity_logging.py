@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Per-request overhead of the request activity log
+
+Calls a minimal FastAPI app directly over ASGI, for an authenticated user,
+with and without ActivityLogMiddleware, and reports microseconds per
+request. Cases:
+  - logging every request, with the background writer flushing to SQLite
+  - sampling 10% of requests
+  - overload, where the database is too slow to keep up and entries are dropped
+It also reports how many rows per second the batched writer inserts.
+
+Usage:
+    python benchmarks/activity_logging.py [--requests 20000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.responses import PlainTextResponse  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from app.core.activity import ActivityLog, ActivityLogMiddleware  # noqa: E402
+from app.models.postgres_db1 import UserLog  # noqa: E402
+
+
+def build_app(activity_log=None):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return PlainTextResponse("ok")
+
+    inner = ActivityLogMiddleware(app, activity_log) if activity_log else app
+
+    async def with_session(scope, receive, send):
+        # Stands in for the session middleware of a logged-in user
+        scope["session"] = {"user": {"id": 42}}
+        await inner(scope, receive, send)
+
+    return with_session
+
+
+async def per_request_us(app, requests: int, repeat: int = 3) -> float:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for n in range(requests):
+            scope = {
+                "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+                "path": f"/items/{n}", "raw_path": f"/items/{n}".encode(), "root_path": "",
+                "query_string": b"", "server": ("bench", 80), "client": ("10.0.0.1", 5000),
+                "headers": [(b"host", b"bench"), (b"user-agent", b"bench/1.0")],
+            }
+            await app(scope, receive, send)
+            await asyncio.sleep(0)  # a server yields between requests; lets the writer run
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) / requests * 1e6
+
+
+async def run(args, directory: str) -> None:
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'activity.db')}")
+    UserLog.__table__.create(engine)
+
+    def slow_engine():
+        time.sleep(1.0)  # a database that cannot keep up
+        return engine
+
+    baseline = await per_request_us(build_app(), args.requests)
+    print(f"  {'no activity logging':<36} {baseline:8.1f} µs/request")
+
+    cases = [
+        ("logging every request", ActivityLog(lambda: engine, sample_rates="", default_rate=1.0)),
+        ("sampling 10%", ActivityLog(lambda: engine, sample_rates="", default_rate=0.1)),
+        ("overloaded database (drops)", ActivityLog(slow_engine, sample_rates="", default_rate=1.0,
+                                                    max_pending=1000)),
+    ]
+    for label, log in cases:
+        await log.start()
+        cost = await per_request_us(build_app(log), args.requests)
+        await log.stop()
+        m = log.metrics()
+        print(f"  {label:<36} {cost:8.1f} µs/request  ({cost - baseline:+.1f})   "
+              f"written {m['written']:,}, dropped {m['dropped']:,}")
+
+    log = ActivityLog(lambda: engine, batch_size=10**9, max_pending=10**9)
+    for n in range(args.requests):
+        log.record(42, "GET /items/{item_id}", "10.0.0.1", "bench/1.0")
+    start = time.perf_counter()
+    log.flush()
+    print(f"\n  batched writer: {args.requests / (time.perf_counter() - start):,.0f} rows/s into SQLite")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
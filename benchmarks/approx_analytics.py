@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Exact SQL versus in-memory sketches for analytics aggregates
+
+Seeds a temporary SQLite database with analytics events spread over a week
+(skewed event types, a numeric ``duration_ms`` field), loads them into
+AnalyticsSketches, then times each aggregate both ways over the last 24
+hours and the whole week and reports the sketch's error:
+  - distinct users (COUNT(DISTINCT user_id) vs HyperLogLog)
+  - top 10 event types (GROUP BY vs count-min top-k)
+  - p50/p99 of duration_ms (sorting the values vs t-digest)
+
+Usage:
+    python benchmarks/approx_analytics.py [--events 200000] [--users 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.analytics_sketches import AnalyticsSketches  # noqa: E402
+from app.models.postgres_db1 import Analytics  # noqa: E402
+
+
+def best_ms(fn, repeat: int = 3):
+    timings, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000, result
+
+
+def seed(engine, events: int, users: int, now: datetime) -> None:
+    rng = random.Random(42)
+    Analytics.__table__.create(engine)
+    rows = []
+    for _ in range(events):
+        rows.append({
+            "user_id": rng.randrange(users),
+            "event_type": f"event_{min(int(rng.paretovariate(1.1)), 60)}",
+            "event_data": {"duration_ms": round(rng.lognormvariate(4, 1), 2)},
+            "timestamp": now - timedelta(seconds=rng.uniform(0, 7 * 86400)),
+        })
+    with engine.begin() as conn:
+        conn.execute(Analytics.__table__.insert(), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--users", type=int, default=20000)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc)
+    table = Analytics.__table__
+    duration = func.json_extract(table.c.event_data, "$.duration_ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'analytics.db')}")
+        seed(engine, args.events, args.users, now)
+        session_factory = sessionmaker(bind=engine)
+
+        sketches = AnalyticsSketches(bucket_seconds=3600, retention_seconds=8 * 86400)
+        start = time.perf_counter()
+        sketches.refresh(session_factory)
+        elapsed = time.perf_counter() - start
+        print(f"Loaded {args.events:,} events into {sketches.metrics()['buckets']} hourly buckets "
+              f"in {elapsed:.1f}s ({args.events / elapsed:,.0f} events/s)\n")
+
+        with engine.connect() as conn:
+            for label, since in (("last 24 hours", now - timedelta(days=1)), ("last 7 days", now - timedelta(days=7))):
+                # Sketch ranges are whole buckets; give SQL the same range
+                since = datetime.fromtimestamp(sketches.bucket_start(since.timestamp()), timezone.utc)
+                in_range = table.c.timestamp >= since
+                print(f"{label}:")
+
+                sql_ms, exact = best_ms(lambda: conn.execute(
+                    select(func.count(func.distinct(table.c.user_id))).where(in_range)).scalar())
+                sketch_ms, approx = best_ms(lambda: sketches.distinct_users(since=since, until=now))
+                error = abs(approx["distinct_users"] - exact) / exact
+                print(f"  distinct users   SQL {sql_ms:8.1f} ms  sketch {sketch_ms:6.2f} ms   "
+                      f"{exact:,} vs {approx['distinct_users']:,} ({error:.2%} error)")
+
+                sql_ms, exact = best_ms(lambda: conn.execute(
+                    select(table.c.event_type, func.count()).where(in_range).group_by(table.c.event_type)
+                    .order_by(func.count().desc()).limit(10)).all())
+                sketch_ms, approx = best_ms(lambda: sketches.top_event_types(k=10, since=since, until=now))
+                exact_counts = dict(exact)
+                worst = max(abs(row["count"] - exact_counts.get(row["event_type"], 0))
+                            for row in approx["event_types"])
+                same = [key for key, _ in exact] == [row["event_type"] for row in approx["event_types"]]
+                print(f"  top 10 types     SQL {sql_ms:8.1f} ms  sketch {sketch_ms:6.2f} ms   "
+                      f"same order: {same}, worst count error {worst}")
+
+                def exact_percentiles():
+                    values = sorted(conn.execute(select(duration).where(in_range)).scalars())
+                    return [values[int(q * (len(values) - 1))] for q in (0.5, 0.99)]
+
+                sql_ms, exact = best_ms(exact_percentiles)
+                sketch_ms, approx = best_ms(lambda: sketches.percentiles("duration_ms", (0.5, 0.99),
+                                                                          since=since, until=now))
+                errors = [abs(a - e) / e for a, e in zip(approx["percentiles"].values(), exact)]
+                print(f"  p50/p99 duration SQL {sql_ms:8.1f} ms  sketch {sketch_ms:6.2f} ms   "
+                      f"{exact[0]:.1f}/{exact[1]:.1f} vs "
+                      f"{approx['percentiles']['p50']:.1f}/{approx['percentiles']['p99']:.1f} "
+                      f"(max {max(errors):.2%} error)\n")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
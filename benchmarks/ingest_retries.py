@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Cost of retried event ingestion
+
+Inserts system events into a temporary SQLite database with an
+Idempotency-Key each, then retries every one of them:
+  - retry answered by the in-memory window of recent keys
+  - retry answered by the unique index (ON CONFLICT DO NOTHING, then a
+    lookup by key), as when another worker took the first attempt
+  - retry without a key, matched by content hash (with the opt-in
+    INGEST_DEDUP_CONTENT_SECONDS window set)
+reporting time per request and the rows left in the table.
+
+Usage:
+    python benchmarks/ingest_retries.py [--events 5000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.database import PostgresDB2Base  # noqa: E402
+from app.core.idempotency import ingest_dedup  # noqa: E402
+from app.models.postgres_db2 import SystemEvent  # noqa: E402
+from app.services.postgres_db2_service import create_system_event  # noqa: E402
+
+
+async def timed(label: str, session_factory, events: int, **kwargs) -> None:
+    start = time.perf_counter()
+    with session_factory() as db:
+        for n in range(events):
+            await create_system_event("job", "INFO", f"job {n} finished", {"n": n}, db=db, **{
+                name: value(n) if callable(value) else value for name, value in kwargs.items()
+            })
+        rows = db.scalar(select(func.count()).select_from(SystemEvent))
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<40} {elapsed / events * 1e6:8.1f} us/request  {rows:>7,} rows")
+
+
+async def run(args, directory: str) -> None:
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'events.db')}")
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    key = lambda n: f"job-{n}"  # noqa: E731
+    print(f"{args.events:,} system events:\n")
+    await timed("first attempt, with key", session_factory, args.events, idempotency_key=key)
+    await timed("retry, key in window", session_factory, args.events, idempotency_key=key)
+    ingest_dedup.reset()
+    await timed("retry, key via unique index", session_factory, args.events, idempotency_key=key)
+    ingest_dedup.reset()
+    ingest_dedup.content_seconds = 60  # content deduplication is opt-in (INGEST_DEDUP_CONTENT_SECONDS)
+    await timed("first attempt, no key", session_factory, args.events, deduplicate=True)
+    await timed("retry, content hash in window", session_factory, args.events, deduplicate=True)
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
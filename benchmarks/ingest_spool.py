@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Spooling ingested events during a database outage, and replaying them
+
+Appends system events to a spool in a temporary directory, with one fsync
+per event and with fsync batching (SPOOL_FSYNC_SECONDS), then replays the
+spool into a SQLite stand-in for PostgreSQL Database 2, reporting appends
+per second, fsyncs, and replay rows per second.
+
+Usage:
+    python benchmarks/ingest_spool.py [--events 20000] [--fsync-seconds 0.2]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, func, select  # noqa: E402
+from app.core.database import PostgresDB2Base  # noqa: E402
+from app.core.idempotency import request_key  # noqa: E402
+from app.core.spool import IngestSpool  # noqa: E402
+from app.models.postgres_db2 import SystemEvent  # noqa: E402
+
+
+def append(spool: IngestSpool, events: int, label: str) -> None:
+    start = time.perf_counter()
+    for n in range(events):
+        spool.append("system_events", {
+            "event_type": "job", "severity": "ERROR", "message": f"job {n} failed",
+            "event_metadata": {"n": n}, "idempotency_key": request_key(f"{label}-{n}"),
+        }, datetime.now(timezone.utc))
+    spool.sync()
+    elapsed = time.perf_counter() - start
+    print(f"  append, {label:<22} {events / elapsed:>10,.0f} events/s  {spool.counts['fsyncs']:>7,} fsyncs")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--fsync-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'db2.db')}")
+        PostgresDB2Base.metadata.create_all(bind=engine)
+        engines = {"postgres_db2": lambda: engine}
+        print(f"{args.events:,} system events:\n")
+        per_event = IngestSpool(os.path.join(directory, "a"), fsync_seconds=0, engines=engines, enabled=True)
+        append(per_event, args.events, "fsync per event")
+        batched = IngestSpool(os.path.join(directory, "b"), fsync_seconds=args.fsync_seconds, engines=engines,
+                              enabled=True)
+        append(batched, args.events, f"fsync every {args.fsync_seconds:g}s")
+
+        start = time.perf_counter()
+        replayed = batched.replay()
+        elapsed = time.perf_counter() - start
+        with engine.connect() as conn:
+            rows = conn.scalar(select(func.count()).select_from(SystemEvent))
+        print(f"  replay                         {replayed / elapsed:>10,.0f} rows/s    {rows:>7,} rows")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
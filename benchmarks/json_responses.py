@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Serialization and wire-size benchmark for a large /analytics response
+
+Loads synthetic analytics rows into an in-memory SQLite database and
+reports, for the response FastAPI used to build (jsonable_encoder over ORM
+objects, then json.dumps) and for FastJSONResponse over ORM objects and
+over Row tuples from a column select:
+  - time to fetch and serialize the body
+  - body size uncompressed, gzip and brotli, with compression time
+
+Usage:
+    python benchmarks/json_responses.py [--rows 10000] [--repeat 10]
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import PostgresDB1Base  # noqa: E402
+from app.core.responses import FastJSONResponse, orjson  # noqa: E402
+from app.models.postgres_db1 import Analytics  # noqa: E402
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def make_session(rows: int):
+    engine = create_engine("sqlite://")
+    PostgresDB1Base.metadata.create_all(bind=engine)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(Analytics.__table__.insert(), [
+            {
+                "id": i,
+                "user_id": i % 500 + 1,
+                "event_type": ("page_view", "click", "signup", "purchase")[i % 4],
+                "event_data": {"path": f"/items/{i % 200}", "ref": "search" if i % 3 else None},
+                "timestamp": start + timedelta(seconds=i),
+            }
+            for i in range(1, rows + 1)
+        ])
+    return sessionmaker(bind=engine)()
+
+
+def timed(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return result, timings
+
+
+def report(label: str, timings: list, extra: str = "") -> None:
+    print(f"  {label:<34} median {statistics.median(timings) * 1000:8.2f} ms   min {min(timings) * 1000:8.2f} ms{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    db = make_session(args.rows)
+    columns = select(*Analytics.__table__.columns).order_by(Analytics.timestamp.desc())
+
+    def orm_rows():
+        db.expunge_all()
+        return db.query(Analytics).order_by(Analytics.timestamp.desc()).all()
+
+    def stock():
+        # What `return events` did: jsonable_encoder, then JSONResponse's json.dumps
+        content = jsonable_encoder(orm_rows())
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def fast_orm():
+        return FastJSONResponse(orm_rows()).body
+
+    def fast_rows():
+        return FastJSONResponse(db.execute(columns).all()).body
+
+    print(f"Fetch + serialize {args.rows} analytics rows "
+          f"({'orjson ' + orjson.__version__ if orjson else 'stdlib json'})")
+    body, timings = timed(stock, args.repeat)
+    report("jsonable_encoder + json.dumps", timings)
+    fast_body, timings = timed(fast_orm, args.repeat)
+    report("FastJSONResponse, ORM objects", timings)
+    _, timings = timed(fast_rows, args.repeat)
+    report("FastJSONResponse, Row tuples", timings)
+    assert json.loads(fast_body) == json.loads(body), "fast path changed the payload"
+
+    print()
+    print("Bytes on the wire")
+    print(f"  {'identity':<34} {len(fast_body):>10,} B")
+    variants = [(f"gzip level {settings.COMPRESSION_GZIP_LEVEL}",
+                 lambda: gzip.compress(fast_body, compresslevel=settings.COMPRESSION_GZIP_LEVEL))]
+    if brotli is not None:
+        variants.append((f"br quality {settings.COMPRESSION_BROTLI_QUALITY}",
+                         lambda: brotli.compress(fast_body, quality=settings.COMPRESSION_BROTLI_QUALITY)))
+    for label, compress in variants:
+        compressed, timings = timed(compress, args.repeat)
+        ratio = len(compressed) / len(fast_body)
+        print(f"  {label:<34} {len(compressed):>10,} B  ({ratio:.1%})  "
+              f"compress median {statistics.median(timings) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
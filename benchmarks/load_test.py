@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Load test for the whole application: API, HTMX admin fragments and ingestion
+
+Seeds synthetic users, settings, analytics, user logs and performance
+metrics, then drives a weighted mix of routes with concurrent async clients
+and reports, per route:
+  - requests, errors (redirects, error statuses, transport errors) and throughput
+  - latency p50 / p90 / p99 / max
+
+By default the app runs in-process (httpx ASGITransport, lifespan included)
+on SQLite files in a temporary directory standing in for all three
+databases, with rate limiting and the scheduler off. --base-url targets a
+running server instead; it must have been seeded (--seed-only against its
+DATABASE_URL / POSTGRES_DB*_URL) and have rate limiting disabled.
+
+--save-baseline writes the results as JSON; --baseline compares against
+such a file and exits with status 1 when a route's p90 latency grows, or
+its throughput drops, by more than --tolerance, or its error rate rises.
+
+Usage:
+    python benchmarks/load_test.py [--duration 10] [--concurrency 32]
+        [--users 2000] [--settings 200] [--events 50000]
+        [--routes admin_users,api_users] [--save-baseline FILE] [--baseline FILE]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN_EMAIL = "loadtest-admin@example.com"
+PASSWORD = "loadtest-password"
+EVENT_TYPES = ("page_view", "click", "signup", "purchase")
+METRIC_NAMES = ("response_time", "cpu", "memory", "queue_depth")
+
+
+def configure_environment(args) -> None:
+    """Point the app at throwaway SQLite files; must run before importing it"""
+    if not args.use_configured_databases and not args.base_url:
+        directory = args.data_dir or tempfile.mkdtemp(prefix="loadtest-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'app.db')}"
+        os.environ["POSTGRES_DB1_URL"] = f"sqlite:///{os.path.join(directory, 'db1.db')}"
+        os.environ["POSTGRES_DB2_URL"] = f"sqlite:///{os.path.join(directory, 'db2.db')}"
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+    os.environ.setdefault("SCHEDULER_ENABLED", "false")
+    os.environ.setdefault("DEBUG", "false")
+
+
+def seed(args) -> None:
+    from app.core.database import (
+        PostgresDB1Base, PostgresDB2Base, SQLiteBase,
+        get_postgres_db1_engine, get_postgres_db2_engine, get_sqlite_engine
+    )
+    from app.core.security import get_password_hash
+    from app.models import Analytics, PerformanceMetric, Settings, User, UserLog
+
+    started = time.perf_counter()
+    SQLiteBase.metadata.create_all(bind=get_sqlite_engine())
+    PostgresDB1Base.metadata.create_all(bind=get_postgres_db1_engine())
+    PostgresDB2Base.metadata.create_all(bind=get_postgres_db2_engine())
+    hashed = get_password_hash(PASSWORD)  # one bcrypt hash shared by every user
+    now = datetime.now(timezone.utc)
+
+    def insert(engine, table, rows, batch: int = 10_000) -> None:
+        with engine.begin() as conn:
+            conn.execute(table.delete())
+            for start in range(0, len(rows), batch):
+                conn.execute(table.insert(), rows[start:start + batch])
+
+    insert(get_sqlite_engine(), User.__table__, [
+        {
+            "id": i,
+            "email": ADMIN_EMAIL if i == 1 else f"user{i}@example.com",
+            "username": "loadtest-admin" if i == 1 else f"user{i}",
+            "hashed_password": hashed,
+            "full_name": f"User {i}" if i % 3 else None,
+            "is_active": i % 5 != 0 or i == 1,
+            "is_superuser": i == 1,
+        }
+        for i in range(1, args.users + 1)
+    ])
+    insert(get_sqlite_engine(), Settings.__table__, [
+        {"setting_name": f"setting_{i:05d}", "value": str(i)} for i in range(args.settings)
+    ])
+    insert(get_postgres_db1_engine(), Analytics.__table__, [
+        {
+            "user_id": random.randint(1, args.users),
+            "event_type": EVENT_TYPES[i % 4],
+            "event_data": {"path": f"/items/{i % 500}"},
+            "timestamp": now - timedelta(seconds=i),
+        }
+        for i in range(args.events)
+    ])
+    insert(get_postgres_db1_engine(), UserLog.__table__, [
+        {
+            "user_id": random.randint(1, args.users),
+            "action": ("login", "logout", "update")[i % 3],
+            "ip_address": f"10.0.{i % 256}.{i % 200}",
+            "created_at": now - timedelta(seconds=i),
+        }
+        for i in range(args.events // 2)
+    ])
+    insert(get_postgres_db2_engine(), PerformanceMetric.__table__, [
+        {
+            "metric_name": METRIC_NAMES[i % 4],
+            "metric_value": random.random() * 100,
+            "unit": "ms",
+            "tags": {"host": f"web-{i % 8}"},
+            "recorded_at": now - timedelta(seconds=i),
+        }
+        for i in range(args.events // 2)
+    ])
+    print(f"Seeded {args.users:,} users, {args.settings:,} settings, {args.events:,} analytics events, "
+          f"{args.events // 2:,} user logs and metrics in {time.perf_counter() - started:.1f} s")
+
+
+def build_routes(args):
+    """name -> (weight, request factory returning (method, url, kwargs))"""
+    users = args.users
+
+    def user_id() -> int:
+        return random.randint(1, users)
+
+    htmx = {"headers": {"HX-Request": "true"}}
+    return {
+        "home": (1, lambda: ("GET", "/", {})),
+        "api_users": (3, lambda: ("GET", f"/api/v1/users/?skip={random.randint(0, max(users - 50, 0))}&limit=50", {})),
+        "api_user": (3, lambda: ("GET", f"/api/v1/users/{user_id()}", {})),
+        "admin_users": (2, lambda: ("GET", "/admin/users?sort=username&order=asc", htmx)),
+        "admin_settings": (1, lambda: ("GET", "/admin/settings", htmx)),
+        "analytics_list": (3, lambda: ("GET", f"/api/v1/postgres-demo/analytics?user_id={user_id()}&limit=100", {})),
+        "analytics_fields": (2, lambda: (
+            "GET", "/api/v1/postgres-demo/analytics?limit=500&fields=id,event_type,timestamp", {}
+        )),
+        "analytics_ingest": (4, lambda: ("POST", "/api/v1/postgres-demo/analytics", {"json": {
+            "user_id": user_id(), "event_type": random.choice(EVENT_TYPES), "event_data": {"path": "/loadtest"}
+        }})),
+        "user_log_ingest": (2, lambda: ("POST", "/api/v1/postgres-demo/user-log", {"json": {
+            "user_id": user_id(), "action": "login", "ip_address": "10.0.0.1"
+        }})),
+        "metrics_list": (2, lambda: ("GET", "/api/v1/postgres-demo/performance-metrics?limit=100", {})),
+        "api_login": (1, lambda: ("POST", "/api/v1/auth/login", {"data": {
+            "username": f"user{random.randint(2, users)}@example.com", "password": PASSWORD
+        }})),
+    }
+
+
+def percentile(sorted_values, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+async def drive(client, routes, duration: float, concurrency: int):
+    names = list(routes)
+    weights = [routes[name][0] for name in names]
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    first_error = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker() -> None:
+        while time.perf_counter() < deadline:
+            name = random.choices(names, weights)[0]
+            method, url, kwargs = routes[name][1]()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                error = f"HTTP {response.status_code}" if response.status_code >= 300 else None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            samples[name].append(time.perf_counter() - start)
+            if error:
+                errors[name] += 1
+                first_error.setdefault(name, error)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    results = {}
+    for name in names:
+        latencies = sorted(samples[name])
+        if not latencies:
+            continue
+        results[name] = {
+            "requests": len(latencies),
+            "errors": errors[name],
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p90_ms": percentile(latencies, 0.90) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": latencies[-1] * 1000,
+        }
+        if name in first_error:
+            results[name]["first_error"] = first_error[name][:200]
+    return results, elapsed
+
+
+def report(results, elapsed: float) -> None:
+    print(f"\n  {'route':<18} {'requests':>8} {'errors':>6} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, r in sorted(results.items()):
+        print(f"  {name:<18} {r['requests']:>8} {r['errors']:>6} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.1f} {r['p90_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['max_ms']:>8.1f}")
+    total = sum(r["requests"] for r in results.values())
+    failed = sum(r["errors"] for r in results.values())
+    for name, r in sorted(results.items()):
+        if "first_error" in r:
+            print(f"  {name}: first error {r['first_error']}")
+    print(f"\n  total {total:,} requests, {failed:,} errors, {total / elapsed:.1f} req/s over {elapsed:.1f} s")
+
+
+def compare(results, baseline, tolerance: float) -> list:
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if current["p90_ms"] > base["p90_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p90 {base['p90_ms']:.1f} -> {current['p90_ms']:.1f} ms")
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['rps']:.1f} -> {current['rps']:.1f} req/s")
+        base_rate = base["errors"] / max(base["requests"], 1)
+        current_rate = current["errors"] / max(current["requests"], 1)
+        if current_rate > base_rate + 0.01:
+            regressions.append(f"{name}: error rate {base_rate:.1%} -> {current_rate:.1%}")
+    return regressions
+
+
+async def run(args) -> int:
+    import httpx
+
+    routes = build_routes(args)
+    if args.routes:
+        wanted = set(args.routes.split(","))
+        unknown = wanted - set(routes)
+        if unknown:
+            raise SystemExit(f"Unknown routes: {', '.join(sorted(unknown))}; choose from {', '.join(routes)}")
+        routes = {name: route for name, route in routes.items() if name in wanted}
+
+    async def session(client) -> int:
+        # Admin session cookie for the HTMX fragments
+        response = await client.post("/auth/login", data={"email": ADMIN_EMAIL, "password": PASSWORD})
+        if response.status_code != 303 or "session" not in client.cookies:
+            print(f"Warning: admin login failed (status {response.status_code}); admin routes will error")
+        if args.warmup:
+            await drive(client, routes, args.warmup, args.concurrency)
+        print(f"Running {', '.join(routes)} for {args.duration:g} s with {args.concurrency} clients")
+        results, elapsed = await drive(client, routes, args.duration, args.concurrency)
+        report(results, elapsed)
+
+        if args.save_baseline:
+            with open(args.save_baseline, "w") as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            print(f"\n  baseline saved to {args.save_baseline}")
+        if args.baseline:
+            with open(args.baseline) as f:
+                regressions = compare(results, json.load(f), args.tolerance)
+            if regressions:
+                print(f"\n  REGRESSIONS (tolerance {args.tolerance:.0%}):")
+                for line in regressions:
+                    print(f"    {line}")
+                return 1
+            print(f"\n  no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+        return 0
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30, follow_redirects=False) as client:
+            return await session(client)
+
+    from app.main import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://loadtest", limits=limits, timeout=30, follow_redirects=False
+        ) as client:
+            return await session(client)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=2.0, help="seconds of unmeasured load first")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--settings", type=int, default=200)
+    parser.add_argument("--events", type=int, default=50000, help="analytics events; half as many logs and metrics")
+    parser.add_argument("--routes", help="comma-separated subset of routes to drive")
+    parser.add_argument("--base-url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--data-dir", help="directory for the SQLite stand-ins (default: a new temp dir)")
+    parser.add_argument("--use-configured-databases", action="store_true",
+                        help="seed and use DATABASE_URL / POSTGRES_DB*_URL as configured")
+    parser.add_argument("--seed-only", action="store_true")
+    parser.add_argument("--no-seed", action="store_true", help="reuse data already in the databases")
+    parser.add_argument("--save-baseline", metavar="FILE")
+    parser.add_argument("--baseline", metavar="FILE")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    configure_environment(args)
+    if not args.no_seed and (not args.base_url or args.seed_only):
+        seed(args)
+    if args.seed_only:
+        return
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
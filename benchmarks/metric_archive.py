@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Storage and query cost of archiving performance metrics to column files
+
+Seeds a temporary SQLite database with several metrics sampled over 30
+days, times the same 30-day hourly series and LTTB queries against the live
+table, archives everything older than 2 days with the maintenance job,
+then repeats the queries (now served mostly by memory-mapped column files)
+and reports the table size before/after VACUUM and the archive size.
+
+Usage:
+    python benchmarks/metric_archive.py [--points 300000] [--metrics 4]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.archive import ARCHIVED_TABLES, column_archive  # noqa: E402
+from app.models.postgres_db2 import PerformanceMetric  # noqa: E402
+from app.services.maintenance_service import archive_table  # noqa: E402
+from app.services.postgres_db2_service import (  # noqa: E402
+    get_performance_metric_points,
+    get_performance_metric_series
+)
+
+DAYS = 30
+
+
+def seed(engine, points: int, metrics: int, start: datetime) -> None:
+    rng = random.Random(3)
+    PerformanceMetric.__table__.create(engine)
+    interval = DAYS * 86400 / points
+    with engine.begin() as conn:
+        for name in range(metrics):
+            rows = [{
+                "metric_name": f"metric_{name}",
+                "metric_value": 50 + 20 * math.sin(n / 500) + rng.gauss(0, 3),
+                "unit": "ms",
+                "tags": {"host": f"web-{n % 4}"},
+                "recorded_at": start + timedelta(seconds=n * interval),
+            } for n in range(points)]
+            conn.execute(PerformanceMetric.__table__.insert(), rows)
+
+
+def database_bytes(engine) -> int:
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+        return conn.execute(text("PRAGMA page_count")).scalar() * conn.execute(text("PRAGMA page_size")).scalar()
+
+
+async def queries(session_factory, start: datetime, end: datetime) -> str:
+    timings = []
+    for fn in (
+        lambda db: get_performance_metric_series("metric_0", start, end, step=3600, db=db),
+        lambda db: get_performance_metric_points("metric_0", start, end, points=1000, db=db),
+    ):
+        with session_factory() as db:
+            began = time.perf_counter()
+            await fn(db)
+            timings.append((time.perf_counter() - began) * 1000)
+    return f"hourly series {timings[0]:8.1f} ms   LTTB 1000 {timings[1]:8.1f} ms"
+
+
+async def run(args, directory: str) -> None:
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'metrics.db')}")
+    column_archive.root = Path(directory) / "archive"
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=DAYS)
+    seed(engine, args.points, args.metrics, start)
+    session_factory = sessionmaker(bind=engine)
+    rows = args.points * args.metrics
+    print(f"{args.metrics} metrics x {args.points:,} samples over {DAYS} days ({rows:,} rows)\n")
+
+    size_before = database_bytes(engine)
+    print(f"  live table only:  {await queries(session_factory, start, end)}")
+
+    began = time.perf_counter()
+    moved = archive_table(ARCHIVED_TABLES["performance_metrics"], session_factory, cutoff=end - timedelta(days=2))
+    elapsed = time.perf_counter() - began
+    print(f"  mostly archived:  {await queries(session_factory, start, end)}\n")
+
+    size_after = database_bytes(engine)
+    archived = column_archive.metrics()["performance_metrics"]
+    print(f"  archived {moved:,} rows in {elapsed:.1f}s ({moved / elapsed:,.0f} rows/s)")
+    print(f"  database {size_before / 2**20:,.1f} MiB -> {size_after / 2**20:,.1f} MiB (after VACUUM)")
+    print(f"  archive  {archived['bytes'] / 2**20:,.1f} MiB in {archived['files']} files "
+          f"({archived['bytes'] / moved:.1f} bytes/row)")
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=300000)
+    parser.add_argument("--metrics", type=int, default=4)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
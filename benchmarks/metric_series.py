@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Charting a long range of one performance metric: raw points vs downsampled
+
+Seeds a temporary SQLite database with one metric sampled every few
+seconds over 30 days (plus a second, unrelated metric) and compares, for
+the whole range:
+  - fetching every raw point (what the last-N endpoint would need)
+  - hourly avg buckets grouped in the database, gap-filled
+  - LTTB to 1000 points, streamed from the database
+reporting time, points returned and JSON response size.
+
+Usage:
+    python benchmarks/metric_series.py [--points 500000]
+"""
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.responses import dumps  # noqa: E402
+from app.models.postgres_db2 import PerformanceMetric  # noqa: E402
+from app.services.postgres_db2_service import (  # noqa: E402
+    get_performance_metric_points,
+    get_performance_metric_series
+)
+
+DAYS = 30
+
+
+def seed(engine, points: int, start: datetime) -> None:
+    rng = random.Random(1)
+    PerformanceMetric.__table__.create(engine)
+    interval = DAYS * 86400 / points
+    rows = []
+    for n in range(points):
+        at = start + timedelta(seconds=n * interval)
+        if timedelta(days=12) <= at - start < timedelta(days=13):
+            continue  # an outage: a day with no samples
+        hour = at.hour + at.minute / 60
+        value = 40 + 25 * math.sin(hour / 24 * 2 * math.pi) + rng.gauss(0, 5) + (60 if rng.random() < 1e-4 else 0)
+        rows.append({"metric_name": "cpu", "metric_value": value, "recorded_at": at})
+        if n % 10 == 0:
+            rows.append({"metric_name": "memory", "metric_value": rng.random(), "recorded_at": at})
+    with engine.begin() as conn:
+        conn.execute(PerformanceMetric.__table__.insert(), rows)
+
+
+async def timed(label: str, fn) -> None:
+    start = time.perf_counter()
+    result = await fn()
+    elapsed = (time.perf_counter() - start) * 1000
+    body = dumps(result)
+    count = len(result["values"]) if isinstance(result, dict) else len(result)
+    print(f"  {label:<36} {elapsed:9.1f} ms  {count:>9,} points  {len(body) / 1024:>9,.1f} KiB")
+
+
+async def run(args, directory: str) -> None:
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'metrics.db')}")
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    end = start + timedelta(days=DAYS)
+    seed(engine, args.points, start)
+    session_factory = sessionmaker(bind=engine)
+    print(f"cpu metric, {args.points:,} samples over {DAYS} days:\n")
+
+    async def raw():
+        with session_factory() as db:
+            rows = db.execute(
+                select(PerformanceMetric.recorded_at, PerformanceMetric.metric_value)
+                .where(PerformanceMetric.metric_name == "cpu")
+                .order_by(PerformanceMetric.recorded_at)
+            ).all()
+            return [{"recorded_at": at, "metric_value": value} for at, value in rows]
+
+    async def hourly():
+        with session_factory() as db:
+            return await get_performance_metric_series("cpu", start, end, step=3600, fill="linear", db=db)
+
+    async def downsampled():
+        with session_factory() as db:
+            return await get_performance_metric_points("cpu", start, end, points=1000, db=db)
+
+    await timed("raw points", raw)
+    await timed("hourly avg (SQL GROUP BY)", hourly)
+    await timed("LTTB 1000 points (streamed)", downsampled)
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=500000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
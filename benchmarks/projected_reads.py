@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+ORM vs column-projected reads for the analytics list endpoint
+
+For the ORM query the endpoints used to run, the column-dict path with
+every column, and the column-dict path with a narrow ``fields=``
+projection, reports:
+  - per-row CPU for fetch alone and for fetch + FastJSONResponse rendering
+  - per-row memory held by the fetched result (tracemalloc)
+
+Usage:
+    python benchmarks/projected_reads.py [--rows 10000] [--repeat 10] [--fields id,user_id,event_type]
+"""
+import argparse
+import asyncio
+import gc
+import statistics
+import time
+import tracemalloc
+
+from json_responses import make_session  # sets up sys.path for the app imports
+
+from app.core.responses import FastJSONResponse  # noqa: E402
+from app.services.postgres_db1_service import get_user_analytics, get_user_analytics_rows  # noqa: E402
+
+
+def per_row_us(fn, rows: int, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) / rows * 1e6
+
+
+def per_row_bytes(fn, rows: int) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return held / rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--fields", default="id,user_id,event_type")
+    args = parser.parse_args()
+
+    db = make_session(args.rows)
+
+    def orm():
+        # Fresh identity map each time, as with a per-request session
+        db.expunge_all()
+        return asyncio.run(get_user_analytics(limit=args.rows, db=db))
+
+    def rows(fields=None):
+        return asyncio.run(get_user_analytics_rows(limit=args.rows, fields=fields, db=db))
+
+    paths = [
+        ("ORM instances", orm),
+        ("column dicts, all columns", rows),
+        (f"column dicts, fields={args.fields}", lambda: rows(args.fields)),
+    ]
+
+    print(f"{args.rows} analytics rows, median of {args.repeat}")
+    print(f"  {'path':<48} {'fetch':>10} {'fetch+json':>12} {'memory':>12}")
+    for label, fetch in paths:
+        fetch()
+        fetch_us = per_row_us(fetch, args.rows, args.repeat)
+        total_us = per_row_us(lambda: FastJSONResponse(fetch()).body, args.rows, args.repeat)
+        memory = per_row_bytes(fetch, args.rows)
+        print(f"  {label:<48} {fetch_us:7.2f} us {total_us:9.2f} us {memory:8.0f} B/row")
+
+
+if __name__ == "__main__":
+    main()
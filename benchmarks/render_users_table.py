@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Rendering benchmark for the admin users table
+
+Renders users_table.html for synthetic users and reports:
+  - template compile time with and without the persistent bytecode cache
+  - full-table render time with a cold fragment cache, a warm one, and a
+    warm one where a single row changed
+
+Usage:
+    python benchmarks/render_users_table.py [--rows 1000] [--repeat 20]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader  # noqa: E402
+from app.core.templates import FragmentCacheExtension, templates  # noqa: E402
+
+TEMPLATE_DIR = "app/templates"
+
+
+def make_users(count: int) -> list:
+    created = datetime(2024, 1, 1)
+    return [
+        SimpleNamespace(
+            id=i,
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            full_name=f"User {i}" if i % 3 else None,
+            is_active=i % 4 != 0,
+            is_superuser=i % 50 == 0,
+            created_at=created + timedelta(minutes=i),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def timed(fn, repeat: int) -> list:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list) -> None:
+    print(f"  {label:<38} median {statistics.median(timings) * 1000:8.2f} ms   min {min(timings) * 1000:8.2f} ms")
+
+
+def compile_times(repeat: int) -> None:
+    names = ["users_table.html", "user_row.html", "macros.html"]
+
+    def compile_with(bytecode_cache):
+        env = Environment(
+            loader=FileSystemLoader(TEMPLATE_DIR),
+            autoescape=True,
+            bytecode_cache=bytecode_cache,
+            extensions=[FragmentCacheExtension],
+        )
+        for name in names:
+            env.get_template(name)
+
+    with tempfile.TemporaryDirectory() as directory:
+        bytecode_cache = FileSystemBytecodeCache(directory)
+        compile_with(bytecode_cache)
+        print("Template load (fresh environment)")
+        report("source compile", timed(lambda: compile_with(None), repeat))
+        report("bytecode cache hit", timed(lambda: compile_with(bytecode_cache), repeat))
+
+
+def render_times(rows: int, repeat: int) -> None:
+    users = make_users(rows)
+    template = templates.env.get_template("users_table.html")
+    cache = templates.env.fragment_cache
+
+    def render():
+        return template.render(users=users, sort="username", order="asc")
+
+    def render_cold():
+        cache.clear()
+        return render()
+
+    def render_one_changed():
+        users[0].full_name = f"Changed {time.perf_counter_ns()}"
+        return render()
+
+    print(f"Render users_table.html ({rows} rows)")
+    report("fragment cache cold", timed(render_cold, repeat))
+    render()
+    report("fragment cache warm", timed(render, repeat))
+    report("fragment cache warm, 1 row changed", timed(render_one_changed, repeat))
+    print(f"  output size {len(render()) / 1024:.0f} KiB, cached fragments {len(cache)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    compile_times(args.repeat)
+    print()
+    render_times(args.rows, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Session middleware overhead: signed cookie vs server-side stores
+
+Drives each middleware directly over ASGI (no HTTP server) with a logged-in
+session holding the user dict the login handler stores, and reports for
+Starlette's SessionMiddleware and ServerSessionMiddleware over the memory
+and SQLite stores:
+  - request cookie bytes the browser sends on every request
+  - Set-Cookie bytes sent back on an ordinary (session unchanged) request
+  - time per request through the middleware, which only reads the session
+
+Usage:
+    python benchmarks/session_overhead.py [--requests 20000] [--repeat 5]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from starlette.middleware.sessions import SessionMiddleware  # noqa: E402
+from app.core.database import SQLiteBase  # noqa: E402
+from app.core.sessions import DatabaseSessionStore, MemorySessionStore, ServerSessionMiddleware  # noqa: E402
+
+USER = {
+    "id": 4821,
+    "email": "jane.doe@example.com",
+    "username": "janedoe",
+    "full_name": "Jane Doe",
+    "is_active": True,
+    "is_superuser": False,
+}
+
+
+async def endpoint(scope, receive, send):
+    if scope["path"] == "/login":
+        scope["session"]["user"] = USER
+    else:
+        scope["session"].get("user")
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def request(middleware, path: str, cookie: bytes = b""):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": [(b"cookie", cookie)] if cookie else [],
+    }
+    set_cookie = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            set_cookie.extend(v for k, v in message["headers"] if k == b"set-cookie")
+
+    await middleware(scope, receive, send)
+    return set_cookie[0] if set_cookie else b""
+
+
+async def measure(label: str, middleware, requests: int, repeat: int) -> None:
+    cookie = (await request(middleware, "/login")).split(b";", 1)[0]
+    renewal = await request(middleware, "/", cookie)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(requests):
+            await request(middleware, "/", cookie)
+        timings.append((time.perf_counter() - start) / requests)
+    print(
+        f"  {label:<26} cookie {len(cookie):4d} B   Set-Cookie per request {len(renewal):4d} B"
+        f"   median {statistics.median(timings) * 1e6:7.1f} µs   min {min(timings) * 1e6:7.1f} µs"
+    )
+
+
+async def run(args) -> None:
+    print(f"{args.requests} requests x {args.repeat}, session unchanged after login\n")
+    await measure("SessionMiddleware (cookie)", SessionMiddleware(endpoint, secret_key="x" * 32), args.requests, args.repeat)
+    await measure("server-side, memory", ServerSessionMiddleware(endpoint, MemorySessionStore()), args.requests, args.repeat)
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'sessions.db')}")
+        SQLiteBase.metadata.create_all(bind=engine)
+        store = DatabaseSessionStore(sessionmaker(bind=engine))
+        # Fewer requests: each one is a SQLite read in a thread
+        await measure("server-side, sqlite", ServerSessionMiddleware(endpoint, store), max(args.requests // 10, 1), args.repeat)
+        engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Concurrent user-creation throughput with 1..N SQLite shards
+
+Each writer process (as with several uvicorn workers) creates users one
+transaction at a time, as the registration endpoints do, through a
+ShardRouter session. With one file every commit queues on the same SQLite
+write lock; with more shards the writers spread over independent locks.
+Reports commits per second and how many commits hit "database is locked".
+
+Usage:
+    python benchmarks/sharded_writes.py [--shards 1,2,4] [--writers 8] [--users 200]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from app.core.sharding import ShardRouter  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+
+def make_router(paths):
+    return ShardRouter([
+        create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+        for path in paths
+    ])
+
+
+def writer(paths, index: int, users: int, start_at: float) -> int:
+    router = make_router(paths)
+    locked = 0
+    while time.time() < start_at:
+        time.sleep(0.001)
+    with router.session() as db:
+        for n in range(users):
+            email = f"w{index}-u{n}@example.com"
+            db.add(User(email=email, username=email, hashed_password="x"))
+            try:
+                db.commit()
+            except OperationalError:
+                db.rollback()
+                locked += 1
+    return locked
+
+
+def run(shards: int, writers: int, users: int, directory: str):
+    paths = [os.path.join(directory, f"shards{shards}-{i}.db") for i in range(shards)]
+    make_router(paths).create_all()
+    # Processes are started first, then all begin writing together
+    start_at = time.time() + 1.0
+    with ProcessPoolExecutor(writers) as pool:
+        futures = [pool.submit(writer, paths, i, users, start_at) for i in range(writers)]
+        locked = sum(future.result() for future in futures)
+    elapsed = time.time() - start_at
+    return (writers * users - locked) / elapsed, locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", default="1,2,4")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=200, help="users created per writer")
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers x {args.users} users, one commit each\n")
+    with tempfile.TemporaryDirectory() as directory:
+        for shards in (int(n) for n in args.shards.split(",")):
+            rate, locked = run(shards, args.writers, args.users, directory)
+            print(f"  {shards} shard(s)   {rate:8.0f} commits/s   locked {locked}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Startup profiling report for app.main
+
+Runs ``python -X importtime -c "import app.main"`` in fresh interpreters and
+prints the cold-start wall time plus the slowest imports by cumulative time.
+
+Usage:
+    python benchmarks/startup_profile.py [--runs 5] [--top 25] [--module app.main]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure_cold_start(module: str, runs: int) -> list:
+    """Wall time (seconds) of importing ``module`` in a fresh interpreter"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", f"import {module}"],
+            cwd=ROOT,
+            check=True,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def import_breakdown(module: str) -> list:
+    """Parse ``-X importtime`` output into (self_us, cumulative_us, name) rows"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    return rows
+
+
+def top_level_packages(rows: list) -> dict:
+    """Sum self time per top-level package"""
+    totals = {}
+    for self_us, _, name in rows:
+        package = name.split(".")[0]
+        totals[package] = totals.get(package, 0) + self_us
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    timings = measure_cold_start(args.module, args.runs)
+    rows = import_breakdown(args.module)
+
+    print(f"Cold start: import {args.module} ({args.runs} runs)")
+    print(f"  min    {min(timings) * 1000:8.1f} ms")
+    print(f"  median {statistics.median(timings) * 1000:8.1f} ms")
+    print(f"  max    {max(timings) * 1000:8.1f} ms")
+    print()
+
+    print(f"Slowest {args.top} imports by cumulative time")
+    print(f"  {'cumulative ms':>14}  {'self ms':>8}  module")
+    for self_us, cumulative_us, name in sorted(rows, key=lambda r: r[1], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:14.1f}  {self_us / 1000:8.1f}  {name}")
+    print()
+
+    print("Self time per top-level package")
+    for package, total in sorted(top_level_packages(rows).items(), key=lambda i: i[1], reverse=True)[:args.top]:
+        print(f"  {total / 1000:8.1f} ms  {package}")
+
+    heavy = ("smtplib", "email.mime", "jose", "passlib", "bcrypt", "psycopg2", "cryptography")
+    loaded = sorted({prefix for prefix in heavy for _, _, name in rows if name == prefix or name.startswith(prefix + ".")})
+    print()
+    print("Heavy subsystems imported at startup: " + (", ".join(loaded) if loaded else "none"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Searching system event messages: LIKE scan vs the full-text index
+
+Seeds a temporary SQLite database (the FTS5 stand-in for PostgreSQL's
+tsvector/GIN index) with system events and compares, for a few queries:
+  - WHERE message LIKE '%word%' (a scan of every row, unranked)
+  - the full-text search, first page, ranked and highlighted
+  - the full-text search, tenth page through its keyset cursor
+and the cost the index adds to inserts.
+
+Usage:
+    python benchmarks/text_search.py [--events 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, select  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.database import PostgresDB2Base  # noqa: E402
+from app.core.search import SEARCHABLE, ensure_search_index, search  # noqa: E402
+from app.models.postgres_db2 import SystemEvent  # noqa: E402
+
+WORDS = ("connection", "timeout", "disk", "replica", "request", "served", "cache", "miss", "job", "finished",
+         "retry", "queue", "latency", "high", "payment", "gateway", "user", "login", "failed", "started")
+
+
+def messages(events: int):
+    rng = random.Random(1)
+    for n in range(events):
+        words = rng.choices(WORDS, k=rng.randint(4, 12))
+        if n % 5000 == 0:
+            words.append("unreachable")  # a rare term
+        yield {"event_type": "app", "severity": "INFO", "message": " ".join(words)}
+
+
+def seed(engine, events: int, indexed: bool) -> float:
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    if indexed:
+        ensure_search_index(SEARCHABLE["system_events"], engine)
+    rows = list(messages(events))
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(SystemEvent.__table__.insert(), rows)
+    return time.perf_counter() - start
+
+
+def timed(label: str, fn, repeat: int = 3) -> None:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        count = fn()
+    print(f"    {label:<28} {(time.perf_counter() - start) / repeat * 1000:9.1f} ms  {count:>7,} rows")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        plain = create_engine(f"sqlite:///{os.path.join(directory, 'plain.db')}")
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'indexed.db')}")
+        plain_seconds = seed(plain, args.events, indexed=False)
+        indexed_seconds = seed(engine, args.events, indexed=True)
+        print(f"{args.events:,} system events; inserting them took {plain_seconds:.2f}s without the index, "
+              f"{indexed_seconds:.2f}s with it\n")
+        spec = SEARCHABLE["system_events"]
+        with sessionmaker(bind=engine)() as db:
+            for q in ("unreachable", "payment gateway", "timeout"):
+                print(f"  q={q!r}:")
+
+                def like():
+                    stmt = select(SystemEvent.id).where(*[SystemEvent.message.like(f"%{w}%") for w in q.split()])
+                    return len(db.execute(stmt.limit(20)).all())
+
+                def first_page():
+                    return len(search(db, spec, q, limit=20)["results"])
+
+                def tenth_page():
+                    cursor, count = None, 0
+                    for _ in range(10):
+                        page = search(db, spec, q, limit=20, cursor=cursor, sort="recent")
+                        cursor, count = page["next_cursor"], len(page["results"])
+                        if cursor is None:
+                            break
+                    return count
+
+                timed("LIKE, first 20", like)
+                timed("full-text, ranked page 1", first_page)
+                timed("full-text, recent pages 1-10", tenth_page)
+        plain.dispose()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Access token verification throughput
+
+Reports tokens verified per second for:
+  - python-jose jwt.decode (the previous path, if python-jose is installed)
+  - app.core.tokens.decode_token (stdlib HMAC, cached keys, revocation check)
+  - decode_token plus the per-request user lookup that tokens without
+    embedded claims still need (SQLite file database)
+
+Usage:
+    python benchmarks/token_verification.py [--tokens 50000] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core import tokens  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.database import SQLiteBase  # noqa: E402
+from app.core.tokens import RevocationList, create_access_token, decode_token  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+try:
+    from jose import jwt
+except ImportError:
+    jwt = None
+
+
+def rate(fn, count: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return count / statistics.median(timings), count / min(timings)
+
+
+def report(label: str, rates) -> None:
+    print(f"  {label:<34} median {rates[0]:>10,.0f}/s   best {rates[1]:>10,.0f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tokens", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        SQLiteBase.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine)
+        # Revocations are checked against the in-memory copy, as between refreshes
+        tokens.revocations = RevocationList(Session, refresh_interval=3600)
+
+        with Session() as db:
+            user = User(email="bench@example.com", username="bench", hashed_password="x",
+                        full_name="Bench User", is_active=True, is_superuser=False)
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+            token = create_access_token({"sub": user.email}, user=user)
+            plain_token = create_access_token({"sub": user.email})
+
+        print(f"{args.tokens:,} verifications x {args.repeat}, token {len(token)} bytes\n")
+        if jwt is not None:
+            report("python-jose jwt.decode", rate(
+                lambda: jwt.decode(plain_token, settings.SECRET_KEY, algorithms=["HS256"]), args.tokens, args.repeat
+            ))
+        else:
+            print("  python-jose not installed; skipping the previous path")
+        report("decode_token (claims)", rate(lambda: decode_token(token), args.tokens, args.repeat))
+
+        db = Session()
+
+        def with_lookup():
+            claims = decode_token(plain_token)
+            db.query(User).filter(User.email == claims["sub"]).first()
+            db.rollback()
+
+        report("decode_token + user lookup", rate(with_lookup, max(args.tokens // 10, 1), args.repeat))
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+user_id validation on the analytics/user-log ingestion path
+
+Loads synthetic users into a SQLite file and reports validations per
+second for the per-event query the endpoints used to run and for the
+UserIdIndex (hits, and cached misses for unknown ids), plus the index's
+memory and rebuild time.
+
+Usage:
+    python benchmarks/user_id_validation.py [--users 1000000] [--events 200000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from app.core.database import SQLiteBase  # noqa: E402
+from app.core.user_index import UserIdIndex  # noqa: E402
+from app.models.user import User  # noqa: E402
+
+
+def rate(fn, ids, repeat: int = 3) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for user_id in ids:
+            fn(user_id)
+        timings.append(time.perf_counter() - start)
+    return len(ids) / statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--events", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'users.db')}")
+        SQLiteBase.metadata.create_all(bind=engine, tables=[User.__table__])
+        with engine.begin() as conn:
+            for start in range(1, args.users + 1, 50_000):
+                conn.execute(User.__table__.insert(), [
+                    {"id": i, "email": f"u{i}@example.com", "username": f"u{i}", "hashed_password": "x"}
+                    for i in range(start, min(start + 50_000, args.users + 1))
+                ])
+        Session = sessionmaker(bind=engine)
+        known = [random.randint(1, args.users) for _ in range(args.events)]
+        unknown = [args.users + random.randint(1, 1000) for _ in range(args.events)]
+
+        index = UserIdIndex()
+        start = time.perf_counter()
+        index.load(Session)
+        print(f"{args.users:,} users: index rebuild {time.perf_counter() - start:.2f} s, "
+              f"{index.memory_bytes / 1024:.0f} KiB\n")
+
+        db = Session()
+        query_ids = known[:max(args.events // 20, 1)]
+        print(f"  {'SQLite query per event':<32} {rate(lambda i: db.query(User).filter(User.id == i).first(), query_ids):>12,.0f}/s")
+        print(f"  {'index, known ids':<32} {rate(lambda i: index.exists(i, db), known):>12,.0f}/s")
+        index.exists(unknown[0], db)
+        print(f"  {'index, unknown ids (cached)':<32} {rate(lambda i: index.exists(i, db), unknown):>12,.0f}/s"
+              f"   ({index.counts['lookups']:,} database lookups)")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Build the static assets served under /static
+
+  1. Compile app/static/src/app.css with the Tailwind CLI, purged against
+     app/templates (only the classes the templates use) and minified
+  2. Fetch the pinned htmx / hyperscript / htmx-sse bundles into
+     app/static/vendor (skipped for files that are already there)
+  3. Copy everything into app/static/dist under content-hashed names, with
+     gzip and brotli variants, and write dist/manifest.json
+
+Templates resolve assets through the manifest and fall back to the CDNs
+when an asset has not been built.
+
+Usage:
+    python scripts/build_static.py [--tailwind PATH] [--offline]
+
+The Tailwind standalone CLI is taken from --tailwind, $TAILWINDCSS or
+`tailwindcss` on PATH; without it the CSS step is skipped.
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from app.core.static import DIST_DIR, MANIFEST_NAME, STATIC_ROOT  # noqa: E402
+
+try:
+    import brotli
+except ImportError:  # brotli variants are optional
+    brotli = None
+
+SRC_DIR = os.path.join(ROOT, STATIC_ROOT, "src")
+VENDOR_DIR = os.path.join(ROOT, STATIC_ROOT, "vendor")
+BUILD_DIR = os.path.join(ROOT, STATIC_ROOT, "build")
+OUTPUT_DIR = os.path.join(ROOT, DIST_DIR)
+
+# Same versions base.html loads from the CDN
+VENDOR_ASSETS = {
+    "htmx.min.js": "https://unpkg.com/htmx.org@1.9.10/dist/htmx.min.js",
+    "_hyperscript.min.js": "https://unpkg.com/hyperscript.org@0.9.12/dist/_hyperscript.min.js",
+    "htmx-sse.js": "https://unpkg.com/htmx.org@1.9.10/dist/ext/sse.js",
+}
+
+# Below this size compression isn't worth a separate file
+MIN_COMPRESS_BYTES = 256
+
+
+def build_css(tailwind: str) -> str:
+    output = os.path.join(BUILD_DIR, "app.css")
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    subprocess.run(
+        [
+            tailwind,
+            "--config", os.path.join(SRC_DIR, "tailwind.config.js"),
+            "--input", os.path.join(SRC_DIR, "app.css"),
+            "--output", output,
+            "--minify",
+        ],
+        cwd=ROOT,
+        check=True,
+    )
+    return output
+
+
+def fetch_vendor(offline: bool) -> dict:
+    os.makedirs(VENDOR_DIR, exist_ok=True)
+    sources = {}
+    for name, url in VENDOR_ASSETS.items():
+        path = os.path.join(VENDOR_DIR, name)
+        if not os.path.exists(path):
+            if offline:
+                print(f"  skip {name}: not vendored and --offline given")
+                continue
+            print(f"  fetch {url}")
+            try:
+                with urllib.request.urlopen(url, timeout=30) as response, open(path + ".tmp", "wb") as f:
+                    shutil.copyfileobj(response, f)
+            except OSError as e:
+                print(f"  skip {name}: {e}")
+                continue
+            os.replace(path + ".tmp", path)
+        sources[name] = path
+    return sources
+
+
+def hashed_name(name: str, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{digest}{ext}"
+
+
+def publish(sources: dict) -> dict:
+    """Write hashed copies plus .gz/.br variants; returns the manifest"""
+    if os.path.isdir(OUTPUT_DIR):
+        shutil.rmtree(OUTPUT_DIR)
+    os.makedirs(OUTPUT_DIR)
+
+    manifest = {}
+    for name, path in sorted(sources.items()):
+        with open(path, "rb") as f:
+            content = f.read()
+        target = hashed_name(name, content)
+        output = os.path.join(OUTPUT_DIR, target)
+        with open(output, "wb") as f:
+            f.write(content)
+
+        sizes = [f"{len(content)} B"]
+        if len(content) >= MIN_COMPRESS_BYTES:
+            # mtime=0 keeps the .gz byte-identical across builds
+            with open(output + ".gz", "wb") as f:
+                f.write(gzip.compress(content, compresslevel=9, mtime=0))
+            sizes.append(f"gzip {os.path.getsize(output + '.gz')} B")
+            if brotli is not None:
+                with open(output + ".br", "wb") as f:
+                    f.write(brotli.compress(content, quality=11))
+                sizes.append(f"br {os.path.getsize(output + '.br')} B")
+
+        manifest[name] = target
+        print(f"  {name} -> {target} ({', '.join(sizes)})")
+
+    with open(os.path.join(OUTPUT_DIR, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tailwind", default=os.environ.get("TAILWINDCSS") or shutil.which("tailwindcss"))
+    parser.add_argument("--offline", action="store_true", help="don't download missing vendor files")
+    args = parser.parse_args()
+
+    sources = {}
+    print("Tailwind CSS")
+    if args.tailwind:
+        sources["app.css"] = build_css(args.tailwind)
+    else:
+        print("  skip: Tailwind CLI not found (pages keep using the Tailwind CDN)")
+
+    print("Vendor JS")
+    sources.update(fetch_vendor(args.offline))
+
+    print(f"Publishing to {os.path.relpath(OUTPUT_DIR, ROOT)}")
+    if brotli is None:
+        print("  brotli not installed: writing gzip variants only")
+    publish(sources)
+
+
+if __name__ == "__main__":
+    main()
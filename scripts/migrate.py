@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Upgrade existing tables to the current models
+
+Adds the columns and indexes listed in app/core/migrations.py that a
+database lacks (tables created before they were added to the models).
+Safe to run again; run it once per deployment, before the new version
+starts, rather than leaving large index builds to worker startup.
+
+Usage:
+    python scripts/migrate.py [--database postgres_db1] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.migrations import MIGRATIONS, migrate, pending  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", choices=sorted(MIGRATIONS), action="append",
+                        help="only this database (repeatable); all of them by default")
+    parser.add_argument("--dry-run", action="store_true", help="list the pending steps without applying them")
+    args = parser.parse_args()
+    for database in args.database or sorted(MIGRATIONS):
+        if args.dry_run:
+            steps = pending(database)
+            for step in steps:
+                print(f"{database}: would {step.description}")
+            print(f"{database}: {len(steps)} step(s) pending")
+        else:
+            print(f"{database}: {len(migrate(database))} step(s) applied")  # migrate() prints each one
+
+
+if __name__ == "__main__":
+    main()
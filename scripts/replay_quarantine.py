@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Replay spooled events that a database rejected
+
+Replay moves rows PostgreSQL refuses for any reason other than an outage
+(a constraint, a column the table lacks) to *.quarantine files under
+SPOOL_DIR. Once the cause is fixed, this inserts them again; rows still
+rejected stay in their file, which is deleted once empty. Rows already
+inserted are skipped by their idempotency key, so it is safe to run again.
+
+Usage:
+    python scripts/replay_quarantine.py [--spool-dir DIR] [--dry-run]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.spool import IngestSpool, read_segment  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spool-dir", help="the spool directory; SPOOL_DIR by default")
+    parser.add_argument("--dry-run", action="store_true", help="count the quarantined rows without replaying them")
+    args = parser.parse_args()
+    spool = IngestSpool(args.spool_dir, enabled=True)
+    total_replayed = total_rejected = 0
+    for path in spool.quarantined():
+        if args.dry_run:
+            with open(path, "rb") as f:
+                print(f"{path.name}: {sum(1 for _ in read_segment(f))} row(s)")
+            continue
+        replayed, rejected = spool.replay_quarantine(path)
+        print(f"{path.name}: {replayed} row(s) replayed, {rejected} still rejected")
+        total_replayed += replayed
+        total_rejected += rejected
+    if not args.dry_run:
+        print(f"{total_replayed} row(s) replayed, {total_rejected} still rejected")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@ source venv/bin/activate
 echo "Running database migrations..."
 alembic upgrade head
 
+# Build static assets (hashed, precompressed CSS/JS under app/static/dist)
+echo "Building static assets..."
+python scripts/build_static.py
+
 # Start the FastAPI application
 echo "Starting FastAPI application..."
 uvicorn app.main:app --reload --host 0.0.0.0 --port 8000
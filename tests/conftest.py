@@ -1,12 +1,28 @@
+import os
 import pytest
+
+# Test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+
+# SQLite stand-ins for the PostgreSQL databases; settings are read on import
+os.environ.setdefault("DATABASE_URL", SQLALCHEMY_DATABASE_URL)
+os.environ.setdefault("POSTGRES_DB1_URL", "sqlite:///./test_db1.db")
+os.environ.setdefault("POSTGRES_DB2_URL", "sqlite:///./test_db2.db")
+os.environ.setdefault("DEBUG", "false")
+# Tests drive the scheduler directly instead of through the lifespan
+os.environ.setdefault("SCHEDULER_ENABLED", "false")
+
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from app.core.database import Base, get_db
+from app.core.database import SQLiteBase as Base, get_db
+from app.core.email import EmailService
+from app.core.ratelimit import limiter
+from app.core.security import get_password_hash
+from app.core.tokens import revocations
+from app.models.user import User
 from app.main import app
 
-# Test database
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -19,6 +35,13 @@ def override_get_db():
         db.close()
 
 
+@pytest.fixture(autouse=True)
+def reset_rate_limits():
+    """Every test starts with full rate-limit budgets"""
+    limiter.reset()
+    revocations.reset()
+
+
 @pytest.fixture(scope="function")
 def db():
     Base.metadata.create_all(bind=engine)
@@ -36,3 +59,26 @@ def client(db):
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def admin_client(client: TestClient, db, monkeypatch):
+    """Test client logged in as a superuser, with outgoing email disabled"""
+    monkeypatch.setattr(EmailService, "send_activation_email", lambda *args: True)
+    monkeypatch.setattr(EmailService, "send_activation_emails", lambda self, recipients: len(list(recipients)))
+    admin = User(
+        email="admin@example.com",
+        username="admin",
+        hashed_password=get_password_hash("adminpassword"),
+        is_active=True,
+        is_superuser=True
+    )
+    db.add(admin)
+    db.commit()
+    response = client.post(
+        "/auth/login",
+        data={"email": "admin@example.com", "password": "adminpassword"},
+        follow_redirects=False
+    )
+    assert response.status_code == 303
+    return client
@@ -0,0 +1,68 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from app.core.activity import ActivityLog, activity_log, parse_sample_rates
+from app.core.database import create_postgres_db1_session
+from app.core.tokens import create_access_token
+from app.models.postgres_db1 import UserLog
+from app.models.user import User
+
+
+@pytest.fixture
+def logged_actions():
+    """Returns a function giving (user_id, action) of each activity entry written so far"""
+    activity_log.flush()
+    with create_postgres_db1_session() as db:
+        db.execute(UserLog.__table__.delete())
+        db.commit()
+
+    def written():
+        activity_log.flush()
+        with create_postgres_db1_session() as db:
+            return [(log.user_id, log.action) for log in db.query(UserLog).order_by(UserLog.id)]
+
+    return written
+
+
+def test_authenticated_requests_are_logged_by_route(admin_client: TestClient, logged_actions, db):
+    admin = db.query(User).filter(User.username == "admin").one()
+    admin_client.get("/admin/users", headers={"HX-Request": "true", "User-Agent": "pytest-agent"})
+    admin_client.get(f"/admin/users/{admin.id}/edit")
+    admin_client.cookies.clear()
+    admin_client.get("/login")  # anonymous: not logged
+
+    token = create_access_token({"sub": admin.email}, user=admin)
+    admin_client.get("/api/v1/metrics/", headers={"Authorization": f"Bearer {token}"})
+
+    assert logged_actions() == [
+        (admin.id, "GET /admin/users"),
+        (admin.id, "GET /admin/users/{user_id}/edit"),
+        (admin.id, "GET /api/v1/metrics/"),
+    ]
+    with create_postgres_db1_session() as session:
+        entry = session.query(UserLog).order_by(UserLog.id).first()
+    assert entry.user_agent == "pytest-agent" and entry.ip_address == "testclient"
+
+
+def test_sample_rates_use_the_longest_matching_prefix():
+    assert parse_sample_rates("/api=0.5,/api/v1/postgres-demo=0,/static=0") == [
+        ("/api/v1/postgres-demo", 0.0), ("/static", 0.0), ("/api", 0.5)
+    ]
+    with pytest.raises(ValueError):
+        parse_sample_rates("/api=2")
+
+    log = ActivityLog(sample_rates="/api=0.25,/api/v1/postgres-demo=0", default_rate=1.0)
+    log.random = iter([0.1, 0.9]).__next__
+    assert log.sampled("/admin") and not log.sampled("/api/v1/postgres-demo/analytics")
+    assert log.sampled("/api/v1/users/") and not log.sampled("/api/v1/users/")
+
+
+def test_overload_drops_entries_instead_of_queueing(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'activity.db'}")  # no user_logs table: writes fail
+    log = ActivityLog(engine_factory=lambda: engine, max_pending=2)
+    assert log.record(1, "GET /admin") and log.record(1, "GET /admin")
+    assert not log.record(1, "GET /admin")
+    with pytest.raises(Exception):
+        log.flush()
+    # The failed batch is discarded, not retried
+    assert log.metrics() == {"recorded": 2, "written": 0, "dropped": 3, "failed_flushes": 1, "pending": 0}
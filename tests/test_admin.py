@@ -0,0 +1,61 @@
+from fastapi.testclient import TestClient
+from app.models.user import User
+
+
+def test_create_user_returns_single_row(admin_client: TestClient):
+    response = admin_client.post("/admin/users", data={
+        "email": "new@example.com",
+        "username": "newuser",
+        "password": "newpassword",
+        "is_active": "true"
+    })
+    assert response.status_code == 200
+    assert response.text.count("<tr") == 1
+    assert "<table" not in response.text
+    assert "new@example.com" in response.text
+
+
+def test_update_user_returns_single_row(admin_client: TestClient, db):
+    user = db.query(User).filter(User.username == "admin").first()
+    response = admin_client.put(f"/admin/users/{user.id}", data={
+        "email": "admin@example.com",
+        "username": "admin",
+        "full_name": "Renamed Admin",
+        "is_active": "true",
+        "is_superuser": "true"
+    })
+    assert response.status_code == 200
+    assert f'id="user-row-{user.id}"' in response.text
+    assert "Renamed Admin" in response.text
+    assert response.text.count("<tr") == 1
+
+
+def test_delete_user_returns_oob_delete(admin_client: TestClient):
+    created = admin_client.post("/admin/users", data={
+        "email": "gone@example.com",
+        "username": "gone",
+        "password": "password"
+    })
+    user_id = created.text.split('id="user-row-')[1].split('"')[0]
+    response = admin_client.delete(f"/admin/users/{user_id}")
+    assert response.status_code == 200
+    assert f'id="user-row-{user_id}"' in response.text
+    assert 'hx-swap-oob="delete"' in response.text
+
+
+def test_setting_mutations_return_single_rows(admin_client: TestClient):
+    response = admin_client.post("/admin/settings", data={"setting_name": "site name", "value": "Admin"})
+    assert response.status_code == 200
+    assert response.text.count("<tr") == 1
+    row_id = response.text.split('id="')[1].split('"')[0]
+    assert row_id.startswith("setting-row-")
+
+    response = admin_client.put("/admin/settings/site name", data={"value": "Renamed"})
+    assert response.status_code == 200
+    assert f'id="{row_id}"' in response.text
+    assert "Renamed" in response.text
+
+    response = admin_client.delete("/admin/settings/site name")
+    assert response.status_code == 200
+    assert f'id="{row_id}"' in response.text
+    assert 'hx-swap-oob="delete"' in response.text
@@ -0,0 +1,174 @@
+import asyncio
+import email
+import smtplib
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.alerts import AlertEngine, AlertRule, SlidingWindowCounter, alert_engine, parse_rules
+from app.core.database import PostgresDB2Base
+from app.core.email import EmailQueue, email_queue
+from app.services.postgres_db2_service import create_system_event
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSMTP:
+    def __init__(self, refuse=()):
+        self.sent = []
+        self.refuse = refuse
+
+    def sendmail(self, from_email, to_email, message):
+        if to_email in self.refuse:
+            raise smtplib.SMTPRecipientsRefused({to_email: (550, b"no such user")})
+        self.sent.append((to_email, message))
+
+    def quit(self):
+        pass
+
+
+def _event(severity="ERROR", event_type="db", message="m", metadata=None):
+    return {"id": 1, "event_type": event_type, "severity": severity, "message": message,
+            "event_metadata": metadata, "created_at": None}
+
+
+def _engine(*rules, **kwargs):
+    queue = EmailQueue(max_pending=100, retry_seconds=1, max_attempts=2)
+    clock = FakeClock()
+    engine = AlertEngine([AlertRule.from_dict(rule) for rule in rules], recipients=["ops@example.com"],
+                         queue=queue, clock=clock, **kwargs)
+    return engine, queue, clock
+
+
+def test_sliding_window_counter_expires_old_slots():
+    counter = SlidingWindowCounter(60, slots=6)
+    assert counter.add(0) == 1
+    assert counter.add(25, 2) == 3
+    assert counter.count(59) == 3
+    assert counter.count(65) == 2  # the first slot (0-10s) left the window
+    assert counter.count(200) == 0
+
+
+def test_rule_validation():
+    with pytest.raises(ValueError):
+        AlertRule.from_dict({"name": "x", "severity": "LOUD"})
+    with pytest.raises(ValueError):
+        AlertRule.from_dict({"name": "x", "message": "("})
+    with pytest.raises(ValueError):
+        AlertRule.from_dict({"name": "x", "threshold": 3})
+    with pytest.raises(ValueError):
+        AlertRule.from_dict({"name": "x", "field": "latency_ms"})
+    with pytest.raises(ValueError):
+        parse_rules('[{"name": "x"}, {"name": "x"}]')
+    assert [rule.name for rule in parse_rules("")] == ["critical-event", "error-burst"]
+
+
+def test_severity_threshold_pattern_and_metadata_matching():
+    rule = AlertRule.from_dict({
+        "name": "slow-db", "severity": "warn", "message": "(?i)timeout",
+        "metadata": {"host": "^db-"}, "field": "latency_ms", "op": ">=", "value": 500,
+    })
+    matching = _event("ERROR", message="Query TIMEOUT", metadata={"host": "db-1", "latency_ms": 800})
+    assert rule.matches(matching)
+    assert rule.matches({**matching, "severity": "fatal"})
+    assert not rule.matches({**matching, "severity": "info"})
+    assert not rule.matches({**matching, "message": "ok"})
+    assert not rule.matches({**matching, "event_metadata": {"host": "web-1", "latency_ms": 800}})
+    assert not rule.matches({**matching, "event_metadata": {"host": "db-1", "latency_ms": 100}})
+    assert not rule.matches({**matching, "event_metadata": {"host": "db-1", "latency_ms": "slow"}})
+
+
+def test_rate_rule_fires_per_group_with_cooldown():
+    engine, queue, clock = _engine({
+        "name": "burst", "severity": "ERROR", "count": 3, "window_seconds": 60,
+        "group_by": ["event_type"], "cooldown_seconds": 300,
+    })
+    assert engine.observe(_event(event_type="db")) == []
+    assert engine.observe(_event(event_type="db")) == []
+    assert engine.observe(_event(event_type="cache")) == []
+    [alert] = engine.observe(_event(event_type="db"))
+    assert alert["rule"] == "burst" and alert["group"] == {"event_type": "db"} and alert["count"] == 3
+    assert queue.metrics()["pending"] == 1
+
+    for _ in range(5):
+        assert engine.observe(_event(event_type="db")) == []  # in cooldown
+    assert engine.metrics()["suppressed"] == 5
+
+    clock.now += 301
+    assert engine.observe(_event(event_type="db")) == []  # the old events left the window
+    engine.observe(_event(event_type="db"))
+    [alert] = engine.observe(_event(event_type="db"))
+    assert alert["suppressed"] == 5
+    assert queue.metrics()["pending"] == 2
+
+
+def test_groups_are_bounded():
+    engine, _, _ = _engine({"name": "any", "group_by": ["metadata.host"], "cooldown_seconds": 0}, max_groups=10)
+    for n in range(50):
+        engine.observe(_event(metadata={"host": f"h{n}"}))
+    assert engine.metrics()["groups"] == 10
+
+
+def test_queue_sends_over_one_connection_and_retries():
+    engine, queue, _ = _engine({"name": "any", "cooldown_seconds": 0})
+    engine.recipients = ["ops@example.com", "gone@example.com"]
+    engine.observe(_event())
+
+    def unreachable():
+        raise OSError("connection refused")
+
+    queue.email_service.connect = unreachable
+    assert queue.send_pending() == 0
+    assert queue.metrics()["pending"] == 2
+
+    server = FakeSMTP(refuse={"gone@example.com"})
+    queue.email_service.connect = lambda: server
+    assert queue.send_pending() == 1
+    assert [to for to, _ in server.sent] == ["ops@example.com"]
+    assert "[Alert] any" in server.sent[0][1]
+    assert queue.metrics() == {"queued": 2, "sent": 1, "failed": 1, "dropped": 0, "pending": 0}
+
+
+def test_a_bad_message_does_not_hold_back_the_batch():
+    engine, queue, _ = _engine({"name": "any", "group_by": ["event_type"], "cooldown_seconds": 0})
+    engine.observe(_event(event_type="evil\nBcc: victim@example.com"))
+    assert "\n" not in queue._pending[0][1]
+    queue.enqueue("ops@example.com", "broken\nBcc: victim@example.com", "<p>x</p>")  # not from an alert
+    engine.observe(_event(event_type="db down"))
+    server = FakeSMTP()
+    queue.email_service.connect = lambda: server
+    assert queue.send_pending() == 2
+    assert email.message_from_string(server.sent[0][1])["Bcc"] is None
+    assert "db down" in server.sent[1][1]
+    assert queue.metrics()["failed"] == 1 and queue.metrics()["pending"] == 0
+
+
+def test_system_event_ingest_fires_alerts(monkeypatch):
+    engine = create_engine("sqlite://")
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    server = FakeSMTP()
+    monkeypatch.setattr(alert_engine, "recipients", ["ops@example.com"])
+    monkeypatch.setattr(email_queue.email_service, "connect", lambda: server)
+
+    async def ingest():
+        await email_queue.start()
+        try:
+            with sessionmaker(bind=engine)() as db:
+                await create_system_event("disk", "CRITICAL", "disk full", {"mount": "/"}, db=db)
+            for _ in range(100):
+                if server.sent:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await email_queue.stop()
+
+    fired = alert_engine.metrics()["fired"]
+    asyncio.run(ingest())
+    assert alert_engine.metrics()["fired"] == fired + 1
+    [(to, message)] = server.sent
+    assert to == "ops@example.com" and "critical-event" in message and "disk full" in message
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi.testclient import TestClient
+from app.core.archive import ARCHIVED_TABLES, column_archive
+from app.core.columnar import ColumnFile, write_columns
+from app.core.database import create_postgres_db1_session, create_postgres_db2_session
+from app.models.postgres_db1 import Analytics
+from app.models.postgres_db2 import PerformanceMetric
+from app.services.maintenance_service import archive_table
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+CUTOFF = START + timedelta(days=2)
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(column_archive, "root", tmp_path)
+    return column_archive
+
+
+def test_column_files_round_trip_and_map_numeric_columns(tmp_path):
+    path = tmp_path / "part.col"
+    write_columns(path, {
+        "time": ("f8", [1.5, 2.5, 3.5]),
+        "id": ("i8", [7, 8, 9]),
+        "tags": ("json", [{"host": "a"}, None, "x"]),
+    }, {"day": "2026-01-01"})
+    with ColumnFile(path) as column_file:
+        assert column_file.rows == 3 and column_file.footer["day"] == "2026-01-01"
+        assert isinstance(column_file.column("time"), memoryview)
+        assert column_file.column("id")[1:].tolist() == [8, 9]
+        assert column_file.read() == {"time": [1.5, 2.5, 3.5], "id": [7, 8, 9], "tags": [{"host": "a"}, None, "x"]}
+
+    path.write_bytes(b"not a column file")
+    with pytest.raises(ValueError):
+        ColumnFile(path)
+    with pytest.raises(ValueError):
+        write_columns(path, {"a": ("i8", [1]), "b": ("i8", [])}, {})
+
+
+def test_archived_metrics_read_the_same_through_the_endpoints(client: TestClient, archive):
+    with create_postgres_db2_session() as db:
+        db.execute(PerformanceMetric.__table__.delete())
+        db.add_all([
+            PerformanceMetric(metric_name=name, metric_value=float(n % 17) * scale, unit="ms", tags={"n": n},
+                              recorded_at=START + timedelta(minutes=37 * n))
+            for n in range(200) for name, scale in (("cpu", 1.0), ("disk io", 2.0))
+        ])
+        db.commit()
+
+    url = "/api/v1/postgres-demo/performance-metrics"
+    series_params = {"metric_name": "cpu", "start": START.isoformat(), "end": (START + timedelta(days=6)).isoformat(),
+                     "step": 7200, "aggregation": "avg", "fill": "previous"}
+    lttb_params = {**series_params, "downsample": "lttb", "points": 40}
+
+    def snapshot():
+        return (
+            client.get(f"{url}/series", params=series_params).json(),
+            client.get(f"{url}/series", params={**series_params, "aggregation": "count"}).json(),
+            client.get(f"{url}/series", params=lttb_params).json(),
+        )
+
+    before = snapshot()
+    moved = archive_table(ARCHIVED_TABLES["performance_metrics"], create_postgres_db2_session, cutoff=CUTOFF)
+    assert moved == 2 * len([n for n in range(200) if START + timedelta(minutes=37 * n) < CUTOFF])
+    with create_postgres_db2_session() as db:
+        assert db.query(PerformanceMetric).filter(PerformanceMetric.recorded_at < CUTOFF).count() == 0
+    assert [(day.isoformat(), key) for day, key, _ in archive.partitions("performance_metrics")] == [
+        ("2026-01-01", "cpu"), ("2026-01-01", "disk io"), ("2026-01-02", "cpu"), ("2026-01-02", "disk io")
+    ]
+    assert snapshot() == before
+
+    # Re-archiving rows already archived (a delete that failed) adds nothing
+    with create_postgres_db2_session() as db:
+        rows = db.execute(PerformanceMetric.__table__.select().limit(5)).mappings().all()
+    assert archive.append(ARCHIVED_TABLES["performance_metrics"], [
+        {**row, "id": row["id"] - 1000, "recorded_at": START} for row in rows[:1]
+    ]) == 1
+    assert archive.append(ARCHIVED_TABLES["performance_metrics"], [
+        {**row, "id": row["id"] - 1000, "recorded_at": START} for row in rows[:1]
+    ]) == 0
+
+    # The last-N listing continues into the archive once live rows run out
+    with create_postgres_db2_session() as db:
+        live = db.query(PerformanceMetric).filter(PerformanceMetric.metric_name == "disk io").count()
+    listed = client.get(url, params={"metric_name": "disk io", "limit": live + 2, "fields": "metric_value,recorded_at,tags"})
+    archived = listed.json()[live:]
+    expected_n = max(n for n in range(200) if START + timedelta(minutes=37 * n) < CUTOFF)
+    assert archived[0] == {
+        "metric_value": float(expected_n % 17) * 2.0,
+        "recorded_at": (START + timedelta(minutes=37 * expected_n)).isoformat(),
+        "tags": {"n": expected_n},
+    }
+    assert len(archived) == 2
+
+
+def test_archived_analytics_fill_the_listing_with_filters(client: TestClient, archive):
+    with create_postgres_db1_session() as db:
+        db.execute(Analytics.__table__.delete())
+        db.add_all([
+            Analytics(user_id=n % 3, event_type="click" if n % 2 else "view", event_data={"n": n},
+                      timestamp=START + timedelta(hours=6 * n))
+            for n in range(16)
+        ])
+        db.commit()
+    archive_table(ARCHIVED_TABLES["analytics"], create_postgres_db1_session, cutoff=CUTOFF)
+
+    url = "/api/v1/postgres-demo/analytics"
+    events = client.get(url, params={"user_id": 1, "event_type": "click", "fields": "user_id,event_data"}).json()
+    assert [event["event_data"]["n"] for event in events] == [13, 7, 1]
+    assert all(event == {"user_id": 1, "event_data": event["event_data"]} for event in events)
+    assert len(client.get(url, params={"limit": 100}).json()) == 16
@@ -0,0 +1,105 @@
+import re
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from app.core.audit import AuditLog, audit_log
+from app.core.database import create_postgres_db1_session
+from app.models.audit_event import AuditEvent
+from app.models.user import User
+
+
+@pytest.fixture
+def audit_events(admin_client: TestClient):
+    """Audited admin client; yields a function returning the written events"""
+    with create_postgres_db1_session() as db:
+        db.execute(AuditEvent.__table__.delete())
+        db.commit()
+
+    def written():
+        audit_log.flush()
+        with create_postgres_db1_session() as db:
+            return db.query(AuditEvent).order_by(AuditEvent.id).all()
+
+    return written
+
+
+def test_admin_mutations_are_audited_with_diffs(admin_client: TestClient, audit_events, db):
+    admin_client.post("/admin/users", data={
+        "email": "new@example.com", "username": "newbie", "password": "password123", "is_active": "true"
+    })
+    user = db.query(User).filter(User.username == "newbie").one()
+    admin_client.put(f"/admin/users/{user.id}", data={
+        "email": "new@example.com", "username": "newbie", "full_name": "New Person",
+        "is_active": "true", "is_superuser": "true"
+    })
+    admin_client.delete(f"/admin/users/{user.id}")
+    admin_client.post("/admin/settings", data={"setting_name": "theme", "value": "dark"})
+    admin_client.put("/admin/settings/theme", data={"value": "dark"})  # unchanged: not audited
+    admin_client.put("/admin/settings/theme", data={"value": "light"})
+    admin_client.delete("/admin/settings/theme")
+
+    events = audit_events()
+    assert [event.action for event in events] == [
+        "user.create", "user.update", "user.delete", "setting.create", "setting.update", "setting.delete"
+    ]
+    assert {event.actor for event in events} == {"admin"}
+    create, update, delete = events[:3]
+    assert create.entity_id == str(user.id) and create.changes["email"] == [None, "new@example.com"]
+    # New users stay inactive until activated, so the update activates too
+    assert update.changes == {
+        "full_name": [None, "New Person"], "is_active": [False, True], "is_superuser": [False, True]
+    }
+    assert delete.changes["username"] == ["newbie", None]
+    assert events[4].changes == {"value": ["dark", "light"]}
+
+
+def test_failed_writes_stay_buffered_and_are_bounded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")  # no audit_events table yet
+    log = AuditLog(engine_factory=lambda: engine, max_pending=3)
+    for n in range(2):
+        log.record({"id": 1, "username": "admin"}, "setting.update", "setting", f"s{n}")
+    with pytest.raises(Exception):
+        log.flush()
+    assert log.metrics()["pending"] == 2 and log.counts["failed_flushes"] == 1
+
+    for n in range(2, 4):
+        log.record(None, "setting.update", "setting", f"s{n}")
+    assert log.counts["dropped"] == 1
+
+    AuditEvent.__table__.create(engine)
+    assert log.flush() == 3
+    with engine.connect() as conn:
+        assert [row.entity_id for row in conn.execute(AuditEvent.__table__.select())] == ["s1", "s2", "s3"]
+
+
+def test_audit_trail_pages_by_id_and_filters(admin_client: TestClient, audit_events):
+    for n in range(25):
+        audit_log.record({"id": 1, "username": "admin"}, "setting.update", "setting", f"s{n}", {"value": [n, n + 1]})
+    audit_log.record({"id": 2, "username": "other"}, "user.delete", "user", 7)
+    audit_events()
+
+    first = admin_client.get("/admin/audit?action=setting.update&limit=10")
+    assert first.status_code == 200
+    assert first.text.count("setting.update</td>") == 10 and "s24" in first.text and "user.delete</td>" not in first.text
+    next_url = re.search(r'hx-get="(/admin/audit\?[^"]+)"', first.text).group(1).replace("&amp;", "&")
+    assert "action=setting.update" in next_url
+
+    second = admin_client.get(next_url)
+    assert 'id="audit-panel"' not in second.text  # rows only, appended in place
+    assert "s14" in second.text and "s24" not in second.text
+
+    by_actor = admin_client.get("/admin/audit?actor=other")
+    assert "user.delete</td>" in by_actor.text and "setting.update</td>" not in by_actor.text
+
+    by_id = admin_client.get("/admin/audit?entity_id=s3")  # without entity_type
+    assert by_id.text.count("setting.update</td>") == 1 and "user.delete</td>" not in by_id.text
+
+
+def test_audit_events_are_append_only(audit_events):
+    audit_log.record(None, "scheduler.run", "scheduler_job", "purge")
+    [event] = audit_events()
+    with create_postgres_db1_session() as db:
+        event = db.get(AuditEvent, event.id)
+        event.action = "tampered"
+        with pytest.raises(ValueError):
+            db.commit()
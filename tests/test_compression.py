@@ -0,0 +1,88 @@
+import gzip
+import json
+from datetime import datetime
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from app.core.compression import CompressionMiddleware, choose_encoding
+from app.core.database import PostgresDB1Base
+from app.core.responses import FastJSONResponse
+from app.models.postgres_db1 import Analytics
+
+BIG = "x" * 4096
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/big")
+    def big():
+        return PlainTextResponse(BIG)
+
+    @app.get("/small")
+    def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/chunks")
+    def chunks():
+        return StreamingResponse(iter([BIG, BIG]), media_type="text/plain")
+
+    @app.get("/events")
+    def events():
+        return StreamingResponse(iter(["data: x\n\n"] * 500), media_type="text/event-stream")
+
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip, br;q=0") == "gzip"
+    assert choose_encoding("identity") is None
+
+
+def test_compresses_above_threshold_only():
+    client = _client()
+    # httpx decodes br/gzip transparently; check the headers and the raw size
+    response = client.get("/big", headers={"Accept-Encoding": "br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(BIG)
+    assert response.text == BIG
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.text == "tiny"
+
+
+def test_streaming_bodies_and_event_streams():
+    client = _client()
+    with client.stream("GET", "/chunks", headers={"Accept-Encoding": "gzip"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw).decode() == BIG * 2
+
+    with client.stream("GET", "/events", headers={"Accept-Encoding": "br"}) as response:
+        raw = b"".join(response.iter_raw())
+    assert "content-encoding" not in response.headers
+    assert raw.startswith(b"data: x")
+
+
+def test_fast_json_matches_jsonable_encoder_for_orm_and_rows():
+    engine = create_engine("sqlite://")
+    PostgresDB1Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    db.add(Analytics(user_id=1, event_type="click", event_data={"a": [1, 2]},
+                     timestamp=datetime(2024, 1, 2, 3, 4, 5, 600000)))
+    db.commit()
+
+    events = db.query(Analytics).all()
+    expected = jsonable_encoder(events)
+    assert json.loads(FastJSONResponse(events).body) == expected
+
+    rows = db.execute(select(*Analytics.__table__.columns)).all()
+    assert json.loads(FastJSONResponse(rows).body) == expected
+    db.close()
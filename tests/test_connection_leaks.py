@@ -0,0 +1,67 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from fastapi.testclient import TestClient
+from app.core.connection_tracking import ConnectionTracker, connection_tracker
+from app.core.database import session_scope
+from app.core.tokens import create_access_token
+from tests.conftest import engine
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_unclosed_session_is_reported_with_its_stack(tmp_path):
+    clock = FakeClock()
+    tracker = ConnectionTracker(threshold=10, capture_stacks=True, clock=clock)
+    file_engine = tracker.instrument(create_engine(f"sqlite:///{tmp_path / 'leak.db'}"), "leaky")
+
+    leaked = Session(file_engine)
+    leaked.execute(text("SELECT 1"))
+    with session_scope(lambda: Session(file_engine)) as db:
+        db.execute(text("SELECT 1"))
+    assert tracker.checked_out("leaky") == 1
+
+    clock.now += 11
+    [leak] = tracker.leaks()
+    assert leak["engine"] == "leaky" and leak["held_seconds"] == 11
+    assert "test_unclosed_session_is_reported_with_its_stack" in leak["stack"]
+
+    leaked.close()
+    assert tracker.leaks() == [] and tracker.peak["leaky"] == 2
+
+
+def test_session_scope_leaves_a_passed_session_open(db):
+    with session_scope(db=db) as scoped:
+        assert scoped is db
+        scoped.execute(text("SELECT 1"))
+    assert db.in_transaction()
+
+
+def test_soak_keeps_connections_bounded(admin_client: TestClient):
+    # The test engine serves get_db overrides; the app's engines serve the rest
+    connection_tracker.instrument(engine, "test")
+    connection_tracker.reset_peaks()
+    checkouts = connection_tracker.checkouts
+
+    for _ in range(100):
+        assert admin_client.get("/admin").status_code == 200
+        assert admin_client.get("/admin/users", headers={"HX-Request": "true"}).status_code == 200
+        assert admin_client.get("/admin/settings", headers={"HX-Request": "true"}).status_code == 200
+        assert admin_client.get("/api/v1/postgres-demo/analytics").status_code == 200
+
+    # Claim-less tokens authorize through a user lookup in get_current_user
+    admin_client.cookies.clear()
+    token = create_access_token({"sub": "admin@example.com"})
+    for _ in range(100):
+        response = admin_client.get("/api/v1/metrics/", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+
+    assert connection_tracker.checkouts - checkouts >= 500
+    assert connection_tracker.checked_out() == 0
+    assert max(connection_tracker.peak.values()) <= 2
+    assert response.json()["db_connections"]["leaks"] == []
@@ -0,0 +1,93 @@
+import asyncio
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from app.core.database import PostgresDB1Base, create_postgres_db2_session
+from app.core.idempotency import IngestDeduplicator, ingest_dedup
+from app.models.postgres_db1 import Analytics
+from app.models.postgres_db2 import PerformanceMetric, SystemEvent
+from app.services.postgres_db1_service import create_analytics_event
+
+URL = "/api/v1/postgres-demo"
+
+
+def _count(model, **equals) -> int:
+    with create_postgres_db2_session() as db:
+        criteria = [getattr(model, name) == value for name, value in equals.items()]
+        return db.scalar(select(func.count()).select_from(model).where(*criteria))
+
+
+def test_idempotency_key_makes_retries_return_the_original_event(client: TestClient):
+    ingest_dedup.reset()
+    event = {"event_type": "retry-test", "severity": "INFO", "message": "deploy started"}
+    first = client.post(f"{URL}/system-event", json=event, headers={"Idempotency-Key": "deploy-1"}).json()
+    retry = client.post(f"{URL}/system-event", json=event, headers={"Idempotency-Key": "deploy-1"}).json()
+    assert retry["event_id"] == first["event_id"]
+
+    # Another worker (or this one after the window forgot the key) hits the unique index instead
+    ingest_dedup.reset()
+    conflicts = ingest_dedup.counts["duplicates_conflict"]
+    again = client.post(f"{URL}/system-event", json=event, headers={"Idempotency-Key": "deploy-1"}).json()
+    assert again["event_id"] == first["event_id"]
+    assert ingest_dedup.counts["duplicates_conflict"] == conflicts + 1
+
+    other = client.post(f"{URL}/system-event", json=event, headers={"Idempotency-Key": "deploy-2"}).json()
+    assert other["event_id"] != first["event_id"]
+    assert _count(SystemEvent, event_type="retry-test") == 2
+
+
+def test_identical_samples_without_key_are_separate_events_by_default(client: TestClient):
+    ingest_dedup.reset()
+    metric = {"metric_name": "same_sample", "metric_value": 50.0}
+    ids = {client.post(f"{URL}/performance-metric", json=metric).json()["metric_id"] for _ in range(2)}
+    assert len(ids) == 2
+    listed = client.get(f"{URL}/performance-metrics", params={"metric_name": "same_sample"}).json()
+    assert len(listed) == 2 and all("idempotency_key" not in row for row in listed)
+
+
+def test_identical_payload_without_key_is_deduplicated_within_the_window(client: TestClient, monkeypatch):
+    ingest_dedup.reset()
+    monkeypatch.setattr(ingest_dedup, "content_seconds", 60)  # opt-in
+    metric = {"metric_name": "retry_test", "metric_value": 1.5, "tags": {"host": "a"}}
+    first = client.post(f"{URL}/performance-metric", json=metric).json()
+    assert client.post(f"{URL}/performance-metric", json=metric).json()["metric_id"] == first["metric_id"]
+    changed = client.post(f"{URL}/performance-metric", json={**metric, "tags": {"host": "b"}}).json()
+    assert changed["metric_id"] != first["metric_id"]
+    assert _count(PerformanceMetric, metric_name="retry_test") == 2
+
+    ingest_dedup.reset()  # the window expired: the same values are a new sample
+    assert client.post(f"{URL}/performance-metric", json=metric).json()["metric_id"] != first["metric_id"]
+
+
+def test_content_window_expires_and_is_opt_in():
+    engine = create_engine("sqlite://")
+    PostgresDB1Base.metadata.create_all(bind=engine)
+    clock = [0.0]
+    dedup = IngestDeduplicator(window_size=2, content_seconds=10, clock=lambda: clock[0])
+    values = {"user_id": 1, "event_type": "click", "event_data": {"x": 1}}
+    with sessionmaker(bind=engine)() as db:
+        first, created = dedup.ingest(db, Analytics, values, deduplicate=True)
+        assert created
+        assert dedup.ingest(db, Analytics, values, deduplicate=True) == (first, False)
+        assert dedup.ingest(db, Analytics, values)[1]  # internal callers don't opt in
+        clock[0] = 11
+        assert dedup.ingest(db, Analytics, values, deduplicate=True)[1]
+        for n in range(3):
+            dedup.ingest(db, Analytics, {**values, "event_data": {"x": n + 2}}, deduplicate=True)
+        assert dedup.metrics()["window"] == 2
+
+
+def test_service_accepts_idempotency_key():
+    engine = create_engine("sqlite://")
+    PostgresDB1Base.metadata.create_all(bind=engine)
+
+    async def ingest():
+        with sessionmaker(bind=engine)() as db:
+            ids = [
+                (await create_analytics_event(1, "view", {"page": "/"}, idempotency_key="view-1", db=db)).id
+                for _ in range(3)
+            ]
+            return ids, db.scalar(select(func.count()).select_from(Analytics))
+
+    ids, count = asyncio.run(ingest())
+    assert len(set(ids)) == 1 and count == 1
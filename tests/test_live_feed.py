@@ -0,0 +1,86 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import PostgresDB2Base
+from app.core.pubsub import broker, format_sse
+from app.services.postgres_db2_service import (
+    SYSTEM_EVENT_TOPIC,
+    PERFORMANCE_METRIC_TOPIC,
+    create_system_event,
+    subscribe_live_feed
+)
+
+
+@pytest.fixture
+def db2():
+    """In-memory SQLite stand-in for PostgreSQL Database 2"""
+    engine = create_engine("sqlite://")
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _event(severity):
+    return {"id": 1, "event_type": "test", "severity": severity, "message": "m",
+            "event_metadata": None, "created_at": None}
+
+
+def test_publish_fans_out_with_filters():
+    async def scenario():
+        errors = subscribe_live_feed(severity="ERROR,CRITICAL")
+        everything = subscribe_live_feed()
+        cpu = subscribe_live_feed(metric_name="cpu", topics=[PERFORMANCE_METRIC_TOPIC])
+        try:
+            broker.publish(SYSTEM_EVENT_TOPIC, _event("INFO"))
+            broker.publish(SYSTEM_EVENT_TOPIC, _event("error"))
+            broker.publish(PERFORMANCE_METRIC_TOPIC, {"metric_name": "cpu", "metric_value": 1.0})
+            broker.publish(PERFORMANCE_METRIC_TOPIC, {"metric_name": "disk", "metric_value": 2.0})
+            return errors.queue.qsize(), everything.queue.qsize(), cpu.queue.qsize()
+        finally:
+            for subscription in (errors, everything, cpu):
+                broker.unsubscribe(subscription)
+
+    # errors gets the ERROR event plus both metrics (severity only filters events)
+    assert asyncio.run(scenario()) == (3, 4, 1)
+    assert broker.subscriber_count(SYSTEM_EVENT_TOPIC) == 0
+
+
+def test_full_queue_drops_oldest():
+    async def scenario():
+        subscription = broker.subscribe([SYSTEM_EVENT_TOPIC], maxsize=2)
+        try:
+            for severity in ("INFO", "WARNING", "ERROR"):
+                broker.publish(SYSTEM_EVENT_TOPIC, _event(severity))
+            first = await subscription.get(timeout=1)
+            return subscription.dropped, first.data["severity"]
+        finally:
+            broker.unsubscribe(subscription)
+
+    assert asyncio.run(scenario()) == (1, "WARNING")
+
+
+def test_create_system_event_publishes_once_encoded(db2):
+    async def scenario():
+        first = subscribe_live_feed()
+        second = subscribe_live_feed()
+        try:
+            event = await create_system_event("deploy", "INFO", "released", db=db2)
+            a = await first.get(timeout=1)
+            b = await second.get(timeout=1)
+            return event, a, b
+        finally:
+            broker.unsubscribe(first)
+            broker.unsubscribe(second)
+
+    event, a, b = asyncio.run(scenario())
+    assert a is b
+    assert a.data["id"] == event.id
+    assert a.json() is b.json()
+
+
+def test_format_sse_splits_multiline_data():
+    assert format_sse("system_event", "<li>\nx</li>") == "event: system_event\ndata: <li>\ndata: x</li>\n\n"
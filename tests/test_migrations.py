@@ -0,0 +1,99 @@
+import asyncio
+from sqlalchemy import Column, MetaData, Table, create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+from app.core.idempotency import IngestDeduplicator
+from app.core.migrations import AddColumn, migrate, pending
+from app.core.projection import select_projection
+from app.models.postgres_db1 import Analytics
+from app.models.postgres_db2 import PerformanceMetric, SystemEvent
+from app.models.token_revocation import TokenRevocation
+from app.services.postgres_db2_service import create_system_event
+
+
+def _baseline(engine, *models):
+    """The tables as the first release created them: no idempotency_key, no secondary indexes"""
+    metadata = MetaData()
+    for model in models:
+        Table(model.__tablename__, metadata, *[
+            Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+            for column in model.__table__.c if column.name != "idempotency_key"
+        ])
+    metadata.create_all(bind=engine)
+
+
+def test_tables_from_the_old_schema_are_upgraded(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    _baseline(engine, SystemEvent, PerformanceMetric)
+    with engine.begin() as conn:
+        conn.execute(SystemEvent.__table__.insert().values(event_type="old", severity="INFO", message="before"))
+
+    assert len(pending("postgres_db2", engine)) == 6
+    applied = migrate("postgres_db2", engine)
+    assert "add column system_events.idempotency_key" in applied
+    assert pending("postgres_db2", engine) == [] and migrate("postgres_db2", engine) == []
+    assert "idempotency_key" in {column["name"] for column in inspect(engine).get_columns("performance_metrics")}
+    indexes = {index["name"] for index in inspect(engine).get_indexes("performance_metrics")}
+    assert "ix_performance_metrics_name_time" in indexes
+
+    dedup = IngestDeduplicator()
+    with sessionmaker(bind=engine)() as db:
+        first = asyncio.run(create_system_event("job", "ERROR", "failed", None, idempotency_key="job-1", db=db))
+        dedup.reset()
+        values = {"event_type": "job", "severity": "ERROR", "message": "failed", "event_metadata": None}
+        assert dedup.ingest(db, SystemEvent, values, idempotency_key="job-1") == (first, False)  # the unique index
+        rows = db.execute(select_projection(SystemEvent).order_by(SystemEvent.id)).all()
+    assert [row.message for row in rows] == ["before", "failed"]
+
+
+def test_keyed_ingest_works_before_the_unique_index_is_built(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    _baseline(engine, SystemEvent)
+    with engine.begin() as conn:
+        AddColumn(SystemEvent, "idempotency_key").apply(conn)  # the index build is still to come
+    now = [0.0]
+    dedup = IngestDeduplicator(clock=lambda: now[0])
+    values = {"event_type": "job", "severity": "ERROR", "message": "failed", "event_metadata": None}
+
+    with sessionmaker(bind=engine)() as db:
+        first, created = dedup.ingest(db, SystemEvent, values, idempotency_key="job-1")
+        assert created
+        dedup.reset()
+        assert dedup.ingest(db, SystemEvent, values, idempotency_key="job-1") == (first, False)
+
+        migrate("postgres_db2", engine)
+        now[0] += 60  # past SCHEMA_RECHECK_SECONDS
+        dedup._window.clear()
+        assert dedup.ingest(db, SystemEvent, values, idempotency_key="job-1") == (first, False)
+        assert dedup.counts["duplicates_conflict"] == 2
+        assert dedup._schema[(str(engine.url), "system_events")][0]  # the second time through ON CONFLICT
+        assert db.query(SystemEvent).count() == 1
+
+
+def test_a_current_schema_needs_nothing(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db1.db'}")
+    Analytics.metadata.create_all(bind=engine)  # unique=True made a constraint, not uq_analytics_idempotency_key
+    assert [step.description for step in pending("postgres_db1", engine)] == [
+        "create full-text index on user_logs (user_agent)"  # never made by create_all
+    ]
+    migrate("postgres_db1", engine)
+    assert pending("postgres_db1", engine) == []
+
+
+def test_sqlite_tables_are_rebuilt_with_autoincrement(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'app.db'}")
+    metadata = MetaData()
+    revocations = TokenRevocation.__table__.to_metadata(metadata)
+    revocations.dialect_options["sqlite"]["autoincrement"] = False  # as created before the option
+    metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(revocations.insert().values(id=5, kind="token", key="t1", revoked_at=1.0, expires_at=2.0))
+
+    assert "rebuild token_revocations with AUTOINCREMENT ids" in [step.description for step in pending("sqlite", engine)]
+    migrate("sqlite", engine)
+    assert pending("sqlite", engine) == []
+    with engine.begin() as conn:
+        assert conn.execute(text("SELECT id, key FROM token_revocations")).all() == [(5, "t1")]
+        conn.execute(text("DELETE FROM token_revocations"))
+        conn.execute(TokenRevocation.__table__.insert().values(kind="token", key="t2", revoked_at=1.0, expires_at=2.0))
+        assert conn.execute(text("SELECT id FROM token_revocations")).scalar() == 6
+    assert "ix_token_revocations_expires_at" in {index["name"] for index in inspect(engine).get_indexes("token_revocations")}
@@ -0,0 +1,47 @@
+import asyncio
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import PostgresDB1Base
+from app.core.exceptions import InvalidFieldsException
+from app.core.projection import project_columns
+from app.models.postgres_db1 import Analytics
+from app.services.postgres_db1_service import get_user_analytics_rows
+
+
+@pytest.fixture
+def db1():
+    """In-memory SQLite stand-in for PostgreSQL Database 1"""
+    engine = create_engine("sqlite://")
+    PostgresDB1Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def test_project_columns_keeps_table_order_and_rejects_unknown():
+    assert [c.key for c in project_columns(Analytics, "event_type, id")] == ["id", "event_type"]
+    assert [c.key for c in project_columns(Analytics)] == ["id", "user_id", "event_type", "event_data", "timestamp"]
+    assert project_columns(Analytics, ", ") == project_columns(Analytics)
+    with pytest.raises(InvalidFieldsException) as exc:
+        project_columns(Analytics, "id,password,idempotency_key")
+    assert exc.value.status_code == 400
+    assert "password" in exc.value.detail and "idempotency_key" in exc.value.detail.split("Allowed")[0]
+
+
+def test_rows_path_returns_only_requested_columns(db1):
+    db1.add_all([Analytics(user_id=1, event_type="click"), Analytics(user_id=2, event_type="view")])
+    db1.commit()
+    db1.expunge_all()
+
+    rows = asyncio.run(get_user_analytics_rows(user_id=2, fields="user_id,event_type", db=db1))
+    assert rows == [{"user_id": 2, "event_type": "view"}]
+    # Plain rows, nothing loaded into the session's identity map
+    assert len(db1.identity_map) == 0
+
+
+def test_empty_fields_lists_every_column(client):
+    response = client.get("/api/v1/postgres-demo/analytics", params={"fields": ","})
+    assert response.status_code == 200
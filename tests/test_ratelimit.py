@@ -0,0 +1,73 @@
+from unittest.mock import patch
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app.core.database import SQLiteBase
+from app.core.ratelimit import DatabaseBackend, MemoryBackend, Rate, limiter
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_rate_parse():
+    rate = Rate.parse("5/minute")
+    assert (rate.count, rate.period) == (5, 60)
+    with pytest.raises(ValueError):
+        Rate.parse("5/fortnight")
+
+
+def test_memory_token_bucket_refills():
+    clock = FakeClock()
+    backend = MemoryBackend(clock=clock)
+    rate = Rate(2, 10)
+    assert backend.hit("k", rate) == 0
+    assert backend.hit("k", rate) == 0
+    assert backend.hit("k", rate) == pytest.approx(5.0)
+    clock.now += 5
+    assert backend.hit("k", rate) == 0
+    assert backend.hit("other", rate) == 0
+
+
+def test_database_sliding_window(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'limits.db'}")
+    SQLiteBase.metadata.create_all(bind=engine)
+    clock = FakeClock(600.0)  # start of a 60s window
+    backend = DatabaseBackend(sessionmaker(bind=engine), clock=clock)
+    rate = Rate(3, 60)
+
+    assert [backend.hit("k", rate) for _ in range(3)] == [0, 0, 0]
+    assert backend.hit("k", rate) > 0
+    # Halfway into the next window, half of the previous 4 hits still count
+    clock.now += 90
+    assert backend.hit("k", rate) == 0
+    assert backend.hit("k", rate) > 0
+
+
+def test_login_rejected_before_any_password_check(client: TestClient):
+    with patch("app.services.auth_service.verify_password", return_value=False) as verify, \
+            patch("app.services.auth_service.AuthService.authenticate_user", return_value=None) as authenticate:
+        statuses = [
+            client.post("/api/v1/auth/login", data={"username": "victim@example.com", "password": "guess"}).status_code
+            for _ in range(7)
+        ]
+    assert statuses == [401] * 5 + [429] * 2
+    assert authenticate.call_count == 5
+    assert verify.call_count == 0
+
+    # The web form shares the username budget and re-renders with the error
+    response = client.post("/auth/login", data={"email": "VICTIM@example.com", "password": "guess"})
+    assert "Too many requests" in response.text
+    assert int(response.headers["retry-after"]) > 0
+    assert limiter.metrics()["rejected"] == {"login:username": 3}
+
+
+def test_metrics_endpoint(admin_client: TestClient):
+    response = admin_client.get("/api/v1/metrics/")
+    assert response.status_code == 200
+    assert response.json()["rate_limit"]["allowed"]["login"] == 1
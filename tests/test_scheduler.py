@@ -0,0 +1,147 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+from app.core.database import SQLiteBase
+from app.core.scheduler import CronSchedule, IntervalSchedule, Scheduler
+from app.models.user import User
+from app.services import maintenance_service
+from app.services.maintenance_service import purge_expired_activation_tokens, purge_inactive_registrations
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scheduler.db'}")
+    SQLiteBase.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def forgotten(monkeypatch):
+    """(what, user id) for each deleted user the purge cleans up after"""
+    calls = []
+    for name in ("revoke_user_sessions", "revoke_user_tokens"):
+        monkeypatch.setattr(maintenance_service, name, lambda user_id, name=name: calls.append((name, user_id)))
+    monkeypatch.setattr(maintenance_service.user_index, "discard", lambda user_id: calls.append(("discard", user_id)))
+    return calls
+
+
+def test_cron_schedule_next_after():
+    start = datetime(2024, 1, 31, 23, 59, 30)
+    assert CronSchedule("*/15 * * * *").next_after(start) == datetime(2024, 2, 1, 0, 0)
+    assert CronSchedule("30 3 * * *").next_after(start) == datetime(2024, 2, 1, 3, 30)
+    # 2024-02-04 is a Sunday
+    assert CronSchedule("0 9 * * 0").next_after(start) == datetime(2024, 2, 4, 9, 0)
+    assert CronSchedule("0 0 1 3,6 *").next_after(start) == datetime(2024, 3, 1, 0, 0)
+    with pytest.raises(ValueError):
+        CronSchedule("61 * * * *")
+
+
+def test_leader_lease_is_exclusive_until_released(session_factory):
+    first = Scheduler(session_factory, worker_id="a")
+    second = Scheduler(session_factory, worker_id="b")
+    assert first._elect() is True
+    assert second._elect() is False
+    assert first._elect() is True  # renewal
+    first._release()
+    assert second._elect() is True
+    assert first._elect() is False
+
+
+def test_run_records_history(session_factory):
+    scheduler = Scheduler(session_factory, worker_id="a")
+    scheduler.add("count_users", IntervalSchedule(hours=1), lambda db: db.query(User).count())
+    scheduler.add("broken", IntervalSchedule(hours=1), lambda db: 1 / 0)
+
+    assert asyncio.run(scheduler.run("count_users"))["result"] == 0
+    assert asyncio.run(scheduler.run("broken"))["status"] == "failed"
+
+    runs = scheduler.recent_runs()
+    assert [(r.job_name, r.status) for r in runs] == [("broken", "failed"), ("count_users", "succeeded")]
+    assert runs[0].error.startswith("ZeroDivisionError")
+    assert runs[1].result == "0" and runs[1].finished_at is not None
+
+
+def test_a_failed_start_record_does_not_leave_the_job_running(session_factory, monkeypatch):
+    scheduler = Scheduler(session_factory, worker_id="a")
+    ran = []
+    scheduler.add("job", IntervalSchedule(hours=1), ran.append)
+
+    def locked(*args):
+        raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(scheduler, "_record_start", locked)
+    assert asyncio.run(scheduler.run("job"))["status"] == "failed"
+    assert not scheduler.jobs["job"].running and ran == []
+    monkeypatch.undo()
+    assert asyncio.run(scheduler.run("job"))["status"] == "succeeded" and len(ran) == 1
+
+
+def test_due_jobs_run_only_on_the_leader(session_factory):
+    async def scenario():
+        leader = Scheduler(session_factory, worker_id="leader")
+        standby = Scheduler(session_factory, worker_id="standby")
+        calls = []
+        for scheduler in (leader, standby):
+            scheduler.add("tick", IntervalSchedule(seconds=0.05), lambda db, s=scheduler: calls.append(s.worker_id))
+        await leader.start()
+        await asyncio.sleep(0.05)
+        await standby.start()
+        await asyncio.sleep(0.4)
+        await standby.stop()
+        await leader.stop()
+        return calls
+
+    calls = asyncio.run(scenario())
+    assert calls and set(calls) == {"leader"}
+
+
+def test_purge_jobs_work_in_bounded_batches(session_factory, forgotten):
+    now = datetime.utcnow()
+    db = session_factory()
+
+    def user(name, active, expires, superuser=False):
+        return User(email=f"{name}@example.com", username=name, hashed_password="x", is_active=active,
+                    is_superuser=superuser, activation_token=f"token-{name}", activation_token_expires=expires)
+
+    db.add_all([
+        user("active1", True, now - timedelta(hours=1)),
+        user("active2", True, now - timedelta(hours=2)),
+        user("active3", True, now + timedelta(hours=1)),  # not expired yet
+        user("stale", False, now - timedelta(days=30)),
+        user("recent", False, now - timedelta(days=1)),  # still within retention
+        user("root", False, now - timedelta(days=30), superuser=True),
+    ])
+    db.commit()
+
+    assert purge_expired_activation_tokens(db, batch_size=1, max_batches=1) == 1
+    assert purge_expired_activation_tokens(db, batch_size=1) == 1
+    assert purge_inactive_registrations(db, batch_size=1) == 1
+
+    tokens = {u.username: u.activation_token for u in db.query(User).all()}
+    assert tokens == {"active1": None, "active2": None, "active3": "token-active3",
+                      "recent": "token-recent", "root": "token-root"}
+    db.close()
+
+
+def test_purged_registrations_are_forgotten(session_factory, forgotten):
+    db = session_factory()
+    stale = User(email="stale@example.com", username="stale", hashed_password="x", is_active=False,
+                 activation_token="token", activation_token_expires=datetime.utcnow() - timedelta(days=30))
+    db.add(stale)
+    db.commit()
+    stale_id = stale.id
+
+    assert purge_inactive_registrations(db) == 1
+    assert sorted(forgotten) == [("discard", stale_id), ("revoke_user_sessions", stale_id),
+                                 ("revoke_user_tokens", stale_id)]
+    db.close()
+
+
+def test_admin_scheduler_panel(admin_client: TestClient):
+    response = admin_client.get("/admin/scheduler")
+    assert response.status_code == 200
+    assert "purge_expired_activation_tokens" in response.text
+    assert "purge_inactive_registrations" in response.text
@@ -0,0 +1,109 @@
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import PostgresDB2Base, create_postgres_db1_session, create_postgres_db2_session
+from app.core.exceptions import SearchIndexMissingException
+from app.core.search import SEARCHABLE, ensure_search_index, search
+from app.models.postgres_db1 import UserLog
+from app.models.postgres_db2 import SystemEvent
+
+URL = "/api/v1/postgres-demo"
+
+
+@pytest.fixture
+def db2(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        db.add(SystemEvent(event_type="db", severity="ERROR", message="connection timeout to primary"))
+        db.commit()
+        ensure_search_index(SEARCHABLE["system_events"], engine)  # indexes rows already there
+        yield db
+
+
+def test_index_follows_inserts_updates_and_deletes(db2):
+    spec = SEARCHABLE["system_events"]
+    assert [row["id"] for row in search(db2, spec, "timeout")["results"]] == [1]
+
+    db2.add_all([
+        SystemEvent(event_type="db", severity="ERROR", message="Query timed out after 30s"),
+        SystemEvent(event_type="web", severity="INFO", message="request served"),
+    ])
+    db2.commit()
+    assert [row["id"] for row in search(db2, spec, "timeouts")["results"]] == [1]  # stemmed
+    assert [row["id"] for row in search(db2, spec, "time")["results"]] == [2]
+
+    db2.get(SystemEvent, 3).message = "request timeout"
+    db2.delete(db2.get(SystemEvent, 1))
+    db2.commit()
+    assert [row["id"] for row in search(db2, spec, "timeout")["results"]] == [3]
+
+
+def test_ranking_highlighting_and_filters(db2):
+    spec = SEARCHABLE["system_events"]
+    db2.add_all([
+        SystemEvent(event_type="db", severity="WARNING", message="disk <nearly> full on replica"),
+        SystemEvent(event_type="db", severity="ERROR", message="disk full disk full disk full"),
+    ])
+    db2.commit()
+    assert [row["id"] for row in search(db2, spec, '"disk full"')["results"]] == [3]  # a phrase
+    results = search(db2, spec, "disk full")["results"]
+    assert [row["id"] for row in results] == [3, 2]
+    assert results[0]["score"] > results[1]["score"]
+    assert "<mark>disk</mark> <mark>full</mark>" in results[0]["highlight"]
+    assert "&lt;nearly&gt;" in results[1]["highlight"]
+    assert search(db2, spec, "disk replica")["results"][0]["id"] == 2
+    assert search(db2, spec, '"full disk" OR NEAR(')["results"] == []  # user input is never query syntax
+    assert [row["id"] for row in search(db2, spec, "disk", [SystemEvent.severity == "WARNING"])["results"]] == [2]
+    with pytest.raises(ValueError):
+        search(db2, spec, '  ""  ')
+
+
+def test_keyset_pagination(db2):
+    spec = SEARCHABLE["system_events"]
+    db2.add_all([
+        SystemEvent(event_type="job", severity="INFO", message="job finished " + "ok " * (n % 4))
+        for n in range(23)
+    ])
+    db2.commit()
+    for sort in ("rank", "recent"):
+        seen, cursor = [], None
+        while True:
+            page = search(db2, spec, "job", limit=5, cursor=cursor, sort=sort)
+            seen += [row["id"] for row in page["results"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert sorted(seen) == list(range(2, 25)) and len(seen) == 23
+        if sort == "recent":
+            assert seen == sorted(seen, reverse=True)
+    with pytest.raises(ValueError):
+        search(db2, spec, "job", cursor=search(db2, spec, "job", limit=1)["next_cursor"], sort="recent")
+
+
+def test_search_before_the_index_is_built(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        with pytest.raises(SearchIndexMissingException) as exc:
+            search(db, SEARCHABLE["system_events"], "timeout")
+        assert exc.value.status_code == 503 and "scripts/migrate.py" in exc.value.detail
+        ensure_search_index(SEARCHABLE["system_events"], engine)
+        assert search(db, SEARCHABLE["system_events"], "timeout")["results"] == []
+
+
+def test_search_endpoints(client: TestClient):
+    with create_postgres_db2_session() as db:
+        db.add(SystemEvent(event_type="search-test", severity="ERROR", message="payment gateway unreachable"))
+        db.commit()
+    with create_postgres_db1_session() as db:
+        db.add(UserLog(user_id=1, action="search-test", user_agent="Mozilla/5.0 (X11; Linux x86_64) Firefox/120.0"))
+        db.commit()
+
+    events = client.get(f"{URL}/system-events/search", params={"q": "gateway", "event_type": "search-test"}).json()
+    assert [row["message"] for row in events["results"]] == ["payment gateway unreachable"]
+    assert events["results"][0]["highlight"] == "payment <mark>gateway</mark> unreachable"
+    logs = client.get(f"{URL}/user-logs/search", params={"q": "firefox", "action": "search-test"}).json()
+    assert len(logs["results"]) >= 1 and logs["next_cursor"] is None
+    assert client.get(f"{URL}/system-events/search", params={"q": "x", "cursor": "bogus"}).status_code == 400
@@ -0,0 +1,128 @@
+from types import SimpleNamespace
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core import sessions
+from app.core.database import SQLiteBase
+from app.core.sessions import DatabaseSessionStore, MemorySessionStore, ServerSessionMiddleware
+from app.models.user import User
+from app.schemas.user import UserUpdate
+from app.services.user_service import UserService
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_client(store, max_age: int = 3600, refresh_after: int = 300) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(ServerSessionMiddleware, store=store, max_age=max_age, refresh_after=refresh_after)
+
+    @app.get("/login/{user_id}")
+    async def login(request: Request, user_id: int):
+        request.session["user"] = {"id": user_id, "username": f"user{user_id}"}
+        return {}
+
+    @app.get("/me")
+    async def me(request: Request):
+        return request.session.get("user")
+
+    @app.get("/logout")
+    async def logout(request: Request):
+        request.session.clear()
+        return {}
+
+    return TestClient(app)
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, tmp_path):
+    clock = FakeClock()
+    if request.param == "memory":
+        return MemorySessionStore(clock=clock)
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.db'}")
+    SQLiteBase.metadata.create_all(bind=engine)
+    return DatabaseSessionStore(sessionmaker(bind=engine), clock=clock)
+
+
+def test_cookie_holds_only_a_session_id(store):
+    client = make_client(store)
+    response = client.get("/login/1")
+    session_id = response.cookies["session"]
+    assert len(session_id) == 22
+    assert "user1" not in response.headers["set-cookie"]
+    assert client.get("/me").json() == {"id": 1, "username": "user1"}
+
+    client.get("/logout")
+    assert store.get(session_id) is None
+    assert client.get("/me").json() is None
+
+
+def test_sliding_expiry_renews_at_most_once_per_interval(store):
+    client = make_client(store, max_age=3600, refresh_after=300)
+    session_id = client.get("/login/1").cookies["session"]
+
+    # Unchanged session within the refresh interval: no Set-Cookie, no write
+    assert "set-cookie" not in client.get("/me").headers
+    store.clock.now += 301
+    assert "set-cookie" in client.get("/me").headers
+    assert store.get(session_id)[1] == store.clock.now + 3600
+
+    # Idle past the TTL: the session is gone
+    store.clock.now += 3601
+    assert client.get("/me").json() is None
+
+
+def test_bulk_revocation_and_update(store):
+    clients = [make_client(store) for _ in range(3)]
+    clients[0].get("/login/1")
+    clients[1].get("/login/1")
+    clients[2].get("/login/2")
+
+    assert store.update_user(1, {"id": 1, "username": "renamed"}) == 2
+    assert clients[0].get("/me").json()["username"] == "renamed"
+
+    assert store.delete_for_user(1) == 2
+    assert clients[0].get("/me").json() is None
+    assert clients[1].get("/me").json() is None
+    assert clients[2].get("/me").json()["id"] == 2
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemorySessionStore(max_entries=2)
+    for session_id in ("a", "b", "c"):
+        store.set(session_id, "{}", 1, 60)
+    assert store.get("a") is None
+    assert store.get("c") is not None
+    assert store.delete_for_user(1) == 2
+
+
+def test_user_service_revokes_sessions_on_deactivate_and_delete(db, monkeypatch):
+    store = MemorySessionStore()
+    monkeypatch.setattr(sessions, "session_store", store)
+    user = User(email="a@example.com", username="alice", hashed_password="x", is_active=True)
+    db.add(user)
+    db.commit()
+    store.set("s1", '{"user": {"id": %d}}' % user.id, user.id, 60)
+
+    UserService(db).update_user(user.id, UserUpdate(full_name="Alice"))
+    assert '"full_name": "Alice"' in store.get("s1")[0]
+
+    UserService(db).update_user(user.id, UserUpdate(is_active=False))
+    assert store.get("s1") is None
+
+    store.set("s2", "{}", user.id, 60)
+    assert UserService(db).delete_user(user.id)
+    assert store.get("s2") is None
+
+
+def test_helpers_are_noops_with_cookie_sessions(monkeypatch):
+    monkeypatch.setattr(sessions, "session_store", None)
+    assert sessions.revoke_user_sessions(1) == 0
+    assert sessions.sync_user_sessions(SimpleNamespace(id=1, is_active=False)) == 0
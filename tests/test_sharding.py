@@ -0,0 +1,156 @@
+from unittest.mock import patch
+import pytest
+from sqlalchemy import MetaData, create_engine, delete, event, select
+from app.core.sharding import ShardRouter
+from app.models.settings import Settings
+from app.models.user import User
+from app.schemas.settings import SettingsCreate
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.settings_service import SettingsService
+from app.services.user_service import UserService
+
+ID_RANGE = 1000
+
+
+@pytest.fixture
+def router(tmp_path):
+    engines = [
+        create_engine(f"sqlite:///{tmp_path / f'shard{i}.db'}", connect_args={"check_same_thread": False})
+        for i in range(3)
+    ]
+    router = ShardRouter(engines, id_range=ID_RANGE)
+    router.create_all()
+    yield router
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def users(router):
+    with patch("app.services.user_service.EmailService.send_activation_email"), \
+            patch("app.services.user_service.get_password_hash", return_value="x"), \
+            router.session() as db:
+        service = UserService(db)
+        for i in range(30):
+            service.create_user(UserCreate(
+                email=f"user{i}@example.com", username=f"user{i:02d}", password="secret123",
+                full_name=None if i % 5 == 0 else f"Name {29 - i:02d}"
+            ))
+    return router
+
+
+def count_queries(router):
+    counts = {}
+    for shard_id, engine in router.engines.items():
+        event.listen(engine, "before_cursor_execute",
+                     lambda *args, shard_id=shard_id: counts.__setitem__(shard_id, counts.get(shard_id, 0) + 1))
+    return counts
+
+
+def test_users_spread_with_ids_from_their_shard_range(users):
+    for shard_id, engine in users.engines.items():
+        with engine.connect() as conn:
+            ids = conn.execute(select(User.id)).scalars().all()
+        assert ids, f"shard {shard_id} got no users"
+        assert all(users.shard_for_user_id(user_id) == shard_id for user_id in ids)
+
+
+def _unsharded_app_db(path, *ids):
+    """A users table as created before sharding: no AUTOINCREMENT, no sqlite_sequence"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    metadata = MetaData()
+    users = User.__table__.to_metadata(metadata)
+    users.dialect_options["sqlite"]["autoincrement"] = False
+    metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for user_id in ids:
+            conn.execute(users.insert().values(
+                id=user_id, email=f"old{user_id}@example.com", username=f"old{user_id}", hashed_password="x"
+            ))
+    return engine
+
+
+def test_sharding_an_existing_database(tmp_path):
+    engines = [_unsharded_app_db(tmp_path / "app.db", 1, 2)] + [
+        create_engine(f"sqlite:///{tmp_path / f'shard{i}.db'}", connect_args={"check_same_thread": False})
+        for i in (1, 2)
+    ]
+    router = ShardRouter(engines, id_range=ID_RANGE)
+    router.create_all()
+    with engines[0].begin() as conn:
+        assert conn.execute(select(User.email).order_by(User.id)).scalars().all() == [
+            "old1@example.com", "old2@example.com"
+        ]
+        conn.execute(delete(User))
+        conn.execute(User.__table__.insert().values(email="new@example.com", username="new", hashed_password="x"))
+        assert conn.execute(select(User.id)).scalar() == 3  # not 1 again
+
+    overlapping = [engines[0], _unsharded_app_db(tmp_path / "overlap.db", 5)]
+    with pytest.raises(RuntimeError, match="outside its range"):
+        ShardRouter(overlapping, id_range=ID_RANGE).create_all()
+
+
+def test_lookup_by_id_touches_one_shard(users):
+    with users.session() as db:
+        user = UserService(db).get_user_by_email("user7@example.com")
+        counts = count_queries(users)
+        assert UserService(db).get_user(user.id).email == "user7@example.com"
+        assert db.get(User, user.id) is not None
+        assert sum(counts.values()) == 1
+        assert UserService(db).get_user(2 * ID_RANGE + 999) is None
+
+
+def test_listing_merge_sorts_across_shards(users):
+    with users.session() as db:
+        service = UserService(db)
+        all_names = [u.full_name for u in service.get_users(limit=100, sort="full_name")]
+        expected = sorted(all_names, key=lambda name: (name is not None, name))
+        assert all_names == expected
+        page = service.get_users(skip=10, limit=5, sort="full_name", order="desc")
+        assert [u.full_name for u in page] == expected[::-1][10:15]
+        ids = [u.id for u in service.get_users(skip=0, limit=100)]
+        assert ids == sorted(ids) and len(ids) == 30
+
+
+def test_updates_stay_on_the_users_shard(users, db):
+    # db: token revocations on update/delete are written to the main database
+    with users.session() as sharded:
+        service = UserService(sharded)
+        user = service.get_user_by_username("user03")
+        service.update_user(user.id, UserUpdate(email="moved@example.com"))
+        sharded.expunge_all()
+        assert service.get_user_by_email("moved@example.com").id == user.id
+        assert service.delete_user(user.id)
+        assert service.get_user(user.id) is None
+
+
+def test_settings_placed_by_name(router):
+    with router.session() as db:
+        service = SettingsService(db)
+        for i in range(12):
+            service.create_setting(SettingsCreate(setting_name=f"key{i:02d}", value=str(12 - i)))
+        counts = count_queries(router)
+        assert service.get_setting("key05").value == "7"
+        assert sum(counts.values()) == 1
+        assert [s.setting_name for s in service.get_settings(sort="setting_name", order="desc")] == \
+            [f"key{i:02d}" for i in reversed(range(12))]
+        for shard_id, engine in router.engines.items():
+            with engine.connect() as conn:
+                names = conn.execute(select(Settings.setting_name)).scalars().all()
+            assert all(router.shard_for_key(name) == shard_id for name in names)
+
+
+def test_bulk_import_insert_routes_rows_by_email(router):
+    from app.services.user_import_service import UserImportService
+    rows = [
+        {"email": f"bulk{i}@example.com", "username": f"bulk{i}", "hashed_password": "x", "is_active": False}
+        for i in range(20)
+    ]
+    UserImportService(router.session)._insert(rows)
+    total = 0
+    for shard_id, engine in router.engines.items():
+        with engine.connect() as conn:
+            found = conn.execute(select(User.id, User.email)).all()
+        assert all(router.shard_for_key(row.email) == shard_id == router.shard_for_user_id(row.id) for row in found)
+        total += len(found)
+    assert total == 20
@@ -0,0 +1,116 @@
+import random
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.core.analytics_sketches import AnalyticsSketches, analytics_sketches
+from app.core.database import create_postgres_db1_session
+from app.core.sketches import HyperLogLog, TDigest, TopK
+from app.models.postgres_db1 import Analytics
+
+NOW = datetime(2026, 3, 2, 12, 30, tzinfo=timezone.utc).timestamp()
+
+
+def at(hours_ago: float) -> datetime:
+    return datetime.fromtimestamp(NOW - hours_ago * 3600, timezone.utc)
+
+
+def test_sketches_stay_within_their_error_bounds():
+    rng = random.Random(7)
+    users = HyperLogLog(11)
+    for user_id in range(50000):
+        users.add(user_id)
+    assert abs(users.count() - 50000) <= 3 * users.relative_error * 50000
+
+    other = HyperLogLog(11)
+    for user_id in range(25000, 75000):
+        other.add(user_id)
+    users.merge(other)
+    assert abs(users.count() - 75000) <= 3 * users.relative_error * 75000
+
+    top = TopK(capacity=20)
+    events = [f"type{int(rng.paretovariate(1.2))}" for _ in range(20000)]
+    for event in events:
+        top.add(event)
+    exact = sorted(((events.count(e), e) for e in set(events)), reverse=True)[:3]
+    for (key, estimate), (count, event) in zip(TopK.combine([top], 3), exact):
+        assert key == event and count <= estimate <= count + top.sketch.epsilon * len(events)
+
+    values = sorted(rng.expovariate(1 / 50) for _ in range(20000))
+    halves = TDigest(), TDigest()
+    for n, value in enumerate(values):
+        halves[n % 2].add(value)
+    buffered = len(halves[0]._buffer)
+    digest = TDigest()
+    digest.merge(*halves)
+    assert len(halves[0]._buffer) == buffered  # merging leaves the sources alone
+    for q in (0.5, 0.9, 0.99):
+        exact_value = values[int(q * len(values))]
+        assert abs(digest.quantile(q) - exact_value) <= 0.02 * exact_value
+    assert digest.quantile(0) == values[0] and digest.quantile(1) == values[-1]
+
+
+def test_a_full_top_k_keeps_its_heavy_hitters():
+    top = TopK(capacity=2)
+    for key in ("a", "b"):
+        top.add(key, 100)
+    top.add("c")
+    assert top.candidates == {"a": 100, "b": 100}
+    top.add("c", 150)
+    assert set(top.candidates) == {"a", "c"} or set(top.candidates) == {"b", "c"}
+
+
+def test_buckets_partition_queries_and_expire():
+    clock = [NOW]
+    sketches = AnalyticsSketches(bucket_seconds=3600, retention_seconds=48 * 3600, max_keys=2,
+                                 clock=lambda: clock[0])
+    for user_id in range(100):
+        sketches.add(user_id, "view", {"ms": user_id, "page": "home"}, at(0))
+    for user_id in range(50, 80):
+        sketches.add(user_id, "click", {"ms": 1000 + user_id}, at(30))
+    sketches.add(2, "signup", None, at(30))
+    sketches.add(1, "purchase", {"ms": 5, "total": 9.5, "coupon": True}, at(30))  # third type: not tracked
+    sketches.add(1, "view", None, at(72))  # past retention
+
+    assert abs(sketches.distinct_users()["distinct_users"] - 100) <= 2  # last 24 hours
+    week = sketches.distinct_users(since=at(7 * 24))
+    assert abs(week["distinct_users"] - 100) <= 2 and week["events"] == 132
+    assert abs(sketches.distinct_users(since=at(48), until=at(1), event_type="click")["distinct_users"] - 30) <= 1
+    assert not sketches.distinct_users(since=at(48), event_type="purchase")["complete"]
+
+    top = sketches.top_event_types(k=2, since=at(48))
+    assert [(row["event_type"], row["count"]) for row in top["event_types"]] == [("view", 100), ("click", 30)]
+
+    latency = sketches.percentiles("ms", [0.5], since=at(48))
+    assert latency["count"] == 131 and latency["min"] == 0 and latency["max"] == 1079
+    assert sketches.percentiles("coupon", [0.5], since=at(48))["count"] == 0  # booleans are not numbers
+
+    clock[0] += 24 * 3600
+    sketches.expire()
+    assert sketches.distinct_users(since=at(7 * 24))["events"] == 100
+    assert sketches.metrics()["expired_buckets"] == 1
+
+
+def test_endpoints_answer_from_incrementally_refreshed_sketches(client: TestClient):
+    with create_postgres_db1_session() as db:
+        db.execute(Analytics.__table__.delete())
+        db.commit()
+    analytics_sketches.reset()
+    url = "/api/v1/postgres-demo/analytics"
+    assert client.get(f"{url}/distinct-users").status_code == 503
+
+    with create_postgres_db1_session() as db:
+        db.add_all([Analytics(user_id=n % 7, event_type="search", event_data={"results": n}) for n in range(40)])
+        db.commit()
+    assert analytics_sketches.refresh(create_postgres_db1_session) == 40
+    with create_postgres_db1_session() as db:
+        db.add(Analytics(user_id=99, event_type="export", event_data={"results": 1000}))
+        db.commit()
+    assert analytics_sketches.refresh(create_postgres_db1_session) == 1
+
+    assert client.get(f"{url}/distinct-users").json()["distinct_users"] == 8
+    assert client.get(f"{url}/distinct-users", params={"event_type": "export"}).json()["distinct_users"] == 1
+    top = client.get(f"{url}/top-event-types", params={"k": 1}).json()
+    assert top["event_types"] == [{"event_type": "search", "count": 40, "max_overestimate": 0}]
+    assert top["events"] == 41
+    percentiles = client.get(f"{url}/percentiles", params={"field": "results", "q": "0,1"}).json()
+    assert percentiles["percentiles"] == {"p0": 0, "p100": 1000}
+    assert client.get(f"{url}/percentiles", params={"field": "results", "q": "2"}).status_code == 400
@@ -0,0 +1,195 @@
+import asyncio
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import Column, MetaData, Table, create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.core.database import PostgresDB1Base, PostgresDB2Base
+from app.core.migrations import AddColumn, migrate
+from app.core.spool import IngestSpool, is_unavailable, read_segment
+from app.models.postgres_db1 import Analytics
+from app.models.postgres_db2 import SystemEvent
+from app.services.postgres_db2_service import create_system_event
+
+
+def _spool(tmp_path, engines=None, **kwargs) -> IngestSpool:
+    return IngestSpool(str(tmp_path / "spool"), fsync_seconds=0, replay_batch=2, engines=engines, enabled=True, **kwargs)
+
+
+def _unreachable():
+    """A session whose database cannot be opened, standing in for a PostgreSQL outage"""
+    return sessionmaker(bind=create_engine("sqlite:////nonexistent-directory/db2.db"))()
+
+
+def _count(engine, model) -> int:
+    with engine.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(model))
+
+
+def test_segments_rotate_and_a_torn_record_ends_a_segment(tmp_path):
+    spool = _spool(tmp_path, segment_bytes=300)
+    at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    for n in range(6):
+        spool.append("system_events", {"event_type": "t", "message": "x" * 50, "n": n}, at)
+    spool.sync()
+    segments = spool.segments()
+    assert len(segments) > 1
+    with open(segments[0], "ab") as f:
+        f.write(b"\x10\x00\x00\x00garbage")  # a write cut short by a crash
+    records = [record for path in segments for record in read_segment(open(path, "rb"))]
+    assert [record["values"]["n"] for record in records] == list(range(6))
+    assert records[0]["at"] == at.isoformat()
+
+
+def test_outage_is_spooled_and_replayed_exactly_once(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    spool = _spool(tmp_path, engines={"postgres_db2": lambda: engine})
+
+    async def ingest(n, **kwargs):
+        with _unreachable() as db:
+            return await create_system_event("job", "ERROR", f"job {n} failed", {"n": n}, db=db, **kwargs)
+
+    monkeypatch.setattr("app.services.postgres_db2_service.ingest_spool", spool)
+    events = [asyncio.run(ingest(n)) for n in range(5)]
+    asyncio.run(ingest(0, idempotency_key="job-0"))
+    assert all(event.id is None and event.created_at is not None for event in events)
+    assert spool.down == {"postgres_db2"}
+    assert spool.counts["spooled"] == 6
+
+    assert spool.replay() == 6
+    assert spool.down == set() and spool.segments() == []
+    assert spool.metrics()["last_replay"]["rows"] == 6
+    with engine.connect() as conn:
+        rows = conn.execute(select(SystemEvent.message, SystemEvent.created_at).order_by(SystemEvent.id)).all()
+    assert [message for message, _ in rows][:5] == [f"job {n} failed" for n in range(5)]
+    assert rows[0].created_at.replace(tzinfo=None) == events[0].created_at.replace(tzinfo=None)  # when spooled
+
+    # A segment replayed again (a crash before it was deleted) adds nothing
+    spool.append("system_events", {"event_type": "job", "severity": "INFO", "message": "again",
+                                   "event_metadata": None, "idempotency_key": "k" * 64}, datetime.now(timezone.utc))
+    spool.replay()
+    spool.append("system_events", {"event_type": "job", "severity": "INFO", "message": "again",
+                                   "event_metadata": None, "idempotency_key": "k" * 64}, datetime.now(timezone.utc))
+    spool.replay()
+    assert _count(engine, SystemEvent) == 7
+
+
+def test_failed_replay_keeps_the_spool(tmp_path):
+    engine = create_engine("sqlite:////nonexistent-directory/db1.db")
+    spool = _spool(tmp_path, engines={"postgres_db1": lambda: engine})
+    with _unreachable() as db:
+        row, created = spool.ingest(db, Analytics, {"user_id": 1, "event_type": "click", "event_data": None})
+    assert created and row.id is None
+    assert spool.replay() == 0
+    assert spool.counts["failed_replays"] == 1 and len(spool.segments()) == 1
+    assert spool.down == {"postgres_db1"}
+
+    healthy = create_engine(f"sqlite:///{tmp_path / 'db1.db'}")
+    PostgresDB1Base.metadata.create_all(bind=healthy)
+    spool.engines["postgres_db1"] = lambda: healthy
+    assert spool.replay() == 1
+    assert _count(healthy, Analytics) == 1
+
+
+def test_one_database_down_does_not_hold_back_the_other(tmp_path):
+    db2 = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    PostgresDB2Base.metadata.create_all(bind=db2)
+    db1 = create_engine("sqlite:////nonexistent-directory/db1.db")
+    spool = _spool(tmp_path, engines={"postgres_db1": lambda: db1, "postgres_db2": lambda: db2}, segment_bytes=200)
+    spool.down = {"postgres_db1", "postgres_db2"}
+    for n in range(4):
+        with _unreachable() as db:
+            spool.ingest(db, Analytics, {"user_id": n, "event_type": "click", "event_data": None})
+            spool.ingest(db, SystemEvent, {"event_type": "job", "severity": "INFO", "message": f"m{n}",
+                                           "event_metadata": None})
+    assert len(spool.segments()) > 1
+
+    assert spool.replay() == 4
+    assert _count(db2, SystemEvent) == 4 and spool.down == {"postgres_db1"}
+    kept = [record["table"] for path in spool.segments() for record in read_segment(open(path, "rb"))]
+    assert kept.count("analytics") == 4  # segments with rows for postgres_db1 stay
+
+    healthy = create_engine(f"sqlite:///{tmp_path / 'db1.db'}")
+    PostgresDB1Base.metadata.create_all(bind=healthy)
+    spool.engines["postgres_db1"] = lambda: healthy
+    spool.replay()
+    assert _count(healthy, Analytics) == 4 and _count(db2, SystemEvent) == 4
+    assert spool.down == set() and spool.segments() == []
+
+
+def test_rejected_records_are_quarantined(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    PostgresDB2Base.metadata.create_all(bind=engine)
+    spool = _spool(tmp_path, engines={"postgres_db2": lambda: engine})
+    at = datetime.now(timezone.utc)
+    for n, message in enumerate(["a", None, "c"]):  # message is NOT NULL
+        spool.append("system_events", {"event_type": "job", "severity": "INFO", "message": message,
+                                       "event_metadata": None, "idempotency_key": f"{n:064d}"}, at)
+    assert spool.replay() == 2
+    assert _count(engine, SystemEvent) == 2 and spool.segments() == []
+    [quarantine] = (tmp_path / "spool").glob("*.quarantine")
+    assert [record["values"]["message"] for record in read_segment(open(quarantine, "rb"))] == [None]
+    assert spool.metrics()["quarantined"] == 1
+
+
+def _system_events_without(engine, *missing):
+    """system_events as an older release created it: no unique index, without ``missing`` columns"""
+    Table("system_events", MetaData(), *[
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in SystemEvent.__table__.c if column.name not in missing
+    ]).create(bind=engine)
+
+
+def _append_events(spool, *messages):
+    at = datetime.now(timezone.utc)
+    for n, message in enumerate(messages):
+        spool.append("system_events", {"event_type": "job", "severity": "INFO", "message": message,
+                                       "event_metadata": {"n": n}, "idempotency_key": f"{n:064d}"}, at)
+
+
+def test_unmigrated_database_keeps_the_spool(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    _system_events_without(engine)  # idempotency_key is there, its unique index isn't yet
+    spool = _spool(tmp_path, engines={"postgres_db2": lambda: engine})
+    _append_events(spool, "a", "b")
+
+    assert spool.replay() == 0
+    assert len(spool.segments()) == 1 and spool.quarantined() == []
+    migrate("postgres_db2", engine)
+    assert spool.replay() == 2
+    assert _count(engine, SystemEvent) == 2 and spool.segments() == []
+
+
+def test_quarantined_records_replay_once_fixed(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    _system_events_without(engine, "event_metadata")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE UNIQUE INDEX uq_system_events_idempotency_key ON system_events (idempotency_key)")
+    spool = _spool(tmp_path, engines={"postgres_db2": lambda: engine})
+    _append_events(spool, "a", None, "c")  # message is NOT NULL
+    assert spool.replay() == 0
+    [quarantine] = spool.quarantined()
+    assert spool.replay_quarantine(quarantine) == (0, 3)
+
+    with engine.begin() as conn:
+        AddColumn(SystemEvent, "event_metadata").apply(conn)
+    assert spool.replay_quarantine(quarantine) == (2, 1)
+    assert [record["values"]["message"] for record in read_segment(open(quarantine, "rb"))] == [None]
+    assert _count(engine, SystemEvent) == 2
+
+
+def test_schema_errors_are_not_outages(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db2.db'}")
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE system_events (id INTEGER PRIMARY KEY, event_type TEXT)")
+    spool = _spool(tmp_path)
+    with sessionmaker(bind=engine)() as db:
+        with pytest.raises(OperationalError) as exc:
+            spool.ingest(db, SystemEvent, {"event_type": "job", "severity": "INFO", "message": "m",
+                                           "event_metadata": None})
+    assert not is_unavailable(exc.value) and spool.down == set()
+    with _unreachable() as db:
+        with pytest.raises(OperationalError) as exc:
+            db.execute(select(1))
+    assert is_unavailable(exc.value)
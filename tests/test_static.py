@@ -0,0 +1,36 @@
+import gzip
+import json
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.core.static import IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles, load_manifest
+
+
+def _static_client(directory) -> TestClient:
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(directory)), name="static")
+    return TestClient(app)
+
+
+def test_serves_precompressed_variant_with_immutable_caching(tmp_path):
+    content = b"body { color: red; }" * 50
+    (tmp_path / "app.0123456789ab.css").write_bytes(content)
+    (tmp_path / "app.0123456789ab.css.gz").write_bytes(gzip.compress(content))
+    client = _static_client(tmp_path)
+
+    response = client.get("/static/app.0123456789ab.css", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-type"].startswith("text/css")
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.content == content
+
+    response = client.get("/static/app.0123456789ab.css", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.content == content
+
+
+def test_manifest_missing_or_present(tmp_path):
+    assert load_manifest(str(tmp_path / "missing")) == {}
+    (tmp_path / "manifest.json").write_text(json.dumps({"app.css": "app.0123456789ab.css"}))
+    assert load_manifest(str(tmp_path)) == {"app.css": "app.0123456789ab.css"}
@@ -0,0 +1,64 @@
+import math
+from datetime import datetime, timedelta, timezone
+import pytest
+from fastapi.testclient import TestClient
+from app.core.database import create_postgres_db2_session
+from app.core.timeseries import fill_gaps, lttb
+from app.models.postgres_db2 import PerformanceMetric
+
+START = datetime(2026, 3, 1, tzinfo=timezone.utc)
+URL = "/api/v1/postgres-demo/performance-metrics/series"
+
+
+@pytest.fixture
+def cpu_metric():
+    """cpu samples every 10 s for the first 5 minutes from START, then nothing until minute 8"""
+    with create_postgres_db2_session() as db:
+        db.execute(PerformanceMetric.__table__.delete())
+        db.add_all([
+            PerformanceMetric(metric_name="cpu", metric_value=float(n), recorded_at=START + timedelta(seconds=10 * n))
+            for n in range(30)
+        ] + [
+            PerformanceMetric(metric_name="cpu", metric_value=100.0, recorded_at=START + timedelta(minutes=8)),
+            PerformanceMetric(metric_name="memory", metric_value=5.0, recorded_at=START),
+        ])
+        db.commit()
+
+
+def test_series_is_aggregated_per_bucket_and_gap_filled(client: TestClient, cpu_metric):
+    params = {"metric_name": "cpu", "start": START.isoformat(), "end": (START + timedelta(minutes=9)).isoformat()}
+    series = client.get(URL, params={**params, "step": 60}).json()
+    assert series["timestamps"][:2] == [START.isoformat(), (START + timedelta(minutes=1)).isoformat()]
+    assert series["values"] == [2.5, 8.5, 14.5, 20.5, 26.5, None, None, None, 100.0]
+
+    counts = client.get(URL, params={**params, "step": 120, "aggregation": "count", "fill": "zero"}).json()
+    assert counts["values"] == [12, 12, 6, 0, 1]
+
+    linear = client.get(URL, params={**params, "step": 60, "aggregation": "max", "fill": "linear"}).json()
+    assert linear["values"][4:] == [29.0, 46.75, 64.5, 82.25, 100.0]
+
+    assert client.get(URL, params={**params, "step": 1, "end": "2026-03-30T00:00:00+00:00"}).status_code == 400
+    assert client.get(URL, params={**params, "aggregation": "median"}).status_code == 400
+
+
+def test_lttb_keeps_spikes_and_endpoints(client: TestClient, cpu_metric):
+    points = [(float(x), math.sin(x / 40)) for x in range(5000)]
+    points[3333] = (3333.0, 25.0)
+    picked = lttb(iter(points), len(points), 50)
+    assert len(picked) == 50 and picked[0] == points[0] and picked[-1] == points[-1]
+    assert points[3333] in picked
+    assert [x for x, _ in picked] == sorted(x for x, _ in picked)
+    assert lttb(points[:40], 40, 50) == points[:40]
+
+    series = client.get(URL, params={
+        "metric_name": "cpu", "start": START.isoformat(), "end": (START + timedelta(hours=1)).isoformat(),
+        "downsample": "lttb", "points": 5
+    }).json()
+    assert series["source_points"] == 31 and len(series["values"]) == 5
+    assert series["values"][0] == 0.0 and series["values"][-1] == 100.0
+
+
+def test_fill_gaps():
+    assert fill_gaps({1: 2.0, 4: 8.0}, 6, "previous") == [None, 2.0, 2.0, 2.0, 8.0, 8.0]
+    assert fill_gaps({1: 2.0, 4: 8.0}, 6, "linear") == [None, 2.0, 4.0, 6.0, 8.0, None]
+    assert fill_gaps({0: 1.0}, 3, "zero") == [1.0, 0, 0]
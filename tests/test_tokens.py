@@ -0,0 +1,139 @@
+import hashlib
+import hmac
+import json
+import time
+from unittest.mock import patch
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, delete
+from sqlalchemy.orm import sessionmaker
+from app.core import tokens
+from app.core.database import SQLiteBase
+from app.core.security import get_password_hash
+from app.core.tokens import KeyRing, RevocationList, TokenError, create_access_token, decode_token, parse_keys
+from app.models.token_revocation import TokenRevocation
+from app.models.user import User
+
+
+@pytest.fixture
+def user(db):
+    user = User(
+        email="api@example.com",
+        username="apiuser",
+        hashed_password=get_password_hash("secret123"),
+        full_name="Api User",
+        is_active=True,
+        is_superuser=True
+    )
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    return user
+
+
+def login(client: TestClient) -> str:
+    response = client.post("/api/v1/auth/login", data={"username": "api@example.com", "password": "secret123"})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+
+def test_round_trip_and_rejections():
+    token = create_access_token({"sub": "a@example.com"}, expires_in=60)
+    claims = decode_token(token)
+    assert claims["sub"] == "a@example.com" and claims["jti"]
+
+    header, payload, signature = token.split(".")
+    bad_signature = signature[:-2] + ("AA" if signature[-2:] != "AA" else "BB")
+    for bad, reason in [
+        ("not-a-token", "malformed"),
+        (f"{header}.{payload}.{bad_signature}", "signature"),
+        (create_access_token({"sub": "a@example.com"}, expires_in=-1), "expired"),
+    ]:
+        with pytest.raises(TokenError) as e:
+            decode_token(bad)
+        assert e.value.reason == reason
+
+
+def test_key_rotation_accepts_old_kid_and_legacy_tokens(monkeypatch):
+    monkeypatch.setattr(tokens, "keyring", KeyRing(parse_keys("old:s1", "unused")))
+    old_token = create_access_token({"sub": "a@example.com"}, expires_in=60)
+
+    # Token from before key ids (python-jose): no kid, signed with the then-current secret
+    header = tokens._b64encode(b'{"alg":"HS256","typ":"JWT"}')
+    payload = tokens._b64encode(json.dumps({"sub": "b@example.com", "exp": int(time.time()) + 60}).encode())
+    signature = tokens._b64encode(hmac.new(b"s1", header + b"." + payload, hashlib.sha256).digest())
+    legacy = b".".join((header, payload, signature)).decode()
+    assert decode_token(legacy)["sub"] == "b@example.com"
+
+    monkeypatch.setattr(tokens, "keyring", KeyRing(parse_keys("new:s2,old:s1", "unused")))
+    assert decode_token(old_token)["sub"] == "a@example.com"
+    assert decode_token(create_access_token({"sub": "c@example.com"}))["sub"] == "c@example.com"
+
+    monkeypatch.setattr(tokens, "keyring", KeyRing(parse_keys("new:s2", "unused")))
+    with pytest.raises(TokenError):
+        decode_token(old_token)
+
+
+def test_revocations_reach_other_workers(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'revocations.db'}")
+    SQLiteBase.metadata.create_all(bind=engine)
+    worker_a = RevocationList(sessionmaker(bind=engine), refresh_interval=0)
+    worker_b = RevocationList(sessionmaker(bind=engine), refresh_interval=3600)
+    now = time.time()
+    claims = {"jti": "t1", "uid": 7, "iat": int(now) - 10, "exp": now + 60}
+
+    assert not worker_b.is_revoked(claims)
+    worker_a.revoke_user(7)
+    assert worker_a.is_revoked(claims)
+    assert worker_a.is_revoked({**claims, "jti": "t2"})
+    assert not worker_a.is_revoked({**claims, "iat": int(now) + 10})
+    # worker_b only sees it after its refresh interval
+    assert not worker_b.is_revoked(claims)
+    worker_b.refresh()
+    assert worker_b.is_revoked(claims)
+
+    worker_a.revoke_token("t3", now + 60)
+    worker_b.refresh()
+    assert worker_b.is_revoked({"jti": "t3", "uid": 8, "iat": int(now)})
+
+
+def test_revocations_after_a_purge_reach_other_workers(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'revocations.db'}")
+    SQLiteBase.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    worker_a = RevocationList(session_factory, refresh_interval=0)
+    worker_b = RevocationList(session_factory, refresh_interval=3600)
+    now = time.time()
+    worker_a.revoke_token("t1", now + 60)
+    worker_a.revoke_token("t2", now + 60)
+    worker_b.refresh()
+
+    with session_factory() as db:
+        db.execute(delete(TokenRevocation))  # as purge_expired_token_revocations would, once they expire
+        db.commit()
+    worker_a.revoke_token("t3", now + 60)
+    worker_b.refresh()
+    assert worker_b.is_revoked({"jti": "t3", "uid": 8, "iat": int(now)})
+
+
+def test_api_authorizes_from_claims_without_user_lookup(client: TestClient, user):
+    token = login(client)
+    with patch("app.core.auth.UserService.get_user_by_email") as lookup:
+        response = client.get("/api/v1/metrics/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    lookup.assert_not_called()
+    assert response.json()["tokens"]["claims"] >= 1
+
+
+def test_logout_and_user_changes_revoke_tokens(client: TestClient, user, db):
+    token = login(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/api/v1/auth/logout", headers=headers).status_code == 204
+    assert client.get("/api/v1/metrics/", headers=headers, follow_redirects=False).status_code == 303
+
+    # Any edit to a claim carried by the user's tokens revokes them
+    headers = {"Authorization": f"Bearer {login(client)}"}
+    from app.schemas.user import UserUpdate
+    from app.services.user_service import UserService
+    UserService(db).update_user(user.id, UserUpdate(full_name="Renamed"))
+    assert client.get("/api/v1/metrics/", headers=headers, follow_redirects=False).status_code == 303
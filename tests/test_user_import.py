@@ -0,0 +1,68 @@
+import json
+import time
+from fastapi.testclient import TestClient
+from app.core.security import verify_password
+from app.models.user import User
+
+
+def _wait_for_job(client: TestClient, job_id: str) -> dict:
+    for _ in range(300):
+        job = client.get(f"/api/v1/jobs/{job_id}").json()
+        if job["status"] in ("succeeded", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError("import job did not finish")
+
+
+def test_csv_import_validates_hashes_and_inserts(admin_client: TestClient, db):
+    csv_body = (
+        "email,username,password,full_name\n"
+        "a@example.com,alice,secret-a,Alice\n"
+        "not-an-email,bob,secret-b,\n"
+        "c@example.com,carol,secret-c,\n"
+        "admin@example.com,admin2,secret-d,\n"  # email already registered
+        "c@example.com,carol2,secret-e,\n"  # duplicate within the file
+    )
+    response = admin_client.post(
+        "/api/v1/users/import",
+        files={"file": ("users.csv", csv_body, "text/csv")}
+    )
+    assert response.status_code == 202
+    job = _wait_for_job(admin_client, response.json()["id"])
+
+    assert job["status"] == "succeeded"
+    assert job["counters"]["processed"] == 5
+    assert job["counters"]["created"] == 2
+    assert job["counters"]["emails_sent"] == 2
+    assert sorted(error["line"] for error in job["errors"]) == [3, 5, 6]
+
+    alice = db.query(User).filter(User.username == "alice").one()
+    assert alice.full_name == "Alice"
+    assert alice.is_active is False and alice.activation_token
+    assert verify_password("secret-a", alice.hashed_password)
+
+
+def test_ndjson_import_and_streaming_export(admin_client: TestClient):
+    lines = [json.dumps({"email": f"u{i}@example.com", "username": f"u{i}", "password": "pw"}) for i in range(3)]
+    response = admin_client.post(
+        "/api/v1/users/import",
+        files={"file": ("users.ndjson", "\n".join(lines + ["{broken"]), "application/x-ndjson")}
+    )
+    job = _wait_for_job(admin_client, response.json()["id"])
+    assert job["counters"]["created"] == 3
+    assert job["error_count"] == 1
+
+    response = admin_client.get("/api/v1/users/export?format=ndjson")
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [user["username"] for user in exported] == ["admin", "u0", "u1", "u2"]
+    assert "hashed_password" not in exported[0]
+
+    response = admin_client.get("/api/v1/users/export?format=csv")
+    assert response.text.splitlines()[0] == "id,email,username,full_name,is_active,is_superuser,created_at"
+    assert len(response.text.splitlines()) == 5
+
+
+def test_import_rejects_unknown_format(admin_client: TestClient):
+    response = admin_client.post("/api/v1/users/import", files={"file": ("users.xlsx", b"x", "application/octet-stream")})
+    assert response.status_code == 400
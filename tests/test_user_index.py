@@ -0,0 +1,72 @@
+from unittest.mock import patch
+from fastapi.testclient import TestClient
+from app.core.user_index import CHUNK_BITS, UserIdIndex, user_index
+from app.models.user import User
+from tests.conftest import TestingSessionLocal
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_bitmap_membership_and_memory():
+    index = UserIdIndex()
+    index.rebuild(range(1, 1_000_001))
+    assert len(index) == 1_000_000
+    assert index.memory_bytes == 16 * CHUNK_BITS // 8  # 128 KiB
+    assert index.contains(1) and index.contains(1_000_000)
+    assert index.contains(1_000_001) is None
+
+    index.discard(500)
+    assert index.contains(500) is None
+    # Sharded id ranges only allocate the chunks in use
+    index.add(3_000_000_001)
+    assert index.contains(3_000_000_001)
+    assert index.memory_bytes == 17 * CHUNK_BITS // 8
+
+
+def test_unknown_ids_hit_the_database_once_per_ttl(db):
+    user = User(email="a@example.com", username="alice", hashed_password="x")
+    db.add(user)
+    db.commit()
+    clock = FakeClock()
+    index = UserIdIndex(negative_ttl=30, clock=clock)
+    index.load(TestingSessionLocal)
+
+    assert index.exists(user.id, db)
+    assert not index.exists(999, db)
+    assert not index.exists(999, db)
+    assert index.counts["lookups"] == 1
+
+    # Created elsewhere after the negative answer: seen once the TTL passes
+    db.add(User(id=999, email="b@example.com", username="bob", hashed_password="x"))
+    db.commit()
+    clock.now += 31
+    assert index.exists(999, db)
+    assert index.contains(999)
+
+
+def test_ingestion_validates_without_querying_sqlite(client: TestClient, db):
+    user = User(email="a@example.com", username="alice", hashed_password="x")
+    db.add(user)
+    db.commit()
+    user_index.add(user.id)
+
+    with patch("app.api.v1.endpoints.postgres_demo.create_user_log") as create_log, \
+            patch.object(user_index, "exists", wraps=user_index.exists) as exists, \
+            patch("app.core.user_index.select", side_effect=AssertionError("database lookup")):
+        create_log.return_value.id = 1
+        response = client.post("/api/v1/postgres-demo/user-log", json={"user_id": user.id, "action": "login"})
+    assert response.status_code == 200
+    assert exists.call_count == 1
+
+    # Unknown id: one SQLite lookup, then rejected without writing the log
+    with patch("app.api.v1.endpoints.postgres_demo.create_user_log") as create_log:
+        client.post("/api/v1/postgres-demo/user-log", json={"user_id": 424242, "action": "login"})
+        client.post("/api/v1/postgres-demo/user-log", json={"user_id": 424242, "action": "login"})
+    create_log.assert_not_called()
+    assert user_index.contains(424242) is False